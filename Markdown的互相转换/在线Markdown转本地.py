@@ -6,6 +6,7 @@ Markdown链接转换器
 
 import re
 import os
+import sys
 import urllib.parse
 from pathlib import Path
 import requests
@@ -13,6 +14,12 @@ import hashlib
 import time
 from urllib.parse import urlparse
 
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.bandwidth import DOWNLOAD, get_default_bandwidth_governor
+from pan123_common.transport import create_requests_session
+
 class MarkdownConverter:
     """
     Markdown链接转换器类
@@ -52,8 +59,8 @@ class MarkdownConverter:
         # 创建必要的文件夹（images 和 attachments）
         self.create_directories()
 
-        # 初始化下载会话（用于保持连接复用，提高下载效率）
-        self.session = requests.Session()
+        # 初始化下载会话（带有界连接池，保持连接复用，提高下载效率）
+        self.session = create_requests_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
@@ -315,6 +322,8 @@ class MarkdownConverter:
         with open(local_path, 'wb') as f:
             for chunk in response.iter_content(chunk_size=8192):
                 if chunk:
+                    # 与同一进程中的其他传输共用下载限速
+                    get_default_bandwidth_governor().throttle(DOWNLOAD, len(chunk))
                     f.write(chunk)
                     downloaded_size += len(chunk)
 
@@ -21,13 +21,25 @@ import sys
 import shutil
 import argparse
 import json
-import http.client
-import hashlib
 import math
-import time
+import hashlib
+from concurrent.futures import Future
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional, Set, Any
-from urllib.parse import urlparse, unquote
+from urllib.parse import unquote
+
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.auth import TokenManager, get_access_token
+from pan123_common.client import ApiClient
+from pan123_common.bandwidth import get_default_bandwidth_governor
+from pan123_common.completion import CompletionTracker
+from pan123_common.filemap import FileMap, map_file
+from pan123_common.hash_cache import get_default_hash_cache
+from pan123_common.hashing import hash_range
+from pan123_common.multipart import MultipartEncoder
+from pan123_common.transport import PooledTransport, PooledResponse, get_default_transport
 
 
 def load_config(config_path: str = None) -> Dict[str, str]:
@@ -60,8 +72,15 @@ class Pan123Manager:
     """123云盘管理器基类"""
 
     def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
-                 client_secret: Optional[str] = None):
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None,
+                 slice_mmap: bool = False):
         self.api_base = "open-api.123pan.com"
+        # 所有请求经由共享连接池发送，复用keep-alive连接
+        self.transport = transport or get_default_transport()
+        # 分片是否以文件映射窗口发送（零拷贝；文件在上传期间被截断会使进程收到 SIGBUS，默认关闭）
+        self.slice_mmap = slice_mmap
+        # 进程内共享的带宽控制器：图片和附件的上传请求体按配置的上传速率限速发送
+        self.bandwidth = get_default_bandwidth_governor()
 
         if access_token:
             self.access_token = access_token
@@ -70,40 +89,29 @@ class Pan123Manager:
         else:
             raise ValueError("必须提供access_token或者client_id和client_secret")
 
+        # 令牌失效（401）时由 token_manager 自动重新认证并重放请求
+        self.token_manager = TokenManager(self.access_token, client_id, client_secret, self.transport)
+        self.api_client = ApiClient(self.transport, self.token_manager)
+
     def _get_access_token(self, client_id: str, client_secret: str) -> str:
         """获取访问令牌"""
         print("正在获取访问令牌...")
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
-            payload = json.dumps({
-                "clientID": client_id,
-                "clientSecret": client_secret
-            })
-            headers = {
-                'Platform': 'open_platform',
-                'Content-Type': 'application/json'
-            }
-            conn.request("POST", "/api/v1/access_token", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                access_token = result.get("data", {}).get("accessToken")
-                if access_token:
-                    print("访问令牌获取成功")
-                    return access_token
-                else:
-                    raise Exception("响应中未找到访问令牌")
-            else:
-                raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+            # 优先使用本地缓存的令牌（按client_id在多个进程间共享，过期前自动换新）
+            access_token = get_access_token(client_id, client_secret, self.transport)
+            print("访问令牌获取成功")
+            return access_token
         except Exception as e:
             print(f"获取访问令牌时发生错误: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
+
+    def _request(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                 host: Optional[str] = None) -> PooledResponse:
+        """通过共享连接池发送请求（按接口QPS限流，令牌失效时自动重新认证），host为空时使用API服务器地址"""
+        response = self.api_client.request(method, host or self.api_base, path, body, headers)
+        # 重新认证后同步新令牌，后续构造的请求头直接使用新令牌
+        self.access_token = self.token_manager.access_token
+        return response
 
     def _get_headers(self) -> Dict[str, str]:
         """获取通用请求头"""
@@ -126,31 +134,24 @@ class Pan123Manager:
         return f"{float_size:.1f} {units[unit_index]}"
 
     def _calculate_md5(self, file_path: str) -> str:
-        """计算文件MD5值"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        """计算文件MD5值（文件未变化时直接使用持久化哈希缓存中的结果）"""
+        return get_default_hash_cache().md5(file_path)
 
-    def _calculate_slice_md5(self, data: bytes) -> str:
-        """计算分片MD5值"""
-        return hashlib.md5(data).hexdigest()
+    def _calculate_slice_md5(self, file_path: str, start: int, size: int) -> str:
+        """计算文件分片的MD5值（按块读取，不把分片载入内存）"""
+        return hash_range(file_path, start, size)
 
     def find_directory(self, dir_name: str, parent_id: str = "") -> Optional[str]:
         """查找目录"""
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
             payload = json.dumps({
                 "parentFileID": parent_id,
                 "limit": 100,
                 "type": 1
             })
-            conn.request("POST", "/api/v1/oss/file/list", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("POST", "/api/v1/oss/file/list", payload, headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -166,25 +167,19 @@ class Pan123Manager:
         except Exception as e:
             print(f"查找目录时发生错误: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     def create_directory(self, dir_name: str, parent_id: str = "") -> Optional[str]:
         """创建目录"""
         print(f"正在创建目录: {dir_name}")
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
             payload = json.dumps({
                 "name": [dir_name],
                 "parentID": parent_id,
                 "type": 1
             })
-            conn.request("POST", "/upload/v1/oss/file/mkdir", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("POST", "/upload/v1/oss/file/mkdir", payload, headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -202,9 +197,6 @@ class Pan123Manager:
         except Exception as e:
             print(f"创建目录时发生错误: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     def get_or_create_directory(self, dir_name: str, parent_id: str = "") -> Optional[str]:
         """获取或创建目录"""
@@ -218,10 +210,13 @@ class ImageHostingManager(Pan123Manager):
     """123云盘图床管理器"""
 
     def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
-                 client_secret: Optional[str] = None):
-        super().__init__(access_token, client_id, client_secret)
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None,
+                 slice_mmap: bool = False):
+        super().__init__(access_token, client_id, client_secret, transport, slice_mmap)
         self.SUPPORTED_FORMATS = ['png', 'gif', 'jpeg', 'jpg', 'tiff', 'tif', 'webp', 'svg', 'bmp']
         self.MAX_IMAGE_SIZE = 100 * 1024 * 1024  # 100MB
+        # 需要异步轮询的上传由同一个跟踪器按指数退避成批检查
+        self.completions = CompletionTracker(self._poll_async_result)
 
     def create_file(self, file_path: str, parent_file_id: str = "") -> Dict[str, Any]:
         """创建文件（检测秒传）"""
@@ -241,9 +236,7 @@ class ImageHostingManager(Pan123Manager):
         file_md5 = self._calculate_md5(file_path)
         print(f"正在创建文件: {filename}")
 
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
             payload = json.dumps({
                 "parentFileID": parent_file_id,
@@ -252,9 +245,8 @@ class ImageHostingManager(Pan123Manager):
                 "size": file_size,
                 "type": 1
             })
-            conn.request("POST", "/upload/v1/oss/file/create", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("POST", "/upload/v1/oss/file/create", payload, headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -275,23 +267,17 @@ class ImageHostingManager(Pan123Manager):
         except Exception as e:
             print(f"创建文件时发生错误: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     def get_upload_url(self, preupload_id: str, slice_no: int) -> Optional[str]:
         """获取上传地址"""
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
             payload = json.dumps({
                 "preuploadID": preupload_id,
                 "sliceNo": slice_no
             })
-            conn.request("POST", "/upload/v1/oss/file/get_upload_url", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("POST", "/upload/v1/oss/file/get_upload_url", payload, headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -302,58 +288,48 @@ class ImageHostingManager(Pan123Manager):
         except Exception as e:
             print(f"获取上传地址时发生错误: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
-    def upload_slice(self, upload_url: str, file_path: str, start: int, size: int) -> bool:
-        """上传分片到预签名URL"""
-        conn = None
+    def upload_slice(self, upload_url: str, file_path: str, start: int, size: int,
+                     file_map: Optional[FileMap] = None) -> bool:
+        """上传分片到预签名URL（提供文件映射时直接发送映射上的窗口，不复制分片数据）"""
         try:
-            parsed = urlparse(upload_url)
-            host = parsed.netloc
-            path = parsed.path + ('?' + parsed.query if parsed.query else '')
-
-            with open(file_path, 'rb') as f:
-                f.seek(start)
-                slice_data = f.read(size)
+            if file_map is not None:
+                file_map.check(start, size)
+                slice_data = file_map.window(start, size)
+            else:
+                with open(file_path, 'rb') as f:
+                    f.seek(start)
+                    slice_data = f.read(size)
 
-            conn = http.client.HTTPSConnection(host)
             headers = {'Content-Type': 'application/octet-stream'}
-            conn.request("PUT", path, slice_data, headers)
-            response = conn.getresponse()
-            response.read()
+            response = self.transport.request_url("PUT", upload_url, self.bandwidth.wrap_upload(slice_data), headers)
 
             return response.status == 200
         except Exception as e:
             print(f"上传分片时发生错误: {e}")
             return False
-        finally:
-            if conn:
-                conn.close()
 
-    def upload_complete(self, preupload_id: str) -> Dict[str, Any]:
-        """确认上传完成"""
+    def submit_complete(self, preupload_id: str) -> Future:
+        """确认上传完成，服务器需要异步处理时不等待结果"""
         print("正在确认上传完成...")
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
             payload = json.dumps({"preuploadID": preupload_id})
 
-            conn.request("POST", "/upload/v1/oss/file/upload_complete", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("POST", "/upload/v1/oss/file/upload_complete", payload, headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
                 data_info = result.get("data", {})
                 if data_info.get("async", False):
                     print("需要异步轮询上传结果...")
-                    return self.poll_upload_result(preupload_id)
+                    return self.completions.submit(preupload_id, self.completions.initial_delay)
                 elif data_info.get("completed", False) and data_info.get("fileID"):
                     print(f"上传完成! 文件ID: {data_info.get('fileID')}")
-                    return {"success": True, "fileID": data_info.get("fileID")}
+                    future = Future()
+                    future.set_result({"success": True, "fileID": data_info.get("fileID")})
+                    return future
                 else:
                     raise Exception("上传未完成")
             else:
@@ -361,47 +337,44 @@ class ImageHostingManager(Pan123Manager):
         except Exception as e:
             print(f"确认上传完成时发生错误: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
+
+    def upload_complete(self, preupload_id: str) -> Dict[str, Any]:
+        """确认上传完成"""
+        return self.submit_complete(preupload_id).result()
+
+    def _poll_async_result(self, preupload_id: str) -> Optional[Dict[str, Any]]:
+        """检查一次异步上传的结果（由 completions 跟踪器调用），尚未完成时返回None"""
+        headers = self._get_headers()
+        payload = json.dumps({"preuploadID": preupload_id})
+
+        response = self._request("POST", "/upload/v1/oss/file/upload_async_result", payload, headers)
+        result = json.loads(response.data.decode("utf-8"))
+
+        if result.get("code") != 0:
+            raise Exception(f"轮询失败: {result.get('message', '未知错误')}")
+
+        data_info = result.get("data", {})
+        if data_info.get("completed", False):
+            file_id = data_info.get("fileID")
+            print(f"上传完成! 文件ID: {file_id}")
+            return {"success": True, "fileID": file_id}
+        return None
 
     def poll_upload_result(self, preupload_id: str, max_retries: int = 30) -> Dict[str, Any]:
-        """异步轮询获取上传结果"""
+        """异步轮询获取上传结果（检查间隔按指数退避增长）"""
         print("开始轮询上传结果...")
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
-            headers = self._get_headers()
-            payload = json.dumps({"preuploadID": preupload_id})
-
-            for i in range(max_retries):
-                conn.request("POST", "/upload/v1/oss/file/upload_async_result", payload, headers)
-                response = conn.getresponse()
-                data = response.read().decode("utf-8")
-                result = json.loads(data)
-
-                if result.get("code") == 0:
-                    data_info = result.get("data", {})
-                    if data_info.get("completed", False):
-                        file_id = data_info.get("fileID")
-                        print(f"上传完成! 文件ID: {file_id}")
-                        return {"success": True, "fileID": file_id}
-                    else:
-                        print(f"上传处理中... ({i+1}/{max_retries})")
-                        time.sleep(1)
-                else:
-                    raise Exception(f"轮询失败: {result.get('message', '未知错误')}")
-
-            raise Exception("轮询超时，上传可能未完成")
+            return self.completions.wait(preupload_id, max_polls=max_retries)
         except Exception as e:
             print(f"轮询上传结果时发生错误: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     def upload_image(self, file_path: str, parent_file_id: str = "") -> Dict[str, Any]:
         """上传图片到图床"""
+        return self.start_upload_image(file_path, parent_file_id).result()
+
+    def start_upload_image(self, file_path: str, parent_file_id: str = "") -> Future:
+        """上传图片到图床，分片传输完成后即返回，不等待服务器异步处理"""
         if not os.path.exists(file_path):
             raise Exception(f"文件不存在: {file_path}")
 
@@ -413,7 +386,9 @@ class ImageHostingManager(Pan123Manager):
         create_result = self.create_file(file_path, parent_file_id)
 
         if create_result.get("reuse", False):
-            return {"success": True, "fileID": create_result.get("fileID")}
+            future = Future()
+            future.set_result({"success": True, "fileID": create_result.get("fileID")})
+            return future
 
         # 需要上传
         preupload_id = create_result.get("preuploadID")
@@ -426,34 +401,36 @@ class ImageHostingManager(Pan123Manager):
         total_slices = math.ceil(file_size / slice_size)
         print(f"开始分片上传，总分片数: {total_slices}")
 
-        # 上传每个分片
-        for slice_no in range(1, total_slices + 1):
-            start_pos = (slice_no - 1) * slice_size
-            current_slice_size = min(slice_size, file_size - start_pos)
-            print(f"正在上传分片 {slice_no}/{total_slices}")
+        # 上传每个分片（开启映射时整个文件只映射一次，各分片发送映射上的窗口）
+        file_map = map_file(file_path) if self.slice_mmap else None
+        try:
+            for slice_no in range(1, total_slices + 1):
+                start_pos = (slice_no - 1) * slice_size
+                current_slice_size = min(slice_size, file_size - start_pos)
+                print(f"正在上传分片 {slice_no}/{total_slices}")
 
-            upload_url = self.get_upload_url(preupload_id, slice_no)
-            if not upload_url:
-                raise Exception(f"获取分片 {slice_no} 上传地址失败")
+                upload_url = self.get_upload_url(preupload_id, slice_no)
+                if not upload_url:
+                    raise Exception(f"获取分片 {slice_no} 上传地址失败")
 
-            if not self.upload_slice(upload_url, file_path, start_pos, current_slice_size):
-                raise Exception(f"分片 {slice_no} 上传失败")
+                if not self.upload_slice(upload_url, file_path, start_pos, current_slice_size, file_map):
+                    raise Exception(f"分片 {slice_no} 上传失败")
 
-            print(f"分片 {slice_no} 上传成功")
+                print(f"分片 {slice_no} 上传成功")
+        finally:
+            if file_map is not None:
+                file_map.close()
 
         print("所有分片上传完成")
-        return self.upload_complete(preupload_id)
+        return self.submit_complete(preupload_id)
 
     def get_image_detail(self, file_id: str) -> Optional[Dict[str, Any]]:
         """获取图片详情"""
         print(f"正在获取图片详情...")
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
-            conn.request("GET", f"/api/v1/oss/file/detail?fileID={file_id}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("GET", f"/api/v1/oss/file/detail?fileID={file_id}", "", headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -464,19 +441,19 @@ class ImageHostingManager(Pan123Manager):
         except Exception as e:
             print(f"获取图片详情时发生错误: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
 
 class DirectLinkManager(Pan123Manager):
     """123网盘直链管理器 - 使用普通文件上传API + 直链API获取下载链接"""
 
     def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
-                 client_secret: Optional[str] = None):
-        super().__init__(access_token, client_id, client_secret)
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None,
+                 slice_mmap: bool = False):
+        super().__init__(access_token, client_id, client_secret, transport, slice_mmap)
         self.MAX_ATTACHMENT_SIZE = 10 * 1024 * 1024 * 1024  # 10GB (普通上传限制)
         self.SINGLE_UPLOAD_LIMIT = 1 * 1024 * 1024 * 1024   # 1GB
+        # 分片上传的完成确认按指数退避轮询
+        self.completions = CompletionTracker(self._poll_complete_v2)
 
     def upload_attachment(self, file_path: str, parent_file_id: int = 0) -> Dict[str, Any]:
         """上传附件到直链目录"""
@@ -524,47 +501,40 @@ class DirectLinkManager(Pan123Manager):
         file_md5 = self._calculate_md5(file_path)
 
         # 创建文件
-        conn = None
-        try:
-            conn = http.client.HTTPSConnection(self.api_base)
-            headers = self._get_headers()
-            headers['Content-Type'] = 'application/json'
-
-            payload = json.dumps({
-                "parentFileID": parent_file_id,
-                "filename": filename,
-                "etag": file_md5,
-                "size": file_size
-            })
-
-            conn.request("POST", "/upload/v2/file/create", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                data_info = result.get("data", {})
-                if data_info.get("reuse", False):
-                    print(f"文件秒传成功! 文件ID: {data_info.get('fileID')}")
-                    return str(data_info.get("fileID"))
-                else:
-                    preupload_id = data_info.get("preuploadID")
-                    slice_size = data_info.get("sliceSize")
-                    servers = data_info.get("servers", [])
+        headers = self._get_headers()
+        headers['Content-Type'] = 'application/json'
+
+        payload = json.dumps({
+            "parentFileID": parent_file_id,
+            "filename": filename,
+            "etag": file_md5,
+            "size": file_size
+        })
+
+        response = self._request("POST", "/upload/v2/file/create", payload, headers)
+        data = response.data.decode("utf-8")
+        result = json.loads(data)
+
+        if result.get("code") == 0:
+            data_info = result.get("data", {})
+            if data_info.get("reuse", False):
+                print(f"文件秒传成功! 文件ID: {data_info.get('fileID')}")
+                return str(data_info.get("fileID"))
+            else:
+                preupload_id = data_info.get("preuploadID")
+                slice_size = data_info.get("sliceSize")
+                servers = data_info.get("servers", [])
 
-                    if not servers:
-                        raise Exception("未获取到上传服务器")
+                if not servers:
+                    raise Exception("未获取到上传服务器")
 
-                    # 上传分片
-                    self._upload_slices_v2(file_path, preupload_id, slice_size, file_size, servers[0])
+                # 上传分片
+                self._upload_slices_v2(file_path, preupload_id, slice_size, file_size, servers[0])
 
-                    # 确认上传完成
-                    return self._upload_complete_v2(preupload_id)
-            else:
-                raise Exception(f"创建文件失败: {result.get('message', '未知错误')}")
-        finally:
-            if conn:
-                conn.close()
+                # 确认上传完成
+                return self._upload_complete_v2(preupload_id)
+        else:
+            raise Exception(f"创建文件失败: {result.get('message', '未知错误')}")
 
     def _upload_slices_v2(self, file_path: str, preupload_id: str, slice_size: int,
                           file_size: int, server: str) -> None:
@@ -572,86 +542,56 @@ class DirectLinkManager(Pan123Manager):
         total_slices = math.ceil(file_size / slice_size)
         print(f"开始分片上传，总分片数: {total_slices}")
 
-        for slice_no in range(1, total_slices + 1):
-            start_pos = (slice_no - 1) * slice_size
-            current_slice_size = min(slice_size, file_size - start_pos)
-            print(f"正在上传分片 {slice_no}/{total_slices}")
-
-            # 读取分片数据并计算MD5
-            with open(file_path, 'rb') as f:
-                f.seek(start_pos)
-                slice_data = f.read(current_slice_size)
-
-            slice_md5 = self._calculate_slice_md5(slice_data)
+        # 开启映射时整个文件只映射一次：分片MD5和请求体都直接使用映射上的窗口，分片数据不复制
+        file_map = map_file(file_path) if self.slice_mmap else None
+        try:
+            for slice_no in range(1, total_slices + 1):
+                start_pos = (slice_no - 1) * slice_size
+                current_slice_size = min(slice_size, file_size - start_pos)
+                print(f"正在上传分片 {slice_no}/{total_slices}")
+
+                # 计算分片MD5（无法映射时按块读取，分片数据在发送时再从文件按块读取）
+                data = file_map.window(start_pos, current_slice_size) if file_map is not None else None
+                if data is not None:
+                    # 先确认文件没有被截断，否则访问映射会导致 SIGBUS
+                    file_map.check(start_pos, current_slice_size)
+                    slice_md5 = hashlib.md5(data).hexdigest()
+                else:
+                    slice_md5 = self._calculate_slice_md5(file_path, start_pos, current_slice_size)
 
-            # 上传分片
-            if not self._upload_slice_v2(server, preupload_id, slice_no, slice_md5, slice_data):
-                raise Exception(f"分片 {slice_no} 上传失败")
+                # 上传分片
+                if not self._upload_slice_v2(server, preupload_id, slice_no, slice_md5,
+                                             file_path, start_pos, current_slice_size, data):
+                    raise Exception(f"分片 {slice_no} 上传失败")
 
-            print(f"分片 {slice_no} 上传成功")
+                print(f"分片 {slice_no} 上传成功")
+        finally:
+            if file_map is not None:
+                file_map.close()
 
-    def _upload_slice_v2(self, server: str, preupload_id: str, slice_no: int,
-                        slice_md5: str, slice_data: bytes) -> bool:
-        """上传分片（使用multipart/form-data格式）"""
-        conn = None
+    def _upload_slice_v2(self, server: str, preupload_id: str, slice_no: int, slice_md5: str,
+                         file_path: str, start_pos: int, size: int,
+                         data: Optional[memoryview] = None) -> bool:
+        """上传分片（使用multipart/form-data格式，部分头单独发送，分片数据为映射窗口或从文件流式发送）"""
         try:
-            # 解析服务器地址
-            parsed = urlparse(server)
-            host = parsed.netloc if parsed.netloc else server.replace('http://', '').replace('https://', '')
-
-            # 构建multipart/form-data
-            boundary = '----WebKitFormBoundary' + ''.join([chr(ord('a') + i % 26) for i in range(16)])
-
-            # 构建表单数据
-            body_parts = []
-
-            # preuploadID字段
-            body_parts.append(f'--{boundary}'.encode())
-            body_parts.append(b'Content-Disposition: form-data; name="preuploadID"')
-            body_parts.append(b'')
-            body_parts.append(preupload_id.encode())
-
-            # sliceNo字段
-            body_parts.append(f'--{boundary}'.encode())
-            body_parts.append(b'Content-Disposition: form-data; name="sliceNo"')
-            body_parts.append(b'')
-            body_parts.append(str(slice_no).encode())
-
-            # sliceMD5字段
-            body_parts.append(f'--{boundary}'.encode())
-            body_parts.append(b'Content-Disposition: form-data; name="sliceMD5"')
-            body_parts.append(b'')
-            body_parts.append(slice_md5.encode())
-
-            # slice文件字段
-            body_parts.append(f'--{boundary}'.encode())
-            body_parts.append(b'Content-Disposition: form-data; name="slice"; filename="slice"')
-            body_parts.append(b'Content-Type: application/octet-stream')
-            body_parts.append(b'')
-            body_parts.append(slice_data)
-
-            # 结束边界
-            body_parts.append(f'--{boundary}--'.encode())
-            body_parts.append(b'')
-
-            # 组合body
-            body = b'\r\n'.join(body_parts)
-
-            # 建立连接
-            if server.startswith('https://'):
-                conn = http.client.HTTPSConnection(host)
+            body = MultipartEncoder()
+            body.add_field("preuploadID", preupload_id)
+            body.add_field("sliceNo", slice_no)
+            body.add_field("sliceMD5", slice_md5)
+            if data is not None:
+                body.add_buffer("slice", "slice", data)
             else:
-                conn = http.client.HTTPConnection(host)
+                body.add_file("slice", "slice", file_path, offset=start_pos, length=size)
 
             headers = {
                 'Authorization': f'Bearer {self.access_token}',
                 'Platform': 'open_platform',
-                'Content-Type': f'multipart/form-data; boundary={boundary}'
+                'Content-Type': body.content_type
             }
 
-            conn.request("POST", "/upload/v2/file/slice", body, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("POST", "/upload/v2/file/slice", self.bandwidth.wrap_upload(body), headers,
+                                     host=server)
+            data = response.data.decode("utf-8")
 
             if response.status == 200:
                 try:
@@ -666,58 +606,40 @@ class DirectLinkManager(Pan123Manager):
         except Exception as e:
             print(f"上传分片时发生错误: {e}")
             return False
-        finally:
-            if conn:
-                conn.close()
 
-    def _upload_complete_v2(self, preupload_id: str) -> str:
-        """确认上传完成"""
-        print("正在确认上传完成...")
+    def _poll_complete_v2(self, preupload_id: str) -> Optional[str]:
+        """检查一次上传是否已完成（由 completions 跟踪器调用），尚未完成时返回None"""
+        headers = self._get_headers()
+        headers['Content-Type'] = 'application/json'
 
-        # 轮询检查上传状态
-        max_retries = 30
-        for retry in range(max_retries):
-            conn = None
-            try:
-                conn = http.client.HTTPSConnection(self.api_base)
-                headers = self._get_headers()
-                headers['Content-Type'] = 'application/json'
-
-                payload = json.dumps({"preuploadID": preupload_id})
-
-                conn.request("POST", "/upload/v2/file/upload_complete", payload, headers)
-                response = conn.getresponse()
-                data = response.read().decode("utf-8")
-                result = json.loads(data)
-
-                if result.get("code") == 0:
-                    data_info = result.get("data", {})
-                    if data_info.get("completed", False) and data_info.get("fileID", 0) != 0:
-                        file_id = data_info.get("fileID")
-                        print(f"上传完成! 文件ID: {file_id}")
-                        return str(file_id)
-                    else:
-                        print(f"上传处理中... ({retry+1}/{max_retries})")
-                        time.sleep(1)
-                else:
-                    raise Exception(f"确认上传完成失败: {result.get('message', '未知错误')}")
-            finally:
-                if conn:
-                    conn.close()
+        payload = json.dumps({"preuploadID": preupload_id})
+
+        response = self._request("POST", "/upload/v2/file/upload_complete", payload, headers)
+        result = json.loads(response.data.decode("utf-8"))
+
+        if result.get("code") != 0:
+            raise Exception(f"确认上传完成失败: {result.get('message', '未知错误')}")
 
-        raise Exception("上传完成确认超时")
+        data_info = result.get("data", {})
+        if data_info.get("completed", False) and data_info.get("fileID", 0) != 0:
+            file_id = data_info.get("fileID")
+            print(f"上传完成! 文件ID: {file_id}")
+            return str(file_id)
+        return None
+
+    def _upload_complete_v2(self, preupload_id: str) -> str:
+        """确认上传完成（检查间隔按指数退避增长）"""
+        print("正在确认上传完成...")
+        return self.completions.wait(preupload_id)
 
     def _get_direct_link(self, file_id: str) -> str:
         """获取文件的直链下载地址"""
         print(f"正在获取直链...")
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", f"/api/v1/direct-link/url?fileID={file_id}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("GET", f"/api/v1/direct-link/url?fileID={file_id}", "", headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -732,22 +654,16 @@ class DirectLinkManager(Pan123Manager):
         except Exception as e:
             print(f"获取直链时发生错误: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     def find_directory(self, dir_name: str, parent_id: int = 0) -> Optional[int]:
         """查找目录（使用普通文件查询API）"""
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             # 使用v2文件列表API
             params = f"?parentFileId={parent_id}&limit=100"
-            conn.request("GET", f"/api/v2/file/list{params}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("GET", f"/api/v2/file/list{params}", "", headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -765,16 +681,11 @@ class DirectLinkManager(Pan123Manager):
         except Exception as e:
             print(f"查找目录时发生错误: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     def create_directory(self, dir_name: str, parent_id: int = 0) -> Optional[int]:
         """创建目录（使用普通文件创建API）"""
         print(f"正在创建目录: {dir_name}")
-        conn = None
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
             headers['Content-Type'] = 'application/json'
 
@@ -783,9 +694,8 @@ class DirectLinkManager(Pan123Manager):
                 "parentID": parent_id
             })
 
-            conn.request("POST", "/upload/v1/file/mkdir", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
+            response = self._request("POST", "/upload/v1/file/mkdir", payload, headers)
+            data = response.data.decode("utf-8")
             result = json.loads(data)
 
             if result.get("code") == 0:
@@ -802,9 +712,6 @@ class DirectLinkManager(Pan123Manager):
         except Exception as e:
             print(f"创建目录时发生错误: {e}")
             return None
-        finally:
-            if conn:
-                conn.close()
 
     def get_or_create_directory(self, dir_name: str, parent_id: int = 0) -> Optional[int]:
         """获取或创建目录"""
@@ -829,13 +736,17 @@ class MarkdownFileConverter:
                 self.direct_link_manager = DirectLinkManager(client_id=client_id, client_secret=client_secret)
             else:
                 config = load_config()
+                get_default_bandwidth_governor().configure(config)
+                slice_mmap = config.get("SLICE_MMAP", "").strip().lower() in ("1", "true", "yes")
                 self.image_manager = ImageHostingManager(
                     client_id=config.get("CLIENT_ID"),
-                    client_secret=config.get("CLIENT_SECRET")
+                    client_secret=config.get("CLIENT_SECRET"),
+                    slice_mmap=slice_mmap
                 )
                 self.direct_link_manager = DirectLinkManager(
                     client_id=config.get("CLIENT_ID"),
-                    client_secret=config.get("CLIENT_SECRET")
+                    client_secret=config.get("CLIENT_SECRET"),
+                    slice_mmap=slice_mmap
                 )
             print("管理器初始化成功")
         except Exception as e:
@@ -978,6 +889,8 @@ class MarkdownFileConverter:
         path_to_cdn = {}
         print(f"开始上传 {len(images)} 个图片到图床...")
 
+        # 先依次传输所有图片（服务器异步处理的结果由跟踪器统一轮询），再逐个取结果和CDN链接
+        started = []
         for i, image_info in enumerate(images, 1):
             image_path = image_info['full_path']
             filename = image_info['filename']
@@ -988,7 +901,14 @@ class MarkdownFileConverter:
                     print(f"跳过 {filename}: 文件大小超过100MB限制")
                     continue
 
-                result = self.image_manager.upload_image(image_path, image_dir_id)
+                started.append((image_info, self.image_manager.start_upload_image(image_path, image_dir_id)))
+            except Exception as e:
+                print(f"{filename} 上传出错: {e}")
+
+        for image_info, future in started:
+            filename = image_info['filename']
+            try:
+                result = future.result()
 
                 if result.get('success') and result.get('fileID'):
                     file_id = result['fileID']
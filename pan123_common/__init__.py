@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘开放平台工具集公共模块
+
+各工具脚本共用的基础设施，通过把项目根目录加入 sys.path 后导入：
+
+    >>> from pan123_common.transport import get_default_transport
+
+模块列表：
+    - transport: 按主机复用keep-alive连接的HTTP传输层
+    - auth: 访问令牌获取、按client_id共享的磁盘缓存和401自动重新认证
+    - storage: 缓存目录、跨进程文件锁和原子写入
+    - rate_limit: 按官方QPS表、按client_id和接口分别限流的令牌桶
+    - retry: 重试策略（幂等性分类、指数退避、重试预算和重试指标）
+    - client: 请求层，组合连接池、限流、令牌重新认证和重试
+    - aio: 基于asyncio标准库流的异步传输层和异步请求层
+    - upload_hosts: 按吞吐和错误率在多个上传服务器之间分配分片
+    - host_probe: 上传服务器延迟探测（并发测量连接和小请求耗时，按有效期缓存排名）
+    - readahead: 分片预读（后台读入有内存上限的共享缓冲池，读盘与发送重叠）
+    - filemap: 文件只读映射（分片以 memoryview 窗口发送，不复制分片数据）
+    - hashing: 一遍读取文件，同时计算etag和分片MD5表
+    - multipart: 流式multipart/form-data编码器，上传时不把文件读入内存
+    - upload_journal: 分片上传的断点续传日志
+    - hash_cache: 按路径、大小、修改时间和inode缓存文件MD5的持久化哈希缓存
+    - upload_strategy: 按文件大小和近期秒传命中率决定是否先通过 create 探测秒传
+    - concurrency: AIMD自适应并发控制（按吞吐加性增，遇到限流或错误时减半）
+    - bandwidth: 上传和下载共用的带宽限制（字节令牌桶，可按时段切换限速）
+    - spool: 标准输入等不可回退数据流的边缓存边哈希（小数据留在内存，大数据写入临时文件）
+    - completion: 上传完成确认的集中轮询（所有等待合并的上传按指数退避成批检查，每个上传一个Future）
+    - hash_service: 并行文件哈希服务（线程池 + 每线程复用的读取缓冲区，可在后台提前计算一批文件）
+    - pipeline: 由有界队列连接的多阶段流水线（各阶段独立的工作线程、背压、逐阶段统计）
+"""
+
+from .transport import PooledTransport, PooledResponse, get_default_transport
+from .auth import TokenCache, TokenManager, get_access_token
+from .rate_limit import RateLimiter, get_default_rate_limiter
+from .retry import RetryPolicy, get_default_retry_policy
+from .client import ApiClient
+from .aio import AsyncTransport, AsyncApiClient
+
+__all__ = [
+    "PooledTransport",
+    "PooledResponse",
+    "get_default_transport",
+    "TokenCache",
+    "TokenManager",
+    "RateLimiter",
+    "get_default_rate_limiter",
+    "RetryPolicy",
+    "get_default_retry_policy",
+    "ApiClient",
+    "AsyncTransport",
+    "AsyncApiClient",
+    "get_access_token",
+]
@@ -0,0 +1,632 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘异步HTTP传输层与请求客户端
+
+功能说明：
+    基于 asyncio 标准库流（asyncio.open_connection + ssl）实现的最小 HTTP/1.1 客户端，
+    供 AsyncPan123Query、AsyncPan123Uploader、AsyncPan123Downloader 使用。
+    单个事件循环即可同时发起成百上千个请求，不再需要为每个并发请求占用一个线程。
+
+主要功能：
+    - 按主机复用连接：与 transport.PooledTransport 相同的keep-alive连接池语义
+    - 有界并发：每个主机同时签出的连接数有上限，超出时协程挂起等待
+    - 响应体：支持 Content-Length、chunked 和"读到连接关闭"三种形式
+    - 流式响应：stream() 按块读取大响应体（下载文件），自动跟随重定向
+    - 流式请求体：multipart.MultipartEncoder 按块从文件读取并写入连接，上传大文件不占用内存
+    - 带宽限制：bandwidth.ThrottledBody 包装的请求体逐块在事件循环中等待限速，不占用线程池
+    - AsyncApiClient：复用同步版的限流表、重试策略和令牌管理，等待改为 asyncio.sleep
+
+使用示例:
+    >>> async def main():
+    ...     transport = AsyncTransport()
+    ...     response = await transport.request("GET", "open-api.123pan.com", "/upload/v2/file/domain",
+    ...                                        headers={'Platform': 'open_platform'})
+    ...     print(response.status, response.data)
+    ...     await transport.close()
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import ssl
+import asyncio
+from email.message import Message
+from typing import Optional, Dict, Any, Tuple, Union, AsyncIterator
+from urllib.parse import urlsplit, urljoin
+
+from .auth import TokenManager, bearer_token, is_token_expired, with_token
+from .bandwidth import ThrottledBody
+from .client import body_code
+from .multipart import is_streaming_body
+from .rate_limit import RateLimiter, get_default_rate_limiter
+from .retry import (RetryPolicy, get_default_retry_policy, response_retry_reason, exception_retry_reason,
+                    parse_retry_after)
+from .transport import PooledResponse, DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
+
+
+# 流式读取响应体时的默认块大小
+DEFAULT_CHUNK_SIZE = 256 * 1024
+
+# 流式请求最多跟随的重定向次数
+MAX_REDIRECTS = 5
+
+# 单行（状态行、响应头、chunk长度行）的最大长度
+_MAX_LINE = 64 * 1024
+
+# 复用空闲连接时可能出现的"连接已被服务器关闭"类异常
+_STALE_CONNECTION_ERRORS = (
+    asyncio.IncompleteReadError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+
+class AsyncConnection:
+    """单条keep-alive连接"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class AsyncConnectionPool:
+    """
+    单个主机的异步keep-alive连接池
+
+    与 transport.ConnectionPool 相同：空闲连接后进先出，签出数受信号量限制。
+    必须在事件循环中创建和使用。
+
+    属性:
+        scheme: 协议（http或https）
+        host: 主机名（可带端口）
+        maxsize: 最多同时签出的连接数
+        timeout: 建立连接超时时间（秒）
+        created: 累计新建连接数（即握手次数）
+        reused: 累计复用空闲连接次数
+    """
+
+    def __init__(self, scheme: str, host: str, maxsize: int = DEFAULT_POOL_SIZE,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT, ssl_context: Optional[ssl.SSLContext] = None):
+        self.scheme = scheme
+        self.host = host
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.ssl_context = ssl_context
+        self.created = 0
+        self.reused = 0
+
+        self._idle = []
+        self._slots = asyncio.Semaphore(maxsize)
+
+    async def _new_conn(self) -> AsyncConnection:
+        """建立新连接（TCP握手，https时同时完成TLS握手）"""
+        self.created += 1
+
+        hostname, _, port = self.host.partition(":")
+        if self.scheme == "http":
+            connect = asyncio.open_connection(hostname, int(port or 80), limit=_MAX_LINE)
+        else:
+            connect = asyncio.open_connection(hostname, int(port or 443), ssl=self.ssl_context,
+                                              server_hostname=hostname, limit=_MAX_LINE)
+
+        reader, writer = await asyncio.wait_for(connect, self.timeout)
+        return AsyncConnection(reader, writer)
+
+    async def get(self) -> Tuple[AsyncConnection, bool]:
+        """
+        签出一个连接
+
+        Returns:
+            Tuple[AsyncConnection, bool]: 连接对象，以及是否为复用的空闲连接
+        """
+        await self._slots.acquire()
+
+        while self._idle:
+            conn = self._idle.pop()
+            # 服务器已关闭的空闲连接直接丢弃
+            if conn.reader.at_eof():
+                conn.close()
+                continue
+            self.reused += 1
+            return conn, True
+
+        try:
+            return await self._new_conn(), False
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, conn: AsyncConnection, reusable: bool = True) -> None:
+        """
+        归还连接
+
+        Args:
+            conn: 签出的连接
+            reusable: 连接是否仍可复用，不可复用的连接将被关闭
+        """
+        try:
+            if reusable and len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+            else:
+                conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class AsyncStreamResponse:
+    """
+    流式响应
+
+    响应体按块读取，读完后连接自动归还连接池；未读完就关闭时连接被丢弃。
+
+    属性:
+        status: HTTP状态码
+        reason: HTTP状态说明
+        headers: 响应头
+        url: 最终请求地址（跟随重定向后）
+    """
+
+    def __init__(self, status: int, reason: str, headers: Message, url: str,
+                 pool: AsyncConnectionPool, conn: AsyncConnection, method: str):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.url = url
+
+        self._pool = pool
+        self._conn = conn
+        self._chunked = "chunked" in (headers.get("Transfer-Encoding") or "").lower()
+        self._remaining = None
+        self._chunk_left = 0
+        self._done = False
+        self._keep_alive = _keep_alive(headers)
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            self._remaining = 0
+        elif not self._chunked and headers.get("Content-Length") is not None:
+            self._remaining = int(headers.get("Content-Length"))
+        elif not self._chunked:
+            # 既无长度也非chunked：读到连接关闭为止，连接不可复用
+            self._keep_alive = False
+
+        if self._remaining == 0:
+            self._finish()
+
+    def _finish(self) -> None:
+        if not self._done:
+            self._done = True
+            self._pool.put(self._conn, reusable=self._keep_alive)
+
+    async def read_chunk(self, size: int = DEFAULT_CHUNK_SIZE) -> bytes:
+        """
+        读取下一块响应体
+
+        Args:
+            size: 最多读取的字节数
+
+        Returns:
+            bytes: 数据块，响应体读完时返回 b""
+        """
+        if self._done:
+            return b""
+
+        reader = self._conn.reader
+        try:
+            if self._chunked:
+                if self._chunk_left == 0:
+                    line = await reader.readuntil(b"\r\n")
+                    self._chunk_left = int(line.split(b";", 1)[0].strip(), 16)
+                    if self._chunk_left == 0:
+                        # 跳过trailer直到空行
+                        while (await reader.readuntil(b"\r\n")) != b"\r\n":
+                            pass
+                        self._finish()
+                        return b""
+                data = await reader.read(min(size, self._chunk_left))
+                if not data:
+                    raise asyncio.IncompleteReadError(b"", self._chunk_left)
+                self._chunk_left -= len(data)
+                if self._chunk_left == 0:
+                    await reader.readexactly(2)
+                return data
+
+            if self._remaining is not None:
+                data = await reader.read(min(size, self._remaining))
+                if not data:
+                    raise asyncio.IncompleteReadError(b"", self._remaining)
+                self._remaining -= len(data)
+                if self._remaining == 0:
+                    self._finish()
+                return data
+
+            data = await reader.read(size)
+            if not data:
+                self._finish()
+            return data
+        except BaseException:
+            self.close()
+            raise
+
+    async def iter_chunks(self, size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        """按块迭代响应体"""
+        while True:
+            data = await self.read_chunk(size)
+            if not data:
+                return
+            yield data
+
+    async def read(self) -> bytes:
+        """读取剩余的全部响应体"""
+        return b"".join([data async for data in self.iter_chunks()])
+
+    def close(self) -> None:
+        """关闭响应（未读完的连接不再复用）"""
+        if not self._done:
+            self._keep_alive = False
+            self._finish()
+
+
+class _StreamContext:
+    """AsyncTransport.stream() 返回的异步上下文管理器"""
+
+    def __init__(self, transport: "AsyncTransport", method: str, url: str, body, headers):
+        self._transport = transport
+        self._args = (method, url, body, headers)
+        self._response = None
+
+    async def __aenter__(self) -> AsyncStreamResponse:
+        self._response = await self._transport.open_stream(*self._args)
+        return self._response
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self._response.close()
+
+
+def _keep_alive(headers: Message) -> bool:
+    """按响应头判断连接能否复用"""
+    return "close" not in (headers.get("Connection") or "").lower()
+
+
+def _encode_body(body):
+    """统一请求体类型：str 编码为 bytes，流式请求体原样返回"""
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode("utf-8")
+    if is_streaming_body(body):
+        return body
+    return bytes(body)
+
+
+def _https_context() -> ssl.SSLContext:
+    """创建与 http.client.HTTPSConnection 默认行为一致的TLS上下文"""
+    return ssl._create_default_https_context()
+
+
+class AsyncTransport:
+    """
+    按主机管理异步连接池的HTTP传输层
+
+    与 transport.PooledTransport 接口一致（request/request_url/stats/close 均为协程或同名方法），
+    响应同样为 PooledResponse。实例绑定创建它的事件循环，不要跨事件循环共享。
+
+    使用示例:
+        >>> transport = AsyncTransport(pool_size=20)
+        >>> response = await transport.request("GET", "open-api.123pan.com", "/api/v2/file/list?parentFileId=0&limit=100",
+        ...                                    headers={'Authorization': f'Bearer {token}', 'Platform': 'open_platform'})
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        """
+        初始化传输层
+
+        Args:
+            pool_size: 每个主机的连接池大小
+            timeout: 单次请求（连接、发送、读取响应头）超时时间（秒）
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._pools = {}
+        self._ssl_context = None
+
+    @staticmethod
+    def _split_host(host: str) -> Tuple[str, str]:
+        """解析主机地址，未指定协议时默认为https"""
+        if "://" in host:
+            parsed = urlsplit(host)
+            return parsed.scheme.lower(), parsed.netloc
+        return "https", host
+
+    def get_pool(self, scheme: str, host: str) -> AsyncConnectionPool:
+        """获取（必要时创建）指定主机的连接池"""
+        key = (scheme, host)
+
+        pool = self._pools.get(key)
+        if pool is None:
+            if scheme == "https" and self._ssl_context is None:
+                self._ssl_context = _https_context()
+            pool = AsyncConnectionPool(scheme, host, self.pool_size, self.timeout, self._ssl_context)
+            self._pools[key] = pool
+        return pool
+
+    async def _send(self, conn: AsyncConnection, method: str, host: str, path: str,
+                    body, headers: Optional[Dict[str, str]]) -> None:
+        """发送请求行、请求头和请求体（流式请求体逐块写入，每块单独计算超时）"""
+        names = {key.lower() for key in (headers or {})}
+        lines = [f"{method} {path} HTTP/1.1"]
+        if "host" not in names:
+            lines.append(f"Host: {host}")
+        if "accept-encoding" not in names:
+            lines.append("Accept-Encoding: identity")
+        if "content-length" not in names and (body or method in ("POST", "PUT", "PATCH")):
+            lines.append(f"Content-Length: {len(body)}")
+        for key, value in (headers or {}).items():
+            lines.append(f"{key}: {value}")
+
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+        if is_streaming_body(body):
+            conn.writer.write(head)
+            # 读文件是阻塞操作，放到线程池中逐块读取；限速的请求体在事件循环中等待，不占用线程池
+            loop = asyncio.get_event_loop()
+            throttled = isinstance(body, ThrottledBody)
+            chunks = body.iter_raw() if throttled else iter(body)
+            while True:
+                chunk = await loop.run_in_executor(None, next, chunks, None)
+                if chunk is None:
+                    break
+                if throttled:
+                    delay = body.reserve(len(chunk))
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                conn.writer.write(chunk)
+                await asyncio.wait_for(conn.writer.drain(), self.timeout)
+        elif len(body) < 64 * 1024:
+            # 小请求体与请求头合并为一次写入，避免拆成两个TCP包
+            conn.writer.write(head + body)
+        else:
+            conn.writer.write(head)
+            conn.writer.write(body)
+        await asyncio.wait_for(conn.writer.drain(), self.timeout)
+
+    @staticmethod
+    async def _read_head(conn: AsyncConnection) -> Tuple[int, str, Message]:
+        """读取状态行和响应头（跳过 100 Continue）"""
+        while True:
+            line = await conn.reader.readuntil(b"\r\n")
+            parts = line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+            if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+                raise ConnectionResetError(f"无效的HTTP状态行: {line[:64]!r}")
+            status = int(parts[1])
+            reason = parts[2] if len(parts) > 2 else ""
+
+            headers = Message()
+            while True:
+                line = await conn.reader.readuntil(b"\r\n")
+                if line == b"\r\n":
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip()] = value.strip()
+
+            if parts[0] == "HTTP/1.0" and "keep-alive" not in (headers.get("Connection") or "").lower():
+                headers["Connection"] = "close"
+
+            if status != 100:
+                return status, reason, headers
+
+    async def open_stream(self, method: str, url: str, body: Union[str, bytes, None] = None,
+                          headers: Optional[Dict[str, str]] = None,
+                          max_redirects: int = MAX_REDIRECTS) -> AsyncStreamResponse:
+        """
+        发送请求并返回尚未读取响应体的流式响应（GET/HEAD 按 max_redirects 自动跟随重定向）
+
+        调用方读完或 close() 响应后连接才会归还，推荐使用 stream() 上下文管理器。
+
+        Args:
+            method: HTTP方法
+            url: 完整URL，或 "host" + path 形式由 request() 调用
+            body: 请求体
+            headers: 请求头
+            max_redirects: 最多跟随的重定向次数（0表示不跟随，与同步传输层一样直接返回3xx响应）
+
+        Returns:
+            AsyncStreamResponse: 流式响应
+
+        Raises:
+            Exception: 网络错误（复用连接失效时会先自动重试一次）
+        """
+        data = _encode_body(body)
+
+        for attempt in range(max_redirects + 1):
+            parsed = urlsplit(url)
+            scheme, netloc = parsed.scheme.lower(), parsed.netloc
+            path = (parsed.path or "/") + ("?" + parsed.query if parsed.query else "")
+            pool = self.get_pool(scheme, netloc)
+
+            while True:
+                conn, reused = await pool.get()
+                try:
+                    await self._send(conn, method, netloc, path, data, headers)
+                    status, reason, response_headers = await asyncio.wait_for(self._read_head(conn), self.timeout)
+                except _STALE_CONNECTION_ERRORS:
+                    pool.put(conn, reusable=False)
+                    # 空闲连接可能已被服务器关闭，换新连接重发一次
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    pool.put(conn, reusable=False)
+                    raise
+                break
+
+            response = AsyncStreamResponse(status, reason, response_headers, url, pool, conn, method)
+            location = response_headers.get("Location")
+            if status in (301, 302, 303, 307, 308) and location and method in ("GET", "HEAD") \
+                    and max_redirects > 0:
+                await response.read()
+                if attempt >= max_redirects:
+                    break
+                url = urljoin(url, location)
+                continue
+            return response
+
+        raise Exception(f"重定向次数超过 {max_redirects} 次: {url}")
+
+    def stream(self, method: str, url: str, body: Union[str, bytes, None] = None,
+               headers: Optional[Dict[str, str]] = None) -> _StreamContext:
+        """
+        以流式方式请求完整URL
+
+        使用示例:
+            >>> async with transport.stream("GET", download_url) as response:
+            ...     async for chunk in response.iter_chunks():
+            ...         f.write(chunk)
+        """
+        return _StreamContext(self, method, url, body, headers)
+
+    async def request(self, method: str, host: str, path: str, body: Union[str, bytes, None] = None,
+                      headers: Optional[Dict[str, str]] = None) -> PooledResponse:
+        """
+        发送请求并读取完整响应
+
+        Args:
+            method: HTTP方法
+            host: 主机地址，可带 http:// 或 https:// 前缀
+            path: 请求路径（包含查询参数）
+            body: 请求体
+            headers: 请求头
+
+        Returns:
+            PooledResponse: 响应对象
+        """
+        scheme, netloc = self._split_host(host)
+        response = await self.open_stream(method, f"{scheme}://{netloc}{path}", body, headers, max_redirects=0)
+        try:
+            data = await asyncio.wait_for(response.read(), self.timeout)
+        finally:
+            response.close()
+        return PooledResponse(response.status, response.reason, response.headers, data)
+
+    async def request_url(self, method: str, url: str, body: Union[str, bytes, None] = None,
+                          headers: Optional[Dict[str, str]] = None) -> PooledResponse:
+        """按完整URL发送请求（用于预签名上传地址等场景）"""
+        parsed = urlsplit(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        return await self.request(method, f"{parsed.scheme}://{parsed.netloc}", path, body, headers)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接统计（格式与 PooledTransport.stats() 相同）
+
+        Returns:
+            Dict[str, Any]: connections_created、connections_reused、hosts
+        """
+        pools = list(self._pools.values())
+        hosts = {f"{p.scheme}://{p.host}": {"created": p.created, "reused": p.reused} for p in pools}
+        return {
+            "connections_created": sum(p.created for p in pools),
+            "connections_reused": sum(p.reused for p in pools),
+            "hosts": hosts
+        }
+
+    async def close(self) -> None:
+        """关闭所有主机的空闲连接"""
+        for pool in list(self._pools.values()):
+            pool.close()
+
+
+class AsyncApiClient:
+    """
+    client.ApiClient 的异步版本
+
+    限流、重试和令牌刷新逻辑与同步版完全一致，并共享进程内的限流器和重试策略；
+    等待改为 asyncio.sleep，令牌刷新在线程池中执行，不阻塞事件循环。
+
+    属性:
+        transport: 异步HTTP传输层
+        token_manager: 令牌管理器（为None时不做重新认证）
+        rate_limiter: 限流器（为None时不限流）
+        retry_policy: 重试策略
+    """
+
+    def __init__(self, transport: Optional[AsyncTransport] = None, token_manager: Optional[TokenManager] = None,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None):
+        """
+        Args:
+            transport: 异步HTTP传输层（可选，默认新建）
+            token_manager: 令牌管理器（可选）
+            rate_limiter: 限流器（可选，默认使用进程内共享的限流器）
+            retry_policy: 重试策略（可选，默认使用进程内共享的策略）
+        """
+        self.transport = transport or AsyncTransport()
+        self.token_manager = token_manager
+        self.rate_limiter = rate_limiter or get_default_rate_limiter()
+        self.retry_policy = retry_policy or get_default_retry_policy()
+
+    @property
+    def client_id(self) -> Optional[str]:
+        """限流所用的客户端ID"""
+        return self.token_manager.client_id if self.token_manager is not None else None
+
+    async def _send(self, method: str, host: str, path: str, body, headers) -> PooledResponse:
+        """按接口QPS等待后发送请求，可重试的失败按重试策略退避后重发"""
+        attempt = 0
+
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                delay = self.rate_limiter.reserve(self.client_id, path)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.retry_policy.record_request()
+
+            try:
+                response = await self.transport.request(method, host, path, body, headers)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                delay = self.retry_policy.next_delay(method, path, exception_retry_reason(e), attempt)
+                if delay is None:
+                    raise
+                print(f"⚠️  请求失败（{e}），{delay:.1f}秒后重试 ({attempt}/{self.retry_policy.max_attempts - 1})")
+                await asyncio.sleep(delay)
+                continue
+
+            reason = response_retry_reason(response.status, body_code(response))
+            retry_after = parse_retry_after(response.headers.get("Retry-After")) if reason else None
+            delay = self.retry_policy.next_delay(method, path, reason, attempt, retry_after)
+            if delay is None:
+                return response
+
+            await asyncio.sleep(delay)
+
+    async def request(self, method: str, host: str, path: str, body: Union[str, bytes, None] = None,
+                      headers: Optional[Dict[str, str]] = None) -> PooledResponse:
+        """
+        发送请求（参数和返回值与 ApiClient.request 相同）
+
+        Raises:
+            Exception: 不可重试或重试用尽的网络错误
+        """
+        response = await self._send(method, host, path, body, headers)
+
+        stale_token = bearer_token(headers)
+        if (self.token_manager is not None and stale_token is not None
+                and self.token_manager.can_refresh and is_token_expired(response)):
+            loop = asyncio.get_event_loop()
+            new_token = await loop.run_in_executor(None, self.token_manager.refresh, stale_token)
+            response = await self._send(method, host, path, body, with_token(headers, new_token))
+
+        return response
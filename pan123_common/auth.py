@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘访问令牌获取与本地缓存
+
+功能说明：
+    /api/v1/access_token 接口限流 1 QPS，且同一 client_id 最多同时存在3个有效令牌，
+    官方要求调用方缓存令牌直到 expiredAt。本模块把令牌和过期时间按 client_id
+    保存在本地缓存文件中，多个工具进程共享同一份令牌。
+
+主要功能：
+    - 磁盘缓存：令牌保存在 .cache/access_tokens.json，权限0600
+    - 进程互斥：获取新令牌时持有文件锁，并发启动的多个进程最多只请求一次
+    - 提前刷新：距离过期不足 REFRESH_AHEAD_SECONDS 时视为过期，提前换新令牌
+    - 过期重认证：请求返回401（HTTP状态码或响应体code）时由 TokenManager
+      换新令牌，多线程同时遇到401时只刷新一次
+
+使用示例:
+    >>> from pan123_common.auth import get_access_token
+    >>> token = get_access_token(client_id, client_secret)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Tuple
+
+from .rate_limit import get_default_rate_limiter
+from .storage import FileLock, get_cache_dir, read_json, write_json_atomic
+from .transport import PooledTransport, PooledResponse, get_default_transport
+
+
+# 令牌接口地址
+ACCESS_TOKEN_HOST = "open-api.123pan.com"
+ACCESS_TOKEN_PATH = "/api/v1/access_token"
+
+# 距离过期不足该时长（秒）时提前刷新，令牌有效期为30天
+REFRESH_AHEAD_SECONDS = 24 * 3600
+
+# 响应中缺少或无法解析 expiredAt 时采用的保守有效期（秒）
+FALLBACK_TOKEN_TTL = 24 * 3600
+
+# 缓存文件名
+TOKEN_CACHE_FILE = "access_tokens.json"
+
+# 令牌无效时接口返回的状态码（HTTP状态码或响应体中的code）
+TOKEN_EXPIRED_CODE = 401
+
+
+def parse_expired_at(expired_at: Optional[str]) -> Optional[float]:
+    """
+    解析接口返回的过期时间
+
+    Args:
+        expired_at: 形如 "2025-03-23T15:48:37+08:00" 的时间字符串
+
+    Returns:
+        Optional[float]: Unix时间戳，无法解析时返回None
+    """
+    if not expired_at:
+        return None
+
+    # 兼容Python 3.6：%z 不接受带冒号的时区偏移
+    value = re.sub(r"([+-]\d{2}):(\d{2})$", r"\1\2", expired_at.strip())
+    if value.endswith("Z"):
+        value = value[:-1] + "+0000"
+
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+    except ValueError:
+        return None
+
+
+def request_access_token(client_id: str, client_secret: str,
+                         transport: Optional[PooledTransport] = None) -> Tuple[str, Optional[str]]:
+    """
+    向开放平台请求新的访问令牌（不经过缓存）
+
+    Args:
+        client_id: 客户端ID
+        client_secret: 客户端密钥
+        transport: HTTP传输层（可选，默认使用共享连接池）
+
+    Returns:
+        Tuple[str, Optional[str]]: (访问令牌, 过期时间字符串)
+
+    Raises:
+        Exception: 令牌获取失败
+    """
+    transport = transport or get_default_transport()
+
+    payload = json.dumps({
+        "clientID": client_id,
+        "clientSecret": client_secret
+    })
+
+    headers = {
+        'Platform': 'open_platform',
+        'Content-Type': 'application/json'
+    }
+
+    # 令牌接口限流 1 QPS
+    get_default_rate_limiter().acquire(client_id, ACCESS_TOKEN_PATH)
+
+    response = transport.request("POST", ACCESS_TOKEN_HOST, ACCESS_TOKEN_PATH, payload, headers)
+    result = json.loads(response.data.decode("utf-8"))
+
+    if result.get("code") != 0:
+        raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+
+    data = result.get("data") or {}
+    access_token = data.get("accessToken")
+    if not access_token:
+        raise Exception("响应中未找到访问令牌")
+
+    return access_token, data.get("expiredAt")
+
+
+class TokenCache:
+    """
+    按 client_id 保存访问令牌的磁盘缓存
+
+    文件内容示例:
+        {
+          "<client_id>": {
+            "accessToken": "...",
+            "expiredAt": "2025-03-23T15:48:37+08:00",
+            "expiresAt": 1742716117.0
+          }
+        }
+
+    读写缓存文件之外的"检查-请求-写回"流程应在 lock() 内完成，
+    以保证多进程并发时只有一个进程真正请求新令牌。
+    """
+
+    def __init__(self, path: Optional[str] = None, refresh_ahead: float = REFRESH_AHEAD_SECONDS):
+        """
+        Args:
+            path: 缓存文件路径，默认为缓存目录下的 access_tokens.json
+            refresh_ahead: 提前刷新的时长（秒）
+        """
+        self.path = path or os.path.join(get_cache_dir(), TOKEN_CACHE_FILE)
+        self.refresh_ahead = refresh_ahead
+
+    def lock(self) -> FileLock:
+        """获取缓存文件对应的跨进程锁"""
+        return FileLock(self.path + ".lock")
+
+    def get(self, client_id: str) -> Optional[str]:
+        """
+        读取仍然有效（且不在提前刷新窗口内）的令牌
+
+        Args:
+            client_id: 客户端ID
+
+        Returns:
+            Optional[str]: 令牌，不存在或即将过期时返回None
+        """
+        entries = read_json(self.path, {})
+        entry = entries.get(client_id) if isinstance(entries, dict) else None
+        if not isinstance(entry, dict):
+            return None
+
+        expires_at = entry.get("expiresAt") or 0
+        if expires_at - self.refresh_ahead <= time.time():
+            return None
+        return entry.get("accessToken")
+
+    def put(self, client_id: str, access_token: str, expired_at: Optional[str]) -> None:
+        """
+        写入令牌（调用方应持有 lock()）
+
+        Args:
+            client_id: 客户端ID
+            access_token: 访问令牌
+            expired_at: 接口返回的过期时间字符串
+        """
+        expires_at = parse_expired_at(expired_at)
+        if expires_at is None:
+            expires_at = time.time() + FALLBACK_TOKEN_TTL
+
+        entries = read_json(self.path, {})
+        if not isinstance(entries, dict):
+            entries = {}
+
+        entries[client_id] = {
+            "accessToken": access_token,
+            "expiredAt": expired_at,
+            "expiresAt": expires_at
+        }
+        write_json_atomic(self.path, entries)
+
+
+def get_access_token(client_id: str, client_secret: str, transport: Optional[PooledTransport] = None,
+                     cache: Optional[TokenCache] = None, stale_token: Optional[str] = None) -> str:
+    """
+    获取访问令牌：优先使用缓存，缓存缺失或即将过期时请求新令牌并写回缓存
+
+    Args:
+        client_id: 客户端ID
+        client_secret: 客户端密钥
+        transport: HTTP传输层（可选）
+        cache: 令牌缓存（可选，默认使用缓存目录下的共享缓存文件）
+        stale_token: 已被服务器拒绝的令牌，缓存中的令牌与之相同时强制换新
+
+    Returns:
+        str: 访问令牌
+
+    Raises:
+        Exception: 令牌获取失败
+    """
+    cache = cache or TokenCache()
+
+    access_token = cache.get(client_id)
+    if access_token and access_token != stale_token:
+        return access_token
+
+    with cache.lock():
+        # 等锁期间可能已有其他进程写入了新令牌
+        access_token = cache.get(client_id)
+        if access_token and access_token != stale_token:
+            return access_token
+
+        access_token, expired_at = request_access_token(client_id, client_secret, transport)
+        cache.put(client_id, access_token, expired_at)
+        return access_token
+
+
+def is_token_expired(response: PooledResponse) -> bool:
+    """
+    判断响应是否表示访问令牌无效（HTTP 401 或响应体 code 为401）
+
+    Args:
+        response: 请求响应
+
+    Returns:
+        bool: 令牌是否已失效
+    """
+    if response.status == TOKEN_EXPIRED_CODE:
+        return True
+
+    # 先做廉价的字节匹配，避免对每个响应都解析JSON
+    data = response.data
+    if b"401" not in data[:64]:
+        return False
+
+    try:
+        return json.loads(data.decode("utf-8")).get("code") == TOKEN_EXPIRED_CODE
+    except (ValueError, AttributeError):
+        return False
+
+
+def bearer_token(headers: Optional[Dict[str, str]]) -> Optional[str]:
+    """从请求头中取出 Bearer 令牌，没有时返回None"""
+    for key, value in (headers or {}).items():
+        if key.lower() == "authorization" and value.startswith("Bearer "):
+            return value[len("Bearer "):]
+    return None
+
+
+def with_token(headers: Dict[str, str], access_token: str) -> Dict[str, str]:
+    """返回把 Authorization 替换为新令牌后的请求头副本"""
+    headers = {key: value for key, value in headers.items() if key.lower() != "authorization"}
+    headers['Authorization'] = f'Bearer {access_token}'
+    return headers
+
+
+class TokenManager:
+    """
+    访问令牌持有者，负责令牌失效后的重新认证
+
+    长时间运行的批量任务（上传、遍历、离线任务提交）可能跨越令牌有效期。
+    请求层（见 client.ApiClient）遇到401时调用 refresh() 换新令牌后重放请求；
+    多个线程同时遇到401时只有第一个线程真正刷新，其余线程等待后直接使用新令牌。
+
+    只提供 access_token（没有 client_id/client_secret）时无法刷新，
+    401响应将原样返回给调用方处理。
+
+    使用示例:
+        >>> tokens = TokenManager(token, client_id, client_secret)
+        >>> new_token = tokens.refresh(stale_token=token)
+    """
+
+    def __init__(self, access_token: str, client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                 transport: Optional[PooledTransport] = None, cache: Optional[TokenCache] = None):
+        """
+        Args:
+            access_token: 当前访问令牌
+            client_id: 客户端ID（用于刷新令牌）
+            client_secret: 客户端密钥（用于刷新令牌）
+            transport: HTTP传输层（可选，默认使用共享连接池）
+            cache: 令牌缓存（可选）
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.transport = transport or get_default_transport()
+        self.cache = cache
+        self.refresh_count = 0
+
+        self._access_token = access_token
+        self._lock = threading.Lock()
+
+    @property
+    def access_token(self) -> str:
+        """当前有效的访问令牌"""
+        return self._access_token
+
+    @property
+    def can_refresh(self) -> bool:
+        """是否具备刷新令牌所需的凭据"""
+        return bool(self.client_id and self.client_secret)
+
+    def refresh(self, stale_token: str) -> str:
+        """
+        换新已失效的令牌
+
+        Args:
+            stale_token: 被服务器拒绝的令牌
+
+        Returns:
+            str: 新令牌（若其他线程已完成刷新，直接返回其结果）
+
+        Raises:
+            Exception: 无刷新凭据或令牌获取失败
+        """
+        if not self.can_refresh:
+            raise Exception("访问令牌已失效，且未提供client_id和client_secret，无法自动刷新")
+
+        with self._lock:
+            if self._access_token != stale_token:
+                return self._access_token
+
+            print("🔑 访问令牌已失效，正在重新获取...")
+            self._access_token = get_access_token(self.client_id, self.client_secret, self.transport,
+                                                  self.cache, stale_token=stale_token)
+            self.refresh_count += 1
+            print("✅ 访问令牌已更新")
+            return self._access_token
+
+    def install_requests_hook(self, session) -> None:
+        """
+        为requests会话安装令牌失效自动重认证钩子
+
+        响应为401（或JSON响应体code为401）时，用新令牌重发原请求并返回新响应。
+        流式下载的二进制响应不会被读取。
+
+        Args:
+            session: requests.Session 对象
+        """
+        def reauth_hook(response, *args, **kwargs):
+            stale_token = bearer_token(response.request.headers)
+            if stale_token is None or not self.can_refresh:
+                return response
+
+            expired = response.status_code == TOKEN_EXPIRED_CODE
+            if not expired and "json" in response.headers.get("Content-Type", ""):
+                try:
+                    expired = response.json().get("code") == TOKEN_EXPIRED_CODE
+                except (ValueError, AttributeError):
+                    expired = False
+            if not expired:
+                return response
+
+            new_token = self.refresh(stale_token)
+            retry_request = response.request.copy()
+            retry_request.headers['Authorization'] = f'Bearer {new_token}'
+
+            # 读完并释放原响应的连接后再重发
+            response.content
+            response.close()
+            retry_response = response.connection.send(retry_request, **kwargs)
+            retry_response.history.append(response)
+            retry_response.request = retry_request
+            return retry_response
+
+        session.hooks["response"].append(reauth_hook)
@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘全局带宽控制
+
+功能说明：
+    上传和下载与业务流量共用同一条线路时，需要限制工具占用的带宽。
+    本模块提供一个进程内共享的带宽控制器，所有传输路径（分片上传、单步上传、
+    图床PUT上传、下载文件）在发送或接收每一块数据前向它预约字节数：
+
+    - 分别限制上传、下载速率，也可以再加一个上传+下载合计的总速率
+    - 限速按字节令牌桶实现：与 rate_limit.TokenBucket 一样以"下一字节可用时间"记录状态，
+      预约只做一次加锁和几次浮点运算，欠下的时间由调用方休眠补齐；
+      不限速时直接返回，不加锁，1Gbps下的额外CPU开销可以忽略
+    - 运行中可随时调用 set_limits() 修改限速，正在进行的传输从下一块数据起按新速率执行
+    - 按时段自动切换限速（如工作时间限制上传，夜间不限），每30秒检查一次当前时段
+
+主要功能：
+    - parse_rate(): 解析 "10M"、"512K"、"0" 等写法为字节/秒
+    - parse_schedule(): 解析 "09:00-18:00 up=2M down=5M; 18:00-09:00 up=0" 形式的时段限速表
+    - BandwidthGovernor.reserve() / throttle() / throttle_async(): 预约、阻塞等待、协程等待
+    - BandwidthGovernor.wrap_upload(): 把上传请求体包装为边发送边限速的流式请求体
+    - BandwidthGovernor.configure(): 从 config.txt 的配置项设置限速
+    - get_default_bandwidth_governor(): 进程内共享实例，上传和下载共用同一组令牌桶
+
+使用示例:
+    >>> governor = get_default_bandwidth_governor()
+    >>> governor.set_limits(upload_limit=parse_rate("5M"), download_limit=None, total_limit=parse_rate("8M"))
+    >>> transport.request("POST", host, "/upload/v2/file/slice", governor.wrap_upload(body), headers)
+    >>> for chunk in response.iter_content(chunk_size=8192):
+    ...     governor.throttle(DOWNLOAD, len(chunk))
+    ...     f.write(chunk)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import re
+import time
+import asyncio
+import threading
+from typing import Optional, Dict, Any, List, Tuple
+
+from .multipart import is_streaming_body
+
+
+# 传输方向
+UPLOAD = "upload"
+DOWNLOAD = "download"
+
+# 令牌桶允许的突发量（按秒计的积攒时长）：空闲后最多立即发送该时长对应的字节数
+DEFAULT_BURST_SECONDS = 0.25
+
+# 限速时单次预约的最大字节数：较大的数据块拆开发送，避免低速率下一次等待过久
+THROTTLE_CHUNK_SIZE = 256 * 1024
+
+# 等待时长小于该值时不休眠，欠下的时间累积到下一块再补（减少系统调用）
+MIN_SLEEP_SECONDS = 0.002
+
+# 时段限速表的检查间隔（秒）
+SCHEDULE_CHECK_INTERVAL = 30
+
+# 速率单位（字节/秒）
+_RATE_UNITS = {"": 1, "B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+# 时段限速表中的方向写法
+_SCHEDULE_KEYS = {"up": "upload", "upload": "upload", "down": "download", "download": "download",
+                  "total": "total"}
+
+
+def parse_rate(text) -> Optional[float]:
+    """
+    解析速率
+
+    Args:
+        text: 如 "10M"、"512K"、"1.5M/s"、"2048"（字节/秒）；空值、"0"、"unlimited" 表示不限速
+
+    Returns:
+        Optional[float]: 字节/秒，不限速时为None
+
+    Raises:
+        ValueError: 无法解析
+    """
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text) if text > 0 else None
+
+    value = str(text).strip().upper().replace(" ", "")
+    if value in ("", "0", "NONE", "UNLIMITED", "OFF"):
+        return None
+
+    match = re.match(r"^(\d+(?:\.\d+)?)([KMG]?)(?:I?B)?(?:/S)?$", value)
+    if not match:
+        raise ValueError(f"无法解析的速率: {text}（示例: 10M、512K、0 表示不限速）")
+    rate = float(match.group(1)) * _RATE_UNITS[match.group(2)]
+    return rate if rate > 0 else None
+
+
+def _parse_clock(text: str) -> int:
+    """把 "HH:MM" 解析为当天的分钟数"""
+    match = re.match(r"^(\d{1,2}):(\d{2})$", text.strip())
+    if not match or int(match.group(1)) > 24 or int(match.group(2)) > 59:
+        raise ValueError(f"无法解析的时间: {text}（示例: 09:00）")
+    return (int(match.group(1)) * 60 + int(match.group(2))) % (24 * 60)
+
+
+def parse_schedule(text: str) -> List[Tuple[int, int, Dict[str, Optional[float]]]]:
+    """
+    解析时段限速表
+
+    多个时段以 ";" 分隔，每个时段为 "开始-结束" 加若干 "方向=速率"，
+    方向为 up/upload、down/download、total，速率写法同 parse_rate()（0表示该时段不限速）。
+    结束时间早于开始时间表示跨午夜，如 "22:00-07:00"。未写出的方向沿用 set_limits() 的基础限速。
+
+    Args:
+        text: 如 "09:00-18:00 up=2M down=5M; 22:00-07:00 up=0 down=0"
+
+    Returns:
+        List[Tuple[int, int, Dict[str, Optional[float]]]]: (开始分钟, 结束分钟, 限速) 列表
+
+    Raises:
+        ValueError: 格式错误
+    """
+    schedule = []
+    for entry in (text or "").split(";"):
+        tokens = entry.split()
+        if not tokens:
+            continue
+
+        span = tokens[0].split("-")
+        if len(span) != 2:
+            raise ValueError(f"无法解析的时段: {tokens[0]}（示例: 09:00-18:00）")
+
+        limits = {}
+        for token in tokens[1:]:
+            key, _, value = token.partition("=")
+            direction = _SCHEDULE_KEYS.get(key.strip().lower())
+            if direction is None or not _:
+                raise ValueError(f"无法解析的限速项: {token}（示例: up=2M down=5M total=6M）")
+            limits[direction] = parse_rate(value)
+
+        schedule.append((_parse_clock(span[0]), _parse_clock(span[1]), limits))
+    return schedule
+
+
+def _in_span(minute: int, start: int, end: int) -> bool:
+    if start <= end:
+        return start <= minute < end
+    # 跨午夜
+    return minute >= start or minute < end
+
+
+class ByteBucket:
+    """
+    字节令牌桶
+
+    以"下一字节可用时间"记录状态：每次预约把该时间向后推 字节数/速率 秒，
+    空闲期间最多积攒 burst_seconds 秒的额度。
+    """
+
+    def __init__(self, rate: float, burst_seconds: float = DEFAULT_BURST_SECONDS):
+        """
+        Args:
+            rate: 速率（字节/秒）
+            burst_seconds: 允许积攒的额度（秒）
+        """
+        self.rate = float(rate)
+        self.burst_seconds = burst_seconds
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        """修改速率，尚未补齐的等待时长按新速率折算"""
+        with self._lock:
+            now = time.monotonic()
+            if self._next_free > now:
+                self._next_free = now + (self._next_free - now) * self.rate / rate
+            self.rate = float(rate)
+
+    def reserve(self, nbytes: int, now: float) -> float:
+        """
+        预约 nbytes 字节
+
+        Args:
+            nbytes: 字节数
+            now: 当前时间（time.monotonic()）
+
+        Returns:
+            float: 调用方需要等待的秒数
+        """
+        with self._lock:
+            start = max(self._next_free, now - self.burst_seconds)
+            self._next_free = start + nbytes / self.rate
+            return self._next_free - now
+
+
+class ThrottledBody:
+    """
+    边发送边限速的上传请求体
+
+    与 MultipartEncoder 一样可重复迭代、长度已知，传输层按流式请求体发送；
+    每产生一块数据前向带宽控制器预约，较大的块拆成 THROTTLE_CHUNK_SIZE 大小分段发送。
+    异步传输层通过 iter_raw() 和 reserve() 在事件循环中等待，不占用线程池。
+    """
+
+    def __init__(self, body, governor: "BandwidthGovernor", direction: str = UPLOAD):
+        """
+        Args:
+            body: 原请求体（bytes 或流式请求体）
+            governor: 带宽控制器
+            direction: 计入的方向
+        """
+        self.body = body
+        self.governor = governor
+        self.direction = direction
+
+    def __len__(self) -> int:
+        return len(self.body)
+
+    def iter_raw(self):
+        """按块产生请求体（不限速），大块拆为 THROTTLE_CHUNK_SIZE 大小的分段"""
+        chunks = self.body if is_streaming_body(self.body) else (self.body,)
+        for chunk in chunks:
+            if len(chunk) <= THROTTLE_CHUNK_SIZE:
+                yield chunk
+                continue
+            view = memoryview(chunk)
+            for offset in range(0, len(view), THROTTLE_CHUNK_SIZE):
+                yield view[offset:offset + THROTTLE_CHUNK_SIZE]
+
+    def reserve(self, nbytes: int) -> float:
+        """预约 nbytes 字节，返回需要等待的秒数"""
+        return self.governor.reserve(self.direction, nbytes)
+
+    def __iter__(self):
+        for chunk in self.iter_raw():
+            self.governor.throttle(self.direction, len(chunk))
+            yield chunk
+
+
+class BandwidthGovernor:
+    """
+    上传、下载共用的带宽控制器（线程安全）
+
+    属性:
+        upload_limit / download_limit / total_limit: 基础限速（字节/秒，None表示不限）
+        schedule: 时段限速表（见 parse_schedule）
+        total_wait: 因限速累计等待的时长（秒）
+    """
+
+    def __init__(self, upload_limit: Optional[float] = None, download_limit: Optional[float] = None,
+                 total_limit: Optional[float] = None,
+                 schedule: Optional[List[Tuple[int, int, Dict[str, Optional[float]]]]] = None,
+                 burst_seconds: float = DEFAULT_BURST_SECONDS):
+        """
+        Args:
+            upload_limit: 上传速率上限（字节/秒，可选）
+            download_limit: 下载速率上限（字节/秒，可选）
+            total_limit: 上传和下载合计的速率上限（字节/秒，可选）
+            schedule: 时段限速表（可选）
+            burst_seconds: 令牌桶允许积攒的额度（秒）
+        """
+        self.upload_limit = upload_limit
+        self.download_limit = download_limit
+        self.total_limit = total_limit
+        self.schedule = schedule or []
+        self.burst_seconds = burst_seconds
+        self.total_wait = 0.0
+
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._total = None
+        self._limited = False
+        self._active_limits = {}
+        self._next_check = 0.0
+        self._apply(self._base_limits())
+
+    # ==================== 设置 ====================
+
+    def _base_limits(self) -> Dict[str, Optional[float]]:
+        return {"upload": self.upload_limit, "download": self.download_limit, "total": self.total_limit}
+
+    def set_limits(self, upload_limit: Optional[float] = None, download_limit: Optional[float] = None,
+                   total_limit: Optional[float] = None) -> None:
+        """
+        修改基础限速（运行中可随时调用，正在进行的传输从下一块数据起生效）
+
+        Args:
+            upload_limit: 上传速率上限（字节/秒，None表示不限）
+            download_limit: 下载速率上限（字节/秒，None表示不限）
+            total_limit: 合计速率上限（字节/秒，None表示不限）
+        """
+        with self._lock:
+            self.upload_limit = upload_limit
+            self.download_limit = download_limit
+            self.total_limit = total_limit
+            self._next_check = 0.0
+        self._refresh(time.monotonic(), force=True)
+
+    def set_schedule(self, schedule: Optional[List[Tuple[int, int, Dict[str, Optional[float]]]]]) -> None:
+        """
+        设置时段限速表（传入None或空列表取消）
+
+        Args:
+            schedule: 时段限速表（见 parse_schedule）
+        """
+        with self._lock:
+            self.schedule = schedule or []
+        self._refresh(time.monotonic(), force=True)
+
+    def configure(self, config: Dict[str, str]) -> None:
+        """
+        按配置文件设置限速
+
+        读取 UPLOAD_LIMIT、DOWNLOAD_LIMIT、TOTAL_BANDWIDTH_LIMIT、BANDWIDTH_SCHEDULE 四项，均为可选。
+
+        Args:
+            config: load_config() 返回的配置字典
+
+        Raises:
+            ValueError: 配置格式错误
+        """
+        self.set_limits(parse_rate(config.get("UPLOAD_LIMIT")),
+                        parse_rate(config.get("DOWNLOAD_LIMIT")),
+                        parse_rate(config.get("TOTAL_BANDWIDTH_LIMIT")))
+        self.set_schedule(parse_schedule(config.get("BANDWIDTH_SCHEDULE", "")))
+
+    def _current_limits(self) -> Dict[str, Optional[float]]:
+        """按当前时段计算生效的限速"""
+        limits = self._base_limits()
+        if self.schedule:
+            now = time.localtime()
+            minute = now.tm_hour * 60 + now.tm_min
+            for start, end, entry in self.schedule:
+                if _in_span(minute, start, end):
+                    limits.update(entry)
+                    break
+        return limits
+
+    def _refresh(self, now: float, force: bool = False) -> None:
+        """到检查时间时重新计算生效的限速"""
+        with self._lock:
+            if not force and now < self._next_check:
+                return
+            self._next_check = now + SCHEDULE_CHECK_INTERVAL
+            limits = self._current_limits()
+            if limits != self._active_limits:
+                self._apply(limits)
+
+    def _apply(self, limits: Dict[str, Optional[float]]) -> None:
+        """按限速重建或调整令牌桶（调用方持有锁，构造时除外）"""
+        buckets = {}
+        for direction in (UPLOAD, DOWNLOAD, "total"):
+            rate = limits.get(direction)
+            current = self._total if direction == "total" else self._buckets.get(direction)
+            if not rate:
+                bucket = None
+            elif current is not None:
+                current.set_rate(rate)
+                bucket = current
+            else:
+                bucket = ByteBucket(rate, self.burst_seconds)
+            buckets[direction] = bucket
+
+        self._total = buckets.pop("total")
+        self._buckets = buckets
+        self._active_limits = dict(limits)
+        self._limited = self._total is not None or any(buckets.values())
+
+    @property
+    def limited(self) -> bool:
+        """当前是否有生效的限速"""
+        return self._limited
+
+    # ==================== 预约 ====================
+
+    def reserve(self, direction: str, nbytes: int) -> float:
+        """
+        预约一次传输，返回需要等待的秒数（不休眠）
+
+        Args:
+            direction: UPLOAD 或 DOWNLOAD
+            nbytes: 字节数
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        if not self._limited and not self.schedule:
+            return 0.0
+
+        now = time.monotonic()
+        if self.schedule and now >= self._next_check:
+            self._refresh(now)
+        if not self._limited or nbytes <= 0:
+            return 0.0
+
+        delay = 0.0
+        bucket = self._buckets.get(direction)
+        if bucket is not None:
+            delay = bucket.reserve(nbytes, now)
+        total = self._total
+        if total is not None:
+            delay = max(delay, total.reserve(nbytes, now))
+
+        if delay < MIN_SLEEP_SECONDS:
+            return 0.0
+        with self._lock:
+            self.total_wait += delay
+        return delay
+
+    def throttle(self, direction: str, nbytes: int) -> float:
+        """
+        阻塞直到可以传输 nbytes 字节
+
+        Args:
+            direction: UPLOAD 或 DOWNLOAD
+            nbytes: 字节数
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        delay = self.reserve(direction, nbytes)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def throttle_async(self, direction: str, nbytes: int) -> float:
+        """
+        等待直到可以传输 nbytes 字节（协程版，不阻塞事件循环）
+
+        Args:
+            direction: UPLOAD 或 DOWNLOAD
+            nbytes: 字节数
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        delay = self.reserve(direction, nbytes)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def wrap_upload(self, body):
+        """
+        把上传请求体包装为边发送边限速的请求体
+
+        流式请求体总是包装（限速可能在传输过程中开启）；bytes 请求体只在当前有限速时包装，
+        不限速时保持原样，由传输层一次写出。
+
+        Args:
+            body: 请求体
+
+        Returns:
+            请求体：ThrottledBody 或原请求体
+        """
+        if body is None or isinstance(body, ThrottledBody):
+            return body
+        if is_streaming_body(body) or ((self._limited or self.schedule) and len(body)):
+            return ThrottledBody(body, self, UPLOAD)
+        return body
+
+    def describe(self) -> str:
+        """
+        生成当前生效限速的说明
+
+        Returns:
+            str: 如 "上传 5.0 MB/s，下载不限，合计不限"
+        """
+        with self._lock:
+            limits = dict(self._active_limits)
+
+        def fmt(rate):
+            return f"{rate / 1024 / 1024:.1f} MB/s" if rate else "不限"
+
+        return (f"上传 {fmt(limits.get(UPLOAD))}，下载 {fmt(limits.get(DOWNLOAD))}，"
+                f"合计 {fmt(limits.get('total'))}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取统计快照
+
+        Returns:
+            Dict[str, Any]: 生效的限速（字节/秒）和累计等待时长
+        """
+        with self._lock:
+            return {
+                "upload_limit": self._active_limits.get(UPLOAD),
+                "download_limit": self._active_limits.get(DOWNLOAD),
+                "total_limit": self._active_limits.get("total"),
+                "total_wait": round(self.total_wait, 3),
+            }
+
+
+# ==================== 共享实例 ====================
+
+_default_governor = None
+_default_lock = threading.Lock()
+
+
+def get_default_bandwidth_governor() -> BandwidthGovernor:
+    """
+    获取进程内共享的带宽控制器（默认不限速）
+
+    Returns:
+        BandwidthGovernor: 共享带宽控制器
+    """
+    global _default_governor
+
+    with _default_lock:
+        if _default_governor is None:
+            _default_governor = BandwidthGovernor()
+        return _default_governor
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘开放平台请求层
+
+功能说明：
+    各工具类的 _request 都经由 ApiClient 发送请求，在连接池之上统一处理：
+    按接口QPS限流、令牌失效（401）时重新认证并重放请求、
+    按重试策略对限流（429）、服务器错误和网络错误退避重试。
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import json
+import time
+from typing import Optional, Dict, Union
+
+from .auth import TokenManager, bearer_token, is_token_expired, with_token
+from .rate_limit import RateLimiter, get_default_rate_limiter
+from .retry import (RetryPolicy, get_default_retry_policy, response_retry_reason, exception_retry_reason,
+                    parse_retry_after)
+from .transport import PooledTransport, PooledResponse, get_default_transport
+
+
+def body_code(response: PooledResponse) -> Optional[int]:
+    """
+    读取JSON响应体中的code，非JSON或无法解析时返回None
+
+    只有响应开头出现 "429" 时才完整解析（重试只关心 code 429），避免对大列表反复解析JSON。
+    """
+    head = response.data[:128]
+    if not head.startswith(b"{") or b"429" not in head:
+        return None
+    try:
+        return json.loads(response.data.decode("utf-8")).get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+class ApiClient:
+    """
+    带限流、自动重新认证和重试的API请求客户端
+
+    属性:
+        transport: HTTP传输层
+        token_manager: 令牌管理器（为None时不做重新认证）
+        rate_limiter: 限流器（为None时不限流）
+        retry_policy: 重试策略（重试指标见 retry_policy.metrics）
+
+    使用示例:
+        >>> client = ApiClient(token_manager=TokenManager(token, client_id, client_secret))
+        >>> response = client.request("GET", "open-api.123pan.com", "/api/v2/file/list?parentFileId=0&limit=100",
+        ...                           headers={'Authorization': f'Bearer {token}', 'Platform': 'open_platform'})
+    """
+
+    def __init__(self, transport: Optional[PooledTransport] = None, token_manager: Optional[TokenManager] = None,
+                 rate_limiter: Optional[RateLimiter] = None, retry_policy: Optional[RetryPolicy] = None):
+        """
+        Args:
+            transport: HTTP传输层（可选，默认使用共享连接池）
+            token_manager: 令牌管理器（可选）
+            rate_limiter: 限流器（可选，默认使用进程内共享的限流器）
+            retry_policy: 重试策略（可选，默认使用进程内共享的策略）
+        """
+        self.transport = transport or get_default_transport()
+        self.token_manager = token_manager
+        self.rate_limiter = rate_limiter or get_default_rate_limiter()
+        self.retry_policy = retry_policy or get_default_retry_policy()
+
+    @property
+    def client_id(self) -> Optional[str]:
+        """限流所用的客户端ID"""
+        return self.token_manager.client_id if self.token_manager is not None else None
+
+    def _send(self, method: str, host: str, path: str, body, headers) -> PooledResponse:
+        """按接口QPS等待后发送请求，可重试的失败按重试策略退避后重发"""
+        attempt = 0
+
+        while True:
+            attempt += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(self.client_id, path)
+            self.retry_policy.record_request()
+
+            try:
+                response = self.transport.request(method, host, path, body, headers)
+            except Exception as e:
+                delay = self.retry_policy.next_delay(method, path, exception_retry_reason(e), attempt)
+                if delay is None:
+                    raise
+                print(f"⚠️  请求失败（{e}），{delay:.1f}秒后重试 ({attempt}/{self.retry_policy.max_attempts - 1})")
+                time.sleep(delay)
+                continue
+
+            reason = response_retry_reason(response.status, body_code(response))
+            retry_after = parse_retry_after(response.headers.get("Retry-After")) if reason else None
+            delay = self.retry_policy.next_delay(method, path, reason, attempt, retry_after)
+            if delay is None:
+                return response
+
+            time.sleep(delay)
+
+    def request(self, method: str, host: str, path: str, body: Union[str, bytes, None] = None,
+                headers: Optional[Dict[str, str]] = None) -> PooledResponse:
+        """
+        发送请求
+
+        Args:
+            method: HTTP方法
+            host: 主机地址
+            path: 请求路径
+            body: 请求体（重放时会再次发送，需可重复读取）
+            headers: 请求头
+
+        Returns:
+            PooledResponse: 响应对象（重试用尽时为最后一次的响应）
+
+        Raises:
+            Exception: 不可重试或重试用尽的网络错误
+        """
+        response = self._send(method, host, path, body, headers)
+
+        stale_token = bearer_token(headers)
+        if (self.token_manager is not None and stale_token is not None
+                and self.token_manager.can_refresh and is_token_expired(response)):
+            new_token = self.token_manager.refresh(stale_token)
+            response = self._send(method, host, path, body, with_token(headers, new_token))
+
+        return response
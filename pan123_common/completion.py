@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘上传完成确认的集中轮询
+
+功能说明：
+    分片全部上传后，服务器需要合并分片，upload_complete / upload_async_result 要轮询到
+    completed 为止。原先每个文件在自己的循环里每秒轮询一次、最多30次，
+    上传大量文件时上传位大部分时间都阻塞在这些循环里。
+
+    本模块把所有等待合并的 preuploadID 交给同一个跟踪器统一轮询：
+
+    - 提交后立即返回一个 Future，调用方可以先去上传下一个文件，需要结果时再等待
+    - 每一轮把所有到期的上传成批检查（少量线程并发发送，仍受共享限流器约束）
+    - 每个上传的检查间隔按指数退避增长（默认 0.25s 起、翻倍、封顶 4s），
+      小文件通常第一次检查就已完成，大文件不会每秒空轮询
+    - 检查次数用尽、服务器拒绝或请求失败时 Future 以异常结束
+
+主要功能：
+    - CompletionTracker: 线程版跟踪器，poll 为普通函数，返回 concurrent.futures.Future
+    - AsyncCompletionTracker: 协程版跟踪器，poll 为协程函数，返回 asyncio.Future
+    - poll 函数约定：已完成时返回结果，尚未完成时返回 None，失败时抛出异常
+
+使用示例:
+    >>> def poll(preupload_id):
+    ...     data = request_upload_complete(preupload_id)
+    ...     return {"success": True, "fileID": data["fileID"]} if data["completed"] else None
+    >>> tracker = CompletionTracker(poll)
+    >>> futures = [tracker.submit(pid) for pid in preupload_ids]
+    >>> results = [f.result() for f in futures]
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable, List
+
+
+# 第一次重新检查前的等待时间（秒）
+DEFAULT_INITIAL_DELAY = 0.25
+
+# 每次检查后等待时间的增长倍数
+DEFAULT_BACKOFF_FACTOR = 2.0
+
+# 检查间隔上限（秒）
+DEFAULT_MAX_DELAY = 4.0
+
+# 每个上传最多检查的次数（按默认退避约2分钟）
+DEFAULT_MAX_POLLS = 30
+
+# 每一轮同时发送的检查请求数
+DEFAULT_POLL_WORKERS = 4
+
+
+class CompletionTimeout(Exception):
+    """检查次数用尽时上传仍未完成"""
+
+
+class _Pending:
+    """一个等待合并的上传"""
+
+    __slots__ = ("key", "future", "polls", "max_polls", "submitted")
+
+    def __init__(self, key: str, future, max_polls: int):
+        self.key = key
+        self.future = future
+        self.polls = 0
+        self.max_polls = max_polls
+        self.submitted = time.monotonic()
+
+
+class _CompletionSchedule:
+    """按到期时间排列的待检查上传，以及退避间隔的计算（线程版与协程版共用）"""
+
+    def __init__(self, initial_delay: float, backoff_factor: float, max_delay: float, max_polls: int):
+        self.initial_delay = initial_delay
+        self.backoff_factor = backoff_factor
+        self.max_delay = max_delay
+        self.max_polls = max_polls
+
+        self.completed = 0
+        self.failed = 0
+        self.polls = 0
+        self._heap = []
+        self._seq = itertools.count()
+
+    @property
+    def pending(self) -> int:
+        """等待合并的上传数"""
+        return len(self._heap)
+
+    def delay_after(self, polls: int) -> float:
+        """
+        第 polls 次检查仍未完成时，到下一次检查的等待时间
+
+        Args:
+            polls: 已检查的次数（从1开始）
+
+        Returns:
+            float: 等待秒数
+        """
+        return min(self.max_delay, self.initial_delay * self.backoff_factor ** (polls - 1))
+
+    def _push(self, entry: _Pending, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._seq), entry))
+
+    def _pop_due(self, now: float) -> List[_Pending]:
+        """取出所有已到期的上传"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def _next_due(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def _settle(self, entry: _Pending, result: Any = None, error: Optional[BaseException] = None,
+                now: Optional[float] = None) -> bool:
+        """
+        处理一次检查的结果
+
+        Returns:
+            bool: 上传已有结论（完成或失败）时返回True，仍需继续检查时返回False
+        """
+        entry.polls += 1
+        self.polls += 1
+
+        if error is not None:
+            self.failed += 1
+            self._resolve(entry.future, error=error)
+            return True
+        if result is not None:
+            self.completed += 1
+            self._resolve(entry.future, result=result)
+            return True
+        if entry.polls >= entry.max_polls:
+            self.failed += 1
+            waited = time.monotonic() - entry.submitted
+            self._resolve(entry.future, error=CompletionTimeout(
+                f"上传完成确认超时（检查 {entry.polls} 次，等待 {waited:.0f} 秒）"))
+            return True
+
+        self._push(entry, (now or time.monotonic()) + self.delay_after(entry.polls))
+        return False
+
+    @staticmethod
+    def _resolve(future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """完成 future（concurrent.futures.Future 或 asyncio.Future），已完成（如已取消）时忽略"""
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def summary(self) -> str:
+        """
+        生成统计摘要
+
+        Returns:
+            str: 如 "完成 120 个，失败 0 个，等待中 3 个，共检查 131 次"
+        """
+        return f"完成 {self.completed} 个，失败 {self.failed} 个，等待中 {self.pending} 个，共检查 {self.polls} 次"
+
+
+class CompletionTracker(_CompletionSchedule):
+    """
+    线程版上传完成跟踪器
+
+    后台线程在第一次 submit 时启动，没有待检查的上传时阻塞等待，不占用CPU。
+    """
+
+    def __init__(self, poll: Callable[[str], Optional[Dict[str, Any]]],
+                 initial_delay: float = DEFAULT_INITIAL_DELAY, backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 max_delay: float = DEFAULT_MAX_DELAY, max_polls: int = DEFAULT_MAX_POLLS,
+                 poll_workers: int = DEFAULT_POLL_WORKERS):
+        """
+        Args:
+            poll: 检查函数，已完成时返回结果，尚未完成时返回None，失败时抛出异常
+            initial_delay: 第一次重新检查前的等待时间（秒）
+            backoff_factor: 检查间隔的增长倍数
+            max_delay: 检查间隔上限（秒）
+            max_polls: 每个上传最多检查的次数
+            poll_workers: 每一轮同时发送的检查请求数
+        """
+        super().__init__(initial_delay, backoff_factor, max_delay, max_polls)
+        self.poll = poll
+        self.poll_workers = max(1, poll_workers)
+
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._closed = False
+
+    def submit(self, key: str, delay: float = 0.0, max_polls: Optional[int] = None) -> Future:
+        """
+        提交一个等待合并的上传
+
+        Args:
+            key: 预上传ID
+            delay: 第一次检查前的等待时间（秒），默认立即检查
+            max_polls: 该上传最多检查的次数（可选，默认为跟踪器的 max_polls）
+
+        Returns:
+            Future: 完成时得到 poll 返回的结果，失败或超时时抛出对应异常
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise Exception("上传完成跟踪器已关闭")
+            self._push(_Pending(key, future, max_polls or self.max_polls), time.monotonic() + delay)
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.poll_workers)
+                self._thread = threading.Thread(target=self._run, name="pan123-completion", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def wait(self, key: str, delay: float = 0.0, max_polls: Optional[int] = None) -> Dict[str, Any]:
+        """提交并等待一个上传完成（阻塞）"""
+        return self.submit(key, delay, max_polls).result()
+
+    def close(self) -> None:
+        """停止后台线程，仍在等待的上传以异常结束"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._executor.shutdown(wait=True)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    next_due = self._next_due()
+                    now = time.monotonic()
+                    if next_due is not None and next_due <= now:
+                        break
+                    self._cond.wait(None if next_due is None else next_due - now)
+
+                if self._closed:
+                    for entry in self._pop_due(float("inf")):
+                        self._resolve(entry.future, error=Exception("上传完成跟踪器已关闭"))
+                    return
+                due = self._pop_due(time.monotonic())
+
+            # 同一轮到期的上传成批检查，不持有锁，期间可以继续提交新的上传
+            outcomes = list(self._executor.map(self._poll_one, due))
+            now = time.monotonic()
+            # 不持有锁完成 Future：回调（如更新断点续传日志）可能较慢，不应挡住新的提交
+            for entry, (result, error) in zip(due, outcomes):
+                self._settle(entry, result, error, now)
+
+    def _push(self, entry: _Pending, due: float) -> None:
+        with self._cond:
+            super()._push(entry, due)
+
+    def _poll_one(self, entry: _Pending):
+        try:
+            return self.poll(entry.key), None
+        except Exception as e:
+            return None, e
+
+
+class AsyncCompletionTracker(_CompletionSchedule):
+    """
+    协程版上传完成跟踪器
+
+    轮询任务在第一次 submit 时于当前事件循环中创建，所有待检查的上传都到期后自动结束，
+    之后再次 submit 时重新创建。
+    """
+
+    def __init__(self, poll: Callable[[str], Any],
+                 initial_delay: float = DEFAULT_INITIAL_DELAY, backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                 max_delay: float = DEFAULT_MAX_DELAY, max_polls: int = DEFAULT_MAX_POLLS):
+        """
+        Args:
+            poll: 检查协程函数，已完成时返回结果，尚未完成时返回None，失败时抛出异常
+            initial_delay: 第一次重新检查前的等待时间（秒）
+            backoff_factor: 检查间隔的增长倍数
+            max_delay: 检查间隔上限（秒）
+            max_polls: 每个上传最多检查的次数
+        """
+        super().__init__(initial_delay, backoff_factor, max_delay, max_polls)
+        self.poll = poll
+        self._task = None
+        self._wakeup = None
+
+    def submit(self, key: str, delay: float = 0.0, max_polls: Optional[int] = None) -> "asyncio.Future":
+        """
+        提交一个等待合并的上传（需在事件循环中调用）
+
+        Args:
+            key: 预上传ID
+            delay: 第一次检查前的等待时间（秒），默认立即检查
+            max_polls: 该上传最多检查的次数（可选，默认为跟踪器的 max_polls）
+
+        Returns:
+            asyncio.Future: 完成时得到 poll 返回的结果，失败或超时时抛出对应异常
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self._push(_Pending(key, future, max_polls or self.max_polls), time.monotonic() + delay)
+
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        else:
+            self._wakeup.set()
+        return future
+
+    async def wait(self, key: str, delay: float = 0.0, max_polls: Optional[int] = None) -> Dict[str, Any]:
+        """提交并等待一个上传完成"""
+        return await self.submit(key, delay, max_polls)
+
+    async def _run(self) -> None:
+        while self._heap:
+            delay = self._next_due() - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    # 等到最早的上传到期，期间有新的上传提交时重新计算
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(time.monotonic())
+            outcomes = await asyncio.gather(*(self._poll_one(entry) for entry in due))
+            now = time.monotonic()
+            for entry, (result, error) in zip(due, outcomes):
+                self._settle(entry, result, error, now)
+
+    async def _poll_one(self, entry: _Pending):
+        try:
+            return await self.poll(entry.key), None
+        except Exception as e:
+            return None, e
@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘自适应上传并发控制（AIMD）
+
+功能说明：
+    固定的并发数很难兼顾各种网络：并发太低跑不满上行带宽，太高又会触发上传服务器的
+    429限流和连接重置。本模块按实测的有效吞吐（goodput）、请求耗时和错误动态调整并发上限：
+
+    - 加性增：每个统计窗口（约等于当前并发数个请求）结束时，若有效吞吐比上一窗口提高，
+      并发上限加1；吞吐持平时保持不变，连续若干窗口稳定后再试探性加1
+    - 回退：加1后吞吐没有提高，说明已到带宽瓶颈，撤回这次增加；
+      耗时明显变长而吞吐没有提高时同样减1
+    - 乘性减：遇到限流（429）、服务器错误或网络错误时并发上限立即减半，
+      随后的冷却期内不再重复减少（同一次拥塞往往同时让多个在途请求失败）
+
+    同一控制器可被多个线程（acquire/release）或协程（acquire_async/release）共享，
+    例如同一上传器中所有文件的分片共用一个分片并发控制器。
+
+主要功能：
+    - acquire() / release(): 按当前并发上限获取和归还上传位（线程阻塞等待）
+    - acquire_async(): 协程版获取上传位
+    - record_success(): 记录一次成功请求的字节数和耗时
+    - record_congestion(): 记录一次拥塞信号（限流、5xx、连接错误）
+    - on_retry(): 可注册为 RetryMetrics 的监听器，重试发生时直接作为拥塞信号
+    - limit / peak / in_flight: 当前并发上限、峰值并发、在途请求数
+
+使用示例:
+    >>> controller = AdaptiveConcurrency(initial=4, maximum=16)
+    >>> controller.acquire()
+    >>> try:
+    ...     start = time.monotonic()
+    ...     send_slice()
+    ...     controller.record_success(slice_size, time.monotonic() - start)
+    ... except Exception:
+    ...     controller.record_congestion("network")
+    ...     raise
+    ... finally:
+    ...     controller.release()
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import time
+import asyncio
+import threading
+from typing import Dict, Any, Iterable
+
+
+# 统计窗口的最少样本数（并发较低时避免窗口过小导致频繁调整）
+MIN_WINDOW_SAMPLES = 4
+
+# 吞吐变化超过该比例才视为"提高"或"下降"
+GAIN_THRESHOLD = 0.05
+
+# 拥塞时并发上限乘以该系数
+DECREASE_FACTOR = 0.5
+
+# 拥塞后的冷却期（秒）：期间的其他拥塞信号不再减少并发
+COOLDOWN_SECONDS = 2.0
+
+# 平均耗时超过最佳耗时的多少倍视为排队过深
+LATENCY_TOLERANCE = 2.0
+
+# 吞吐稳定多少个窗口后试探性增加并发
+PROBE_AFTER_STABLE_WINDOWS = 5
+
+# 协程等待上传位时的轮询间隔（秒）
+ASYNC_POLL_INTERVAL = 0.02
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD自适应并发控制器（线程安全）
+
+    属性:
+        minimum: 并发上限的下限
+        maximum: 并发上限的上限
+        limit: 当前并发上限
+        peak: 实际达到过的最大在途请求数
+        in_flight: 当前在途请求数
+        goodput: 最近一个窗口的有效吞吐（字节/秒）
+        increases / decreases: 增加和减少并发上限的次数
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 16,
+                 endpoints: Iterable[str] = ()):
+        """
+        Args:
+            initial: 初始并发上限
+            minimum: 并发上限的下限
+            maximum: 并发上限的上限（minimum == maximum 时即为固定并发）
+            endpoints: on_retry 关心的接口名（如 "upload/v2/file/slice"），为空时响应所有重试
+        """
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.peak = 0
+        self.in_flight = 0
+        self.goodput = None
+        self.increases = 0
+        self.decreases = 0
+        self.endpoints = set(endpoints)
+
+        self._cond = threading.Condition()
+        self._window_start = None
+        self._window_bytes = 0
+        self._window_seconds = 0.0
+        self._window_samples = 0
+        self._window_congested = False
+        self._previous_goodput = None
+        self._best_latency = None
+        self._just_increased = False
+        self._stable_windows = 0
+        self._last_decrease = 0.0
+
+    @property
+    def adaptive(self) -> bool:
+        """并发上限是否可调"""
+        return self.minimum < self.maximum
+
+    # ==================== 上传位 ====================
+
+    def try_acquire(self) -> bool:
+        """
+        不等待地获取一个上传位
+
+        Returns:
+            bool: 当前在途请求数未达到上限时返回True
+        """
+        with self._cond:
+            if self.in_flight >= self.limit:
+                return False
+            self._take()
+            return True
+
+    def acquire(self) -> None:
+        """获取一个上传位，在途请求数达到当前上限时阻塞等待"""
+        with self._cond:
+            while self.in_flight >= self.limit:
+                self._cond.wait()
+            self._take()
+
+    async def acquire_async(self) -> None:
+        """获取一个上传位（协程版，不阻塞事件循环）"""
+        while not self.try_acquire():
+            await asyncio.sleep(ASYNC_POLL_INTERVAL)
+
+    def release(self) -> None:
+        """归还上传位"""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def _take(self) -> None:
+        # 调用方持有锁
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        if self._window_start is None:
+            self._window_start = time.monotonic()
+
+    # ==================== 反馈 ====================
+
+    def record_success(self, nbytes: int, seconds: float) -> None:
+        """
+        记录一次成功的请求
+
+        Args:
+            nbytes: 发送的字节数
+            seconds: 请求耗时（秒）
+        """
+        with self._cond:
+            self._window_bytes += nbytes
+            self._window_seconds += seconds
+            self._window_samples += 1
+            if self._window_samples >= max(MIN_WINDOW_SAMPLES, self.limit):
+                self._close_window()
+
+    def record_congestion(self, reason: str = "") -> None:
+        """
+        记录一次拥塞信号（限流、服务器错误、连接重置或超时），并发上限减半
+
+        Args:
+            reason: 原因（仅用于调试）
+        """
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < COOLDOWN_SECONDS:
+                self._window_congested = True
+                return
+
+            self._last_decrease = now
+            self._set_limit(int(self.limit * DECREASE_FACTOR))
+            self._reset_window(congested=True)
+
+    def on_retry(self, event: Dict[str, Any]) -> None:
+        """
+        RetryMetrics 监听器：关心的接口发生重试时视为拥塞
+
+        Args:
+            event: 重试事件（endpoint, reason, attempt, delay）
+        """
+        if not self.endpoints or event.get("endpoint") in self.endpoints:
+            self.record_congestion(event.get("reason", ""))
+
+    def _close_window(self) -> None:
+        """一个统计窗口结束：按吞吐变化调整并发上限（调用方持有锁）"""
+        elapsed = max(time.monotonic() - (self._window_start or time.monotonic()), 1e-6)
+        goodput = self._window_bytes / elapsed
+        latency = self._window_seconds / self._window_samples
+        previous = self._previous_goodput
+        congested = self._window_congested
+
+        self.goodput = goodput
+        if self._best_latency is None or latency < self._best_latency:
+            self._best_latency = latency
+
+        if congested:
+            # 拥塞后的窗口只作为新的比较基准
+            self._just_increased = False
+        elif previous is None or goodput > previous * (1 + GAIN_THRESHOLD):
+            # 吞吐提高（或第一个窗口）：继续加性增
+            self._just_increased = self._set_limit(self.limit + 1)
+            self._stable_windows = 0
+        elif self._just_increased:
+            # 上次加1没有带来吞吐提高：已到瓶颈，撤回
+            self._set_limit(self.limit - 1)
+            self._just_increased = False
+        elif goodput < previous * (1 - GAIN_THRESHOLD) and latency > self._best_latency * LATENCY_TOLERANCE:
+            # 吞吐下降且耗时明显变长：排队过深
+            self._set_limit(self.limit - 1)
+        else:
+            # 稳定：隔一段时间试探带宽是否变大
+            self._stable_windows += 1
+            if self._stable_windows >= PROBE_AFTER_STABLE_WINDOWS:
+                self._just_increased = self._set_limit(self.limit + 1)
+                self._stable_windows = 0
+
+        self._previous_goodput = goodput
+        self._reset_window()
+
+    def _reset_window(self, congested: bool = False) -> None:
+        self._window_start = time.monotonic() if self.in_flight else None
+        self._window_bytes = 0
+        self._window_seconds = 0.0
+        self._window_samples = 0
+        self._window_congested = congested
+
+    def _set_limit(self, limit: int) -> bool:
+        """修改并发上限（调用方持有锁），返回是否实际发生了变化"""
+        limit = min(self.maximum, max(self.minimum, limit))
+        if limit == self.limit:
+            return False
+        if limit > self.limit:
+            self.increases += 1
+            self._cond.notify(limit - self.limit)
+        else:
+            self.decreases += 1
+        self.limit = limit
+        return True
+
+    # ==================== 统计 ====================
+
+    def status(self) -> str:
+        """
+        生成进度输出中的并发状态
+
+        Returns:
+            str: 如 "并发 6（峰值 8）"
+        """
+        return f"并发 {self.limit}（峰值 {self.peak}）"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取统计快照
+
+        Returns:
+            Dict[str, Any]: 当前上限、峰值、在途请求数、最近吞吐和调整次数
+        """
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "peak": self.peak,
+                "in_flight": self.in_flight,
+                "goodput": self.goodput,
+                "increases": self.increases,
+                "decreases": self.decreases,
+            }
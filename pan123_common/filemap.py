@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘零拷贝文件映射
+
+功能说明：
+    分片上传原先对每个分片重新打开文件、seek、read 出一个新的 bytes 对象，
+    再把它与部分头拼接成完整请求体，分片数据在Python中至少被复制一次到两次。
+
+    本模块把文件以只读方式映射（mmap）到内存，分片数据以映射上的 memoryview 窗口交给
+    multipart 编码器或传输层：部分头单独写出，分片内容由内核直接从页缓存发送到socket，
+    Python中不再产生分片数据的副本。
+
+    - 同一个文件只映射一次，各分片取各自的窗口
+    - 预读通过 madvise(WILLNEED) 提示内核提前把接下来的区间读入页缓存（平台不支持时忽略）
+    - 无法映射的文件（空文件、特殊文件、不支持mmap的文件系统）返回None，调用方退回按块读取
+
+    注意：文件被映射期间被截断时，访问超出新结尾的页会导致整个进程收到 SIGBUS。
+    发送每个窗口前应调用 check()（按块产生时 iter_file_windows 自动检查）用 fstat 确认文件仍足够长，
+    文件变短时抛出 IOError，只让这个文件失败。检查只能缩小而不能消除风险：正在发送的块恰好被截断时
+    仍会收到 SIGBUS，可能仍在被写入的文件应改为读入内存。
+
+主要功能：
+    - FileMap: 一个文件的只读映射（window() 取窗口，check() 确认文件未被截断，willneed() 预读提示，
+      close() 解除映射）
+    - map_file(): 映射文件，失败时返回None
+    - iter_file_windows(): 按块产生文件区间的 memoryview（映射失败时按块读取）
+
+使用示例:
+    >>> file_map = map_file("big.iso")
+    >>> if file_map is not None:
+    ...     with file_map:
+    ...         file_map.check(0, 16 * 1024 * 1024)
+    ...         transport.request_url("PUT", upload_url, file_map.window(0, 16 * 1024 * 1024))
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import mmap
+from typing import Optional, Iterator, Union
+
+
+def _check_size(fileno: int, file_path: str, end: int) -> None:
+    """用 fstat 确认文件至少还有 end 字节，否则抛出 IOError（访问被截断的映射会导致 SIGBUS）"""
+    if os.fstat(fileno).st_size < end:
+        raise IOError(f"读取文件时提前遇到结尾（文件在上传期间被修改？）: {file_path}")
+
+
+def _unmap(mapped: mmap.mmap) -> None:
+    """解除映射；仍有窗口未释放时交给垃圾回收（最后一个窗口释放后自动解除）"""
+    try:
+        mapped.close()
+    except BufferError:
+        pass
+
+
+class FileMap:
+    """
+    一个文件的只读内存映射
+
+    属性:
+        file_path: 文件路径
+        size: 映射的字节数（映射时的文件大小）
+    """
+
+    def __init__(self, file_path: str):
+        """
+        Args:
+            file_path: 文件路径
+
+        Raises:
+            OSError: 无法打开或映射文件
+            ValueError: 文件为空（无法映射）
+        """
+        self.file_path = file_path
+        # 文件保持打开，供 check() 对映射的同一个文件 fstat
+        self._file = open(file_path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        self.size = len(self._mmap)
+        self._view = memoryview(self._mmap)
+
+    def window(self, offset: int, length: int) -> memoryview:
+        """
+        取文件区间的 memoryview 窗口（不复制）
+
+        Args:
+            offset: 起始位置
+            length: 长度
+
+        Returns:
+            memoryview: 区间窗口
+
+        Raises:
+            ValueError: 区间超出映射范围，或映射已关闭
+        """
+        if self._view is None:
+            raise ValueError(f"文件映射已关闭: {self.file_path}")
+        if offset < 0 or length < 0 or offset + length > self.size:
+            raise ValueError(f"文件区间超出范围: {self.file_path} [{offset}, {offset + length}) / {self.size}")
+        return self._view[offset:offset + length]
+
+    def check(self, offset: int, length: int) -> None:
+        """
+        确认文件仍包含区间 [offset, offset + length)（发送窗口前调用）
+
+        Args:
+            offset: 起始位置
+            length: 长度
+
+        Raises:
+            IOError: 文件在映射后被截断
+            ValueError: 映射已关闭
+        """
+        if self._view is None:
+            raise ValueError(f"文件映射已关闭: {self.file_path}")
+        _check_size(self._file.fileno(), self.file_path, offset + length)
+
+    def willneed(self, offset: int, length: int) -> None:
+        """
+        提示内核尽快把区间读入页缓存（平台不支持时忽略）
+
+        Args:
+            offset: 起始位置
+            length: 长度
+        """
+        madvise = getattr(self._mmap, "madvise", None)
+        if madvise is None or self._view is None or length <= 0:
+            return
+        # madvise 的起始位置须按页对齐
+        start = offset - offset % mmap.PAGESIZE
+        try:
+            madvise(mmap.MADV_WILLNEED, start, min(offset + length, self.size) - start)
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def close(self) -> None:
+        """解除映射（重复调用无副作用；尚未释放的窗口仍可使用，全部释放后才真正解除）"""
+        view, self._view = self._view, None
+        if view is not None:
+            view.release()
+            _unmap(self._mmap)
+            self._file.close()
+
+    def __enter__(self) -> "FileMap":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def map_file(file_path: str) -> Optional[FileMap]:
+    """
+    映射文件，无法映射时返回None（调用方退回按块读取）
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        Optional[FileMap]: 文件映射
+    """
+    try:
+        return FileMap(file_path)
+    except (OSError, ValueError):
+        return None
+
+
+def iter_file_windows(file_path: str, offset: int, length: int,
+                      chunk_size: int) -> Iterator[Union[memoryview, bytes]]:
+    """
+    按块产生文件区间的数据：只映射该区间，产生映射上的 memoryview；无法映射时按块读取
+
+    产生每个块之前都用 fstat 确认文件没有被截断。
+
+    Args:
+        file_path: 文件路径
+        offset: 起始位置
+        length: 长度
+        chunk_size: 块大小
+
+    Returns:
+        Iterator[Union[memoryview, bytes]]: 数据块
+
+    Raises:
+        IOError: 文件比预期短（上传期间被修改）
+    """
+    if length <= 0:
+        return
+
+    with open(file_path, "rb") as f:
+        _check_size(f.fileno(), file_path, offset + length)
+
+        # 映射的起始位置须按分配粒度对齐
+        aligned = offset - offset % mmap.ALLOCATIONGRANULARITY
+        try:
+            mapped = mmap.mmap(f.fileno(), offset - aligned + length, access=mmap.ACCESS_READ, offset=aligned)
+        except (OSError, ValueError):
+            mapped = None
+
+        if mapped is None:
+            f.seek(offset)
+            remaining = length
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    raise IOError(f"读取文件时提前遇到结尾（文件在上传期间被修改？）: {file_path}")
+                remaining -= len(chunk)
+                yield chunk
+            return
+
+        view = memoryview(mapped)
+        try:
+            start = offset - aligned
+            for position in range(start, start + length, chunk_size):
+                _check_size(f.fileno(), file_path, aligned + min(position + chunk_size, start + length))
+                yield view[position:min(position + chunk_size, start + length)]
+        finally:
+            view.release()
+            _unmap(mapped)
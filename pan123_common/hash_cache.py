@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘持久化文件哈希缓存
+
+功能说明：
+    上传、图床、Markdown转换和下载校验都需要文件的MD5，原先每次运行都重新读取整个文件。
+    本模块把计算结果保存在缓存目录（与config.txt同级的 .cache/）下的 hash_cache.sqlite3，
+    文件的 绝对路径、大小、修改时间(ns)、inode 都未变化时直接返回保存的MD5，
+    反复同步一个大目录时只需为新增或修改过的文件计算哈希。
+
+主要功能：
+    - 缓存命中判断：路径 + 大小 + mtime_ns + inode 全部一致才命中，任一变化即重新计算
+    - 分片MD5表：与etag一起保存 hash_file() 算出的分片MD5表，续传或重新上传时无需再读文件
+    - 紧凑存储：MD5以16字节二进制保存，分片MD5表为连续的16字节摘要
+    - LRU清理：条目超过上限时删除最久未使用的条目
+    - 并发安全：SQLite WAL模式，多个进程、多个线程可同时读写（每个线程使用独立连接）
+    - 防止脏数据：哈希前后文件身份不一致（计算期间被修改）时不写入缓存
+    - 容错：数据库损坏或不可写时提示一次并直接计算，不影响上传下载
+
+使用示例:
+    >>> cache = get_default_hash_cache()
+    >>> cache.md5("big.iso")              # 首次读取文件计算
+    'e10adc3949ba59abbe56e057f20f883e'
+    >>> cache.md5("big.iso")              # 文件未变化，直接返回
+    'e10adc3949ba59abbe56e057f20f883e'
+    >>> digest = cache.digest("big.iso", slice_sizes=[16 * 1024 * 1024])
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional, Dict, Any, List, Iterable
+
+from .hashing import FileDigest, file_identity, hash_file
+from .storage import get_cache_dir
+
+
+# 缓存文件名（位于缓存目录）
+HASH_CACHE_FILE = "hash_cache.sqlite3"
+
+# 最多保存的文件数（每条约100字节加上分片MD5表，100万条约百余MB）
+DEFAULT_MAX_ENTRIES = 1000000
+
+# 每写入多少条检查一次是否需要清理
+PRUNE_INTERVAL = 1000
+
+# 命中时最近使用时间的更新粒度（秒），避免每次命中都写数据库
+TOUCH_GRANULARITY = 3600
+
+# 数据库被其他进程锁定时的等待时间（秒）
+BUSY_TIMEOUT = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hash (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    inode     INTEGER NOT NULL,
+    md5       BLOB NOT NULL,
+    last_used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS file_hash_last_used ON file_hash (last_used);
+CREATE TABLE IF NOT EXISTS slice_table (
+    path       TEXT NOT NULL,
+    slice_size INTEGER NOT NULL,
+    digests    BLOB NOT NULL,
+    PRIMARY KEY (path, slice_size)
+);
+"""
+
+
+def _pack(hex_digests: List[str]) -> bytes:
+    return b"".join(bytes.fromhex(value) for value in hex_digests)
+
+
+def _unpack(blob: bytes) -> List[str]:
+    return [blob[i:i + 16].hex() for i in range(0, len(blob), 16)]
+
+
+class HashCache:
+    """
+    持久化文件哈希缓存
+
+    同一进程中的多个工具类默认共享一个实例（见 get_default_hash_cache）。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: 数据库文件路径（默认位于缓存目录）
+            max_entries: 最多保存的文件数
+        """
+        self.path = path or os.path.join(get_cache_dir(), HASH_CACHE_FILE)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._warned = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接（首次使用时创建表）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def get(self, file_path: str, slice_sizes: Iterable[int] = ()) -> Optional[FileDigest]:
+        """
+        查询缓存（不会读取文件内容）
+
+        Args:
+            file_path: 文件路径
+            slice_sizes: 需要的分片MD5表的分片大小
+
+        Returns:
+            Optional[FileDigest]: 文件未变化且包含所需分片MD5表时返回缓存结果，否则返回None
+        """
+        try:
+            return self._lookup(file_identity(file_path), slice_sizes)
+        except sqlite3.Error as e:
+            self._warn(e)
+            return None
+
+    def _lookup(self, identity: Dict[str, Any], slice_sizes: Iterable[int]) -> Optional[FileDigest]:
+        conn = self._connect()
+        row = conn.execute("SELECT size, mtime_ns, inode, md5, last_used FROM file_hash WHERE path = ?",
+                           (identity["path"],)).fetchone()
+        if row is None or tuple(row[:3]) != (identity["size"], identity["mtime_ns"], identity["inode"]):
+            return None
+
+        tables = {}
+        for slice_size, blob in conn.execute("SELECT slice_size, digests FROM slice_table WHERE path = ?",
+                                             (identity["path"],)):
+            tables[slice_size] = _unpack(blob)
+
+        if any(size not in tables for size in slice_sizes if size and size > 0):
+            return None
+
+        now = int(time.time())
+        if now - row[4] >= TOUCH_GRANULARITY:
+            conn.execute("UPDATE file_hash SET last_used = ? WHERE path = ?", (now, identity["path"]))
+
+        return FileDigest(row[3].hex(), identity["size"], tables)
+
+    def put(self, file_path: str, digest: FileDigest, identity: Optional[Dict[str, Any]] = None) -> None:
+        """
+        保存文件的哈希结果（例如下载时边写边算出的MD5）
+
+        Args:
+            file_path: 文件路径
+            digest: 哈希结果
+            identity: 计算哈希前获取的文件身份（可选）；与当前身份不一致时说明文件在计算期间被修改，不保存
+        """
+        current = file_identity(file_path)
+        if identity is not None and identity != current:
+            return
+        if digest.size != current["size"]:
+            return
+
+        try:
+            self._store(current, digest)
+            with self._lock:
+                self._writes += 1
+                due = self._writes % PRUNE_INTERVAL == 0
+            if due:
+                self.prune()
+        except sqlite3.Error as e:
+            self._warn(e)
+
+    def _store(self, identity: Dict[str, Any], digest: FileDigest) -> None:
+        path = identity["path"]
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("INSERT OR REPLACE INTO file_hash (path, size, mtime_ns, inode, md5, last_used) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (path, identity["size"], identity["mtime_ns"], identity["inode"],
+                          bytes.fromhex(digest.etag), int(time.time())))
+            conn.execute("DELETE FROM slice_table WHERE path = ?", (path,))
+            conn.executemany("INSERT INTO slice_table (path, slice_size, digests) VALUES (?, ?, ?)",
+                             [(path, size, _pack(table)) for size, table in digest.slice_md5s.items()])
+
+    def digest(self, file_path: str, slice_sizes: Iterable[int] = (),
+               buffer: Optional[bytearray] = None) -> FileDigest:
+        """
+        获取文件的etag和分片MD5表，缓存未命中时读取文件计算并保存
+
+        Args:
+            file_path: 文件路径
+            slice_sizes: 需要的分片MD5表的分片大小
+            buffer: 计算哈希时复用的读取缓冲区（可选，见 hashing.hash_file）
+
+        Returns:
+            FileDigest: 哈希结果
+        """
+        slice_sizes = list(slice_sizes)
+        identity = file_identity(file_path)
+
+        try:
+            digest = self._lookup(identity, slice_sizes)
+        except sqlite3.Error as e:
+            self._warn(e)
+            digest = None
+
+        if digest is not None:
+            with self._lock:
+                self.hits += 1
+            return digest
+
+        with self._lock:
+            self.misses += 1
+        digest = hash_file(file_path, slice_sizes, buffer=buffer)
+        self.put(file_path, digest, identity)
+        return digest
+
+    def _warn(self, error: Exception) -> None:
+        """缓存数据库不可用时只提示一次，哈希照常计算"""
+        with self._lock:
+            if self._warned:
+                return
+            self._warned = True
+        print(f"⚠️  哈希缓存不可用，将直接计算MD5: {error}")
+
+    def md5(self, file_path: str) -> str:
+        """
+        获取文件MD5，缓存未命中时读取文件计算并保存
+
+        Args:
+            file_path: 文件路径
+
+        Returns:
+            str: 文件的MD5（32位小写十六进制）
+        """
+        return self.digest(file_path).etag
+
+    def prune(self) -> int:
+        """
+        条目超过上限时删除最久未使用的条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            count = conn.execute("SELECT COUNT(*) FROM file_hash").fetchone()[0]
+            excess = count - self.max_entries
+            if excess <= 0:
+                return 0
+
+            # 多删一部分，避免之后每次写入都触发清理
+            excess += self.max_entries // 10
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS evicted (path TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM evicted")
+            conn.execute("INSERT INTO evicted SELECT path FROM file_hash ORDER BY last_used LIMIT ?", (excess,))
+            conn.execute("DELETE FROM file_hash WHERE path IN (SELECT path FROM evicted)")
+            conn.execute("DELETE FROM slice_table WHERE path IN (SELECT path FROM evicted)")
+            return excess
+
+    def forget(self, file_path: str) -> None:
+        """
+        删除指定文件的缓存
+
+        Args:
+            file_path: 文件路径
+        """
+        path = os.path.abspath(file_path)
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM file_hash WHERE path = ?", (path,))
+            conn.execute("DELETE FROM slice_table WHERE path = ?", (path,))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            Dict[str, Any]: 包含 hits、misses、entries 的字典
+        """
+        entries = self._connect().execute("SELECT COUNT(*) FROM file_hash").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+# ==================== 共享实例 ====================
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_hash_cache() -> HashCache:
+    """
+    获取进程内共享的哈希缓存
+
+    Returns:
+        HashCache: 共享哈希缓存
+    """
+    global _default_cache
+
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = HashCache()
+        return _default_cache
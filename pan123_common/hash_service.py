@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘并行文件哈希服务
+
+功能说明：
+    上传前每个文件都要先算出MD5（create 检测秒传、单步上传都需要），原先在调用线程中
+    逐个计算。一次上传数万个文件时，单线程计算哈希的时间甚至超过传输本身。
+
+    hashlib 在计算较大的数据块时会释放GIL，因此本模块用线程池并行计算，多个核心同时工作：
+
+    - 每个工作线程预先分配一个读取缓冲区（hashing.HASH_BUFFER_SIZE），用 readinto 读入后
+      直接计算，所有文件复用同一缓冲区，不为每个文件分配内存
+    - 结果写入持久化哈希缓存（hash_cache），上传器随后查缓存即可，不再读取文件
+    - 同一文件正在计算时再次提交，直接返回同一个 Future，不会重复读取
+    - prefetch() 在后台按顺序提交一批文件，提前量有上限（不会一次创建数万个任务），
+      上传器按同样的顺序处理文件，前面的文件算完即可开始 create 和传输，无需等整批算完
+
+主要功能：
+    - HashService.submit(): 提交一个文件，返回 Future[FileDigest]
+    - HashService.digest(): 计算（或等待正在进行的计算）并返回结果
+    - HashService.prefetch(): 后台预先计算一批文件
+    - HashService.map(): 并行计算一批文件，按完成顺序返回 (路径, 结果或异常)
+    - get_default_hash_service(): 获取进程内共享的哈希服务
+
+使用示例:
+    >>> service = get_default_hash_service()
+    >>> service.prefetch(paths, slice_sizes=[16 * 1024 * 1024])
+    >>> for path in paths:
+    ...     digest = service.digest(path, [16 * 1024 * 1024])   # 通常已算好，直接命中缓存
+    ...     create_file(path, digest.etag)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Dict, Iterable, Iterator, Tuple, Union
+
+from .hash_cache import HashCache, get_default_hash_cache
+from .hashing import FileDigest, HASH_BUFFER_SIZE
+
+
+# 默认工作线程数（MD5计算受CPU和磁盘限制，线程过多只会增加随机读）
+DEFAULT_HASH_WORKERS = min(8, os.cpu_count() or 4)
+
+# 预先提交的任务数上限 = 工作线程数 × 该系数
+PREFETCH_FACTOR = 4
+
+
+class HashService:
+    """
+    并行文件哈希服务（线程安全）
+
+    属性:
+        workers: 工作线程数
+        cache: 持久化哈希缓存（hits / misses 即命中缓存和实际读取文件计算的次数）
+    """
+
+    def __init__(self, workers: int = DEFAULT_HASH_WORKERS, cache: Optional[HashCache] = None,
+                 buffer_size: int = HASH_BUFFER_SIZE):
+        """
+        Args:
+            workers: 工作线程数
+            cache: 持久化哈希缓存（默认使用进程内共享的缓存）
+            buffer_size: 每个工作线程的读取缓冲区大小
+        """
+        self.workers = max(1, workers)
+        self.cache = cache or get_default_hash_cache()
+        self.buffer_size = buffer_size
+
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pan123-hash")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def _buffer(self) -> bytearray:
+        """当前工作线程的读取缓冲区（首次使用时分配）"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = bytearray(self.buffer_size)
+        return buffer
+
+    def _compute(self, path: str, slice_sizes: Tuple[int, ...]) -> FileDigest:
+        return self.cache.digest(path, slice_sizes, buffer=self._buffer())
+
+    def submit(self, file_path: str, slice_sizes: Iterable[int] = ()) -> Future:
+        """
+        提交一个文件（缓存命中时也在工作线程中完成查询）
+
+        Args:
+            file_path: 文件路径
+            slice_sizes: 需要的分片MD5表的分片大小
+
+        Returns:
+            Future: 完成时得到 FileDigest；同一文件正在计算且包含所需分片表时返回同一个 Future
+        """
+        path = os.path.abspath(file_path)
+        sizes = tuple(sorted(set(slice_sizes)))
+
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is not None and set(sizes) <= set(pending[0]):
+                return pending[1]
+
+            future = self._executor.submit(self._compute, path, sizes)
+            self._pending[path] = (sizes, future)
+
+        future.add_done_callback(lambda f, path=path: self._forget(path, f))
+        return future
+
+    def _forget(self, path: str, future: Future) -> None:
+        with self._lock:
+            pending = self._pending.get(path)
+            if pending is not None and pending[1] is future:
+                del self._pending[path]
+
+    def digest(self, file_path: str, slice_sizes: Iterable[int] = ()) -> FileDigest:
+        """
+        获取文件的哈希结果（阻塞）
+
+        Args:
+            file_path: 文件路径
+            slice_sizes: 需要的分片MD5表的分片大小
+
+        Returns:
+            FileDigest: 哈希结果
+        """
+        return self.submit(file_path, slice_sizes).result()
+
+    def prefetch(self, file_paths: Iterable[str], slice_sizes: Iterable[int] = ()) -> threading.Thread:
+        """
+        在后台按顺序预先计算一批文件
+
+        同时提交的任务数不超过 workers × PREFETCH_FACTOR，调用方按相同顺序使用结果时，
+        前面的文件算完即可开始后续工作。单个文件出错（例如已被删除）只跳过该文件，
+        调用方使用时会再次得到相应的错误。
+
+        Args:
+            file_paths: 文件路径（可以是生成器）
+            slice_sizes: 需要的分片MD5表的分片大小
+
+        Returns:
+            threading.Thread: 提交任务的后台线程
+        """
+        sizes = tuple(slice_sizes)
+        window = threading.BoundedSemaphore(self.workers * PREFETCH_FACTOR)
+
+        def feed():
+            for path in file_paths:
+                window.acquire()
+                self.submit(path, sizes).add_done_callback(lambda f: window.release())
+
+        thread = threading.Thread(target=feed, name="pan123-hash-prefetch", daemon=True)
+        thread.start()
+        return thread
+
+    def map(self, file_paths: Iterable[str], slice_sizes: Iterable[int] = ()
+            ) -> Iterator[Tuple[str, Union[FileDigest, Exception]]]:
+        """
+        并行计算一批文件，按完成顺序逐个返回
+
+        同时提交的任务数不超过 workers × PREFETCH_FACTOR，调用方处理一个结果的同时
+        其余文件继续计算。
+
+        Args:
+            file_paths: 文件路径（可以是生成器）
+            slice_sizes: 需要的分片MD5表的分片大小
+
+        Returns:
+            Iterator[Tuple[str, Union[FileDigest, Exception]]]: (原路径, 哈希结果)，计算失败时为异常对象
+        """
+        sizes = tuple(slice_sizes)
+        limit = self.workers * PREFETCH_FACTOR
+        paths = iter(file_paths)
+        running = {}
+        exhausted = False
+
+        while running or not exhausted:
+            while not exhausted and len(running) < limit:
+                try:
+                    path = next(paths)
+                except StopIteration:
+                    exhausted = True
+                    break
+                running[self.submit(path, sizes)] = path
+
+            if not running:
+                break
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                path = running.pop(future)
+                error = future.exception()
+                yield path, (error if error is not None else future.result())
+
+    def digests(self, file_paths: Iterable[str], slice_sizes: Iterable[int] = ()
+                ) -> Dict[str, Union[FileDigest, Exception]]:
+        """
+        并行计算一批文件
+
+        Args:
+            file_paths: 文件路径
+            slice_sizes: 需要的分片MD5表的分片大小
+
+        Returns:
+            Dict[str, Union[FileDigest, Exception]]: 原路径 -> 哈希结果（计算失败时为异常对象）
+        """
+        return dict(self.map(file_paths, slice_sizes))
+
+
+# ==================== 共享实例 ====================
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_default_hash_service() -> HashService:
+    """
+    获取进程内共享的哈希服务
+
+    Returns:
+        HashService: 共享哈希服务
+    """
+    global _default_service
+
+    with _default_lock:
+        if _default_service is None:
+            _default_service = HashService()
+        return _default_service
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘上传文件哈希计算
+
+功能说明：
+    上传前需要整个文件的MD5（etag），分片上传时还需要每个分片的MD5。
+    本模块只顺序读取文件一遍（大缓冲区 + readinto，不产生额外的bytes副本），
+    同时算出整个文件的MD5和若干种分片大小下的分片MD5表，
+    上传阶段只需再读取一次分片数据用于发送，不必为计算分片MD5重复读盘。
+
+主要功能：
+    - hash_file(): 一遍读取同时计算 etag 和分片MD5表
+    - StreamHasher: 增量版本，边读取数据流边计算（hash_file 即基于它实现）
+    - FileDigest: 哈希结果，按分片大小查询分片MD5
+    - hash_range(): 计算文件中一个区间的MD5（分片MD5表未命中时使用，不把分片读入内存）
+    - file_identity(): 文件身份（路径、大小、修改时间、inode），用于判断缓存的哈希是否仍然有效
+
+分片大小由 create 接口返回（文件上传通常为16MB），计算etag时尚不知道，
+因此调用方传入预期的分片大小；实际分片大小不在其中时，上传阶段在读取分片后再计算MD5。
+
+使用示例:
+    >>> digest = hash_file("big.iso", slice_sizes=[16 * 1024 * 1024])
+    >>> digest.etag
+    'e10adc3949ba59abbe56e057f20f883e'
+    >>> digest.slice_table(16 * 1024 * 1024)[0]
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import hashlib
+from typing import Optional, Dict, Any, List, Iterable
+
+
+# 读取缓冲区大小
+HASH_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def file_identity(file_path: str) -> Dict[str, Any]:
+    """
+    获取文件身份（绝对路径、大小、修改时间、inode）
+
+    四者都未变化时认为文件内容未变，可直接使用之前计算的哈希。
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        Dict[str, Any]: 包含 path、size、mtime_ns、inode 的字典
+    """
+    stat = os.stat(file_path)
+    return {
+        "path": os.path.abspath(file_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "inode": stat.st_ino,
+    }
+
+
+class FileDigest:
+    """
+    文件哈希结果
+
+    属性:
+        etag: 整个文件的MD5（32位小写十六进制）
+        size: 读取的字节数
+        slice_md5s: 分片大小 -> 按分片序号排列的分片MD5列表
+    """
+
+    def __init__(self, etag: str, size: int, slice_md5s: Optional[Dict[int, List[str]]] = None):
+        self.etag = etag
+        self.size = size
+        self.slice_md5s = slice_md5s or {}
+
+    def slice_table(self, slice_size: int) -> Optional[List[str]]:
+        """
+        获取指定分片大小的分片MD5表
+
+        Args:
+            slice_size: 分片大小（字节）
+
+        Returns:
+            Optional[List[str]]: 第 i 个元素为第 i+1 个分片的MD5；未计算该分片大小时返回None
+        """
+        return self.slice_md5s.get(slice_size)
+
+
+class StreamHasher:
+    """
+    增量哈希：按顺序喂入数据，同时计算整体MD5和若干种分片大小下的分片MD5表
+
+    hash_file() 读取本地文件时使用；从不可回退的数据流（标准输入、管道）边读边缓存时，
+    也用它在读取的同时算出哈希，数据流结束即得到 etag、大小和分片MD5表。
+    """
+
+    def __init__(self, slice_sizes: Iterable[int] = ()):
+        """
+        Args:
+            slice_sizes: 需要计算分片MD5表的分片大小（可为空）
+        """
+        self._whole = hashlib.md5()
+        self._sizes = sorted({size for size in slice_sizes if size and size > 0})
+        self._tables = {size: [] for size in self._sizes}
+        self._current = {size: hashlib.md5() for size in self._sizes}
+        self._filled = {size: 0 for size in self._sizes}
+        self.size = 0
+
+    def update(self, chunk) -> None:
+        """
+        喂入一块数据
+
+        Args:
+            chunk: bytes、bytearray 或 memoryview
+        """
+        n = len(chunk)
+        base = self.size
+
+        # 第一个分片的MD5就是整体MD5在分片边界处的值：整体哈希在边界处切开更新并取值，
+        # 不必为第一个分片再算一遍（不超过一个分片的文件因此只计算一次MD5）
+        offset = 0
+        for size in self._sizes:
+            if base < size <= base + n:
+                self._whole.update(chunk[offset:size - base])
+                offset = size - base
+                self._tables[size].append(self._whole.hexdigest())
+        self._whole.update(chunk[offset:] if offset else chunk)
+        self.size = base + n
+
+        # 第一个分片之后的数据按分片边界切分，分别更新各分片大小的当前分片哈希
+        for size in self._sizes:
+            if base + n <= size:
+                continue
+            offset = max(0, size - base)
+            while offset < n:
+                take = min(size - self._filled[size], n - offset)
+                self._current[size].update(chunk[offset:offset + take])
+                self._filled[size] += take
+                offset += take
+
+                if self._filled[size] == size:
+                    self._tables[size].append(self._current[size].hexdigest())
+                    self._current[size] = hashlib.md5()
+                    self._filled[size] = 0
+
+    def finish(self) -> FileDigest:
+        """
+        结束并返回哈希结果（之后不应再调用 update）
+
+        Returns:
+            FileDigest: 哈希结果
+        """
+        etag = self._whole.hexdigest()
+
+        for size in self._sizes:
+            if 0 < self.size < size:
+                # 不满一个分片：唯一的分片MD5即整体MD5
+                self._tables[size].append(etag)
+            elif self._filled[size]:
+                # 最后一个不满的分片
+                self._tables[size].append(self._current[size].hexdigest())
+                self._filled[size] = 0
+
+        return FileDigest(etag, self.size, self._tables)
+
+
+def hash_file(file_path: str, slice_sizes: Iterable[int] = (),
+              buffer_size: int = HASH_BUFFER_SIZE, buffer: Optional[bytearray] = None) -> FileDigest:
+    """
+    一遍读取文件，计算整个文件的MD5以及每种分片大小下的分片MD5
+
+    Args:
+        file_path: 文件路径
+        slice_sizes: 需要计算分片MD5表的分片大小（可为空）
+        buffer_size: 读取缓冲区大小
+        buffer: 可复用的读取缓冲区（可选）；批量计算大量文件时由调用方预先分配，
+                避免每个文件重新分配缓冲区
+
+    Returns:
+        FileDigest: 哈希结果
+    """
+    hasher = StreamHasher(slice_sizes)
+
+    with open(file_path, "rb", buffering=0) as f:
+        if buffer is None:
+            # 小文件不必分配完整的缓冲区
+            buffer = bytearray(max(1, min(buffer_size, os.fstat(f.fileno()).st_size)))
+        view = memoryview(buffer)
+
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+
+    return hasher.finish()
+
+
+def hash_range(file_path: str, start: int, size: int, buffer_size: int = HASH_BUFFER_SIZE) -> str:
+    """
+    计算文件中一个区间的MD5
+
+    Args:
+        file_path: 文件路径
+        start: 区间起始位置
+        size: 区间长度
+        buffer_size: 读取缓冲区大小
+
+    Returns:
+        str: 区间的MD5（读到文件末尾时只计算实际读到的部分）
+    """
+    md5 = hashlib.md5()
+    buffer = bytearray(min(buffer_size, max(size, 1)))
+    view = memoryview(buffer)
+
+    with open(file_path, "rb", buffering=0) as f:
+        f.seek(start)
+        remaining = size
+        while remaining > 0:
+            n = f.readinto(view[:min(len(buffer), remaining)])
+            if not n:
+                break
+            md5.update(view[:n])
+            remaining -= n
+
+    return md5.hexdigest()
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘上传服务器延迟探测
+
+功能说明：
+    /upload/v2/file/domain 和 create 接口返回的上传服务器通常不止一个，原先总是从第一个开始使用，
+    而对不同地区的网络，第一个往往不是最快的。调度器（upload_hosts）要等实际上传过
+    若干请求后才知道各服务器的吞吐，在此之前只能平均分配。
+
+    本模块在开始上传前同时探测所有上传服务器：建立连接（含TLS握手）并发送一个很小的请求，
+    以两者的总耗时作为该服务器的延迟。
+
+    - 探测使用传输层连接池中的连接，探测完成后连接留在池中，第一次上传无需再握手
+    - 结果按服务器缓存 ttl 秒（内存和缓存目录中的文件），有效期内的后续运行不再探测
+    - 无法连接的服务器标记为不可达，调度器在有其他服务器可用时不使用它
+    - 服务器表现变差（连续失败或吞吐明显下降）时由调度器调用 invalidate()，
+      下次选择服务器时在后台重新探测，期间继续使用原有结果
+
+主要功能：
+    - probe_host(): 探测单个服务器，返回 ProbeResult
+    - HostProber.latencies(): 获取一组服务器的延迟（缺失时探测，过期时后台重新探测）
+    - HostProber.rank(): 按延迟从低到高排列服务器
+    - HostProber.invalidate(): 标记服务器需要重新探测
+    - HostProber.configure(): 从 config.txt 的 UPLOAD_HOST_PROBE_TTL 设置有效期
+
+使用示例:
+    >>> prober = HostProber(get_default_transport())
+    >>> prober.rank(["openapi-upload-1.123242.com", "openapi-upload-2.123242.com"])
+    ['openapi-upload-2.123242.com', 'openapi-upload-1.123242.com']
+    >>> print(prober.summary())
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Iterable
+
+from .storage import get_cache_dir, read_json, write_json_atomic
+from .transport import PooledTransport, get_default_transport
+
+
+# 探测结果的默认有效期（秒），0表示不探测
+DEFAULT_PROBE_TTL = 600.0
+
+# 单个服务器的探测超时（秒）
+DEFAULT_PROBE_TIMEOUT = 5.0
+
+# 探测请求的路径（只需要服务器返回任意HTTP响应）
+PROBE_PATH = "/"
+
+# 缓存文件名（位于缓存目录）
+CACHE_FILENAME = "upload_host_probe.json"
+
+
+class ProbeResult:
+    """
+    单个服务器的探测结果
+
+    属性:
+        host: 服务器域名
+        connect_time: 建立连接（含TLS握手）的耗时（秒），复用已有连接时为0
+        request_time: 探测请求的耗时（秒）
+        error: 探测失败时的错误信息
+        probed_at: 探测时间（time.time()）
+    """
+
+    def __init__(self, host: str, connect_time: float = 0.0, request_time: float = 0.0,
+                 error: Optional[str] = None, probed_at: Optional[float] = None):
+        self.host = host
+        self.connect_time = connect_time
+        self.request_time = request_time
+        self.error = error
+        self.probed_at = time.time() if probed_at is None else probed_at
+
+    @property
+    def reachable(self) -> bool:
+        """服务器是否可以连接"""
+        return self.error is None
+
+    @property
+    def latency(self) -> Optional[float]:
+        """连接和请求的总耗时（秒），不可达时为None"""
+        return self.connect_time + self.request_time if self.reachable else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"connect_time": self.connect_time, "request_time": self.request_time,
+                "error": self.error, "probed_at": self.probed_at}
+
+    @classmethod
+    def from_dict(cls, host: str, data: Dict[str, Any]) -> "ProbeResult":
+        return cls(host, float(data.get("connect_time", 0.0)), float(data.get("request_time", 0.0)),
+                   data.get("error"), float(data.get("probed_at", 0.0)))
+
+
+def probe_host(transport: PooledTransport, host: str, path: str = PROBE_PATH,
+               timeout: float = DEFAULT_PROBE_TIMEOUT) -> ProbeResult:
+    """
+    探测单个上传服务器：建立连接并发送一个GET请求
+
+    任何HTTP响应（包括404）都视为可达，只有连接失败、超时和5xx视为不可达。
+    探测使用的连接在可复用时归还到传输层的连接池。
+
+    Args:
+        transport: HTTP传输层
+        host: 服务器地址（可带协议前缀）
+        path: 探测请求的路径
+        timeout: 超时时间（秒）
+
+    Returns:
+        ProbeResult: 探测结果
+    """
+    scheme, netloc = transport._split_host(host)
+    pool = transport.get_pool(scheme, netloc)
+
+    while True:
+        conn, reused = pool.get()
+        previous_timeout = conn.timeout
+        reusable = False
+
+        try:
+            conn.timeout = timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(timeout)
+
+            start = time.monotonic()
+            if not reused:
+                conn.connect()
+            connected = time.monotonic()
+
+            conn.request("GET", path, headers={"Platform": "open_platform"})
+            response = conn.getresponse()
+            response.read()
+            finished = time.monotonic()
+
+            reusable = not response.will_close
+            if response.status >= 500:
+                return ProbeResult(host, connected - start, finished - connected, f"HTTP {response.status}")
+            return ProbeResult(host, connected - start, finished - connected)
+        except Exception as e:
+            # 复用的空闲连接可能已被服务器关闭，换新连接重新探测一次
+            if reused:
+                continue
+            return ProbeResult(host, error=str(e) or type(e).__name__)
+        finally:
+            conn.timeout = previous_timeout
+            if reusable and conn.sock is not None:
+                conn.sock.settimeout(previous_timeout)
+            pool.put(conn, reusable=reusable)
+
+
+class HostProber:
+    """
+    上传服务器延迟探测与缓存（线程安全）
+
+    属性:
+        transport: 探测使用的HTTP传输层（与上传共用时探测建立的连接可直接用于上传）
+        ttl: 探测结果的有效期（秒），0或负数表示不探测
+        timeout: 单个服务器的探测超时（秒）
+        blocking: 缺少某些服务器的探测结果时是否等待探测完成（异步上传器设为False，改为后台探测）
+        probes: 累计探测次数
+    """
+
+    def __init__(self, transport: Optional[PooledTransport] = None, ttl: float = DEFAULT_PROBE_TTL,
+                 timeout: float = DEFAULT_PROBE_TIMEOUT, blocking: bool = True,
+                 cache_path: Optional[str] = None):
+        """
+        Args:
+            transport: HTTP传输层（默认使用进程内共享的连接池）
+            ttl: 探测结果的有效期（秒）
+            timeout: 单个服务器的探测超时（秒）
+            blocking: 缺少探测结果时是否等待探测完成
+            cache_path: 缓存文件路径（默认位于缓存目录）
+        """
+        self.transport = transport or get_default_transport()
+        self.ttl = ttl
+        self.timeout = timeout
+        self.blocking = blocking
+        self.cache_path = cache_path or os.path.join(get_cache_dir(), CACHE_FILENAME)
+        self.probes = 0
+
+        self._results = {}
+        self._stale = set()
+        self._probing = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用探测"""
+        return self.ttl > 0
+
+    def configure(self, config: Dict[str, str]) -> None:
+        """
+        从 config.txt 的配置项设置探测结果的有效期
+
+        读取 UPLOAD_HOST_PROBE_TTL（秒，可选；0表示不探测，留空使用默认值）。
+
+        Args:
+            config: load_config() 返回的配置字典
+
+        Raises:
+            ValueError: 配置值不是数字
+        """
+        value = config.get("UPLOAD_HOST_PROBE_TTL", "").strip()
+        if value:
+            try:
+                self.ttl = float(value)
+            except ValueError:
+                raise ValueError(f"UPLOAD_HOST_PROBE_TTL 必须是秒数: {value}")
+
+    def _load(self) -> None:
+        """读取缓存文件中的探测结果（过期的结果同样读入，用于后台重新探测期间）"""
+        data = read_json(self.cache_path, {})
+        if not isinstance(data, dict):
+            return
+        for host, item in data.items():
+            try:
+                self._results[host] = ProbeResult.from_dict(host, item)
+            except (TypeError, ValueError, AttributeError):
+                continue
+
+    def _save(self) -> None:
+        with self._lock:
+            data = {host: result.to_dict() for host, result in self._results.items()}
+        try:
+            write_json_atomic(self.cache_path, data)
+        except OSError:
+            # 缓存只是优化，写入失败时下次运行重新探测即可
+            pass
+
+    def _expired(self, result: ProbeResult, now: float) -> bool:
+        return result.host in self._stale or now - result.probed_at > self.ttl
+
+    def probe(self, hosts: Iterable[str]) -> List[ProbeResult]:
+        """
+        同时探测一组服务器（阻塞直到全部完成或超时）并更新缓存
+
+        Args:
+            hosts: 服务器域名（不带协议前缀）
+
+        Returns:
+            List[ProbeResult]: 探测结果
+        """
+        hosts = list(dict.fromkeys(hosts))
+        if not hosts:
+            return []
+
+        with ThreadPoolExecutor(max_workers=len(hosts), thread_name_prefix="pan123-probe") as executor:
+            results = list(executor.map(lambda host: probe_host(self.transport, host, timeout=self.timeout),
+                                        hosts))
+
+        with self._lock:
+            self.probes += len(results)
+            for result in results:
+                self._results[result.host] = result
+                self._stale.discard(result.host)
+                self._probing.discard(result.host)
+        self._save()
+        return results
+
+    def _probe_in_background(self, hosts: List[str]) -> None:
+        thread = threading.Thread(target=self.probe, args=(hosts,), name="pan123-probe-refresh", daemon=True)
+        thread.start()
+
+    def latencies(self, hosts: Iterable[str]) -> Dict[str, Optional[float]]:
+        """
+        获取一组服务器的延迟
+
+        缺少探测结果的服务器立即探测（blocking为False时改为后台探测，本次不返回其延迟），
+        结果过期或被标记为需要重新探测的服务器在后台重新探测，本次先返回原有结果。
+
+        Args:
+            hosts: 服务器域名（不带协议前缀）
+
+        Returns:
+            Dict[str, Optional[float]]: 服务器域名 -> 延迟（秒），探测失败的服务器为None，
+                尚无探测结果的服务器不包含在内；未启用探测时返回空字典
+        """
+        if not self.enabled:
+            return {}
+
+        hosts = list(dict.fromkeys(hosts))
+        now = time.time()
+        with self._lock:
+            missing = [h for h in hosts if h not in self._results and h not in self._probing]
+            expired = [h for h in hosts if h in self._results and h not in self._probing
+                       and self._expired(self._results[h], now)]
+            # 正在探测的服务器不重复探测
+            self._probing.update(missing)
+            self._probing.update(expired)
+
+        if expired:
+            self._probe_in_background(expired)
+        if missing:
+            if self.blocking:
+                self.probe(missing)
+            else:
+                self._probe_in_background(missing)
+
+        with self._lock:
+            return {h: self._results[h].latency for h in hosts if h in self._results}
+
+    def rank(self, hosts: Iterable[str]) -> List[str]:
+        """
+        按延迟从低到高排列服务器（不可达的排在最后，尚无结果的保持原有顺序排在可达服务器之后）
+
+        Args:
+            hosts: 服务器域名（不带协议前缀）
+
+        Returns:
+            List[str]: 排序后的服务器域名
+        """
+        hosts = list(dict.fromkeys(hosts))
+        latencies = self.latencies(hosts)
+
+        def key(item):
+            index, host = item
+            if host not in latencies:
+                return (1, 0.0, index)
+            latency = latencies[host]
+            return (2, 0.0, index) if latency is None else (0, latency, index)
+
+        return [host for _, host in sorted(enumerate(hosts), key=key)]
+
+    def invalidate(self, host: Optional[str] = None) -> None:
+        """
+        标记服务器需要重新探测（下次获取延迟时在后台进行）
+
+        Args:
+            host: 服务器域名，None表示全部
+        """
+        with self._lock:
+            if host is None:
+                self._stale.update(self._results)
+            elif host in self._results:
+                self._stale.add(host)
+
+    def summary(self, hosts: Optional[Iterable[str]] = None) -> str:
+        """
+        生成一行可读的探测结果
+
+        Args:
+            hosts: 只输出这些服务器（可选，默认全部），按延迟排序
+
+        Returns:
+            str: 如 "host-b 35ms；host-a 120ms；host-c 不可达"
+        """
+        with self._lock:
+            results = dict(self._results)
+        names = list(hosts) if hosts is not None else list(results)
+
+        parts = []
+        for host in sorted((h for h in names if h in results),
+                           key=lambda h: (results[h].latency is None, results[h].latency or 0.0)):
+            latency = results[host].latency
+            parts.append(f"{host} 不可达" if latency is None else f"{host} {latency * 1000:.0f}ms")
+        return "；".join(parts)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘流式multipart/form-data编码器
+
+功能说明：
+    单步上传（≤1GB）和分片上传都以multipart/form-data发送文件内容。
+    原先的做法是把整个文件读入内存再用 b'\\r\\n'.join() 拼接一次，峰值内存约为文件大小的两倍。
+    本模块在发送前只记录各部分的描述（文本字段、文件区间），预先算出 Content-Length，
+    发送时按块依次产生"部分头 → 文件数据 → 结尾边界"，由传输层直接写入socket，
+    内存占用与文件大小无关。文件数据以只读映射（mmap）上的 memoryview 窗口产生，
+    部分头单独产生，分片内容在Python中不复制（无法映射时退回按块读取）。
+
+主要功能：
+    - add_field(): 添加文本字段
+    - add_file(): 添加文件（或文件中的一个区间，用于分片），发送时才映射并按块产生
+    - add_bytes(): 添加内存中的数据
+    - add_buffer(): 添加内存中的缓冲区（如预读的分片），发送时按块产生其 memoryview，不复制
+    - len(encoder): 整个请求体的长度（即 Content-Length）
+    - iter(encoder): 按块产生请求体；每次迭代都重新打开文件，请求失败重放时可再次发送
+
+传输层（transport.PooledTransport、aio.AsyncTransport）识别这种流式请求体，
+按其长度设置 Content-Length 后逐块发送，不使用分块传输编码。
+
+使用示例:
+    >>> body = MultipartEncoder()
+    >>> body.add_field("preuploadID", preupload_id)
+    >>> body.add_field("sliceNo", "1")
+    >>> body.add_field("sliceMD5", slice_md5)
+    >>> body.add_file("slice", "slice_1", "big.iso", offset=0, length=16 * 1024 * 1024)
+    >>> headers['Content-Type'] = body.content_type
+    >>> transport.request("POST", host, "/upload/v2/file/slice", body, headers)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import uuid
+from typing import Optional, Iterator, Callable
+
+from .filemap import iter_file_windows
+
+
+# 发送文件内容时每次产生的块大小
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+# 部分类型
+_FIELD = "field"
+_FILE = "file"
+_BUFFER = "buffer"
+
+
+def _quote(value: str) -> str:
+    """按浏览器的做法转义Content-Disposition参数值中的引号和换行"""
+    return value.replace('"', '%22').replace("\r", "%0D").replace("\n", "%0A")
+
+
+def is_streaming_body(body) -> bool:
+    """判断请求体是否为可重复迭代、长度已知的流式请求体（如 MultipartEncoder）"""
+    return (body is not None and not isinstance(body, (str, bytes, bytearray, memoryview))
+            and hasattr(body, "__iter__") and hasattr(body, "__len__"))
+
+
+class MultipartEncoder:
+    """
+    流式multipart/form-data请求体
+
+    各部分按添加顺序编码。文件部分只保存路径和区间，
+    每次迭代重新打开并映射文件，因此同一个请求体可以在重试时再次发送。
+
+    属性:
+        boundary: 分隔符
+        chunk_size: 产生文件数据的块大小
+    """
+
+    def __init__(self, boundary: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            boundary: 分隔符（默认随机生成）
+            chunk_size: 产生文件数据的块大小
+        """
+        self.boundary = boundary or uuid.uuid4().hex
+        self.chunk_size = chunk_size
+        self._parts = []
+        self._length = len(self._closing())
+
+    @property
+    def content_type(self) -> str:
+        """请求头 Content-Type 的值"""
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def _part_head(self, disposition: str, content_type: Optional[str]) -> bytes:
+        lines = [f"--{self.boundary}", f"Content-Disposition: form-data; {disposition}"]
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+    def _closing(self) -> bytes:
+        return f"--{self.boundary}--\r\n".encode("utf-8")
+
+    def _append(self, head: bytes, kind: str, payload, size: int) -> "MultipartEncoder":
+        self._parts.append((head, kind, payload, size))
+        # 部分头 + 内容 + 内容后的换行
+        self._length += len(head) + size + 2
+        return self
+
+    def add_field(self, name: str, value) -> "MultipartEncoder":
+        """
+        添加文本字段
+
+        Args:
+            name: 字段名
+            value: 字段值（按字符串编码）
+
+        Returns:
+            MultipartEncoder: 自身，便于链式调用
+        """
+        data = str(value).encode("utf-8")
+        return self._append(self._part_head(f'name="{_quote(name)}"', None), _FIELD, data, len(data))
+
+    def add_bytes(self, name: str, filename: str, data: bytes,
+                  content_type: str = "application/octet-stream") -> "MultipartEncoder":
+        """
+        添加内存中的数据作为文件部分
+
+        Args:
+            name: 字段名
+            filename: 文件名
+            data: 数据
+            content_type: 内容类型
+
+        Returns:
+            MultipartEncoder: 自身
+        """
+        head = self._part_head(f'name="{_quote(name)}"; filename="{_quote(filename)}"', content_type)
+        return self._append(head, _FIELD, bytes(data), len(data))
+
+    def add_buffer(self, name: str, filename: str, data,
+                   content_type: str = "application/octet-stream",
+                   check: Optional[Callable[[], None]] = None) -> "MultipartEncoder":
+        """
+        添加内存中的缓冲区作为文件部分（不复制，发送时按块产生其 memoryview）
+
+        调用方须保证请求发送完毕（含重试）之前缓冲区内容不被修改。
+
+        Args:
+            name: 字段名
+            filename: 文件名
+            data: bytes、bytearray 或 memoryview
+            content_type: 内容类型
+            check: 产生每个块之前调用的检查（可选），如确认映射的文件没有被截断，失败时抛出异常中止发送
+
+        Returns:
+            MultipartEncoder: 自身
+        """
+        view = memoryview(data).cast("B")
+        head = self._part_head(f'name="{_quote(name)}"; filename="{_quote(filename)}"', content_type)
+        return self._append(head, _BUFFER, (view, check), len(view))
+
+    def add_file(self, name: str, filename: str, file_path: str, offset: int = 0,
+                 length: Optional[int] = None,
+                 content_type: str = "application/octet-stream") -> "MultipartEncoder":
+        """
+        添加文件部分（发送时才映射文件，按块产生映射上的 memoryview）
+
+        Args:
+            name: 字段名
+            filename: 文件名
+            file_path: 本地文件路径
+            offset: 区间起始位置
+            length: 区间长度（默认到文件末尾）
+            content_type: 内容类型
+
+        Returns:
+            MultipartEncoder: 自身
+
+        Raises:
+            ValueError: 区间超出文件范围
+        """
+        file_size = os.path.getsize(file_path)
+        if length is None:
+            length = file_size - offset
+        if offset < 0 or length < 0 or offset + length > file_size:
+            raise ValueError(f"文件区间超出范围: {file_path} [{offset}, {offset + length}) / {file_size}")
+
+        head = self._part_head(f'name="{_quote(name)}"; filename="{_quote(filename)}"', content_type)
+        return self._append(head, _FILE, (file_path, offset), length)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        for head, kind, payload, size in self._parts:
+            if kind == _FILE:
+                yield head
+                for chunk in iter_file_windows(payload[0], payload[1], size, self.chunk_size):
+                    yield chunk
+                yield b"\r\n"
+            elif kind == _BUFFER:
+                yield head
+                view, check = payload
+                for offset in range(0, size, self.chunk_size):
+                    if check is not None:
+                        check()
+                    yield view[offset:offset + self.chunk_size]
+                yield b"\r\n"
+            else:
+                # 文本字段和内存数据较小，与部分头合并产生
+                yield head + payload + b"\r\n"
+        yield self._closing()
+
+    def to_bytes(self) -> bytes:
+        """
+        把整个请求体读入内存（仅用于调试或小请求体）
+
+        Returns:
+            bytes: 完整请求体
+        """
+        return b"".join(self)
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘多阶段流水线
+
+功能说明：
+    批量上传小文件时，每个文件原先严格按 哈希 → create → 传输 → 确认完成 顺序执行，
+    计算哈希时网络空闲，传输时磁盘空闲。本模块把这些步骤拆成独立的阶段，
+    各阶段由自己的工作线程处理，相邻阶段之间用有界队列连接：
+
+    - 每个阶段只要上游有数据就持续工作，各阶段互不等待
+    - 队列有界：下游处理不过来时上游自然阻塞（背压），内存占用与批量大小无关
+    - 单个条目在某个阶段出错时交给错误回调，不影响其他条目
+    - 记录各阶段的处理数、忙碌时间、等待上游和等待下游的时间，便于找出瓶颈
+
+主要功能：
+    - Stage: 一个阶段（名称、处理函数、工作线程数、输入队列容量）
+    - Pipeline.run(): 送入全部条目并等待流水线排空
+    - Pipeline.summary(): 各阶段统计
+
+    处理函数返回要交给下一阶段的条目；返回 None 表示该条目已处理完毕（例如秒传成功，
+    无需传输），不再进入后续阶段。最后一个阶段的返回值被忽略。
+
+使用示例:
+    >>> pipeline = Pipeline([
+    ...     Stage("哈希", hash_item, workers=4),
+    ...     Stage("创建", create_item, workers=2),
+    ...     Stage("传输", transfer_item, workers=8),
+    ... ], on_error=lambda item, error, stage: print(stage, error))
+    >>> pipeline.run(items)
+    >>> print(pipeline.summary())
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import time
+import queue
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Dict
+
+
+# 阶段输入队列的默认容量
+DEFAULT_STAGE_CAPACITY = 64
+
+# 通知工作线程结束的标记
+_DONE = object()
+
+
+class Stage:
+    """
+    流水线中的一个阶段
+
+    属性:
+        name: 阶段名称
+        func: 处理函数 func(item) -> Optional[item]
+        workers: 工作线程数
+        capacity: 输入队列容量
+        processed: 处理完成的条目数
+        failed: 出错的条目数
+        busy: 处理函数累计耗时（秒，多个线程累加）
+        starved: 等待上游条目的累计时间（秒）
+        blocked: 下游队列已满、等待放入的累计时间（秒）
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1,
+                 capacity: int = DEFAULT_STAGE_CAPACITY):
+        """
+        Args:
+            name: 阶段名称
+            func: 处理函数，返回交给下一阶段的条目，返回None表示条目已处理完毕
+            workers: 工作线程数
+            capacity: 输入队列容量
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.capacity = max(1, capacity)
+
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.blocked = 0.0
+
+        self.queue = queue.Queue(self.capacity)
+        self._lock = threading.Lock()
+
+    def _record(self, busy: float, starved: float, blocked: float, failed: bool) -> None:
+        with self._lock:
+            if failed:
+                self.failed += 1
+            else:
+                self.processed += 1
+            self.busy += busy
+            self.starved += starved
+            self.blocked += blocked
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取统计快照
+
+        Returns:
+            Dict[str, Any]: 处理数、出错数、忙碌/等待上游/等待下游时间和当前队列长度
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "processed": self.processed,
+                "failed": self.failed,
+                "busy": self.busy,
+                "starved": self.starved,
+                "blocked": self.blocked,
+                "queued": self.queue.qsize(),
+            }
+
+
+class Pipeline:
+    """
+    由有界队列连接的多阶段流水线（每次 run 处理一批条目）
+    """
+
+    def __init__(self, stages: List[Stage],
+                 on_error: Optional[Callable[[Any, Exception, str], None]] = None):
+        """
+        Args:
+            stages: 按顺序排列的阶段
+            on_error: 条目出错时的回调 on_error(item, error, stage_name)（可选，默认忽略）
+        """
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = stages
+        self.on_error = on_error
+        self.elapsed = 0.0
+
+    def run(self, items: Iterable[Any]) -> None:
+        """
+        送入全部条目并等待所有阶段处理完毕
+
+        Args:
+            items: 条目（可以是生成器；第一个阶段的队列已满时暂停读取）
+        """
+        start = time.monotonic()
+        groups = []
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            threads = [threading.Thread(target=self._work, args=(stage, downstream),
+                                        name=f"pan123-pipeline-{stage.name}", daemon=True)
+                       for _ in range(stage.workers)]
+            for thread in threads:
+                thread.start()
+            groups.append(threads)
+
+        try:
+            for item in items:
+                self.stages[0].queue.put(item)
+        finally:
+            # 逐级结束：上一阶段的线程全部退出后，下一阶段不会再有新的条目
+            for stage, threads in zip(self.stages, groups):
+                for _ in threads:
+                    stage.queue.put(_DONE)
+                for thread in threads:
+                    thread.join()
+            self.elapsed = time.monotonic() - start
+
+    def _work(self, stage: Stage, downstream: Optional[Stage]) -> None:
+        while True:
+            waited = time.monotonic()
+            item = stage.queue.get()
+            starved = time.monotonic() - waited
+            if item is _DONE:
+                return
+
+            began = time.monotonic()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                stage._record(time.monotonic() - began, starved, 0.0, True)
+                if self.on_error is not None:
+                    self.on_error(item, e, stage.name)
+                continue
+            busy = time.monotonic() - began
+
+            blocked = 0.0
+            if downstream is not None and result is not None:
+                waited = time.monotonic()
+                downstream.queue.put(result)
+                blocked = time.monotonic() - waited
+            stage._record(busy, starved, blocked, False)
+
+    def summary(self) -> str:
+        """
+        生成各阶段的统计摘要
+
+        Returns:
+            str: 如 "哈希 120 个（忙 35%）→ 创建 120 个（忙 90%）→ 传输 80 个（忙 60%）"
+        """
+        parts = []
+        for stage in self.stages:
+            info = stage.snapshot()
+            capacity = self.elapsed * info["workers"]
+            usage = info["busy"] / capacity if capacity > 0 else 0.0
+            text = f"{info['name']} {info['processed']} 个（忙 {usage:.0%}）"
+            if info["failed"]:
+                text += f"，失败 {info['failed']} 个"
+            parts.append(text)
+        return " → ".join(parts)
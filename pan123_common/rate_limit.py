@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘客户端限流器
+
+功能说明：
+    开放平台按 client_id 对部分接口限制每秒请求数（见 官方API文档/接入指南/开发者接入/开发须知.md）。
+    本模块把该限流表作为数据内置，按"client_id + 接口路径"各维护一个令牌桶，
+    请求前只等待恰好足够的时间，而不是固定休眠或等服务器返回429。
+
+主要功能：
+    - 内置QPS表：QPS_LIMITS 与官方文档一致，未公布的接口不限流
+    - 令牌桶：默认容量为1（请求均匀间隔 1/QPS 秒），保证任意1秒窗口内不超过限额；
+      实际速率按 SAFETY_FACTOR 留出余量，吸收网络抖动
+    - 线程安全：多线程共享同一个限流器时按预约顺序依次放行
+    - 预约接口：reserve() 只计算需要等待的时长而不休眠，便于异步代码复用
+
+使用示例:
+    >>> limiter = get_default_rate_limiter()
+    >>> limiter.acquire(client_id, "/api/v2/file/list?parentFileId=0&limit=100")
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import time
+import threading
+from typing import Optional, Dict
+
+
+# 官方公布的限流表（同一个client_id，每秒最大请求次数）
+QPS_LIMITS = {
+    "api/v1/user/info": 1,
+    "api/v1/file/move": 1,
+    "api/v1/file/delete": 1,
+    "api/v1/file/list": 4,
+    "api/v2/file/list": 3,
+    "upload/v1/file/mkdir": 2,
+    "upload/v1/file/create": 2,
+    "api/v1/access_token": 1,
+    "api/v1/share/list": 10,
+    "api/v1/share/list/info": 10,
+    "api/v1/transcode/folder/info": 20,
+    "api/v1/transcode/upload/from_cloud_disk": 1,
+    "api/v1/transcode/delete": 10,
+    "api/v1/transcode/video/resolutions": 1,
+    "api/v1/transcode/video": 3,
+    "api/v1/transcode/video/record": 20,
+    "api/v1/transcode/video/result": 20,
+    "api/v1/transcode/file/download": 10,
+    "api/v1/transcode/m3u8_ts/download": 20,
+    "api/v1/transcode/file/download/all": 1,
+}
+
+# 工具实际使用、但限流表中未公布的接口，按保守值处理
+UNPUBLISHED_QPS_LIMITS = {
+    # v2创建文件接口沿用v1的公布值
+    "upload/v2/file/create": 2,
+    # 离线下载原先每5秒提交一次，这里按1 QPS处理
+    "api/v1/offline/download": 1,
+    # 删除至回收站与彻底删除（api/v1/file/delete）同按1 QPS处理
+    "api/v1/file/trash": 1,
+}
+
+
+# 实际发送速率占公布QPS的比例：请求到达服务器的时间有抖动，
+# 严格按 1/QPS 间隔发送时，相邻窗口边界上的请求仍可能被判定超限
+SAFETY_FACTOR = 0.9
+
+
+def normalize_endpoint(path: str) -> str:
+    """
+    把请求路径规范化为限流表中的写法
+
+    Args:
+        path: 请求路径，如 "/api/v2/file/list?parentFileId=0"
+
+    Returns:
+        str: 规范化后的接口名，如 "api/v2/file/list"
+    """
+    return path.split("?", 1)[0].strip("/")
+
+
+class TokenBucket:
+    """
+    单个接口的令牌桶
+
+    以"下一个令牌可用时间"记录状态：每次预约把该时间向后推 1/rate 秒，
+    预约时若桶中有积攒的令牌（最多 capacity 个）则无需等待。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        """
+        Args:
+            rate: 每秒生成的令牌数（即QPS）
+            capacity: 桶容量，即允许的最大突发请求数
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._interval = 1.0 / self.rate
+        self._next_free = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        """
+        预约一个令牌
+
+        Args:
+            now: 当前时间（time.monotonic()），默认取当前值
+
+        Returns:
+            float: 调用方发送请求前需要等待的秒数
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            # 空闲期间最多积攒 capacity 个令牌
+            earliest = now - (self.capacity - 1) * self._interval
+            start = max(self._next_free, earliest)
+            self._next_free = start + self._interval
+            return max(0.0, start - now)
+
+    def wait_time(self, now: Optional[float] = None) -> float:
+        """
+        查询现在预约一个令牌需要等待的秒数（不预约）
+
+        Args:
+            now: 当前时间（time.monotonic()），默认取当前值
+
+        Returns:
+            float: 需要等待的秒数，0表示有可用令牌
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self._lock:
+            earliest = now - (self.capacity - 1) * self._interval
+            return max(0.0, max(self._next_free, earliest) - now)
+
+    def acquire(self) -> float:
+        """
+        阻塞直到获得一个令牌
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter:
+    """
+    按 client_id 和接口路径分别限流的限流器
+
+    属性:
+        limits: 接口名 -> QPS 的映射
+        capacity: 每个令牌桶的容量
+        total_wait: 累计等待时长（秒），便于观察限流对吞吐的影响
+    """
+
+    def __init__(self, limits: Optional[Dict[str, float]] = None, capacity: float = 1,
+                 safety_factor: float = SAFETY_FACTOR):
+        """
+        Args:
+            limits: 接口限流表，默认为官方表加上未公布接口的保守值
+            capacity: 令牌桶容量
+            safety_factor: 实际发送速率占公布QPS的比例
+        """
+        if limits is None:
+            limits = dict(QPS_LIMITS)
+            limits.update(UNPUBLISHED_QPS_LIMITS)
+
+        self.limits = limits
+        self.capacity = capacity
+        self.safety_factor = safety_factor
+        self.total_wait = 0.0
+
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def set_limit(self, endpoint: str, qps: float) -> None:
+        """
+        调整（或新增）某个接口的QPS，已有的令牌桶会被重建
+
+        Args:
+            endpoint: 接口名或请求路径
+            qps: 每秒最大请求次数
+        """
+        endpoint = normalize_endpoint(endpoint)
+        with self._lock:
+            self.limits[endpoint] = qps
+            for key in [key for key in self._buckets if key[1] == endpoint]:
+                del self._buckets[key]
+
+    def bucket_for(self, client_id: Optional[str], path: str) -> Optional[TokenBucket]:
+        """
+        获取接口对应的令牌桶，不受限流的接口返回None
+
+        Args:
+            client_id: 客户端ID（未知时所有调用共享同一组令牌桶）
+            path: 请求路径
+
+        Returns:
+            Optional[TokenBucket]: 令牌桶
+        """
+        endpoint = normalize_endpoint(path)
+        qps = self.limits.get(endpoint)
+        if not qps:
+            return None
+
+        key = (client_id or "", endpoint)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(qps * self.safety_factor, self.capacity)
+                self._buckets[key] = bucket
+            return bucket
+
+    def reserve(self, client_id: Optional[str], path: str) -> float:
+        """
+        预约一次请求，返回需要等待的秒数（不休眠）
+
+        Args:
+            client_id: 客户端ID
+            path: 请求路径
+
+        Returns:
+            float: 需要等待的秒数
+        """
+        bucket = self.bucket_for(client_id, path)
+        if bucket is None:
+            return 0.0
+
+        delay = bucket.reserve()
+        if delay > 0:
+            with self._lock:
+                self.total_wait += delay
+        return delay
+
+    def wait_time(self, client_id: Optional[str], path: str) -> float:
+        """
+        查询现在发送该请求需要等待的秒数（不预约，不计入 total_wait）
+
+        Args:
+            client_id: 客户端ID
+            path: 请求路径
+
+        Returns:
+            float: 需要等待的秒数，不受限流的接口返回0
+        """
+        bucket = self.bucket_for(client_id, path)
+        return bucket.wait_time() if bucket is not None else 0.0
+
+    def acquire(self, client_id: Optional[str], path: str) -> float:
+        """
+        阻塞直到可以发送该请求
+
+        Args:
+            client_id: 客户端ID
+            path: 请求路径
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        delay = self.reserve(client_id, path)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+# ==================== 共享实例 ====================
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_default_rate_limiter() -> RateLimiter:
+    """
+    获取进程内共享的限流器
+
+    Returns:
+        RateLimiter: 共享限流器
+    """
+    global _default_limiter
+
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘分片预读与内存上限
+
+功能说明：
+    分片上传时，每个分片在上传线程开始发送时才从磁盘读取：读盘期间网络空闲，
+    发送期间磁盘空闲，遇到较慢的磁盘（机械盘、网络存储）时上传线程大部分时间在等读盘。
+
+    本模块用一个后台线程按顺序预先把接下来的 K 个分片读入内存，上传线程取到的分片
+    已在内存中，读盘与发送重叠进行：
+
+    - 分片读入进程内共享的缓冲池（BufferPool）中可复用的 bytearray（readinto，不产生临时bytes），
+      发送时以 memoryview 交给multipart编码器，不再复制
+    - 缓冲池有进程级的内存硬上限：已分配的缓冲区总大小永远不超过上限，
+      达到上限时预读线程等待其他分片发送完毕归还缓冲区（空闲的缓冲区先释放再分配）
+    - 同一进程中的多个上传器、多个文件共用同一个上限，单机运行多个上传器时内存占用可控
+    - 分片重试时复用已读入的数据，不再读盘
+
+    能映射的文件（见 filemap）默认不使用缓冲池：整个文件只读映射一次，预读线程按顺序对接下来的
+    分片调用 madvise(WILLNEED) 让内核提前读入页缓存，上传线程取到的是映射上的 memoryview 窗口，
+    分片数据在Python中不复制，也不占用缓冲池的内存上限（页缓存由内核按需回收）。
+    映射的文件在上传期间被截断时，访问窗口会导致进程收到 SIGBUS，因此发送（和计算MD5）前
+    须调用分片数据的 check()，文件变短时抛出 IOError，只有这个文件失败。
+
+主要功能：
+    - BufferPool: 有内存上限的可复用缓冲池
+    - BufferPool.configure(): 从 config.txt 的 SLICE_MEMORY_LIMIT 设置上限
+    - SliceReadAhead: 单个文件的分片预读（get() 取出分片数据，close() 归还全部缓冲区）
+    - MappedSlice: 映射模式下取出的分片窗口（与 PooledBuffer 用法相同）
+    - get_default_buffer_pool(): 获取进程内共享的缓冲池
+
+使用示例:
+    >>> slices = [(1, 0, 16 * 1024 * 1024), (2, 16 * 1024 * 1024, 4096)]
+    >>> with SliceReadAhead("big.iso", slices, depth=4) as readahead:
+    ...     data = readahead.get(1)
+    ...     try:
+    ...         data.check()
+    ...         send(data.view)
+    ...     finally:
+    ...         data.release()
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import hashlib
+import threading
+from typing import Optional, Dict, List, Tuple, Union
+
+from .bandwidth import parse_rate
+from .filemap import FileMap, map_file
+
+
+# 进程内所有预读缓冲区的默认内存上限（字节）
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+# 默认预读的分片数（已读入内存、尚未被上传线程取走的分片数上限）
+DEFAULT_READAHEAD_SLICES = 4
+
+# 预读线程等待缓冲区时检查是否已关闭的间隔（秒）
+_WAIT_INTERVAL = 0.5
+
+# 映射窗口按块计算MD5的块大小（每块之前确认文件没有被截断）
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class PooledBuffer:
+    """
+    从缓冲池借出的缓冲区
+
+    属性:
+        size: 有效数据的字节数
+    """
+
+    __slots__ = ("_pool", "_buffer", "size")
+
+    def __init__(self, pool: "BufferPool", buffer: bytearray, size: int):
+        self._pool = pool
+        self._buffer = buffer
+        self.size = size
+
+    @property
+    def view(self) -> memoryview:
+        """有效数据的 memoryview（不复制）"""
+        return memoryview(self._buffer)[:self.size]
+
+    def check(self) -> None:
+        """数据已读入内存，与 MappedSlice.check() 接口一致"""
+
+    def md5(self) -> str:
+        """分片数据的MD5（十六进制）"""
+        return hashlib.md5(self.view).hexdigest()
+
+    def release(self) -> None:
+        """归还缓冲区（重复调用无副作用）"""
+        buffer, self._buffer = self._buffer, None
+        if buffer is not None:
+            self._pool._give_back(buffer, self.size)
+
+
+class MappedSlice:
+    """
+    文件映射上的分片窗口（映射模式下由 SliceReadAhead 取出）
+
+    属性:
+        size: 分片的字节数
+    """
+
+    __slots__ = ("_view", "_map", "_offset", "size")
+
+    def __init__(self, view: memoryview, file_map: FileMap, offset: int):
+        self._view = view
+        self._map = file_map
+        self._offset = offset
+        self.size = len(view)
+
+    @property
+    def view(self) -> memoryview:
+        """分片数据的 memoryview（不复制）"""
+        return self._view
+
+    def check(self) -> None:
+        """
+        确认文件没有被截断（访问被截断的映射会导致 SIGBUS，发送和计算MD5前调用）
+
+        Raises:
+            IOError: 文件在映射后变短
+        """
+        self._map.check(self._offset, self.size)
+
+    def md5(self) -> str:
+        """
+        分片数据的MD5（十六进制），按块计算，每块之前确认文件没有被截断
+
+        Raises:
+            IOError: 文件在映射后变短
+        """
+        digest = hashlib.md5()
+        for offset in range(0, self.size, _HASH_CHUNK_SIZE):
+            self.check()
+            digest.update(self._view[offset:offset + _HASH_CHUNK_SIZE])
+        return digest.hexdigest()
+
+    def release(self) -> None:
+        """释放窗口（重复调用无副作用）"""
+        view, self._view = self._view, None
+        if view is not None:
+            view.release()
+
+
+class BufferPool:
+    """
+    有内存硬上限的可复用缓冲池（线程安全）
+
+    属性:
+        max_bytes: 已分配缓冲区总大小的上限（字节）
+        allocated: 当前已分配的缓冲区总大小（含空闲的）
+        in_use: 当前借出的字节数
+        peak: 借出字节数的峰值
+        waits: 因达到上限而等待的次数
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MEMORY_LIMIT):
+        """
+        Args:
+            max_bytes: 内存上限（字节）
+        """
+        self.max_bytes = max_bytes
+        self.allocated = 0
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+
+        self._idle = []
+        self._cond = threading.Condition()
+
+    def configure(self, config: Dict[str, str]) -> None:
+        """
+        从 config.txt 的配置项设置内存上限
+
+        读取 SLICE_MEMORY_LIMIT（可选，写法与限速相同，如 256M、1G；留空使用默认值）。
+
+        Args:
+            config: load_config() 返回的配置字典
+
+        Raises:
+            ValueError: 无法解析
+        """
+        value = config.get("SLICE_MEMORY_LIMIT", "").strip()
+        if value:
+            limit = parse_rate(value)
+            if limit is None:
+                raise ValueError(f"SLICE_MEMORY_LIMIT 必须大于0: {value}")
+            self.set_limit(int(limit))
+
+    def set_limit(self, max_bytes: int) -> None:
+        """
+        修改内存上限（已借出的缓冲区不受影响，超出部分在归还时释放）
+
+        Args:
+            max_bytes: 内存上限（字节）
+        """
+        with self._cond:
+            self.max_bytes = max_bytes
+            self._trim(0)
+            self._cond.notify_all()
+
+    def _trim(self, needed: int) -> None:
+        """释放空闲缓冲区，直到能再分配 needed 字节（或没有空闲缓冲区）"""
+        self._idle.sort(key=len)
+        while self._idle and self.allocated + needed > self.max_bytes:
+            self.allocated -= len(self._idle.pop())
+
+    def acquire(self, size: int, timeout: Optional[float] = None) -> Optional[PooledBuffer]:
+        """
+        借出一个至少 size 字节的缓冲区，达到内存上限时等待
+
+        Args:
+            size: 需要的字节数
+            timeout: 最长等待时间（秒，可选）
+
+        Returns:
+            Optional[PooledBuffer]: 缓冲区，超时时返回None
+
+        Raises:
+            ValueError: size 超过内存上限（永远无法满足）
+        """
+        with self._cond:
+            if size > self.max_bytes:
+                raise ValueError(f"缓冲区大小 {size} 超过内存上限 {self.max_bytes}")
+
+            waited = False
+            while True:
+                # 优先复用足够大的空闲缓冲区中最小的一个
+                fits = [b for b in self._idle if len(b) >= size]
+                if fits:
+                    buffer = min(fits, key=len)
+                    self._idle.remove(buffer)
+                    break
+
+                self._trim(size)
+                if self.allocated + size <= self.max_bytes:
+                    buffer = bytearray(size)
+                    self.allocated += size
+                    break
+
+                if not waited:
+                    self.waits += 1
+                    waited = True
+                if not self._cond.wait(timeout):
+                    return None
+
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+            return PooledBuffer(self, buffer, size)
+
+    def _give_back(self, buffer: bytearray, size: int) -> None:
+        with self._cond:
+            self.in_use -= size
+            if self.allocated <= self.max_bytes:
+                self._idle.append(buffer)
+            else:
+                # 上限已调低：直接释放
+                self.allocated -= len(buffer)
+            self._cond.notify_all()
+
+    def summary(self) -> str:
+        """
+        生成一行可读的缓冲池统计
+
+        Returns:
+            str: 如 "上限 256.0 MB，峰值 64.0 MB，等待 3 次"
+        """
+        with self._cond:
+            return (f"上限 {self.max_bytes / 1024 / 1024:.1f} MB，峰值 {self.peak / 1024 / 1024:.1f} MB，"
+                    f"等待 {self.waits} 次")
+
+
+class SliceReadAhead:
+    """
+    单个文件的分片预读
+
+    后台线程按给定顺序把分片读入缓冲池（映射模式下提示内核预读映射区间），
+    最多领先 depth 个尚未被取走的分片。
+    上传线程应按大致相同的顺序调用 get()，并在分片发送完毕（含重试）后 release()。
+
+    属性:
+        mapped: 是否为映射模式（分片为文件映射上的窗口，不使用缓冲池）
+    """
+
+    def __init__(self, file_path: str, slices: List[Tuple[int, int, int]],
+                 depth: int = DEFAULT_READAHEAD_SLICES, pool: Optional[BufferPool] = None,
+                 use_mmap: bool = True):
+        """
+        Args:
+            file_path: 文件路径
+            slices: 按上传顺序排列的 (分片序号, 起始位置, 大小)
+            depth: 预读的分片数
+            pool: 缓冲池（默认使用进程内共享的缓冲池）
+            use_mmap: 是否优先映射文件（无法映射时自动使用缓冲池）
+
+        Raises:
+            ValueError: 使用缓冲池时，最大的分片超过缓冲池的内存上限
+        """
+        self.file_path = file_path
+        self.depth = max(1, depth)
+        self.pool = pool or get_default_buffer_pool()
+
+        self._map = map_file(file_path) if use_mmap and slices else None
+        self.mapped = self._map is not None
+
+        largest = max((size for _, _, size in slices), default=0)
+        if not self.mapped and largest > self.pool.max_bytes:
+            raise ValueError(f"分片大小 {largest} 超过预读内存上限 {self.pool.max_bytes}")
+
+        self._slices = list(slices)
+        self._ready = {}
+        self._error = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="pan123-readahead", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        if self._map is not None:
+            self._run_mapped()
+            return
+
+        try:
+            with open(self.file_path, "rb") as f:
+                for slice_no, offset, size in self._slices:
+                    with self._cond:
+                        while not self._closed and len(self._ready) >= self.depth:
+                            self._cond.wait()
+                        if self._closed:
+                            return
+
+                    data = None
+                    while data is None:
+                        data = self.pool.acquire(size, timeout=_WAIT_INTERVAL)
+                        if data is None and self._closed:
+                            return
+
+                    try:
+                        f.seek(offset)
+                        view = data.view
+                        filled = 0
+                        while filled < size:
+                            n = f.readinto(view[filled:])
+                            if not n:
+                                raise IOError(f"读取文件时提前遇到结尾（文件在上传期间被修改？）: {self.file_path}")
+                            filled += n
+                    except BaseException:
+                        data.release()
+                        raise
+
+                    with self._cond:
+                        if self._closed:
+                            data.release()
+                            return
+                        self._ready[slice_no] = data
+                        self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+
+    def _run_mapped(self) -> None:
+        try:
+            for slice_no, offset, size in self._slices:
+                with self._cond:
+                    while not self._closed and len(self._ready) >= self.depth:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+
+                self._map.willneed(offset, size)
+                data = MappedSlice(self._map.window(offset, size), self._map, offset)
+
+                with self._cond:
+                    if self._closed:
+                        data.release()
+                        return
+                    self._ready[slice_no] = data
+                    self._cond.notify_all()
+        except Exception as e:
+            with self._cond:
+                self._error = e
+                self._cond.notify_all()
+
+    def get(self, slice_no: int) -> Union[PooledBuffer, MappedSlice]:
+        """
+        取出一个分片的数据（尚未读入时等待）
+
+        Args:
+            slice_no: 分片序号
+
+        Returns:
+            Union[PooledBuffer, MappedSlice]: 分片数据，发送完毕后由调用方 release()
+
+        Raises:
+            Exception: 读取文件失败，或预读已关闭
+        """
+        with self._cond:
+            while slice_no not in self._ready:
+                if self._error is not None:
+                    raise Exception(f"预读分片 {slice_no} 失败: {self._error}")
+                if self._closed:
+                    raise Exception(f"分片预读已关闭: {self.file_path}")
+                self._cond.wait()
+            data = self._ready.pop(slice_no)
+            self._cond.notify_all()
+            return data
+
+    def close(self) -> None:
+        """停止预读并归还所有尚未取走的缓冲区（映射模式下解除映射）"""
+        with self._cond:
+            self._closed = True
+            ready, self._ready = self._ready, {}
+            self._cond.notify_all()
+
+        for data in ready.values():
+            data.release()
+        self._thread.join()
+        if self._map is not None:
+            self._map.close()
+
+    def __enter__(self) -> "SliceReadAhead":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+# ==================== 共享实例 ====================
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_default_buffer_pool() -> BufferPool:
+    """
+    获取进程内共享的缓冲池
+
+    Returns:
+        BufferPool: 共享缓冲池
+    """
+    global _default_pool
+
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = BufferPool()
+        return _default_pool
@@ -0,0 +1,400 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘请求重试策略
+
+功能说明：
+    统一决定"哪些失败可以重试、等多久、最多重试多少"，供请求层（client.ApiClient）
+    和基于requests的会话共同使用。
+
+主要功能：
+    - 幂等性分类：GET/PUT、列表查询、分片上传、完成轮询等可安全重放；
+      创建文件、创建目录、删除、移动、提交离线任务等非幂等请求只在
+      确定服务器未处理时（429限流、连接被拒绝）才重试
+    - 指数退避：延迟按 base_delay * 2^n 增长，封顶 max_delay，采用"全抖动"避免重试同步
+    - Retry-After：服务器给出 Retry-After 时以其为准
+    - 重试预算：重试次数不超过正常请求数的一定比例，防止故障时重试风暴
+    - 重试指标：按原因和接口统计重试次数，并可注册监听器实时接收重试事件
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import errno
+import random
+import ssl
+import socket
+import threading
+import http.client
+from typing import Optional, Dict, Any, Callable
+
+from .rate_limit import normalize_endpoint
+
+
+# 幂等性分类
+IDEMPOTENT = "idempotent"
+NON_IDEMPOTENT = "non_idempotent"
+
+# 可安全重放的POST接口（其余POST默认视为非幂等）
+IDEMPOTENT_ENDPOINTS = {
+    "api/v1/access_token",
+    "api/v1/oss/file/list",
+    "api/v1/file/trash",
+    "upload/v2/file/slice",
+    "upload/v2/file/upload_complete",
+    "upload/v1/file/upload_complete",
+    "upload/v1/oss/file/get_upload_url",
+    "upload/v1/oss/file/upload_complete",
+    "upload/v1/oss/file/upload_async_result",
+}
+
+# 重试原因
+REASON_THROTTLED = "throttled"        # HTTP 429 或响应体 code 429
+REASON_SERVER_ERROR = "server_error"  # HTTP 5xx
+REASON_CONNECT = "connect"            # 连接未建立，请求肯定未发出
+REASON_NETWORK = "network"            # 请求可能已发出后的网络错误
+REASON_REJECTED = "rejected"          # 服务器以非0的code拒绝（如分片上传失败，换服务器重发）
+
+REASON_LABELS = {
+    REASON_THROTTLED: "限流429",
+    REASON_SERVER_ERROR: "服务器错误",
+    REASON_CONNECT: "连接失败",
+    REASON_NETWORK: "网络错误",
+    REASON_REJECTED: "服务器拒绝",
+}
+
+# 对所有请求都可以重试的原因（服务器确定没有处理该请求）
+SAFE_FOR_ALL_REASONS = {REASON_THROTTLED, REASON_CONNECT}
+
+# 可重试的HTTP状态码
+RETRYABLE_SERVER_STATUS = {500, 502, 503, 504}
+
+# 网络类异常（本地文件错误如 FileNotFoundError、PermissionError 不在其中，不重试）
+_NETWORK_ERRORS = (
+    http.client.HTTPException,
+    ConnectionError,
+    socket.timeout,
+    TimeoutError,
+    ssl.SSLError,
+)
+
+# 属于网络错误的 errno（其余 OSError 视为本地错误）
+_NETWORK_ERRNOS = {
+    code for code in (getattr(errno, name, None) for name in (
+        "ECONNRESET", "ECONNABORTED", "ECONNREFUSED", "EPIPE", "ENOTCONN", "ETIMEDOUT",
+        "ENETDOWN", "ENETUNREACH", "ENETRESET", "EHOSTDOWN", "EHOSTUNREACH", "EADDRNOTAVAIL",
+    )) if code is not None
+}
+
+
+def classify_request(method: str, path: str) -> str:
+    """
+    判断请求的幂等性
+
+    Args:
+        method: HTTP方法
+        path: 请求路径
+
+    Returns:
+        str: IDEMPOTENT 或 NON_IDEMPOTENT
+    """
+    if method.upper() in ("GET", "HEAD", "PUT", "OPTIONS"):
+        return IDEMPOTENT
+    if normalize_endpoint(path) in IDEMPOTENT_ENDPOINTS:
+        return IDEMPOTENT
+    return NON_IDEMPOTENT
+
+
+def response_retry_reason(status: int, body_code: Optional[int] = None) -> Optional[str]:
+    """
+    根据响应判断是否属于可重试的失败
+
+    Args:
+        status: HTTP状态码
+        body_code: 响应体JSON中的code（无法解析时为None）
+
+    Returns:
+        Optional[str]: 重试原因，不可重试时返回None
+    """
+    if status == 429 or body_code == 429:
+        return REASON_THROTTLED
+    if status in RETRYABLE_SERVER_STATUS:
+        return REASON_SERVER_ERROR
+    return None
+
+
+def exception_retry_reason(error: BaseException) -> Optional[str]:
+    """
+    根据异常判断是否属于可重试的网络失败
+
+    Args:
+        error: 发送请求时抛出的异常
+
+    Returns:
+        Optional[str]: 重试原因，不可重试时返回None
+    """
+    if isinstance(error, ssl.CertificateError):
+        return None
+    if isinstance(error, (ConnectionRefusedError, socket.gaierror)):
+        return REASON_CONNECT
+    if isinstance(error, _NETWORK_ERRORS):
+        return REASON_NETWORK
+    if isinstance(error, OSError) and error.errno in _NETWORK_ERRNOS:
+        return REASON_NETWORK
+    return None
+
+
+class RetryBudget:
+    """
+    重试预算
+
+    每次请求存入 ratio 个额度，每次重试消耗1个，额度最多积攒 max_balance 个。
+    服务整体故障时重试很快耗尽额度，请求直接失败而不是成倍放大流量。
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 10, max_balance: float = 100):
+        """
+        Args:
+            ratio: 每个请求允许的重试比例
+            min_retries: 初始（保底）重试额度
+            max_balance: 额度上限
+        """
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self._balance = float(min_retries)
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        """记录一次请求"""
+        with self._lock:
+            self._balance = min(self.max_balance, self._balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        申请一次重试
+
+        Returns:
+            bool: 额度充足返回True
+        """
+        with self._lock:
+            if self._balance >= 1:
+                self._balance -= 1
+                return True
+            return False
+
+
+class RetryMetrics:
+    """
+    重试指标
+
+    属性:
+        requests: 发送的请求总数（含重试）
+        retries: 重试总数
+        gave_up: 达到最大次数后放弃的请求数
+        budget_exhausted: 因预算耗尽而放弃的请求数
+        backoff_seconds: 累计退避等待时长
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.budget_exhausted = 0
+        self.backoff_seconds = 0.0
+        self.by_reason = {}
+        self.by_endpoint = {}
+
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        注册重试事件监听器
+
+        Args:
+            listener: 回调函数，参数为事件字典（endpoint, reason, attempt, delay）
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        注销重试事件监听器
+
+        Args:
+            listener: add_listener 注册过的回调函数
+        """
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_retry(self, endpoint: str, reason: str, attempt: int, delay: float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.backoff_seconds += delay
+            self.by_reason[reason] = self.by_reason.get(reason, 0) + 1
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + 1
+            listeners = list(self._listeners)
+
+        event = {"endpoint": endpoint, "reason": reason, "attempt": attempt, "delay": delay}
+        for listener in listeners:
+            listener(event)
+
+    def record_give_up(self, budget_exhausted: bool = False) -> None:
+        with self._lock:
+            if budget_exhausted:
+                self.budget_exhausted += 1
+            else:
+                self.gave_up += 1
+
+    def summary(self) -> str:
+        """
+        生成一行可读的重试统计，便于在工具结束时输出
+
+        Returns:
+            str: 统计文本
+        """
+        data = self.snapshot()
+        reasons = "，".join(f"{REASON_LABELS.get(reason, reason)} {count}次"
+                           for reason, count in sorted(data["by_reason"].items()))
+        text = f"请求 {data['requests']} 次，重试 {data['retries']} 次，退避 {data['backoff_seconds']:.1f}秒"
+        if reasons:
+            text += f"（{reasons}）"
+        if data["gave_up"] or data["budget_exhausted"]:
+            text += f"，放弃 {data['gave_up']} 次，预算耗尽 {data['budget_exhausted']} 次"
+        return text
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取指标快照
+
+        Returns:
+            Dict[str, Any]: 各项计数
+        """
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "gave_up": self.gave_up,
+                "budget_exhausted": self.budget_exhausted,
+                "backoff_seconds": round(self.backoff_seconds, 3),
+                "by_reason": dict(self.by_reason),
+                "by_endpoint": dict(self.by_endpoint),
+            }
+
+
+class RetryPolicy:
+    """
+    重试策略
+
+    使用示例:
+        >>> policy = get_default_retry_policy()
+        >>> delay = policy.next_delay("POST", "/upload/v2/file/slice", REASON_NETWORK, attempt=1)
+        >>> if delay is not None:
+        ...     time.sleep(delay)  # 然后重发
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 0.5, max_delay: float = 30.0,
+                 budget: Optional[RetryBudget] = None, metrics: Optional[RetryMetrics] = None):
+        """
+        Args:
+            max_attempts: 单个请求最多发送次数（含首次）
+            base_delay: 首次重试的基准延迟（秒）
+            max_delay: 单次延迟上限（秒）
+            budget: 重试预算（可选）
+            metrics: 重试指标（可选）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.metrics = metrics or RetryMetrics()
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        计算第 attempt 次重试前的等待时长（全抖动指数退避）
+
+        Args:
+            attempt: 已发送的次数（从1开始）
+            retry_after: 服务器要求的等待时长（秒）
+
+        Returns:
+            float: 等待秒数
+        """
+        if retry_after is not None and retry_after >= 0:
+            return min(self.max_delay, retry_after)
+
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def record_request(self) -> None:
+        """记录一次发送（用于预算和指标）"""
+        self.budget.deposit()
+        self.metrics.record_request()
+
+    def next_delay(self, method: str, path: str, reason: Optional[str], attempt: int,
+                   retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        判断是否重试，并返回重试前应等待的时长
+
+        Args:
+            method: HTTP方法
+            path: 请求路径
+            reason: 失败原因（None表示不可重试的失败）
+            attempt: 已发送的次数（从1开始）
+            retry_after: 服务器要求的等待时长（秒）
+
+        Returns:
+            Optional[float]: 等待秒数；不应重试时返回None
+        """
+        if reason is None:
+            return None
+
+        if reason not in SAFE_FOR_ALL_REASONS and classify_request(method, path) != IDEMPOTENT:
+            return None
+
+        if attempt >= self.max_attempts:
+            self.metrics.record_give_up()
+            return None
+
+        if not self.budget.withdraw():
+            self.metrics.record_give_up(budget_exhausted=True)
+            return None
+
+        delay = self.backoff(attempt, retry_after)
+        self.metrics.record_retry(normalize_endpoint(path), reason, attempt, delay)
+        return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头（仅支持秒数写法）"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+# ==================== 共享实例 ====================
+
+_default_policy = None
+_default_lock = threading.Lock()
+
+
+def get_default_retry_policy() -> RetryPolicy:
+    """
+    获取进程内共享的重试策略（共享预算和指标）
+
+    Returns:
+        RetryPolicy: 共享重试策略
+    """
+    global _default_policy
+
+    with _default_lock:
+        if _default_policy is None:
+            _default_policy = RetryPolicy()
+        return _default_policy
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘数据流缓存（边缓存边哈希）
+
+功能说明：
+    上传接口需要事先知道文件的MD5和大小（create 检测秒传、分片MD5表），
+    因此标准输入、管道等不可回退的数据流（例如即时生成的数据库导出）无法直接上传。
+    原先只能先把数据写成文件，上传时再整体读一遍计算MD5。
+
+    本模块只读取数据流一遍：每读到一块数据，同时喂给 hashing.StreamHasher 并写入缓存，
+    数据流结束时 etag、大小和分片MD5表都已算好，之后直接从缓存检测秒传和分片上传，
+    省掉"先落盘再读一遍算哈希"的额外读取。
+
+    - 数据量不超过 memory_threshold 时只缓存在内存中，不产生临时文件
+    - 超过后转为写入临时目录中的文件（文件名即上传后的文件名），已缓存的内存数据一并写入
+    - 超过 max_size 时立即停止读取并报错，不会先写满磁盘
+
+主要功能：
+    - spool_stream(): 读取数据流到缓存并返回 SpooledStream
+    - SpooledStream: 缓存结果（内存数据或临时文件路径、大小、哈希），close() 时删除临时文件
+
+使用示例:
+    >>> with spool_stream(sys.stdin.buffer, "dump.sql", slice_sizes=[16 * 1024 * 1024]) as spool:
+    ...     print(spool.size, spool.digest.etag)
+    ...     if spool.in_memory:
+    ...         upload_bytes(spool.data)
+    ...     else:
+    ...         upload_path(spool.path)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import io
+import os
+import shutil
+import tempfile
+from typing import Optional, Iterable
+
+from .hashing import FileDigest, StreamHasher, HASH_BUFFER_SIZE
+
+
+# 不超过该大小的数据流只缓存在内存中
+DEFAULT_MEMORY_THRESHOLD = 8 * 1024 * 1024
+
+
+class SpooledStream:
+    """
+    数据流的缓存结果
+
+    属性:
+        filename: 上传后的文件名
+        size: 数据总字节数
+        digest: 哈希结果（etag 和分片MD5表）
+        data: 缓存在内存中的数据（写入临时文件时为None）
+        path: 临时文件路径（缓存在内存中时为None），文件名与 filename 相同
+    """
+
+    def __init__(self, filename: str, digest: FileDigest, data: Optional[bytes] = None,
+                 path: Optional[str] = None):
+        self.filename = filename
+        self.digest = digest
+        self.size = digest.size
+        self.data = data
+        self.path = path
+
+    @property
+    def in_memory(self) -> bool:
+        """数据是否只缓存在内存中"""
+        return self.path is None
+
+    def close(self) -> None:
+        """删除临时文件（及其所在的临时目录）并释放内存数据"""
+        self.data = None
+        if self.path:
+            shutil.rmtree(os.path.dirname(self.path), ignore_errors=True)
+            self.path = None
+
+    def __enter__(self) -> "SpooledStream":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def _binary(stream):
+    """文本模式的数据流（如 sys.stdin）改为读取其底层的二进制流"""
+    if isinstance(stream, io.TextIOBase):
+        return stream.buffer
+    return stream
+
+
+def spool_stream(stream, filename: str, slice_sizes: Iterable[int] = (),
+                 memory_threshold: int = DEFAULT_MEMORY_THRESHOLD, spool_dir: Optional[str] = None,
+                 max_size: Optional[int] = None, buffer_size: int = HASH_BUFFER_SIZE) -> SpooledStream:
+    """
+    读取整个数据流，同时计算哈希并缓存数据
+
+    Args:
+        stream: 可读的数据流（二进制或文本模式的文件对象，如 sys.stdin、管道、socket.makefile()）
+        filename: 上传后的文件名（临时文件以此命名）
+        slice_sizes: 需要计算分片MD5表的分片大小
+        memory_threshold: 不超过该字节数时只缓存在内存中
+        spool_dir: 临时目录的父目录（默认为系统临时目录，可通过 TMPDIR 环境变量修改）
+        max_size: 允许的最大字节数（可选），超过时停止读取并报错
+        buffer_size: 每次读取的字节数
+
+    Returns:
+        SpooledStream: 缓存结果
+
+    Raises:
+        ValueError: 文件名为空
+        Exception: 数据流超过 max_size，或读取、写入失败
+    """
+    filename = os.path.basename(filename or "")
+    if not filename:
+        raise ValueError("上传数据流时必须指定文件名")
+
+    stream = _binary(stream)
+    readinto = getattr(stream, "readinto", None)
+    hasher = StreamHasher(slice_sizes)
+    memory = bytearray()
+    spool_file = None
+    path = None
+
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+
+    try:
+        while True:
+            if readinto is not None:
+                n = readinto(buffer)
+                chunk = view[:n] if n else None
+            else:
+                data = stream.read(buffer_size)
+                n = len(data) if data else 0
+                chunk = data if n else None
+            if not chunk:
+                break
+
+            hasher.update(chunk)
+            if max_size is not None and hasher.size > max_size:
+                raise Exception(f"数据流超过最大限制 {max_size} 字节")
+
+            if spool_file is not None:
+                spool_file.write(chunk)
+            elif len(memory) + n <= memory_threshold:
+                memory += chunk
+            else:
+                # 超过内存阈值：转为写入临时文件
+                path = os.path.join(tempfile.mkdtemp(prefix="pan123_spool_", dir=spool_dir), filename)
+                spool_file = open(path, "wb")
+                spool_file.write(memory)
+                spool_file.write(chunk)
+                memory = None
+
+        if spool_file is not None:
+            spool_file.close()
+            spool_file = None
+    except BaseException:
+        if spool_file is not None:
+            spool_file.close()
+        if path:
+            shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+        raise
+
+    digest = hasher.finish()
+    if path:
+        return SpooledStream(filename, digest, path=path)
+    return SpooledStream(filename, digest, data=bytes(memory))
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘工具本地缓存存储
+
+功能说明：
+    为令牌缓存等需要跨进程共享的本地状态提供基础设施：
+    缓存目录定位、跨平台文件锁、原子写入JSON文件。
+
+主要功能：
+    - 缓存目录：默认为项目根目录下的 .cache/（与config.txt同级），
+      可通过环境变量 PAN123_CACHE_DIR 覆盖
+    - 文件锁：Linux/macOS 使用 fcntl.flock，Windows 使用 msvcrt.locking
+    - 原子写入：先写临时文件再替换，进程崩溃也不会留下半截文件
+    - 追加写入：逐行追加并落盘的日志文件（如断点续传日志），崩溃时最多丢失最后一行
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import json
+import tempfile
+from typing import Optional, Any, List
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# 项目根目录（pan123_common 的上一级，即config.txt所在目录）
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_cache_dir() -> str:
+    """
+    获取（必要时创建）本地缓存目录
+
+    Returns:
+        str: 缓存目录路径
+    """
+    cache_dir = os.environ.get("PAN123_CACHE_DIR") or os.path.join(PROJECT_ROOT, ".cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+class FileLock:
+    """
+    基于锁文件的跨进程排他锁
+
+    同一时刻只有一个进程（或线程）能持有锁，其余调用方阻塞等待。
+
+    使用示例:
+        >>> with FileLock("/path/to/tokens.json.lock"):
+        ...     pass  # 读取-修改-写回共享文件
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: 锁文件路径（不存在时自动创建）
+        """
+        self.path = path
+        self._fd = None
+
+    def acquire(self) -> None:
+        """获取锁（阻塞）"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                # msvcrt.LK_LOCK 最多重试10次，持续失败时继续等待
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            os.close(fd)
+            raise
+
+        self._fd = fd
+
+    def release(self) -> None:
+        """释放锁"""
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+
+def read_json(path: str, default: Optional[Any] = None) -> Any:
+    """
+    读取JSON文件
+
+    Args:
+        path: 文件路径
+        default: 文件不存在或内容损坏时的返回值
+
+    Returns:
+        Any: 解析后的数据
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_text_atomic(path: str, text: str) -> None:
+    """
+    原子写入文本文件（权限0600，仅当前用户可读写）
+
+    Args:
+        path: 目标文件路径
+        text: 文件内容
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """
+    原子写入JSON文件（权限0600，仅当前用户可读写）
+
+    Args:
+        path: 目标文件路径
+        data: 可JSON序列化的数据
+    """
+    write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+
+def append_lines(path: str, lines: List[str]) -> None:
+    """
+    向文件追加若干行并立即落盘（调用方负责加锁）
+
+    上次崩溃留下的不完整末行会先补上换行，使其单独成为一行损坏记录，不影响新追加的行。
+
+    Args:
+        path: 文件路径（不存在时创建，权限0600）
+        lines: 不含换行符的文本行
+    """
+    data = "".join(line + "\n" for line in lines).encode("utf-8")
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+    with os.fdopen(fd, "a+b") as f:
+        end = f.seek(0, os.SEEK_END)
+        if end > 0:
+            f.seek(end - 1)
+            if f.read(1) != b"\n":
+                data = b"\n" + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘共享HTTP传输层
+
+功能说明：
+    为所有工具提供统一的HTTP(S)连接池，按主机维护keep-alive长连接，
+    避免每次API调用、每个分片、每次轮询都重新进行TCP和TLS握手。
+
+主要功能：
+    - 按主机复用连接：同一主机的请求共享一组keep-alive连接
+    - 有界连接池：每个主机同时签出的连接数有上限，超出时阻塞等待
+    - 线程安全：连接的签出/归还由锁和信号量保护，可在多线程中共享
+    - 失效重连：复用的空闲连接被服务器关闭时自动换新连接重发一次
+    - 握手统计：记录新建连接数和复用次数，便于评估连接池效果
+    - 流式请求体：multipart.MultipartEncoder 等长度已知的请求体按块写入socket，不整体读入内存
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import http.client
+import threading
+from typing import Optional, Dict, Any, Tuple, Union
+from urllib.parse import urlsplit
+
+from .multipart import is_streaming_body
+
+
+# 每个主机最多同时签出的连接数
+DEFAULT_POOL_SIZE = 10
+
+# 单次socket操作超时时间（秒）
+DEFAULT_TIMEOUT = 120
+
+# 复用空闲连接时可能出现的"连接已被服务器关闭"类异常
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    ConnectionAbortedError,
+    BrokenPipeError,
+)
+
+
+def with_content_length(body, headers: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """
+    为流式请求体补上 Content-Length
+
+    http.client 对没有 Content-Length 的可迭代请求体会改用分块传输编码，
+    上传服务器不一定支持，因此按请求体长度显式设置。
+
+    Args:
+        body: 请求体
+        headers: 请求头
+
+    Returns:
+        Dict[str, str]: 请求头（需要补充时返回新字典）
+    """
+    headers = headers or {}
+    if is_streaming_body(body) and "content-length" not in {key.lower() for key in headers}:
+        headers = dict(headers)
+        headers["Content-Length"] = str(len(body))
+    return headers
+
+
+class PooledResponse:
+    """
+    连接池请求的响应
+
+    响应体在归还连接前已被完整读取，因此可以在任意线程中安全使用。
+
+    属性:
+        status: HTTP状态码
+        reason: HTTP状态说明
+        headers: 响应头
+        data: 响应体（bytes）
+    """
+
+    def __init__(self, status: int, reason: str, headers: http.client.HTTPMessage, data: bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.data = data
+
+
+class ConnectionPool:
+    """
+    单个主机的keep-alive连接池
+
+    空闲连接按后进先出顺序复用（最近使用的连接最不容易被服务器超时关闭）。
+    签出连接数受信号量限制，池满时调用方阻塞等待其他线程归还连接。
+
+    属性:
+        scheme: 协议（http或https）
+        host: 主机名（可带端口）
+        maxsize: 最多同时签出的连接数
+        timeout: socket超时时间（秒）
+        created: 累计新建连接数（即握手次数）
+        reused: 累计复用空闲连接次数
+    """
+
+    def __init__(self, scheme: str, host: str, maxsize: int = DEFAULT_POOL_SIZE,
+                 timeout: Optional[float] = DEFAULT_TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.created = 0
+        self.reused = 0
+
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxsize)
+
+    def _new_conn(self) -> http.client.HTTPConnection:
+        """新建一个连接（首次发送请求时才真正握手）"""
+        with self._lock:
+            self.created += 1
+
+        if self.scheme == "http":
+            return http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+
+    def get(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """
+        签出一个连接
+
+        Returns:
+            Tuple[HTTPConnection, bool]: 连接对象，以及是否为复用的空闲连接
+        """
+        self._slots.acquire()
+
+        with self._lock:
+            if self._idle:
+                self.reused += 1
+                return self._idle.pop(), True
+
+        try:
+            return self._new_conn(), False
+        except Exception:
+            self._slots.release()
+            raise
+
+    def put(self, conn: http.client.HTTPConnection, reusable: bool = True) -> None:
+        """
+        归还连接
+
+        Args:
+            conn: 签出的连接
+            reusable: 连接是否仍可复用，不可复用的连接将被关闭
+        """
+        try:
+            if reusable:
+                with self._lock:
+                    if len(self._idle) < self.maxsize:
+                        self._idle.append(conn)
+                        return
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """关闭所有空闲连接"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for conn in idle:
+            conn.close()
+
+
+class PooledTransport:
+    """
+    按主机管理连接池的HTTP传输层
+
+    所有工具类默认共享同一个实例（见 get_default_transport），
+    因此同一进程中的多个管理器也会复用彼此的连接。
+
+    使用示例:
+        >>> transport = get_default_transport()
+        >>> response = transport.request("GET", "open-api.123pan.com", "/upload/v2/file/domain",
+        ...                              headers={'Platform': 'open_platform'})
+        >>> print(response.status, response.data)
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: Optional[float] = DEFAULT_TIMEOUT):
+        """
+        初始化传输层
+
+        Args:
+            pool_size: 每个主机的连接池大小
+            timeout: socket超时时间（秒）
+        """
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split_host(host: str) -> Tuple[str, str]:
+        """
+        解析主机地址
+
+        支持 "open-api.123pan.com" 和 "https://openapi-upload.123242.com" 两种写法，
+        未指定协议时默认为https。
+
+        Returns:
+            Tuple[str, str]: (协议, 主机名)
+        """
+        if "://" in host:
+            parsed = urlsplit(host)
+            return parsed.scheme.lower(), parsed.netloc
+        return "https", host
+
+    def get_pool(self, scheme: str, host: str) -> ConnectionPool:
+        """获取（必要时创建）指定主机的连接池"""
+        key = (scheme, host)
+
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(scheme, host, self.pool_size, self.timeout)
+                self._pools[key] = pool
+            return pool
+
+    def request(self, method: str, host: str, path: str, body: Union[str, bytes, None] = None,
+                headers: Optional[Dict[str, str]] = None) -> PooledResponse:
+        """
+        发送请求并读取完整响应
+
+        Args:
+            method: HTTP方法
+            host: 主机地址，可带 http:// 或 https:// 前缀
+            path: 请求路径（包含查询参数）
+            body: 请求体（bytes、str，或可重复迭代、长度已知的流式请求体）
+            headers: 请求头
+
+        Returns:
+            PooledResponse: 响应对象
+
+        Raises:
+            Exception: 网络错误（复用连接失效时会先自动重试一次）
+        """
+        scheme, netloc = self._split_host(host)
+        pool = self.get_pool(scheme, netloc)
+        headers = with_content_length(body, headers)
+
+        while True:
+            conn, reused = pool.get()
+
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+            except _STALE_CONNECTION_ERRORS:
+                pool.put(conn, reusable=False)
+                # 空闲连接可能已被服务器关闭，换新连接重发一次
+                if reused:
+                    continue
+                raise
+            except BaseException:
+                pool.put(conn, reusable=False)
+                raise
+
+            pool.put(conn, reusable=not response.will_close)
+            return PooledResponse(response.status, response.reason, response.headers, data)
+
+    def request_url(self, method: str, url: str, body: Union[str, bytes, None] = None,
+                    headers: Optional[Dict[str, str]] = None) -> PooledResponse:
+        """
+        按完整URL发送请求（用于预签名上传地址等场景）
+
+        Args:
+            method: HTTP方法
+            url: 完整URL
+            body: 请求体
+            headers: 请求头
+
+        Returns:
+            PooledResponse: 响应对象
+        """
+        parsed = urlsplit(url)
+        path = parsed.path or "/"
+        if parsed.query:
+            path += "?" + parsed.query
+        return self.request(method, f"{parsed.scheme}://{parsed.netloc}", path, body, headers)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取连接统计
+
+        Returns:
+            Dict[str, Any]: 包含以下键的字典：
+                - connections_created: 新建连接数（握手次数）
+                - connections_reused: 复用连接次数
+                - hosts: 每个主机的统计
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+
+        hosts = {f"{p.scheme}://{p.host}": {"created": p.created, "reused": p.reused} for p in pools}
+        return {
+            "connections_created": sum(p.created for p in pools),
+            "connections_reused": sum(p.reused for p in pools),
+            "hosts": hosts
+        }
+
+    def close(self) -> None:
+        """关闭所有主机的空闲连接"""
+        with self._lock:
+            pools = list(self._pools.values())
+
+        for pool in pools:
+            pool.close()
+
+
+# ==================== 共享实例 ====================
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_default_transport() -> PooledTransport:
+    """
+    获取进程内共享的传输层实例
+
+    Returns:
+        PooledTransport: 共享传输层
+    """
+    global _default_transport
+
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = PooledTransport()
+        return _default_transport
+
+
+def create_requests_session(pool_size: int = DEFAULT_POOL_SIZE, retry_policy=None):
+    """
+    创建带有界连接池和重试的requests会话
+
+    供基于requests的工具（下载文件、在线Markdown转本地）使用，
+    与 PooledTransport 采用相同的每主机连接池大小，
+    并按 retry.RetryPolicy 对限流（429）、服务器错误和网络错误退避重试。
+
+    Args:
+        pool_size: 每个主机的连接池大小
+        retry_policy: 重试策略（可选，默认使用进程内共享的策略）
+
+    Returns:
+        requests.Session: 会话对象
+    """
+    import json
+    import time
+    import requests
+    from requests.adapters import HTTPAdapter
+    from .retry import (get_default_retry_policy, response_retry_reason, parse_retry_after,
+                        REASON_CONNECT, REASON_NETWORK)
+
+    policy = retry_policy or get_default_retry_policy()
+
+    class RetryingHTTPAdapter(HTTPAdapter):
+        """按重试策略重发请求的连接适配器"""
+
+        def send(self, request, **kwargs):
+            attempt = 0
+
+            while True:
+                attempt += 1
+                policy.record_request()
+
+                try:
+                    response = super().send(request, **kwargs)
+                except requests.exceptions.SSLError:
+                    raise
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                    reason = REASON_CONNECT if isinstance(e, requests.exceptions.ConnectTimeout) else REASON_NETWORK
+                    delay = policy.next_delay(request.method, request.path_url, reason, attempt)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+
+                code = None
+                if not kwargs.get("stream") and "json" in response.headers.get("Content-Type", ""):
+                    try:
+                        code = json.loads(response.content.decode("utf-8")).get("code")
+                    except (ValueError, AttributeError):
+                        code = None
+
+                reason = response_retry_reason(response.status_code, code)
+                retry_after = parse_retry_after(response.headers.get("Retry-After")) if reason else None
+                delay = policy.next_delay(request.method, request.path_url, reason, attempt, retry_after)
+                if delay is None:
+                    return response
+
+                response.close()
+                time.sleep(delay)
+
+    session = requests.Session()
+    adapter = RetryingHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘上传服务器调度器
+
+功能说明：
+    create 接口返回的 servers 和 /upload/v2/file/domain 返回的上传域名通常不止一个。
+    本模块记录每个上传服务器的吞吐和错误情况，每次上传分片（或单步上传）前
+    选出预计最快完成的服务器，使分片分散到所有服务器上，并逐渐避开慢的或出错的服务器。
+
+主要功能：
+    - 吞吐估计：按每次上传的字节数和耗时更新指数滑动平均吞吐
+    - 错误率：失败记为1、成功记为0的指数滑动平均
+    - 负载感知：选择"(进行中请求数+1) / 吞吐 × 错误惩罚"最小的服务器，
+      未测量过的服务器按已知最快吞吐乐观估计，保证每个服务器都能被尝试到
+    - 故障隔离：连续失败达到阈值的服务器暂停使用一段时间（指数增长），到期后重新参与调度
+    - 延迟探测（可选，见 host_probe）：尚未测出吞吐的服务器按探测延迟折算预计吞吐，
+      延迟低的服务器先分到请求；探测不可达的服务器在有其他服务器可用时不使用；
+      服务器进入暂停或吞吐降到峰值的 DEGRADED_RATIO 以下时通知探测器重新探测
+    - 线程安全：可被线程池中的多个分片上传线程共享
+
+连接层面每个服务器本身就有独立的keep-alive连接池（见 transport.PooledTransport 按主机建池）。
+
+使用示例:
+    >>> hosts = UploadHostScheduler()
+    >>> host = hosts.acquire(["openapi-upload-1.123242.com", "openapi-upload-2.123242.com"])
+    >>> try:
+    ...     upload_slice(host)
+    ...     hosts.record_success(host, len(body), elapsed)
+    ... except Exception:
+    ...     hosts.record_failure(host)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import time
+import threading
+from typing import Optional, Dict, Any, List
+
+from .host_probe import HostProber
+
+
+# 吞吐和错误率滑动平均的权重
+EWMA_ALPHA = 0.3
+
+# 错误率对预计耗时的放大倍数：错误率为50%时预计耗时翻倍
+ERROR_PENALTY = 2.0
+
+# 连续失败多少次后暂停使用该服务器
+FAILURES_BEFORE_COOLDOWN = 2
+
+# 暂停时长（秒）：首次 BASE_COOLDOWN，之后每次连续失败翻倍，最多 MAX_COOLDOWN
+BASE_COOLDOWN = 5.0
+MAX_COOLDOWN = 120.0
+
+# 吞吐滑动平均低于该服务器峰值的这一比例时视为表现变差，重新探测延迟
+DEGRADED_RATIO = 0.3
+
+# 至少成功多少次后才判断吞吐是否变差（前几次的吞吐波动较大）
+DEGRADED_MIN_SAMPLES = 5
+
+
+def normalize_host(host: str) -> str:
+    """去掉上传地址中的协议前缀和末尾斜杠"""
+    return host.replace("https://", "").replace("http://", "").rstrip("/")
+
+
+class HostStats:
+    """
+    单个上传服务器的统计
+
+    属性:
+        host: 服务器域名
+        in_flight: 进行中的请求数
+        throughput: 吞吐的滑动平均（字节/秒），未测量时为None
+        error_rate: 错误率的滑动平均（0~1）
+        successes: 成功次数
+        failures: 失败次数
+        bytes_sent: 成功上传的字节数
+        consecutive_failures: 当前连续失败次数
+        cooldown_until: 暂停使用直到该时间（time.monotonic()）
+        peak_throughput: 吞吐滑动平均的峰值（字节/秒）
+        degraded: 吞吐是否已降到峰值的 DEGRADED_RATIO 以下
+    """
+
+    def __init__(self, host: str):
+        self.host = host
+        self.in_flight = 0
+        self.throughput = None
+        self.error_rate = 0.0
+        self.successes = 0
+        self.failures = 0
+        self.bytes_sent = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.peak_throughput = 0.0
+        self.degraded = False
+
+    def expected_cost(self, default_throughput: Optional[float]) -> float:
+        """排队等待并完成一个请求的相对代价（越小越好）"""
+        throughput = self.throughput or default_throughput or 1.0
+        return (self.in_flight + 1) / throughput * (1 + ERROR_PENALTY * self.error_rate)
+
+
+class UploadHostScheduler:
+    """
+    按吞吐和错误率在多个上传服务器之间分配请求
+
+    每次 acquire() 必须对应一次 record_success() 或 record_failure()。
+    同一个上传器的所有文件共享一个调度器，服务器的表现会跨文件累积。
+
+    属性:
+        prober: 延迟探测器（可选），为None时只按实测吞吐和错误率调度
+    """
+
+    def __init__(self, prober: Optional[HostProber] = None):
+        """
+        Args:
+            prober: 延迟探测器（可选）
+        """
+        self.prober = prober
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _stats_for(self, host: str) -> HostStats:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = HostStats(host)
+            self._hosts[host] = stats
+        return stats
+
+    def acquire(self, candidates: List[str]) -> str:
+        """
+        选出预计最快完成的服务器，并把它的进行中请求数加一
+
+        Args:
+            candidates: 可用的服务器列表（可带协议前缀）
+
+        Returns:
+            str: 选中的服务器域名（不带协议前缀）
+
+        Raises:
+            ValueError: 服务器列表为空
+        """
+        hosts = [normalize_host(host) for host in candidates if host]
+        if not hosts:
+            raise ValueError("没有可用的上传服务器")
+
+        # 探测在锁外进行（首次探测可能需要几秒）
+        latencies = self.prober.latencies(hosts) if self.prober is not None else {}
+        reachable = [latency for latency in latencies.values() if latency is not None]
+        best_latency = min(reachable) if reachable else None
+
+        now = time.monotonic()
+        with self._lock:
+            stats = [self._stats_for(host) for host in hosts]
+
+            available = [s for s in stats if s.cooldown_until <= now]
+            if not available:
+                # 全部暂停中：选最早恢复的服务器
+                available = [min(stats, key=lambda s: s.cooldown_until)]
+            elif best_latency is not None:
+                # 探测不可达的服务器只在没有其他服务器可用时使用
+                available = [s for s in available
+                             if not (s.host in latencies and latencies[s.host] is None)] or available
+
+            measured = [s.throughput for s in stats if s.throughput]
+            default_throughput = max(measured) if measured else None
+
+            def cost(s: HostStats) -> float:
+                latency = latencies.get(s.host)
+                if s.throughput is None and latency and best_latency:
+                    # 尚未测出吞吐：按探测延迟相对最快服务器折算
+                    return s.expected_cost((default_throughput or 1.0) * best_latency / latency)
+                return s.expected_cost(default_throughput)
+
+            best = min(available, key=cost)
+            best.in_flight += 1
+            return best.host
+
+    def record_success(self, host: str, nbytes: int, seconds: float) -> None:
+        """
+        记录一次成功的上传
+
+        Args:
+            host: acquire() 返回的服务器域名
+            nbytes: 上传的字节数
+            seconds: 请求耗时（秒）
+        """
+        with self._lock:
+            stats = self._stats_for(host)
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.successes += 1
+            stats.bytes_sent += nbytes
+            stats.consecutive_failures = 0
+            stats.error_rate *= (1 - EWMA_ALPHA)
+
+            sample = nbytes / max(seconds, 1e-3)
+            if stats.throughput is None:
+                stats.throughput = sample
+            else:
+                stats.throughput = (1 - EWMA_ALPHA) * stats.throughput + EWMA_ALPHA * sample
+            stats.peak_throughput = max(stats.peak_throughput, stats.throughput)
+
+            # 吞吐明显下降时只通知一次，恢复后重新计算
+            degraded = (stats.successes >= DEGRADED_MIN_SAMPLES
+                        and stats.throughput < DEGRADED_RATIO * stats.peak_throughput)
+            newly_degraded = degraded and not stats.degraded
+            stats.degraded = degraded
+
+        if newly_degraded and self.prober is not None:
+            self.prober.invalidate(host)
+
+    def record_failure(self, host: str) -> None:
+        """
+        记录一次失败的上传，连续失败达到阈值时暂停使用该服务器
+
+        Args:
+            host: acquire() 返回的服务器域名
+        """
+        with self._lock:
+            stats = self._stats_for(host)
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            stats.error_rate = (1 - EWMA_ALPHA) * stats.error_rate + EWMA_ALPHA
+
+            failures = stats.consecutive_failures
+            if failures < FAILURES_BEFORE_COOLDOWN:
+                return
+
+            cooldown = min(MAX_COOLDOWN, BASE_COOLDOWN * (2 ** (failures - FAILURES_BEFORE_COOLDOWN)))
+            stats.cooldown_until = time.monotonic() + cooldown
+
+        print(f"⚠️  上传服务器 {host} 连续失败 {failures} 次，暂停使用 {cooldown:.0f}秒")
+        if self.prober is not None:
+            self.prober.invalidate(host)
+
+    def best_throughput(self) -> Optional[float]:
+        """
+        获取已测量服务器中最高的吞吐
+
+        Returns:
+            Optional[float]: 吞吐（字节/秒），尚未测量过任何服务器时返回None
+        """
+        with self._lock:
+            measured = [s.throughput for s in self._hosts.values() if s.throughput]
+        return max(measured) if measured else None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        获取各服务器的统计快照
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 服务器域名 -> 统计项
+        """
+        with self._lock:
+            return {
+                host: {
+                    "successes": s.successes,
+                    "failures": s.failures,
+                    "bytes_sent": s.bytes_sent,
+                    "throughput": s.throughput,
+                    "error_rate": round(s.error_rate, 3),
+                }
+                for host, s in self._hosts.items()
+            }
+
+    def summary(self) -> str:
+        """
+        生成一行可读的各服务器统计
+
+        Returns:
+            str: 统计文本，如 "host-a 成功12次 35.2 MB/s；host-b 成功4次 8.1 MB/s 失败1次"
+        """
+        parts = []
+        for host, data in sorted(self.snapshot().items()):
+            text = f"{host} 成功{data['successes']}次"
+            if data["throughput"]:
+                text += f" {data['throughput'] / 1024 / 1024:.1f} MB/s"
+            if data["failures"]:
+                text += f" 失败{data['failures']}次"
+            parts.append(text)
+        return "；".join(parts)
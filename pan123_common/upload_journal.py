@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘断点续传日志
+
+功能说明：
+    分片上传大文件时，把"哪个本地文件、上传到哪个目录、对应哪个preuploadID、哪些分片已被服务器确认"
+    逐行追加到缓存目录（与config.txt同级的 .cache/）下的 upload_journal.jsonl。
+    上传中断后重新运行上传工具，可直接沿用原来的preuploadID，只补传缺失的分片，
+    也不必重新计算整个文件的MD5。
+
+主要功能：
+    - 文件身份：按 绝对路径 + 大小 + 修改时间(ns) + inode 识别文件，文件被修改后旧记录自动失效
+    - 崩溃安全：每条记录追加一行并fsync，进程在任意位置崩溃最多丢失最后一个分片的确认，
+      读取时跳过损坏的行
+    - 跨进程：追加和重写都在文件锁内进行
+    - 内存索引：日志只在首次查找和日志文件大小或修改时间变化（其他进程写入）时重新读取，
+      会话按 (文件身份, 父目录ID) 建立索引；本进程的写入直接更新索引，批量上传时每个文件的查找不再
+      读取整个日志，也不争用文件锁
+    - 自动整理：会话结束后删除其记录，日志中失效的行过多时原子重写为只含未完成会话的紧凑文件
+
+日志格式（每行一个JSON对象）：
+    {"op": "begin", "id": preuploadID, "path": ..., "size": ..., "mtime_ns": ..., "inode": ...,
+     "parent": 父目录ID, "etag": ..., "slice_size": ..., "servers": [...], "created": 时间戳}
+    {"op": "ack", "id": preuploadID, "slice": 分片序号}
+    {"op": "end", "id": preuploadID}
+
+使用示例:
+    >>> journal = UploadJournal()
+    >>> session = journal.find("big.iso", parent_file_id=0)
+    >>> if session is None:
+    ...     session = journal.begin("big.iso", 0, etag, preupload_id, slice_size, servers)
+    >>> journal.ack(session, 1)
+    >>> journal.finish(session)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import json
+import time
+import threading
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+from .hashing import file_identity
+from .storage import FileLock, get_cache_dir, append_lines, write_text_atomic
+
+
+# 日志文件名（位于缓存目录）
+JOURNAL_FILE = "upload_journal.jsonl"
+
+# 日志总行数超过未完成会话所需行数的多少行时重写日志
+COMPACT_THRESHOLD = 1000
+
+# 超过该时长（秒）的未完成会话在整理日志时丢弃（服务器早已使其过期）
+SESSION_MAX_AGE = 7 * 24 * 3600
+
+
+class UploadSession:
+    """
+    一次未完成的分片上传
+
+    属性:
+        preupload_id: 预上传ID
+        identity: 文件身份（见 file_identity）
+        parent_file_id: 上传到的父目录ID
+        etag: 文件MD5
+        slice_size: 分片大小
+        servers: 上传服务器列表
+        created: 创建时间戳
+        acked: 已被服务器确认的分片序号
+    """
+
+    def __init__(self, preupload_id: str, identity: Dict[str, Any], parent_file_id: int, etag: str,
+                 slice_size: int, servers: List[str], created: float, acked: Optional[Set[int]] = None):
+        self.preupload_id = preupload_id
+        self.identity = identity
+        self.parent_file_id = parent_file_id
+        self.etag = etag
+        self.slice_size = slice_size
+        self.servers = servers
+        self.created = created
+        self.acked = acked or set()
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """转换为日志记录（用于重写日志）"""
+        begin = dict(self.identity)
+        begin.update({
+            "op": "begin",
+            "id": self.preupload_id,
+            "parent": self.parent_file_id,
+            "etag": self.etag,
+            "slice_size": self.slice_size,
+            "servers": self.servers,
+            "created": self.created,
+        })
+        return [begin] + [{"op": "ack", "id": self.preupload_id, "slice": n} for n in sorted(self.acked)]
+
+
+def _identity_key(identity: Dict[str, Any], parent_file_id: int) -> Tuple:
+    """会话索引的键：文件身份 + 父目录ID"""
+    return (identity.get("path"), identity.get("size"), identity.get("mtime_ns"), identity.get("inode"),
+            parent_file_id)
+
+
+class UploadJournal:
+    """
+    断点续传日志
+
+    同一日志可被多个线程、多个进程同时使用，每次写入都在文件锁内完成；
+    未完成的会话缓存在内存中，日志文件被其他进程改动后才重新读取。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: 日志文件路径（默认位于缓存目录）
+        """
+        self.path = path or os.path.join(get_cache_dir(), JOURNAL_FILE)
+
+        # 内存中的未完成会话（preuploadID -> 会话）及其索引，_stamp 为读取时日志文件的 (大小, 修改时间, inode)
+        self._sessions = {}
+        self._index = {}
+        self._stamp = None
+        self._loaded = False
+        self._cache_lock = threading.Lock()
+
+    def _lock(self) -> FileLock:
+        return FileLock(self.path + ".lock")
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """日志文件的 (大小, 修改时间ns, inode)，不存在时返回None"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def _set_cache(self, sessions: Dict[str, UploadSession], stamp) -> None:
+        """用完整的会话表替换内存缓存（调用方持有 _cache_lock）"""
+        self._sessions = dict(sessions)
+        self._index = {}
+        for session in self._sessions.values():
+            self._index.setdefault(_identity_key(session.identity, session.parent_file_id), {})[
+                session.preupload_id] = session
+        self._stamp = stamp
+        self._loaded = True
+
+    def _cache_add(self, session: UploadSession) -> None:
+        self._sessions[session.preupload_id] = session
+        self._index.setdefault(_identity_key(session.identity, session.parent_file_id), {})[
+            session.preupload_id] = session
+
+    def _cache_remove(self, preupload_id: str) -> None:
+        session = self._sessions.pop(preupload_id, None)
+        if session is None:
+            return
+        key = _identity_key(session.identity, session.parent_file_id)
+        group = self._index.get(key)
+        if group is not None:
+            group.pop(preupload_id, None)
+            if not group:
+                del self._index[key]
+
+    def _write(self, records: List[Dict[str, Any]], apply) -> None:
+        """
+        在文件锁内追加记录，并把同样的改动应用到内存缓存
+
+        追加前日志未被其他进程改动时，缓存仍与日志一致，只需应用改动并记下新的文件状态；
+        否则保持原状，下次查找时重新读取。
+
+        Args:
+            records: 要追加的记录
+            apply: 对内存缓存应用改动的函数（在 _cache_lock 内调用）
+        """
+        with self._lock():
+            before = self._file_stamp()
+            self._append(records)
+            after = self._file_stamp()
+
+            with self._cache_lock:
+                if self._loaded and self._stamp == before:
+                    apply()
+                    self._stamp = after
+
+    def _load(self) -> Tuple[Dict[str, UploadSession], int]:
+        """
+        重放日志
+
+        Returns:
+            Tuple[Dict[str, UploadSession], int]: 未完成的会话（preuploadID -> 会话），以及日志总行数
+        """
+        sessions = {}
+        lines = 0
+
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except OSError:
+            return sessions, lines
+
+        with f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                    op, preupload_id = record["op"], record["id"]
+                except (ValueError, KeyError, TypeError):
+                    # 崩溃时写了一半的行
+                    continue
+
+                if op == "begin":
+                    identity = {key: record.get(key) for key in ("path", "size", "mtime_ns", "inode")}
+                    sessions[preupload_id] = UploadSession(
+                        preupload_id, identity, record.get("parent"), record.get("etag"),
+                        record.get("slice_size"), record.get("servers") or [], record.get("created") or 0)
+                elif op == "ack" and preupload_id in sessions:
+                    sessions[preupload_id].acked.add(record.get("slice"))
+                elif op == "end":
+                    sessions.pop(preupload_id, None)
+
+        return sessions, lines
+
+    def _append(self, records: List[Dict[str, Any]]) -> None:
+        append_lines(self.path, [json.dumps(record, ensure_ascii=False) for record in records])
+
+    def find(self, file_path: str, parent_file_id: int) -> Optional[UploadSession]:
+        """
+        查找同一文件上传到同一目录的未完成会话
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID
+
+        Returns:
+            Optional[UploadSession]: 最近的未完成会话；没有或文件已被修改时返回None
+        """
+        identity = file_identity(file_path)
+
+        key = _identity_key(identity, parent_file_id)
+
+        with self._cache_lock:
+            fresh = self._loaded and self._file_stamp() == self._stamp
+            if fresh:
+                matches = list(self._index.get(key, {}).values())
+
+        if not fresh:
+            # 首次查找或其他进程改动了日志：在文件锁内重新读取（锁顺序与写入一致：先文件锁后缓存锁）
+            with self._lock():
+                sessions, _ = self._load()
+                with self._cache_lock:
+                    self._set_cache(sessions, self._file_stamp())
+                    matches = list(self._index.get(key, {}).values())
+
+        if not matches:
+            return None
+        return max(matches, key=lambda s: s.created)
+
+    def begin(self, file_path: str, parent_file_id: int, etag: str, preupload_id: str,
+              slice_size: int, servers: List[str]) -> UploadSession:
+        """
+        记录一次新的分片上传
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID
+            etag: 文件MD5
+            preupload_id: create 接口返回的预上传ID
+            slice_size: 分片大小
+            servers: 上传服务器列表
+
+        Returns:
+            UploadSession: 新会话
+        """
+        session = UploadSession(preupload_id, file_identity(file_path), parent_file_id, etag,
+                                slice_size, list(servers), time.time())
+        self._write(session.to_records(), lambda: self._cache_add(session))
+        return session
+
+    def ack(self, session: UploadSession, slice_no: int) -> None:
+        """
+        记录一个分片已被服务器确认
+
+        Args:
+            session: 会话
+            slice_no: 分片序号（从1开始）
+        """
+        session.acked.add(slice_no)
+
+        def apply():
+            cached = self._sessions.get(session.preupload_id)
+            if cached is not None:
+                cached.acked.add(slice_no)
+
+        self._write([{"op": "ack", "id": session.preupload_id, "slice": slice_no}], apply)
+
+    def finish(self, session: UploadSession) -> None:
+        """
+        结束会话（上传完成，或服务器上的会话已失效），必要时整理日志
+
+        Args:
+            session: 会话
+        """
+        with self._lock():
+            self._append([{"op": "end", "id": session.preupload_id}])
+            sessions = self._compact()
+
+            # 整理时已完整重放了日志，顺便刷新缓存
+            with self._cache_lock:
+                self._set_cache(sessions, self._file_stamp())
+
+    def _compact(self) -> Dict[str, UploadSession]:
+        """
+        失效的行过多时重写日志（调用方持有锁）
+
+        Returns:
+            Dict[str, UploadSession]: 整理后日志中的未完成会话
+        """
+        sessions, lines = self._load()
+
+        deadline = time.time() - SESSION_MAX_AGE
+        live = [s for s in sessions.values() if s.created >= deadline]
+        records = [record for s in live for record in s.to_records()]
+
+        if not records:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            return {}
+        if lines - len(records) > COMPACT_THRESHOLD:
+            write_text_atomic(self.path, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            return {s.preupload_id: s for s in live}
+        return sessions
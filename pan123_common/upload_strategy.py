@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+123云盘上传策略（是否先探测秒传）
+
+功能说明：
+    秒传只能通过 create 接口检测：服务器已有相同MD5的文件时直接返回 reuse，无需传输任何数据。
+    但 create 本身有代价——一次请求往返，且该接口限流为每秒2次；探测未命中时还要额外发送
+    分片和完成确认两个请求。对小文件而言，直接单步上传往往比探测更快；
+    对大文件或重复率高的文件集合，先探测秒传能省下大量传输时间。
+
+    本模块按"秒传命中率 × 传输耗时"与"探测额外开销"的比较为每个文件做决定：
+
+        先探测的预期耗时 = 限流等待 + 探测 + (1 - p) × (传输 + 2次请求)
+        直接上传的预期耗时 = 传输 + 1次请求
+
+    整理后，当 p × 传输耗时 > 2 × (1 - p) × 请求耗时 + 限流等待 时先探测。
+    其中 p 为实测的秒传命中率（指数滑动平均，设有下限，保证命中率再低也会偶尔探测大文件），
+    传输耗时按上传服务器的实测吞吐估计，请求耗时按 create 的实测耗时估计；
+    create 当前需要排队等待限流时，等待时间也计入探测的代价（无论是否命中都要付出）。
+
+    命中率和请求耗时只能从探测中得知，因此按上式判断为不探测的文件中仍有一部分抽样探测：
+    - 冷启动时先探测 WARMUP_PROBES 个文件，命中率取这些探测的实测平均，不使用先验值
+    - 之后按 SAMPLE_RATE 的比例抽样探测，保证以小文件为主、重复率很高的文件集合也能持续更新命中率，
+      从而学到应当先探测
+    - 抽样探测只在 create 接口当前无需等待限流时进行（调用方传入 probe_wait），
+      不为了学习而让文件排队等待每秒2次的限流；错过的抽样顺延到下一个无需等待的文件
+
+主要功能：
+    - should_probe(): 为一个文件决定先探测秒传，还是直接单步上传
+    - record_probe(): 记录一次探测的结果和耗时，更新命中率和请求耗时估计
+    - 大于单步上传限制的文件只能分片上传，总是先 create（与原有流程一致）
+
+使用示例:
+    >>> strategy = UploadStrategy(single_upload_limit=1024 ** 3)
+    >>> if strategy.should_probe(file_size, throughput):
+    ...     start = time.monotonic()
+    ...     result = create_file(...)
+    ...     strategy.record_probe(result["reuse"], time.monotonic() - start)
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import threading
+from typing import Optional, Dict, Any
+
+
+# 秒传命中率的初始估计（尚无探测结果时）和下限
+DEFAULT_REUSE_PRIOR = 0.5
+MIN_REUSE_RATE = 0.05
+
+# 冷启动时无条件探测的文件数
+WARMUP_PROBES = 4
+
+# 按收益判断为不探测的文件中仍抽样探测的比例
+SAMPLE_RATE = 0.1
+
+# 命中率和请求耗时滑动平均的权重
+EWMA_ALPHA = 0.2
+
+# 尚未测量时假设的上传吞吐（字节/秒）和请求耗时（秒）
+DEFAULT_THROUGHPUT = 10 * 1024 * 1024
+DEFAULT_REQUEST_SECONDS = 0.3
+
+
+class UploadStrategy:
+    """
+    按文件大小和近期秒传命中率决定是否先探测秒传（线程安全，可被并发上传共享）
+
+    属性:
+        single_upload_limit: 单步上传大小上限，超过时总是先 create
+        adaptive: 为False时恢复原有行为（只有超过单步上传限制的文件才 create）
+        sample_rate: 按收益判断为不探测的文件中仍抽样探测的比例
+        reuse_rate: 秒传命中率（前 WARMUP_PROBES 次探测为实测平均，之后为滑动平均）
+        request_seconds: create 请求耗时的滑动平均（含限流等待）
+        probes: 探测次数
+        reused: 探测命中秒传的次数
+        sampled: 抽样探测（含冷启动探测）的次数
+        skipped: 直接单步上传（未探测）的次数
+    """
+
+    def __init__(self, single_upload_limit: int, adaptive: bool = True,
+                 reuse_prior: float = DEFAULT_REUSE_PRIOR, sample_rate: float = SAMPLE_RATE):
+        """
+        Args:
+            single_upload_limit: 单步上传大小上限（字节）
+            adaptive: 是否对不超过单步上传限制的文件按预期收益探测秒传
+            reuse_prior: 尚无探测结果时的秒传命中率估计（仅用于统计显示，冷启动期间总是探测）
+            sample_rate: 按收益判断为不探测的文件中仍抽样探测的比例（0表示冷启动后不再抽样）
+        """
+        self.single_upload_limit = single_upload_limit
+        self.adaptive = adaptive
+        self.sample_rate = sample_rate
+        self.reuse_rate = reuse_prior
+        self.request_seconds = DEFAULT_REQUEST_SECONDS
+        self.probes = 0
+        self.reused = 0
+        self.sampled = 0
+        self.skipped = 0
+        self._sample_credit = 0.0
+        self._lock = threading.Lock()
+
+    def should_probe(self, file_size: int, throughput: Optional[float] = None, probe_wait: float = 0.0) -> bool:
+        """
+        决定是否先通过 create 探测秒传
+
+        Args:
+            file_size: 文件大小（字节）
+            throughput: 上传吞吐估计（字节/秒，可选）
+            probe_wait: 现在发送 create 需要等待限流的秒数（可选，计入探测代价；抽样探测只在无需等待时进行）
+
+        Returns:
+            bool: True表示先探测秒传，False表示直接单步上传
+        """
+        if file_size > self.single_upload_limit:
+            return True
+
+        with self._lock:
+            if not self.adaptive:
+                self.skipped += 1
+                return False
+
+            # 请求耗时加上 create 当前排队等待限流的时间
+            p = max(MIN_REUSE_RATE, self.reuse_rate)
+            transfer_seconds = file_size / (throughput or DEFAULT_THROUGHPUT)
+            if p * transfer_seconds > 2 * (1 - p) * self.request_seconds + probe_wait:
+                return True
+
+            # 抽样探测：冷启动时每个文件都尝试，之后每个文件积累 sample_rate 次机会；
+            # 只在 create 无需等待限流时使用（按决定计数，并发上传时不会多探测）
+            if self.sampled < WARMUP_PROBES and self.probes < WARMUP_PROBES:
+                self._sample_credit = 1.0
+            else:
+                self._sample_credit = min(1.0, self._sample_credit + self.sample_rate)
+            if self._sample_credit >= 1.0 and probe_wait <= 0:
+                self._sample_credit = 0.0
+                self.sampled += 1
+                return True
+
+            self.skipped += 1
+            return False
+
+    def record_probe(self, reused: bool, seconds: float) -> None:
+        """
+        记录一次探测结果
+
+        Args:
+            reused: 是否命中秒传
+            seconds: create 请求耗时（秒，含限流等待）
+        """
+        with self._lock:
+            self.probes += 1
+            if reused:
+                self.reused += 1
+            if self.probes <= WARMUP_PROBES:
+                # 样本较少时用实测平均，先验值不参与
+                self.reuse_rate = self.reused / self.probes
+                self.request_seconds = seconds if self.probes == 1 else \
+                    self.request_seconds + (seconds - self.request_seconds) / self.probes
+            else:
+                self.reuse_rate = (1 - EWMA_ALPHA) * self.reuse_rate + EWMA_ALPHA * (1.0 if reused else 0.0)
+                self.request_seconds = (1 - EWMA_ALPHA) * self.request_seconds + EWMA_ALPHA * seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取统计快照
+
+        Returns:
+            Dict[str, Any]: 探测次数、命中次数、抽样次数、跳过次数和当前估计
+        """
+        with self._lock:
+            return {
+                "probes": self.probes,
+                "reused": self.reused,
+                "sampled": self.sampled,
+                "skipped": self.skipped,
+                "reuse_rate": round(self.reuse_rate, 3),
+                "request_seconds": round(self.request_seconds, 3),
+            }
+
+    def summary(self) -> str:
+        """
+        生成一行可读的统计
+
+        Returns:
+            str: 统计文本，如 "探测秒传 12 次（抽样 5 次），命中 9 次，直接上传 30 个文件"
+        """
+        data = self.snapshot()
+        return (f"探测秒传 {data['probes']} 次（抽样 {data['sampled']} 次），命中 {data['reused']} 次，"
+                f"直接上传 {data['skipped']} 个文件")
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+123云盘目录增量同步工具
+
+功能说明：
+    类似 rsync，把本地目录树同步到云盘中的一个已有目录：按文件名、大小和MD5（etag）
+    比较本地文件与云盘文件，只上传新增或修改过的文件（修改过的文件覆盖云盘上的同名文件），
+    可选把本地已不存在的云盘文件和目录移入回收站。
+
+    为了让"大部分内容未变化"的定期备份只花费与变化量成正比的时间：
+    - 本地MD5来自持久化哈希缓存，未修改的文件不再读取；只有大小相同的文件才需要比较MD5
+    - 每个目录的"指纹"（其中文件名、大小、修改时间、inode和子目录名）在同步成功后记录在
+      缓存目录下的同步状态文件中，连同云盘目录ID；下次同步时指纹未变的目录既不列出云盘内容，
+      也不发送任何请求，只有发生变化的目录才列出云盘文件并比较
+
+主要功能：
+    - 增量上传：新增、大小或MD5不同的文件才上传，并行上传多个文件（大文件不挡住小文件）
+    - 目录映射：按本地结构在云盘中创建缺失的目录，已存在的同名目录直接沿用
+    - 删除同步（--delete）：云盘上多出的文件和目录移入回收站（/api/v1/file/trash，每次最多100个）
+    - 预演（--dry-run）：只列出将要上传和删除的内容，不做任何修改
+    - 完整比较（--full）：忽略同步状态，列出并比较所有目录（云盘上的文件被其他途径修改过时使用）
+
+使用示例:
+    python sync_to_123pan.py /data/backup 12345678
+    python sync_to_123pan.py /data/backup 12345678 --delete --dry-run
+
+注意：
+    同步状态只记录本工具上次同步后的结果。若在网页端或其他工具中修改了云盘上的同步目录，
+    请加 --full 运行一次，以重新比较所有目录。
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from typing import Dict, Any, List, Tuple
+
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.bandwidth import get_default_bandwidth_governor
+from pan123_common.readahead import get_default_buffer_pool
+from pan123_common.storage import FileLock, get_cache_dir, read_json, write_json_atomic
+from upload_to_123pan_v2 import Pan123Uploader, RemoteFolderCache, load_config
+
+
+# 同步状态文件名前缀（位于缓存目录，每对 本地目录 + 云盘目录 一个文件）
+SYNC_STATE_PREFIX = "sync_state_"
+
+# 移入回收站接口每次最多处理的文件数
+TRASH_BATCH_SIZE = 100
+
+
+class SyncState:
+    """
+    一对 本地目录 + 云盘目录 的同步状态
+
+    记录格式：{相对目录: {"id": 云盘目录ID, "fingerprint": 同步成功时的目录指纹, "delete": 是否删除同步}}
+    """
+
+    def __init__(self, local_dir: str, remote_id: int):
+        """
+        Args:
+            local_dir: 本地目录（绝对路径）
+            remote_id: 云盘目录ID
+        """
+        key = hashlib.md5(f"{local_dir}\n{remote_id}".encode("utf-8")).hexdigest()
+        self.path = os.path.join(get_cache_dir(), f"{SYNC_STATE_PREFIX}{key}.json")
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """
+        读取同步状态
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 相对目录 -> 目录状态；没有记录时返回空字典
+        """
+        with FileLock(self.path + ".lock"):
+            data = read_json(self.path, {})
+        return data.get("dirs", {}) if isinstance(data, dict) else {}
+
+    def save(self, dirs: Dict[str, Dict[str, Any]]) -> None:
+        """
+        保存同步状态
+
+        Args:
+            dirs: 相对目录 -> 目录状态
+        """
+        with FileLock(self.path + ".lock"):
+            write_json_atomic(self.path, {"dirs": dirs})
+
+
+class LocalDir:
+    """
+    本地目录的一层内容
+
+    属性:
+        rel_dir: 相对于同步根目录的路径（"/" 分隔，根目录为 ""）
+        files: 文件名 -> (本地路径, 大小)
+        subdirs: 子目录名列表
+        fingerprint: 目录指纹
+    """
+
+    def __init__(self, rel_dir: str, files: Dict[str, Tuple[str, int]], subdirs: List[str], fingerprint: str):
+        self.rel_dir = rel_dir
+        self.files = files
+        self.subdirs = subdirs
+        self.fingerprint = fingerprint
+
+
+def scan_local_tree(local_dir: str) -> List[LocalDir]:
+    """
+    遍历本地目录树（只读取目录项和文件属性，不读取文件内容）
+
+    Args:
+        local_dir: 本地目录
+
+    Returns:
+        List[LocalDir]: 各层目录（父目录在子目录之前）
+    """
+    result = []
+
+    for root, dirs, names in os.walk(local_dir):
+        dirs.sort()
+        rel_dir = os.path.relpath(root, local_dir)
+        rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/")
+
+        digest = hashlib.md5()
+        files = {}
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if not os.path.isfile(path):
+                continue
+            files[name] = (path, stat.st_size)
+            digest.update(f"f\0{name}\0{stat.st_size}\0{stat.st_mtime_ns}\0{stat.st_ino}\n".encode("utf-8"))
+        for name in dirs:
+            digest.update(f"d\0{name}\n".encode("utf-8"))
+
+        result.append(LocalDir(rel_dir, files, list(dirs), digest.hexdigest()))
+
+    return result
+
+
+class Pan123Sync:
+    """
+    本地目录 -> 云盘目录 的增量同步
+
+    属性:
+        uploader: 上传器（负责列出云盘目录、创建目录和上传文件）
+        file_concurrency: 同时上传的文件数
+
+    使用示例:
+        >>> uploader = Pan123Uploader(client_id="id", client_secret="secret")
+        >>> result = Pan123Sync(uploader).sync("/data/backup", 12345678, delete=True)
+        >>> print(result["uploaded"], result["trashed"])
+    """
+
+    def __init__(self, uploader: Pan123Uploader, file_concurrency: int = Pan123Uploader.DEFAULT_FILE_CONCURRENCY):
+        """
+        Args:
+            uploader: 上传器
+            file_concurrency: 同时上传的文件数
+        """
+        self.uploader = uploader
+        self.file_concurrency = file_concurrency
+
+    def _compare_dir(self, local: LocalDir, remote: List[Dict[str, Any]]
+                     ) -> Tuple[List[Tuple[str, str, int, str]], List[Dict[str, Any]]]:
+        """
+        比较一层本地目录与对应的云盘目录
+
+        Args:
+            local: 本地目录
+            remote: 云盘目录内容（list_folder 的结果）
+
+        Returns:
+            Tuple[List[Tuple[str, str, int, str]], List[Dict[str, Any]]]:
+                需要上传的 (本地路径, 相对目录, 大小, 原因)，以及云盘上多出的文件和目录
+        """
+        remote_files = {f.get("filename"): f for f in remote if f.get("type") == 0}
+        remote_dirs = {f.get("filename"): f for f in remote if f.get("type") == 1}
+
+        uploads = []
+        same_size = []
+        for name, (path, size) in local.files.items():
+            info = remote_files.get(name)
+            if info is None:
+                uploads.append((path, local.rel_dir, size, "新增"))
+            elif info.get("size") != size:
+                uploads.append((path, local.rel_dir, size, "大小不同"))
+            else:
+                same_size.append((path, size, info))
+
+        # 大小相同时才比较MD5：并行计算（来自哈希缓存，未修改的文件不会重新读取）
+        digests = self.uploader.hasher.digests(path for path, _, _ in same_size)
+        for path, size, info in same_size:
+            digest = digests[path]
+            if isinstance(digest, Exception):
+                raise digest
+            if (info.get("etag") or "").lower() != digest.etag:
+                uploads.append((path, local.rel_dir, size, "MD5不同"))
+
+        extras = [f for name, f in remote_files.items() if name not in local.files]
+        extras += [f for name, f in remote_dirs.items() if name not in local.subdirs]
+        return uploads, extras
+
+    def trash(self, file_ids: List[int]) -> None:
+        """
+        把云盘文件或目录移入回收站
+
+        Args:
+            file_ids: 文件或目录ID列表（按每次最多100个分批请求）
+
+        Raises:
+            Exception: API调用失败
+        """
+        for start in range(0, len(file_ids), TRASH_BATCH_SIZE):
+            headers = self.uploader._get_headers()
+            headers['Content-Type'] = 'application/json'
+            payload = json.dumps({"fileIDs": file_ids[start:start + TRASH_BATCH_SIZE]})
+
+            response = self.uploader._request("POST", "/api/v1/file/trash", payload, headers)
+            result = json.loads(response.data.decode("utf-8"))
+            if result.get("code") != 0:
+                raise Exception(f"移入回收站失败: {result.get('message', '未知错误')}")
+
+    def sync(self, local_dir: str, remote_id: int, delete: bool = False, dry_run: bool = False,
+             full: bool = False) -> Dict[str, Any]:
+        """
+        把本地目录同步到云盘目录
+
+        Args:
+            local_dir: 本地目录
+            remote_id: 云盘目录ID（本地目录的内容同步到该目录下）
+            delete: 是否把云盘上多出的文件和目录移入回收站
+            dry_run: 只比较，不上传、不删除、不保存同步状态
+            full: 忽略同步状态，比较所有目录
+
+        Returns:
+            Dict[str, Any]: 同步结果，包含：
+                - success: 是否全部成功
+                - uploaded: 上传的文件数
+                - trashed: 移入回收站的文件和目录数
+                - failed: 失败列表 [(本地路径或云盘文件名, 错误信息)]
+                - checked_dirs: 列出并比较的目录数
+                - skipped_dirs: 因指纹未变而跳过的目录数
+                - plan: 预演时为将要执行的操作列表
+
+        Raises:
+            Exception: 本地目录不存在
+        """
+        if not os.path.isdir(local_dir):
+            raise Exception(f"目录不存在: {local_dir}")
+
+        local_dir = os.path.abspath(local_dir)
+        state = SyncState(local_dir, remote_id)
+        previous = {} if full else state.load()
+
+        print("=" * 60)
+        print(f"🔄 同步目录: {local_dir} -> 云盘目录 {remote_id}")
+        print("=" * 60)
+
+        tree = scan_local_tree(local_dir)
+        known = {rel: entry["id"] for rel, entry in previous.items() if entry.get("id")}
+        folders = RemoteFolderCache(self.uploader, remote_id, known)
+
+        uploads = []
+        extras = []
+        failed = []
+        plan = []
+        checked = []
+        skipped = 0
+
+        # 第一步：只对指纹变化的目录列出云盘内容并比较
+        for local in tree:
+            entry = previous.get(local.rel_dir, {})
+            if entry.get("fingerprint") == local.fingerprint and (entry.get("delete") or not delete):
+                skipped += 1
+                continue
+
+            dir_id = folders.get(local.rel_dir)
+            if dir_id is None and dry_run:
+                # 预演时不创建目录：云盘上还没有的目录，其中的文件都是新增
+                uploads.extend((path, local.rel_dir, size, "新增") for path, size in local.files.values())
+                checked.append(local)
+                continue
+
+            try:
+                dir_id = folders.resolve(local.rel_dir)
+                dir_uploads, dir_extras = self._compare_dir(local, self.uploader.list_folder(dir_id))
+            except Exception as e:
+                print(f"❌ 比较目录失败: {local.rel_dir or '/'}: {e}")
+                failed.append((os.path.join(local_dir, local.rel_dir), str(e)))
+                continue
+
+            uploads.extend(dir_uploads)
+            if delete:
+                extras.extend((local.rel_dir, f) for f in dir_extras)
+            checked.append(local)
+
+        total_size = sum(u[2] for u in uploads)
+        print(f"📊 比较了 {len(checked)} 个目录（{skipped} 个未变化已跳过），"
+              f"需上传 {len(uploads)} 个文件（{self.uploader._format_file_size(total_size)}）"
+              + (f"，需删除 {len(extras)} 项" if delete else ""))
+
+        if dry_run:
+            plan = [f"上传 ({reason}) {os.path.relpath(path, local_dir)}" for path, _, _, reason in uploads]
+            plan += [f"删除 {'/'.join(p for p in (rel_dir, f.get('filename')) if p)}" for rel_dir, f in extras]
+            for line in plan:
+                print(f"  {line}")
+            return {"success": not failed, "uploaded": 0, "trashed": 0, "failed": failed,
+                    "checked_dirs": len(checked), "skipped_dirs": skipped, "plan": plan}
+
+        # 第二步：并行上传（修改过的文件覆盖云盘上的同名文件）
+        tasks = [(path, rel_dir, size) for path, rel_dir, size, _ in uploads]
+        uploaded, upload_failed = self.uploader.upload_tasks(tasks, folders, self.file_concurrency,
+                                                             Pan123Uploader.DUPLICATE_OVERWRITE)
+        failed.extend(upload_failed)
+
+        # 第三步：删除云盘上多出的内容
+        trashed = 0
+        if extras:
+            try:
+                self.trash([int(f.get("fileId")) for _, f in extras])
+                trashed = len(extras)
+                print(f"🗑️  已移入回收站 {trashed} 项")
+            except Exception as e:
+                print(f"❌ 移入回收站失败: {e}")
+                failed.extend(("/".join(p for p in (rel_dir, f.get("filename")) if p), str(e))
+                              for rel_dir, f in extras)
+
+        # 第四步：保存同步状态；有失败的目录不作记录（连同其云盘目录ID），下次重新查找并比较
+        failed_paths = {path for path, _ in failed}
+        bad_dirs = {rel_dir for path, rel_dir, _ in tasks if path in failed_paths}
+        bad_dirs.update(local.rel_dir for local in tree
+                        if os.path.join(local_dir, local.rel_dir) in failed_paths)
+        if trashed < len(extras):
+            bad_dirs.update(rel_dir for rel_dir, _ in extras)
+
+        dirs = {}
+        checked_dirs = {local.rel_dir for local in checked}
+        for local in tree:
+            if local.rel_dir in bad_dirs:
+                continue
+            if local.rel_dir not in checked_dirs:
+                if local.rel_dir in previous:
+                    dirs[local.rel_dir] = previous[local.rel_dir]
+                continue
+            dirs[local.rel_dir] = {"id": folders.get(local.rel_dir), "fingerprint": local.fingerprint,
+                                   "delete": delete}
+        state.save(dirs)
+
+        print(f"✅ 同步完成: 上传 {len(uploaded)} 个文件，移入回收站 {trashed} 项，失败 {len(failed)} 项")
+        return {"success": not failed, "uploaded": len(uploaded), "trashed": trashed, "failed": failed,
+                "checked_dirs": len(checked), "skipped_dirs": skipped, "plan": plan}
+
+
+# ==================== 主程序 ====================
+
+def main():
+    """
+    主函数 - 命令行界面
+
+    用法：python sync_to_123pan.py <本地目录> <云盘目录ID> [--delete] [--dry-run] [--full]
+    """
+    parser = argparse.ArgumentParser(description="123云盘目录增量同步工具")
+    parser.add_argument("local_dir", help="本地目录")
+    parser.add_argument("remote_id", type=int, help="云盘目录ID（本地目录的内容同步到该目录下，0表示根目录）")
+    parser.add_argument("--delete", action="store_true", help="把云盘上多出的文件和目录移入回收站")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将要执行的操作，不做任何修改")
+    parser.add_argument("--full", action="store_true", help="忽略上次同步的记录，比较所有目录")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("123云盘目录增量同步工具")
+    print("=" * 60)
+
+    try:
+        config = load_config()
+        client_id = config.get("CLIENT_ID")
+        client_secret = config.get("CLIENT_SECRET")
+        slice_concurrency = int(config.get("SLICE_CONCURRENCY", "").strip()
+                                or Pan123Uploader.DEFAULT_SLICE_CONCURRENCY)
+        file_concurrency = int(config.get("FILE_CONCURRENCY", "").strip()
+                               or Pan123Uploader.DEFAULT_FILE_CONCURRENCY)
+        adaptive_concurrency = config.get("ADAPTIVE_CONCURRENCY", "").strip().lower() not in ("0", "false", "no")
+        slice_mmap = config.get("SLICE_MMAP", "").strip().lower() in ("1", "true", "yes")
+        get_default_bandwidth_governor().configure(config)
+        get_default_buffer_pool().configure(config)
+
+        if not client_id or not client_secret:
+            raise ValueError("配置文件中缺少CLIENT_ID或CLIENT_SECRET")
+
+    except Exception as e:
+        print(f"❌ 加载配置失败: {e}")
+        print("请确保项目根目录存在config.txt文件，并包含CLIENT_ID和CLIENT_SECRET配置")
+        return
+
+    try:
+        uploader = Pan123Uploader(client_id=client_id, client_secret=client_secret,
+                                  slice_concurrency=slice_concurrency,
+                                  adaptive_concurrency=adaptive_concurrency, slice_mmap=slice_mmap)
+        uploader.host_prober.configure(config)
+        result = Pan123Sync(uploader, file_concurrency).sync(args.local_dir, args.remote_id, delete=args.delete,
+                                                              dry_run=args.dry_run, full=args.full)
+
+        for path, error in result.get("failed", []):
+            print(f"❌ {path}: {error}")
+
+    except Exception as e:
+        print(f"\n❌ 同步过程中发生错误: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,9 +8,23 @@
 
 主要功能：
     - 智能上传：根据文件大小自动选择单步上传（≤1GB）或分片上传（≤10GB）
-    - 秒传检测：大文件上传前自动检测是否可以秒传
-    - 断点续传：分片上传支持失败重试机制
+    - 秒传检测：大文件上传前自动检测是否可以秒传；不超过1GB的文件按大小和近期命中率决定是否先检测
+    - 完成确认：服务器合并分片期间不占用上传位，等待合并的文件由同一个跟踪器按指数退避成批轮询
+    - 断点续传：分片上传支持失败重试机制，失败的分片单独重试；
+      已确认的分片记录在本地日志中，中断后重新上传同一文件只补传缺失的分片
+    - 并发分片：多个分片由有界线程池并发上传，并发数可配置
+    - 分片预读：分片以文件只读映射上的窗口发送（不复制分片数据），后台线程提示内核提前读入接下来的分片；
+      无法映射时读入有内存上限的共享缓冲池，读盘与发送重叠进行
+    - 自适应并发：按实测吞吐加性增、遇到限流或出错时减半（AIMD），进度输出中显示当前和峰值并发
+    - 服务器选择：开始上传前并发探测各上传域名的延迟，测出吞吐前优先使用延迟低的域名
+    - 带宽限制：单步上传和分片的请求体按配置的上传速率（及上传下载合计速率）限速发送
+    - 数据流上传：标准输入、管道等不可回退的数据流边读取边缓存边计算MD5，读完即可检测秒传和上传
+    - 目录上传：按本地结构在云盘中创建目录（每个目录只创建或查找一次），多个文件并行上传，
+      大文件最多占用一半上传位，不会挡住大量小文件
+    - 流水线上传：批量小文件的哈希、创建（检测秒传）和传输分成三个阶段重叠进行，阶段之间由有界队列连接
+    - 批内去重：一批文件中大小和MD5都相同的文件只传输一份，其余在其上传完成后秒传
     - 进度显示：实时显示上传进度和状态
+    - 异步接口：AsyncPan123Uploader 提供同名协程方法，便于在事件循环中并发上传
 
 技术特点：
     - 使用v2 API，性能更优
@@ -27,16 +41,41 @@
 """
 
 import os
-import hashlib
+import asyncio
 import json
 import time
 import math
-import http.client
 import mimetypes
 import sys
 import ssl
-from codecs import encode
-from typing import Optional, Dict, Any, List
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed, wait
+from typing import Optional, Dict, Any, List, Tuple, Union, Callable
+
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.aio import AsyncApiClient, AsyncTransport
+from pan123_common.auth import TokenManager, get_access_token
+from pan123_common.bandwidth import get_default_bandwidth_governor
+from pan123_common.client import ApiClient
+from pan123_common.completion import AsyncCompletionTracker, CompletionTracker
+from pan123_common.concurrency import AdaptiveConcurrency
+from pan123_common.hash_cache import get_default_hash_cache
+from pan123_common.hash_service import get_default_hash_service
+from pan123_common.hashing import FileDigest, file_identity, hash_range
+from pan123_common.host_probe import HostProber
+from pan123_common.multipart import MultipartEncoder
+from pan123_common.pipeline import Pipeline, Stage
+from pan123_common.readahead import MappedSlice, PooledBuffer, SliceReadAhead, get_default_buffer_pool
+from pan123_common.retry import (REASON_REJECTED, REASON_SERVER_ERROR, RetryMetrics, RetryPolicy,
+                                 exception_retry_reason, get_default_retry_policy)
+from pan123_common.spool import DEFAULT_MEMORY_THRESHOLD, SpooledStream, spool_stream
+from pan123_common.transport import PooledTransport, PooledResponse, get_default_transport
+from pan123_common.upload_hosts import UploadHostScheduler, normalize_host
+from pan123_common.upload_journal import UploadJournal, UploadSession
+from pan123_common.upload_strategy import UploadStrategy
 
 
 # ==================== SSL配置 ====================
@@ -104,6 +143,205 @@ def load_config(config_path: str = None) -> Dict[str, str]:
 
 # ==================== 核心上传类 ====================
 
+class UploadRejectedError(Exception):
+    """服务器以非0的code拒绝了分片或完成请求（续传时通常表示预上传会话已过期）"""
+
+
+class UploadHostError(Exception):
+    """上传服务器返回了5xx（换一台服务器重发通常可以成功）"""
+
+
+class RemoteFolderCache:
+    """
+    本地相对目录 -> 云盘目录ID 的缓存（目录上传时使用）
+
+    每个目录只创建或查找一次；多个上传线程同时需要同一目录时，
+    只有一个线程调用 mkdir，其余线程等待其结果。创建失败的目录记住其错误，
+    该目录下的其他文件直接失败，不再重复请求。
+
+    属性:
+        root_id: 相对路径 "" 对应的云盘目录ID
+        created: 新创建的目录数
+        found: 云盘上已存在、直接沿用的目录数
+    """
+
+    def __init__(self, uploader: "Pan123Uploader", root_id: int, known: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            uploader: 用于创建和查找目录的上传器
+            root_id: 根目录（相对路径 ""）对应的云盘目录ID
+            known: 已知的 相对目录 -> 云盘目录ID（例如上次同步时记录的），这些目录不再请求
+        """
+        self.uploader = uploader
+        self.root_id = root_id
+        self.created = 0
+        self.found = 0
+        self._ids = dict(known or {})
+        self._ids[""] = root_id
+        self._errors = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, rel_dir: str) -> Optional[int]:
+        """
+        获取已知的云盘目录ID（不发送请求）
+
+        Args:
+            rel_dir: 相对目录
+
+        Returns:
+            Optional[int]: 云盘目录ID，尚未创建或查找过时返回None
+        """
+        with self._lock:
+            return self._ids.get(rel_dir.replace(os.sep, "/").strip("/"))
+
+    def resolve(self, rel_dir: str) -> int:
+        """
+        获取本地相对目录对应的云盘目录ID，不存在时逐级创建
+
+        Args:
+            rel_dir: 相对于上传根目录的目录路径（"/" 或系统分隔符分隔，"" 表示根目录）
+
+        Returns:
+            int: 云盘目录ID
+
+        Raises:
+            Exception: 目录创建失败
+        """
+        rel_dir = rel_dir.replace(os.sep, "/").strip("/")
+        if rel_dir == ".":
+            rel_dir = ""
+
+        with self._lock:
+            if rel_dir in self._ids:
+                return self._ids[rel_dir]
+            lock = self._locks.setdefault(rel_dir, threading.Lock())
+
+        parent_dir, _, name = rel_dir.rpartition("/")
+        parent_id = self.resolve(parent_dir)
+
+        with lock:
+            with self._lock:
+                if rel_dir in self._ids:
+                    return self._ids[rel_dir]
+                if rel_dir in self._errors:
+                    raise self._errors[rel_dir]
+
+            try:
+                dir_id, created = self.uploader.make_directory(name, parent_id)
+            except Exception as e:
+                with self._lock:
+                    self._errors[rel_dir] = e
+                raise
+
+            with self._lock:
+                self._ids[rel_dir] = dir_id
+                if created:
+                    self.created += 1
+                else:
+                    self.found += 1
+            return dir_id
+
+
+class _FileScheduler:
+    """
+    目录上传的文件调度：大文件最多占用 large_slots 个上传位，其余上传位留给小文件
+
+    大文件一有空位就开始（它们耗时最长，应尽早开始），同时其余上传位持续处理小文件，
+    一个10GB的文件不会挡住成千上万个小文件；小文件传完后大文件可以占用全部上传位。
+    """
+
+    def __init__(self, tasks: List[Tuple[str, str, int]], large_threshold: int, large_slots: int):
+        """
+        Args:
+            tasks: (本地路径, 相对目录, 文件大小) 列表
+            large_threshold: 大文件的大小下限（字节）
+            large_slots: 同时上传的大文件数上限（小文件还未传完时）
+        """
+        self._small = deque(t for t in tasks if t[2] < large_threshold)
+        self._large = deque(t for t in tasks if t[2] >= large_threshold)
+        self._large_slots = max(1, large_slots)
+        self._large_running = 0
+        self._lock = threading.Lock()
+
+    def next(self, large_slots: Optional[int] = None) -> Optional[Tuple[Tuple[str, str, int], bool]]:
+        """
+        取下一个要上传的文件
+
+        Args:
+            large_slots: 大文件上传位上限（可选，默认使用构造时的值；并发数自动调整时随之变化）
+
+        Returns:
+            Optional[Tuple[Tuple[str, str, int], bool]]: (任务, 是否为大文件)，没有剩余文件时返回None
+        """
+        slots = max(1, large_slots) if large_slots is not None else self._large_slots
+        with self._lock:
+            if self._large and (self._large_running < slots or not self._small):
+                self._large_running += 1
+                return self._large.popleft(), True
+            if self._small:
+                return self._small.popleft(), False
+            return None
+
+    def done(self, large: bool) -> None:
+        """标记一个文件上传结束（无论成败）"""
+        if large:
+            with self._lock:
+                self._large_running -= 1
+
+
+class _UploadItem:
+    """流水线上传中的一个文件（各阶段依次填入目录ID和 create 结果）"""
+
+    __slots__ = ("path", "rel_dir", "size", "parent_id", "create_result", "resume")
+
+    def __init__(self, path: str, rel_dir: str, size: int):
+        self.path = path
+        self.rel_dir = rel_dir
+        self.size = size
+        self.parent_id = None
+        self.create_result = None
+        self.resume = False
+
+
+class _LargeFileGate:
+    """
+    流水线上传时大文件的上传位限制：小文件尚未传完时，大文件最多占用 slots 个上传位
+
+    大文件由单独的线程上传（不经过流水线），与流水线的传输阶段共用同一个并发控制器。
+    """
+
+    def __init__(self):
+        self._running = 0
+        self._small_pending = True
+        self._cond = threading.Condition()
+
+    def enter(self, slots) -> None:
+        """
+        等待一个大文件上传位
+
+        Args:
+            slots: 返回当前大文件上传位上限的函数（并发数自动调整时随之变化）
+        """
+        with self._cond:
+            while self._small_pending and self._running >= max(1, slots()):
+                # 上限可能随并发调整而提高，定期重新检查
+                self._cond.wait(1.0)
+            self._running += 1
+
+    def leave(self) -> None:
+        """释放一个大文件上传位"""
+        with self._cond:
+            self._running -= 1
+            self._cond.notify_all()
+
+    def small_finished(self) -> None:
+        """小文件已全部处理完，大文件可以占用全部上传位"""
+        with self._cond:
+            self._small_pending = False
+            self._cond.notify_all()
+
+
 class Pan123Uploader:
     """
     123云盘文件上传器
@@ -115,6 +353,10 @@ class Pan123Uploader:
         access_token: API访问令牌
         api_base: API服务器地址
         upload_domains: 上传域名列表
+        slice_concurrency: 分片上传的初始并发数
+        slice_controller: 分片并发控制器（按实测吞吐和限流自动调整并发，所有文件的分片共用）
+        upload_hosts: 上传服务器调度器（记录各服务器的吞吐和错误率）
+        host_prober: 上传服务器延迟探测器（未测出吞吐前按延迟选择服务器）
         SINGLE_UPLOAD_LIMIT: 单步上传文件大小限制（1GB）
         MAX_FILE_SIZE: 最大文件大小限制（10GB）
 
@@ -134,8 +376,40 @@ class Pan123Uploader:
     # multipart/form-data 分隔符
     BOUNDARY = 'wL36Yn8afVp8Ag7AmP8qZ0SA4n1v9T'
 
+    # 分片上传默认并发数（单个连接通常跑不满上行带宽）
+    DEFAULT_SLICE_CONCURRENCY = 4
+    # 自适应并发时分片并发数的上限
+    MAX_SLICE_CONCURRENCY = 16
+    # 单个分片最多尝试次数（每次由调度器重新选择服务器，按 slice_retry_policy 退避并消耗重试预算；
+    # 同一服务器上的快速重试由 slice_client 负责）
+    SLICE_MAX_ATTEMPTS = 3
+    # 分片预读数：已读入内存、等待上传的分片数上限（0表示不预读，分片在发送时才读取）
+    SLICE_READAHEAD = 4
+    # 分片是否以文件只读映射上的窗口发送（不复制分片数据）。映射的文件在发送过程中被截断会使整个进程收到 SIGBUS，
+    # 因此默认读入缓冲池（文件变短时只有该文件失败），映射须显式开启（slice_mmap=True 或 config.txt 的 SLICE_MMAP=1）
+    SLICE_MMAP = False
+    # 开启映射时，最近这么多秒内修改过的文件（可能仍在被写入，如正在轮转的日志）仍读入缓冲池
+    SLICE_MMAP_SETTLE = 60
+
+    # 计算etag时顺带计算分片MD5表的分片大小（create接口通常返回16MB）
+    EXPECTED_SLICE_SIZES = (16 * 1024 * 1024,)
+
+    # create / 单步上传的 duplicate 参数：同名文件已存在时覆盖原文件
+    DUPLICATE_OVERWRITE = 2
+
+    # 目录上传默认同时上传的文件数
+    DEFAULT_FILE_CONCURRENCY = 4
+    # 自适应并发时同时上传的文件数上限
+    MAX_FILE_CONCURRENCY = 32
+    # 目录上传时按大文件调度的大小下限（大文件同时最多占用一半上传位）
+    LARGE_FILE_THRESHOLD = 256 * 1024 * 1024
+    # 流水线上传时同时进行 create（检测秒传）的线程数（实际速率由 create 接口的限流器控制）
+    CREATE_STAGE_WORKERS = 4
+
     def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
-                 client_secret: Optional[str] = None):
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None,
+                 slice_concurrency: int = DEFAULT_SLICE_CONCURRENCY, journal: Optional[UploadJournal] = None,
+                 adaptive_concurrency: bool = True, slice_mmap: bool = SLICE_MMAP):
         """
         初始化上传器
 
@@ -147,12 +421,21 @@ class Pan123Uploader:
             access_token: API访问令牌（可选）
             client_id: 客户端ID（当access_token为空时必需）
             client_secret: 客户端密钥（当access_token为空时必需）
+            transport: HTTP传输层（可选，默认使用进程内共享的连接池）
+            slice_concurrency: 分片上传并发数（自适应并发时为初始值）
+            journal: 断点续传日志（可选，默认位于缓存目录）
+            adaptive_concurrency: 是否按实测吞吐和限流自动调整分片和文件的并发数
+            slice_mmap: 是否以文件映射窗口发送分片（零拷贝；仅用于上传期间不会被截断的文件）
 
         Raises:
             ValueError: 未提供有效的认证信息
         """
         self.api_base = self.API_BASE
         self.upload_domains = []
+        self.slice_concurrency = slice_concurrency
+        self.adaptive_concurrency = adaptive_concurrency
+        self.slice_mmap = slice_mmap
+        self.transport = transport or get_default_transport()
 
         # 根据提供的参数选择认证方式
         if access_token:
@@ -162,11 +445,94 @@ class Pan123Uploader:
         else:
             raise ValueError("必须提供access_token或者client_id和client_secret")
 
+        # 令牌失效（401）时由 token_manager 自动重新认证并重放请求
+        self.token_manager = TokenManager(self.access_token, client_id, client_secret, self.transport)
+        self.api_client = ApiClient(self.transport, self.token_manager)
+
+        # 上传服务器调度：分片和单步上传分散到所有上传服务器，避开慢的或出错的服务器；
+        # 开始上传前探测各服务器的延迟，尚未测出吞吐时优先使用延迟低的服务器
+        self.host_prober = HostProber(self.transport)
+        self.upload_hosts = UploadHostScheduler(self.host_prober)
+        # 分片请求在同一服务器上只快速重试一次，其余失败交给调度器换服务器重试
+        self.slice_client = ApiClient(self.transport, self.token_manager,
+                                      retry_policy=self._slice_retry_policy())
+        # 换服务器重发分片的策略：全抖动指数退避，与 slice_client 共用重试预算和指标
+        slice_policy = self.slice_client.retry_policy
+        self.slice_retry_policy = RetryPolicy(max_attempts=self.SLICE_MAX_ATTEMPTS,
+                                              base_delay=slice_policy.base_delay, max_delay=slice_policy.max_delay,
+                                              budget=slice_policy.budget, metrics=slice_policy.metrics)
+
+        # 分片并发：按实测吞吐加性增，遇到分片请求被限流或出错时减半
+        self.slice_controller = self._concurrency_controller(slice_concurrency, self.MAX_SLICE_CONCURRENCY,
+                                                             ("upload/v2/file/slice",))
+        self.slice_client.retry_policy.metrics.add_listener(self.slice_controller.on_retry)
+
+        # 文件哈希结果（etag + 分片MD5表）的持久化缓存，文件未变化时跨进程、跨运行复用
+        self.hash_cache = get_default_hash_cache()
+        # 并行哈希服务：缓存未命中时在线程池中计算，目录上传时提前计算后面的文件
+        self.hasher = get_default_hash_service()
+
+        # 进程内共享的带宽控制器：单步上传和分片的请求体边发送边限速，与下载共用合计限速
+        self.bandwidth = get_default_bandwidth_governor()
+        # 进程内共享的分片预读缓冲池：所有上传器预读的分片总内存不超过其上限
+        self.buffer_pool = get_default_buffer_pool()
+
+        # 分片上传的断点续传日志：中断后重新上传同一文件时只补传缺失的分片
+        self.journal = journal or UploadJournal()
+
+        # 上传策略：按文件大小和近期秒传命中率决定是否先通过 create 探测秒传
+        self.strategy = UploadStrategy(self.SINGLE_UPLOAD_LIMIT)
+
+        # 上传完成确认：所有等待服务器合并分片的上传由同一个跟踪器按指数退避成批轮询
+        self.completions = CompletionTracker(self._poll_complete)
+
+    @staticmethod
+    def _slice_retry_policy() -> RetryPolicy:
+        """
+        分片请求的重试策略
+
+        与共享策略共用重试预算，但使用每个上传器独立的指标：分片并发控制器监听这份指标，
+        不会收到其他上传器的重试事件，上传器释放后监听也随之释放
+        """
+        shared = get_default_retry_policy()
+        return RetryPolicy(max_attempts=2, base_delay=shared.base_delay, max_delay=shared.max_delay,
+                           budget=shared.budget, metrics=RetryMetrics())
+
+    @staticmethod
+    def _slice_retry_reason(error: BaseException) -> Optional[str]:
+        """
+        判断分片上传失败能否换服务器重发
+
+        Args:
+            error: 发送分片时抛出的异常
+
+        Returns:
+            Optional[str]: 重试原因；本地文件错误（如文件被截断）等不可重试时返回None
+        """
+        if isinstance(error, UploadRejectedError):
+            return REASON_REJECTED
+        if isinstance(error, UploadHostError):
+            return REASON_SERVER_ERROR
+        return exception_retry_reason(error)
+
+    def _concurrency_controller(self, initial: int, maximum: int, endpoints) -> AdaptiveConcurrency:
+        """创建并发控制器；关闭自适应并发时并发数固定为 initial"""
+        if self.adaptive_concurrency:
+            return AdaptiveConcurrency(initial, 1, max(initial, maximum), endpoints)
+        return AdaptiveConcurrency(initial, initial, initial, endpoints)
+
+    @staticmethod
+    def _concurrency_label(controller: AdaptiveConcurrency) -> str:
+        """开始上传时输出的并发说明"""
+        if controller.adaptive:
+            return f"初始并发数: {controller.limit}（自动调整，上限 {controller.maximum}）"
+        return f"并发数: {controller.limit}"
+
     def _get_access_token(self, client_id: str, client_secret: str) -> str:
         """
         获取API访问令牌
 
-        向123云盘开放平台认证服务器请求访问令牌。
+        优先使用本地缓存的令牌，缓存缺失或即将过期时向123云盘开放平台认证服务器请求新令牌。
         令牌用于后续所有API调用的身份验证。
 
         Args:
@@ -182,44 +548,45 @@ class Pan123Uploader:
         print("正在获取访问令牌...")
 
         try:
-            # 建立HTTPS连接
-            conn = http.client.HTTPSConnection(self.api_base)
-
-            # 构造请求体
-            payload = json.dumps({
-                "clientID": client_id,
-                "clientSecret": client_secret
-            })
-
-            # 设置请求头
-            headers = {
-                'Platform': 'open_platform',
-                'Content-Type': 'application/json'
-            }
-
-            # 发送POST请求
-            conn.request("POST", "/api/v1/access_token", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-
-            # 解析响应
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                access_token = result.get("data", {}).get("accessToken")
-                if access_token:
-                    print("✅ 访问令牌获取成功")
-                    return access_token
-                else:
-                    raise Exception("响应中未找到访问令牌")
-            else:
-                raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+            # 优先使用本地缓存的令牌（按client_id在多个进程间共享，过期前自动换新）
+            access_token = get_access_token(client_id, client_secret, self.transport)
+            print("✅ 访问令牌获取成功")
+            return access_token
 
         except Exception as e:
             print(f"❌ 获取访问令牌时发生错误: {e}")
             raise
 
+    def _request(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                 host: Optional[str] = None, client: Optional[ApiClient] = None) -> PooledResponse:
+        """
+        通过共享连接池发送请求
+
+        请求前按接口QPS限流；令牌失效（HTTP 401或响应体code为401）时自动换新令牌并重放一次请求。
+
+        Args:
+            method: HTTP方法
+            path: 请求路径
+            body: 请求体
+            headers: 请求头
+            host: 目标主机，默认为API服务器地址
+            client: 请求客户端，默认为 api_client
+
+        Returns:
+            PooledResponse: 响应对象
+        """
+        response = (client or self.api_client).request(method, host or self.api_base, path, body, headers)
+        # 重新认证后同步新令牌，后续构造的请求头直接使用新令牌
+        self.access_token = self.token_manager.access_token
+        return response
+
+    def _create_wait(self) -> float:
+        """现在调用 create 接口需要等待限流的秒数（上传策略只在无需等待时抽样探测秒传）"""
+        client = self.api_client
+        if client.rate_limiter is None:
+            return 0.0
+        return client.rate_limiter.wait_time(client.client_id, "/upload/v2/file/create")
+
     def _get_headers(self) -> Dict[str, str]:
         """
         构造API请求头
@@ -232,66 +599,79 @@ class Pan123Uploader:
             'Platform': 'open_platform'
         }
 
-    def _calculate_md5(self, file_path: str) -> str:
+    def _hash_file(self, file_path: str, with_slices: Optional[bool] = None) -> FileDigest:
         """
-        计算文件MD5值
+        计算（或从持久化哈希缓存取出）文件的etag和分片MD5表
 
-        分块读取文件并计算MD5哈希值，避免大文件占用过多内存。
+        只读取文件一遍：将要分片上传的文件同时按 EXPECTED_SLICE_SIZES 计算分片MD5表，
+        分片上传时直接查表，不再为计算分片MD5重复读盘。
 
         Args:
             file_path: 文件路径
+            with_slices: 是否计算分片MD5表（默认仅大于单步上传限制的文件计算）
 
         Returns:
-            str: 文件的MD5哈希值（32位小写十六进制字符串）
-
-        示例:
-            >>> _calculate_md5("test.txt")
-            'e10adc3949ba59abbe56e057f20f883e'
+            FileDigest: 哈希结果
         """
+        if with_slices is None:
+            with_slices = os.path.getsize(file_path) > self.SINGLE_UPLOAD_LIMIT
+        slice_sizes = self.EXPECTED_SLICE_SIZES if with_slices else ()
+
+        digest = self.hash_cache.get(file_path, slice_sizes)
+        if digest is not None:
+            return digest
+
         print(f"📊 正在计算文件MD5: {os.path.basename(file_path)}")
-        hash_md5 = hashlib.md5()
+        digest = self.hasher.digest(file_path, slice_sizes)
+        print(f"✅ 文件MD5计算完成: {digest.etag}")
+        return digest
 
-        with open(file_path, "rb") as f:
-            # 分块读取文件，每块4KB
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
+    def _prefetch_hashes(self, tasks: List[Tuple[str, str, int]]) -> None:
+        """
+        在后台并行计算一批待上传文件的哈希（含分片MD5表）
 
-        md5_value = hash_md5.hexdigest()
-        print(f"✅ 文件MD5计算完成: {md5_value}")
-        return md5_value
+        按目录上传处理文件的顺序提交（先小文件、后大文件），上传线程处理到某个文件时
+        其哈希通常已算好；尚未算好时等待同一个计算，不会重复读取。
 
-    def _calculate_slice_md5(self, file_path: str, start: int, size: int) -> str:
+        Args:
+            tasks: (本地路径, 相对目录, 文件大小) 列表
         """
-        计算文件分片的MD5值
+        small = [t[0] for t in tasks if t[2] < self.LARGE_FILE_THRESHOLD]
+        large = [t[0] for t in tasks if t[2] >= self.LARGE_FILE_THRESHOLD]
+        self.hasher.prefetch(small + large, self.EXPECTED_SLICE_SIZES)
 
-        读取文件的指定部分并计算其MD5哈希值。
-        用于分片上传时验证每个分片的完整性。
+    def _cached_slice_table(self, file_path: str, slice_size: int) -> Optional[List[str]]:
+        """
+        查询已缓存的分片MD5表（不会触发读取文件）
 
         Args:
             file_path: 文件路径
-            start: 分片起始位置（字节偏移量）
-            size: 分片大小（字节数）
+            slice_size: 分片大小
 
         Returns:
-            str: 分片的MD5哈希值
+            Optional[List[str]]: 分片MD5表；文件未计算过哈希、已被修改或分片大小不符时返回None
+        """
+        digest = self.hash_cache.get(file_path)
+        return digest.slice_table(slice_size) if digest is not None else None
+
+    def _calculate_md5(self, file_path: str) -> str:
         """
-        hash_md5 = hashlib.md5()
+        计算文件MD5值
 
-        with open(file_path, "rb") as f:
-            # 定位到分片起始位置
-            f.seek(start)
-            remaining = size
+        以大缓冲区一遍读取文件（见 _hash_file），结果保存在持久化哈希缓存中，
+        文件未变化时（包括下次运行）再次需要etag或分片MD5无需重新读取。
 
-            # 读取指定大小的数据
-            while remaining > 0:
-                chunk_size = min(4096, remaining)
-                chunk = f.read(chunk_size)
-                if not chunk:
-                    break
-                hash_md5.update(chunk)
-                remaining -= len(chunk)
+        Args:
+            file_path: 文件路径
 
-        return hash_md5.hexdigest()
+        Returns:
+            str: 文件的MD5哈希值（32位小写十六进制字符串）
+
+        示例:
+            >>> _calculate_md5("test.txt")
+            'e10adc3949ba59abbe56e057f20f883e'
+        """
+        return self._hash_file(file_path).etag
 
     def _format_file_size(self, size: int) -> str:
         """
@@ -324,6 +704,70 @@ class Pan123Uploader:
 
         return f"{float_size:.2f} {units[unit_index]}"
 
+    def _build_single_upload_body(self, file_path: str, parent_file_id: int, file_md5: str,
+                                  file_size: int, duplicate: Optional[int] = None,
+                                  data: Optional[bytes] = None) -> MultipartEncoder:
+        """
+        构建单步上传的multipart/form-data请求体
+
+        文件内容在发送时才按块读取并写入连接，内存占用与文件大小无关。
+
+        Args:
+            file_path: 本地文件路径（传入 data 时只用于确定文件名和内容类型）
+            parent_file_id: 父目录ID
+            file_md5: 文件MD5
+            file_size: 文件大小
+            duplicate: 同名文件处理策略（可选，见 DUPLICATE_OVERWRITE）
+            data: 已在内存中的文件内容（可选，如缓存在内存中的数据流）
+
+        Returns:
+            MultipartEncoder: 流式请求体（分隔符为 BOUNDARY）
+        """
+        filename = os.path.basename(file_path)
+        file_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+
+        body = MultipartEncoder(self.BOUNDARY)
+        if data is not None:
+            body.add_bytes('file', filename, data, content_type=file_type)
+        else:
+            body.add_file('file', filename, file_path, length=file_size, content_type=file_type)
+        body.add_field('parentFileID', parent_file_id)
+        body.add_field('filename', filename)
+        body.add_field('etag', file_md5)
+        body.add_field('size', file_size)
+        if duplicate:
+            body.add_field('duplicate', duplicate)
+        return body
+
+    def _build_slice_body(self, preupload_id: str, slice_no: int, slice_md5: str, file_path: str,
+                          start_pos: int, size: int, data: Optional[memoryview] = None,
+                          check: Optional[Callable[[], None]] = None) -> MultipartEncoder:
+        """
+        构建分片上传的multipart/form-data请求体
+
+        Args:
+            preupload_id: 预上传ID
+            slice_no: 分片序号（从1开始）
+            slice_md5: 分片MD5
+            file_path: 本地文件路径
+            start_pos: 分片起始位置
+            size: 分片大小
+            data: 已预读的分片数据（可选），提供时直接发送该缓冲区，不再读取文件
+            check: 发送 data 的每个块之前调用的检查（可选，映射窗口用来确认文件没有被截断）
+
+        Returns:
+            MultipartEncoder: 流式请求体（分隔符为 BOUNDARY），未预读时分片数据在发送时才读取
+        """
+        body = MultipartEncoder(self.BOUNDARY)
+        body.add_field('preuploadID', preupload_id)
+        body.add_field('sliceNo', slice_no)
+        body.add_field('sliceMD5', slice_md5)
+        if data is not None:
+            body.add_buffer('slice', f'slice_{slice_no}', data, check=check)
+        else:
+            body.add_file('slice', f'slice_{slice_no}', file_path, offset=start_pos, length=size)
+        return body
+
     def get_upload_domains(self) -> List[str]:
         """
         获取上传域名列表
@@ -340,13 +784,10 @@ class Pan123Uploader:
         print("🌐 正在获取上传域名...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", "/upload/v2/file/domain", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", "/upload/v2/file/domain", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -354,6 +795,7 @@ class Pan123Uploader:
                 domains = result.get("data", [])
                 self.upload_domains = domains
                 print(f"✅ 获取到 {len(domains)} 个上传域名")
+                self._probe_upload_domains(domains)
                 return domains
             else:
                 raise Exception(f"获取上传域名失败: {result.get('message', '未知错误')}")
@@ -362,7 +804,17 @@ class Pan123Uploader:
             print(f"❌ 获取上传域名时发生错误: {e}")
             raise
 
-    def create_file(self, file_path: str, parent_file_id: int = 0) -> Dict[str, Any]:
+    def _probe_upload_domains(self, domains: List[str]) -> None:
+        """探测各上传域名的延迟（结果在有效期内时直接使用缓存，blocking为False时在后台探测）"""
+        if not self.host_prober.enabled or len(domains) < 2:
+            return
+        ranking = self.host_prober.rank([normalize_host(domain) for domain in domains if domain])
+        summary = self.host_prober.summary(ranking)
+        if summary:
+            print(f"🏁 上传域名延迟: {summary}")
+
+    def create_file(self, file_path: str, parent_file_id: int = 0,
+                    duplicate: Optional[int] = None) -> Dict[str, Any]:
         """
         创建文件（检测秒传）
 
@@ -372,6 +824,7 @@ class Pan123Uploader:
         Args:
             file_path: 本地文件路径
             parent_file_id: 父目录ID，0表示根目录
+            duplicate: 同名文件处理策略（可选，1保留两者，2覆盖原文件；默认由服务器决定）
 
         Returns:
             Dict[str, Any]: 包含以下键的字典：
@@ -385,10 +838,25 @@ class Pan123Uploader:
         Raises:
             Exception: API调用失败或文件超过大小限制
         """
-        filename = os.path.basename(file_path)
-        file_size = os.path.getsize(file_path)
         file_md5 = self._calculate_md5(file_path)
+        return self._create_file_record(os.path.basename(file_path), os.path.getsize(file_path), file_md5,
+                                        parent_file_id, duplicate)
+
+    def _create_file_record(self, filename: str, file_size: int, file_md5: str, parent_file_id: int = 0,
+                            duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """
+        按文件名、大小和MD5调用 create 接口（create_file 和数据流上传共用）
+
+        Args:
+            filename: 文件名
+            file_size: 文件大小
+            file_md5: 文件MD5
+            parent_file_id: 父目录ID
+            duplicate: 同名文件处理策略（可选）
 
+        Returns:
+            Dict[str, Any]: 同 create_file
+        """
         print(f"📝 正在创建文件: {filename}")
         print(f"📏 文件大小: {self._format_file_size(file_size)}")
 
@@ -400,21 +868,21 @@ class Pan123Uploader:
             )
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
             headers['Content-Type'] = 'application/json'
 
-            payload = json.dumps({
+            payload = {
                 "parentFileID": parent_file_id,
                 "filename": filename,
                 "etag": file_md5,
                 "size": file_size
-            })
+            }
+            if duplicate:
+                payload["duplicate"] = duplicate
+            payload = json.dumps(payload)
 
-            conn.request("POST", "/upload/v2/file/create", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/upload/v2/file/create", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -440,7 +908,8 @@ class Pan123Uploader:
             print(f"❌ 创建文件时发生错误: {e}")
             raise
 
-    def single_upload(self, file_path: str, parent_file_id: int = 0) -> Dict[str, Any]:
+    def single_upload(self, file_path: str, parent_file_id: int = 0,
+                      duplicate: Optional[int] = None) -> Dict[str, Any]:
         """
         单步上传文件
 
@@ -450,6 +919,7 @@ class Pan123Uploader:
         Args:
             file_path: 本地文件路径
             parent_file_id: 父目录ID，0表示根目录
+            duplicate: 同名文件处理策略（可选，1保留两者，2覆盖原文件；默认由服务器决定）
 
         Returns:
             Dict[str, Any]: 上传结果，包含success和fileID
@@ -462,7 +932,22 @@ class Pan123Uploader:
         file_md5 = self._calculate_md5(file_path)
 
         print(f"🚀 开始单步上传: {filename}")
+        body = self._build_single_upload_body(file_path, parent_file_id, file_md5, file_size, duplicate)
+        return self._send_single_upload(body)
+
+    def _send_single_upload(self, body: MultipartEncoder) -> Dict[str, Any]:
+        """
+        把单步上传请求体发送到当前表现最好的上传域名
+
+        Args:
+            body: 单步上传请求体（见 _build_single_upload_body）
 
+        Returns:
+            Dict[str, Any]: 上传结果，包含success和fileID
+
+        Raises:
+            Exception: 上传失败
+        """
         # 获取上传域名
         if not self.upload_domains:
             self.get_upload_domains()
@@ -470,55 +955,16 @@ class Pan123Uploader:
         if not self.upload_domains:
             raise Exception("无法获取上传域名")
 
-        # 提取域名（移除协议前缀）
-        upload_domain = self.upload_domains[0].replace("https://", "").replace("http://", "")
-
         try:
-            # 构建multipart/form-data请求体
-            boundary = self.BOUNDARY
-            data_list = []
-
-            # 添加文件
-            data_list.append(encode('--' + boundary))
-            data_list.append(encode(f'Content-Disposition: form-data; name=file; filename={filename}'))
-
-            file_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
-            data_list.append(encode(f'Content-Type: {file_type}'))
-            data_list.append(encode(''))
-
-            with open(file_path, 'rb') as f:
-                data_list.append(f.read())
-
-            # 添加其他字段
-            fields = [
-                ('parentFileID', str(parent_file_id)),
-                ('filename', filename),
-                ('etag', file_md5),
-                ('size', str(file_size))
-            ]
-
-            for field_name, field_value in fields:
-                data_list.append(encode('--' + boundary))
-                data_list.append(encode(f'Content-Disposition: form-data; name={field_name};'))
-                data_list.append(encode('Content-Type: text/plain'))
-                data_list.append(encode(''))
-                data_list.append(encode(field_value))
-
-            data_list.append(encode('--' + boundary + '--'))
-            data_list.append(encode(''))
-
-            body = b'\r\n'.join(data_list)
-
-            # 发送请求
-            conn = http.client.HTTPSConnection(upload_domain)
+            # 发送请求（请求体按块从文件读取，不整体载入内存）
             headers = self._get_headers()
-            headers['Content-type'] = f'multipart/form-data; boundary={boundary}'
+            headers['Content-type'] = body.content_type
 
+            # 选择当前表现最好的上传域名（已移除协议前缀）
+            upload_domain = self.upload_hosts.acquire(self.upload_domains)
             print(f"⬆️  正在上传到服务器: {upload_domain}")
-            conn.request("POST", "/upload/v2/file/single/create", body, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._send_to_upload_host(upload_domain, "/upload/v2/file/single/create", body, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -536,228 +982,1472 @@ class Pan123Uploader:
             print(f"❌ 单步上传时发生错误: {e}")
             raise
 
-    def slice_upload(self, file_path: str, preupload_id: str, slice_size: int,
-                    servers: List[str]) -> bool:
+    def _send_to_upload_host(self, host: str, path: str, body: MultipartEncoder, headers: Dict[str, str],
+                             client: Optional[ApiClient] = None) -> PooledResponse:
         """
-        分片上传文件
+        向调度器选出的上传服务器发送请求，并把耗时和成败反馈给调度器
+
+        Args:
+            host: upload_hosts.acquire() 返回的服务器域名
+            path: 请求路径
+            body: 请求体
+            headers: 请求头
+            client: 请求客户端，默认为 api_client
+
+        Returns:
+            PooledResponse: 响应对象
+
+        Raises:
+            Exception: 网络错误或服务器返回5xx
+        """
+        start = time.monotonic()
+        try:
+            response = self._request("POST", path, self.bandwidth.wrap_upload(body), headers,
+                                     host=host, client=client)
+        except Exception:
+            self.upload_hosts.record_failure(host)
+            self._record_transfer(path, len(body), None)
+            raise
+
+        return self._check_upload_response(host, path, body, response, time.monotonic() - start)
+
+    def _check_upload_response(self, host: str, path: str, body: MultipartEncoder, response: PooledResponse,
+                               elapsed: float) -> PooledResponse:
+        """把上传请求的结果反馈给服务器调度器和并发控制器，服务器返回5xx时抛出异常"""
+        if response.status >= 500:
+            self.upload_hosts.record_failure(host)
+            self._record_transfer(path, len(body), None)
+            raise UploadHostError(f"上传服务器 {host} 返回 HTTP {response.status}")
+
+        self.upload_hosts.record_success(host, len(body), elapsed)
+        self._record_transfer(path, len(body), None if response.status == 429 else elapsed)
+        return response
+
+    def _record_transfer(self, path: str, nbytes: int, elapsed: Optional[float]) -> None:
+        """
+        把分片请求的结果反馈给分片并发控制器
+
+        Args:
+            path: 请求路径
+            nbytes: 请求体字节数
+            elapsed: 成功时的耗时（秒）；为None表示失败（网络错误、5xx或429）
+        """
+        if path != "/upload/v2/file/slice":
+            return
+        if elapsed is None:
+            self.slice_controller.record_congestion()
+        else:
+            self.slice_controller.record_success(nbytes, elapsed)
+
+    def _upload_slice(self, file_path: str, preupload_id: str, slice_no: int, start_pos: int,
+                      size: int, servers: List[str], slice_md5: Optional[str] = None,
+                      data: Union[PooledBuffer, MappedSlice, None] = None) -> int:
+        """
+        上传单个分片
 
-        将大文件分成多个分片，逐个上传到服务器。
-        每个分片都会计算MD5值以确保完整性。
+        已预读的分片直接从内存（或文件映射）发送，否则在发送时才映射文件按块产生（哈希阶段未算出分片MD5时
+        先计算一次），每次尝试都由调度器重新选择上传服务器；
+        服务器拒绝或请求失败时只重试该分片本身（最多 SLICE_MAX_ATTEMPTS 次，按 slice_retry_policy
+        退避并消耗重试预算），不影响其他分片。
+        每次计算MD5和发送前都确认文件没有被截断（访问被截断的映射会导致 SIGBUS），
+        文件变短时不再重试，直接让这个文件失败。
 
         Args:
             file_path: 本地文件路径
             preupload_id: 预上传ID
-            slice_size: 分片大小（字节）
+            slice_no: 分片序号（从1开始）
+            start_pos: 分片起始位置
+            size: 分片大小
             servers: 上传服务器列表
+            slice_md5: 哈希阶段算好的分片MD5（可选，缺省时按文件区间计算）
+            data: 预读的分片数据（可选，由调用方归还）
 
         Returns:
-            bool: 上传是否成功
+            int: 分片序号
 
         Raises:
-            Exception: 分片上传失败
+            IOError: 文件在上传期间被截断
+            Exception: 不可重试的失败，或重试次数、重试预算用尽后仍然失败
         """
-        file_size = os.path.getsize(file_path)
-        total_slices = math.ceil(file_size / slice_size)
-
-        print(f"📦 开始分片上传，总分片数: {total_slices}")
+        if data is not None:
+            data.check()
+            slice_md5 = slice_md5 or data.md5()
+        else:
+            slice_md5 = slice_md5 or hash_range(file_path, start_pos, size)
+        body = self._build_slice_body(preupload_id, slice_no, slice_md5, file_path, start_pos, size,
+                                      data.view if data is not None else None,
+                                      data.check if data is not None else None)
 
-        # 提取服务器域名
-        upload_server = servers[0].replace("https://", "").replace("http://", "")
+        for attempt in range(1, self.SLICE_MAX_ATTEMPTS + 1):
+            if data is not None:
+                data.check()
 
-        # 上传每个分片
-        for slice_no in range(1, total_slices + 1):
-            start_pos = (slice_no - 1) * slice_size
-            current_slice_size = min(slice_size, file_size - start_pos)
-
-            print(f"⬆️  正在上传分片 {slice_no}/{total_slices} "
-                  f"(大小: {self._format_file_size(current_slice_size)})")
-
-            # 计算分片MD5
-            slice_md5 = self._calculate_slice_md5(file_path, start_pos, current_slice_size)
-
-            # 读取分片数据
-            with open(file_path, 'rb') as f:
-                f.seek(start_pos)
-                slice_data = f.read(current_slice_size)
-
-            # 构建multipart/form-data请求
-            boundary = self.BOUNDARY
-            data_list = []
-
-            # 添加字段
-            fields = [
-                ('preuploadID', preupload_id),
-                ('sliceNo', str(slice_no)),
-                ('sliceMD5', slice_md5)
-            ]
-
-            for field_name, field_value in fields:
-                data_list.append(encode('--' + boundary))
-                data_list.append(encode(f'Content-Disposition: form-data; name={field_name};'))
-                data_list.append(encode('Content-Type: text/plain'))
-                data_list.append(encode(''))
-                data_list.append(encode(field_value))
-
-            # 添加分片文件
-            data_list.append(encode('--' + boundary))
-            data_list.append(encode(f'Content-Disposition: form-data; name=slice; filename=slice_{slice_no}'))
-            data_list.append(encode('Content-Type: application/octet-stream'))
-            data_list.append(encode(''))
-            data_list.append(slice_data)
-
-            data_list.append(encode('--' + boundary + '--'))
-            data_list.append(encode(''))
-
-            body = b'\r\n'.join(data_list)
-
-            # 发送分片
             try:
-                conn = http.client.HTTPSConnection(upload_server)
                 headers = self._get_headers()
-                headers['Content-type'] = f'multipart/form-data; boundary={boundary}'
-
-                conn.request("POST", "/upload/v2/file/slice", body, headers)
-                response = conn.getresponse()
-                data = response.read().decode("utf-8")
-                conn.close()
+                headers['Content-type'] = body.content_type
 
-                result = json.loads(data)
+                upload_server = self.upload_hosts.acquire(servers)
+                print(f"⬆️  正在上传分片 {slice_no} (大小: {self._format_file_size(size)}) -> {upload_server}")
+                response = self._send_to_upload_host(upload_server, "/upload/v2/file/slice", body, headers,
+                                                     client=self.slice_client)
+                result = json.loads(response.data.decode("utf-8"))
 
                 if result.get("code") != 0:
-                    raise Exception(f"分片 {slice_no} 上传失败: {result.get('message', '未知错误')}")
+                    raise UploadRejectedError(f"分片 {slice_no} 上传失败: {result.get('message', '未知错误')}")
 
-                print(f"✅ 分片 {slice_no} 上传成功")
+                return slice_no
 
             except Exception as e:
-                print(f"❌ 分片 {slice_no} 上传时发生错误: {e}")
-                raise
-
-        print("✅ 所有分片上传完成")
-        return True
+                delay = self.slice_retry_policy.next_delay("POST", "/upload/v2/file/slice",
+                                                           self._slice_retry_reason(e), attempt)
+                if delay is None:
+                    print(f"❌ 分片 {slice_no} 上传时发生错误: {e}")
+                    raise
+                print(f"⚠️  分片 {slice_no} 上传失败（{e}），{delay:.1f}秒后换服务器重试 "
+                      f"({attempt}/{self.SLICE_MAX_ATTEMPTS - 1})")
+                time.sleep(delay)
 
-    def upload_complete(self, preupload_id: str) -> Dict[str, Any]:
+    def slice_upload(self, file_path: str, preupload_id: str, slice_size: int,
+                    servers: List[str], concurrency: Optional[int] = None,
+                    session: Optional[UploadSession] = None) -> bool:
         """
-        确认上传完成
+        分片上传文件
 
-        通知服务器所有分片已上传完毕，服务器将合并分片。
-        该操作可能是异步的，需要轮询检查结果。
+        将大文件分成多个分片，由有界线程池并发上传；并发数默认由 slice_controller 按实测吞吐和限流自动调整。
+        每个分片都会计算MD5值以确保完整性，失败的分片单独重试；
+        只有全部分片都被服务器确认后才返回，任一分片最终失败则取消尚未开始的分片并抛出异常。
 
         Args:
+            file_path: 本地文件路径
             preupload_id: 预上传ID
+            slice_size: 分片大小（字节）
+            servers: 上传服务器列表（分片按各服务器的吞吐和错误率分散上传）
+            concurrency: 固定的分片并发数（可选，默认由 slice_controller 自动调整）
+            session: 断点续传会话（可选），跳过其中已确认的分片，并把新确认的分片写入日志
 
         Returns:
-            Dict[str, Any]: 上传完成结果，包含success和fileID
+            bool: 上传是否成功
 
         Raises:
-            Exception: 确认失败或超时
+            Exception: 分片上传失败
         """
-        print("⏰ 正在确认上传完成...")
+        file_size = os.path.getsize(file_path)
+        total_slices = math.ceil(file_size / slice_size)
+        acked = set(session.acked) if session else set()
+        pending = [n for n in range(1, total_slices + 1) if n not in acked]
+        controller = AdaptiveConcurrency(concurrency, concurrency, concurrency) if concurrency else self.slice_controller
+
+        print(f"📦 开始分片上传，总分片数: {total_slices}，{self._concurrency_label(controller)}")
+        if acked:
+            print(f"🔁 跳过已上传的 {total_slices - len(pending)} 个分片，剩余 {len(pending)} 个")
+
+        # 计算etag时已得到的分片MD5表，命中时上传阶段每个分片只读取一次
+        slice_md5s = self._cached_slice_table(file_path, slice_size) or [None] * total_slices
+
+        # 后台预读接下来的分片，读盘与发送重叠进行（映射文件时不复制；使用缓冲池时内存受进程级上限约束）
+        readahead = self._slice_readahead(file_path, pending, slice_size, file_size,
+                                          session.identity if session else None)
+
+        order = iter(pending)
+        order_lock = threading.Lock()
+        aborted = threading.Event()
+
+        def upload_with_slot() -> int:
+            # 线程数按并发上限创建，实际同时上传的分片数由控制器的当前上限决定。
+            # 先占上传位，再按顺序领取下一个分片并取出其数据：已取出的分片不超过当前并发上限，
+            # 预读的分片不超过预读深度；领取顺序与预读顺序一致，占着上传位等待的总是下一个要读的分片
+            controller.acquire()
+            try:
+                with order_lock:
+                    if aborted.is_set():
+                        raise Exception("分片上传已中止")
+                    slice_no = next(order)
+                start_pos = (slice_no - 1) * slice_size
+                data = readahead.get(slice_no) if readahead is not None else None
+                try:
+                    if aborted.is_set():
+                        raise Exception(f"分片上传已中止，跳过分片 {slice_no}")
+                    return self._upload_slice(file_path, preupload_id, slice_no, start_pos,
+                                              min(slice_size, file_size - start_pos), servers,
+                                              slice_md5s[slice_no - 1], data)
+                finally:
+                    if data is not None:
+                        data.release()
+            finally:
+                controller.release()
+
+        # 提交所有分片（未预读时分片数据在工作线程开始上传时才读取，内存占用与并发数成正比）
+        executor = ThreadPoolExecutor(max_workers=max(1, min(controller.maximum, len(pending) or 1)))
+        futures = []
+        completed = total_slices - len(pending)
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
-            headers = self._get_headers()
-            headers['Content-Type'] = 'application/json'
+            for _ in pending:
+                futures.append(executor.submit(upload_with_slot))
+
+            for future in as_completed(futures):
+                slice_no = future.result()
+                if session:
+                    self.journal.ack(session, slice_no)
+                completed += 1
+                print(f"✅ 分片 {slice_no} 上传成功 ({completed}/{total_slices}，{controller.status()})")
+
+        except BaseException:
+            # 尚未开始的分片不再上传，已开始但还没发送的分片直接跳过
+            for future in futures:
+                future.cancel()
+            aborted.set()
+            wait(futures)
+            # 失败前已在上传中的分片可能随后成功，一并记入日志，续传时不必重传
+            if session:
+                for future in futures:
+                    if future.done() and not future.cancelled() and future.exception() is None \
+                            and future.result() not in session.acked:
+                        self.journal.ack(session, future.result())
+            raise
 
-            payload = json.dumps({
-                "preuploadID": preupload_id
-            })
+        finally:
+            executor.shutdown(wait=True)
+            if readahead is not None:
+                readahead.close()
 
-            # 轮询检查上传状态
-            max_retries = 30  # 最多重试30次
-            retry_count = 0
+        print("✅ 所有分片上传完成")
+        if len(servers) > 1:
+            print(f"📊 上传服务器统计: {self.upload_hosts.summary()}")
+        if readahead is not None and not readahead.mapped:
+            print(f"🧠 分片预读内存: {self.buffer_pool.summary()}")
+        return True
 
-            while retry_count < max_retries:
-                conn.request("POST", "/upload/v2/file/upload_complete", payload, headers)
-                response = conn.getresponse()
-                data = response.read().decode("utf-8")
+    def _slice_readahead(self, file_path: str, slice_nos: List[int], slice_size: int,
+                         file_size: int, identity: Optional[Dict[str, Any]] = None) -> Optional[SliceReadAhead]:
+        """
+        为待上传的分片创建预读
 
-                result = json.loads(data)
+        默认读入缓冲池；开启 slice_mmap 时映射文件（分片为映射上的窗口，不复制），无法映射时读入缓冲池。
+        映射的文件一旦被截断，访问窗口会导致整个进程收到 SIGBUS，因此即使开启映射，
+        最近 SLICE_MMAP_SETTLE 秒内修改过、或在计算哈希（创建上传）之后被修改过的文件（可能仍在被写入）
+        也读入缓冲池（文件变短时只有这个文件读取失败）。
 
-                if result.get("code") == 0:
-                    data = result.get("data", {})
+        Args:
+            file_path: 本地文件路径
+            slice_nos: 待上传的分片序号
+            slice_size: 分片大小
+            file_size: 文件大小
+            identity: 创建上传时的文件身份（可选，见 file_identity）
 
-                    if data.get("completed", False) and data.get("fileID", 0) != 0:
-                        print(f"✅ 上传完成确认成功! 文件ID: {data.get('fileID')}")
-                        conn.close()
-                        return {"success": True, "fileID": data.get("fileID")}
-                    else:
-                        print(f"⏳ 上传尚未完成，等待1秒后重试... ({retry_count + 1}/{max_retries})")
-                        time.sleep(1)
-                        retry_count += 1
-                else:
-                    conn.close()
-                    raise Exception(f"确认上传完成失败: {result.get('message', '未知错误')}")
+        Returns:
+            Optional[SliceReadAhead]: 分片预读；未开启预读，或需要缓冲池而分片大小超过其上限时返回None
+            （分片在发送时才读取）
+        """
+        if self.SLICE_READAHEAD <= 0 or not slice_nos:
+            return None
+        slices = [(n, (n - 1) * slice_size, min(slice_size, file_size - (n - 1) * slice_size)) for n in slice_nos]
+        use_mmap = False
+        if self.slice_mmap:
+            current = file_identity(file_path)
+            settled = time.time() - current["mtime_ns"] / 1e9 >= self.SLICE_MMAP_SETTLE
+            use_mmap = settled and (identity is None or current == identity)
+        try:
+            return SliceReadAhead(file_path, slices, self.SLICE_READAHEAD, self.buffer_pool, use_mmap)
+        except ValueError:
+            return None
 
-            conn.close()
-            raise Exception("上传完成确认超时")
+    def _parse_complete(self, response: PooledResponse) -> Optional[Dict[str, Any]]:
+        """
+        解析一次 upload_complete 响应
 
-        except Exception as e:
-            print(f"❌ 确认上传完成时发生错误: {e}")
-            raise
+        Returns:
+            Optional[Dict[str, Any]]: 已完成时返回上传结果（success和fileID），服务器仍在合并分片时返回None
 
-    def upload_file(self, file_path: str, parent_file_id: int = 0) -> Dict[str, Any]:
+        Raises:
+            UploadRejectedError: 服务器拒绝确认（通常是上传会话已过期）
         """
-        上传文件到123云盘
+        result = json.loads(response.data.decode("utf-8"))
 
-        根据文件大小自动选择最优上传方式：
-        - ≤ 1GB: 使用单步上传
-        - > 1GB: 使用分片上传（先检测秒传）
+        if result.get("code") != 0:
+            raise UploadRejectedError(f"确认上传完成失败: {result.get('message', '未知错误')}")
 
-        Args:
-            file_path: 本地文件路径
-            parent_file_id: 父目录ID，0表示根目录
+        data = result.get("data") or {}
+        if data.get("completed", False) and data.get("fileID", 0) != 0:
+            print(f"✅ 上传完成确认成功! 文件ID: {data.get('fileID')}")
+            return {"success": True, "fileID": data.get("fileID")}
+        return None
 
-        Returns:
-            Dict[str, Any]: 上传结果，包含：
-                - success: 是否成功
-                - fileID: 文件ID
+    def _poll_complete(self, preupload_id: str) -> Optional[Dict[str, Any]]:
+        """检查一次上传是否已完成（由 completions 跟踪器调用）"""
+        headers = self._get_headers()
+        headers['Content-Type'] = 'application/json'
+        payload = json.dumps({"preuploadID": preupload_id})
 
-        Raises:
-            Exception: 文件不存在或上传失败
+        response = self._request("POST", "/upload/v2/file/upload_complete", payload, headers)
+        return self._parse_complete(response)
 
-        示例:
-            >>> uploader = Pan123Uploader(client_id="id", client_secret="secret")
-            >>> result = uploader.upload_file("test.txt")
-            >>> print(f"文件ID: {result['fileID']}")
+    def submit_complete(self, preupload_id: str, session: Optional[UploadSession] = None) -> Future:
         """
-        if not os.path.exists(file_path):
-            raise Exception(f"文件不存在: {file_path}")
+        提交上传完成确认，不等待服务器合并分片
 
-        file_size = os.path.getsize(file_path)
-        filename = os.path.basename(file_path)
+        确认请求由 completions 跟踪器与其他等待合并的上传一起按指数退避轮询，
+        调用方可以先开始下一个文件的传输。
 
-        print("=" * 60)
-        print(f"📂 准备上传文件: {filename}")
-        print(f"📏 文件大小: {self._format_file_size(file_size)}")
-        print("=" * 60)
+        Args:
+            preupload_id: 预上传ID
+            session: 断点续传日志中的会话（可选），确认成功后从日志中移除
+
+        Returns:
+            Future: 完成时得到上传结果（success和fileID），失败或超时时抛出异常
+        """
+        print("⏰ 正在确认上传完成...")
+        done = Future()
+
+        def finish(future: Future) -> None:
+            try:
+                result = future.result()
+                if session is not None:
+                    self.journal.finish(session)
+                done.set_result(result)
+            except Exception as e:
+                print(f"❌ 确认上传完成时发生错误: {e}")
+                done.set_exception(e)
+
+        self.completions.submit(preupload_id).add_done_callback(finish)
+        return done
+
+    def upload_complete(self, preupload_id: str) -> Dict[str, Any]:
+        """
+        确认上传完成
+
+        通知服务器所有分片已上传完毕，服务器将合并分片。
+        该操作可能是异步的，由 completions 跟踪器按指数退避轮询直到完成。
+
+        Args:
+            preupload_id: 预上传ID
+
+        Returns:
+            Dict[str, Any]: 上传完成结果，包含success和fileID
+
+        Raises:
+            Exception: 确认失败或超时
+        """
+        return self.submit_complete(preupload_id).result()
+
+    @staticmethod
+    def _resolved(result: Dict[str, Any]) -> Future:
+        """把已得到的上传结果包装为已完成的 Future"""
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def upload_file(self, file_path: str, parent_file_id: int = 0,
+                    duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """
+        上传文件到123云盘
+
+        根据文件大小和近期秒传命中率自动选择最优上传方式（见 pan123_common.upload_strategy）：
+        - 有未完成的分片上传记录: 续传缺失的分片
+        - ≤ 1GB 且预计探测不划算: 直接单步上传
+        - 其余: 先通过 create 检测秒传，未命中时分片上传（> 1GB 的文件总是如此）
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID，0表示根目录
+            duplicate: 同名文件处理策略（可选，1保留两者，2覆盖原文件；默认由服务器决定）
+
+        Returns:
+            Dict[str, Any]: 上传结果，包含：
+                - success: 是否成功
+                - fileID: 文件ID
+
+        Raises:
+            Exception: 文件不存在或上传失败
+
+        示例:
+            >>> uploader = Pan123Uploader(client_id="id", client_secret="secret")
+            >>> result = uploader.upload_file("test.txt")
+            >>> print(f"文件ID: {result['fileID']}")
+        """
+        return self.start_upload(file_path, parent_file_id, duplicate).result()
+
+    def start_upload(self, file_path: str, parent_file_id: int = 0,
+                     duplicate: Optional[int] = None) -> Future:
+        """
+        上传文件，传输完成后即返回，不等待服务器合并分片
+
+        与 upload_file 相同，但分片上传的完成确认交给 completions 跟踪器，
+        调用方拿到 Future 后可以先开始下一个文件的传输（目录上传即如此）。
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID，0表示根目录
+            duplicate: 同名文件处理策略（可选）
+
+        Returns:
+            Future: 完成时得到上传结果（success和fileID）；秒传和单步上传返回已完成的 Future
+
+        Raises:
+            Exception: 文件不存在，或传输阶段失败
+        """
+        if not os.path.exists(file_path):
+            raise Exception(f"文件不存在: {file_path}")
+
+        file_size = os.path.getsize(file_path)
+        filename = os.path.basename(file_path)
+
+        print("=" * 60)
+        print(f"📂 准备上传文件: {filename}")
+        print(f"📏 文件大小: {self._format_file_size(file_size)}")
+        print("=" * 60)
+
+        # 上次中断的分片上传：沿用原preuploadID，只补传缺失的分片
+        session = self.journal.find(file_path, parent_file_id)
+        if session:
+            try:
+                # 续传等待确认完成后再返回：会话过期时要能在这里改为重新创建上传
+                return self._resolved(self._resume_upload(file_path, session))
+            except UploadRejectedError as e:
+                print(f"⚠️  续传失败（{e}），服务器上的上传会话可能已过期，重新创建上传")
+                self.journal.finish(session)
+
+        return self._transfer_upload(file_path, parent_file_id, duplicate,
+                                     self._probe_upload(file_path, parent_file_id, duplicate))
+
+    def _probe_upload(self, file_path: str, parent_file_id: int = 0,
+                      duplicate: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        按上传策略决定是否先通过 create 探测秒传，需要时创建文件记录
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID
+            duplicate: 同名文件处理策略（可选）
+
+        Returns:
+            Optional[Dict[str, Any]]: create 的结果（秒传或分片上传所需信息）；
+                策略选择直接单步上传时返回None
+        """
+        # 按文件大小和近期秒传命中率选择：直接单步上传，或先探测秒传、需要传输时再分片上传
+        file_size = os.path.getsize(file_path)
+        if not self.strategy.should_probe(file_size, self.upload_hosts.best_throughput(), self._create_wait()):
+            return None
 
-        # 根据文件大小选择上传方式
         if file_size <= self.SINGLE_UPLOAD_LIMIT:
-            print("💡 使用单步上传方式")
-            return self.single_upload(file_path, parent_file_id)
+            print("💡 先检测秒传，需要传输时使用分片上传")
         else:
             print("💡 使用分片上传方式")
 
-            # 创建文件（检测秒传）
-            create_result = self.create_file(file_path, parent_file_id)
+        # 一遍读取同时算出分片MD5表，探测未命中时分片上传无需再为分片MD5读盘
+        self._hash_file(file_path, with_slices=True)
+
+        # 创建文件（检测秒传）
+        start = time.monotonic()
+        create_result = self.create_file(file_path, parent_file_id, duplicate)
+        self.strategy.record_probe(create_result.get("reuse", False), time.monotonic() - start)
+        return create_result
+
+    def _transfer_upload(self, file_path: str, parent_file_id: int, duplicate: Optional[int],
+                         create_result: Optional[Dict[str, Any]]) -> Future:
+        """
+        按 _probe_upload 的结果传输文件
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID
+            duplicate: 同名文件处理策略（可选）
+            create_result: _probe_upload 的返回值
+
+        Returns:
+            Future: 完成时得到上传结果；分片上传时在服务器确认合并后完成
+
+        Raises:
+            Exception: 上传失败
+        """
+        if create_result is None:
+            print("💡 使用单步上传方式")
+            return self._resolved(self.single_upload(file_path, parent_file_id, duplicate))
+
+        if create_result.get("reuse", False):
+            # 秒传成功
+            return self._resolved({"success": True, "fileID": create_result.get("fileID")})
+
+        # 需要分片上传
+        preupload_id = create_result.get("preuploadID")
+        slice_size = create_result.get("sliceSize")
+        servers = create_result.get("servers", [])
+
+        if not preupload_id or not slice_size or not servers:
+            raise Exception("创建文件响应数据不完整")
+
+        session = self.journal.begin(file_path, parent_file_id, self._calculate_md5(file_path),
+                                     preupload_id, slice_size, servers)
+
+        # 执行分片上传
+        self.slice_upload(file_path, preupload_id, slice_size, servers, session=session)
+
+        # 确认上传完成（服务器合并分片期间可以开始传输下一个文件）
+        return self.submit_complete(preupload_id, session)
+
+    def _resume_upload(self, file_path: str, session: UploadSession) -> Dict[str, Any]:
+        """
+        继续上次中断的分片上传
+
+        Args:
+            file_path: 本地文件路径
+            session: 断点续传日志中的未完成会话
+
+        Returns:
+            Dict[str, Any]: 上传结果，包含success和fileID
+
+        Raises:
+            UploadRejectedError: 服务器拒绝了该会话的请求（通常是会话已过期）
+            Exception: 其他上传失败（会话保留，下次继续续传）
+        """
+        total_slices = math.ceil(session.identity["size"] / session.slice_size)
+        print(f"🔁 发现未完成的上传（已确认 {len(session.acked)}/{total_slices} 个分片），继续上传")
+
+        self.slice_upload(file_path, session.preupload_id, session.slice_size, session.servers, session=session)
+
+        return self.submit_complete(session.preupload_id, session).result()
+
+    def _spool(self, stream, filename: str, memory_threshold: int) -> SpooledStream:
+        """读取整个数据流，边缓存边计算etag和分片MD5表"""
+        print("=" * 60)
+        print(f"📥 正在读取数据流: {filename}（边缓存边计算MD5）")
+        spool = spool_stream(stream, filename, self.EXPECTED_SLICE_SIZES, memory_threshold,
+                             max_size=self.MAX_FILE_SIZE)
+        where = "内存" if spool.in_memory else "临时文件"
+        print(f"✅ 数据流读取完成: {self._format_file_size(spool.size)}，MD5: {spool.digest.etag}（缓存于{where}）")
+        print("=" * 60)
+
+        # 临时文件的哈希结果写入哈希缓存，之后检测秒传和分片上传时不再读取临时文件计算MD5
+        if not spool.in_memory:
+            self.hash_cache.put(spool.path, spool.digest)
+        return spool
+
+    def upload_stream(self, stream, filename: str, parent_file_id: int = 0, duplicate: Optional[int] = None,
+                      memory_threshold: int = DEFAULT_MEMORY_THRESHOLD) -> Dict[str, Any]:
+        """
+        上传标准输入、管道等不可回退的数据流
+
+        只读取数据流一遍：边缓存边计算MD5和分片MD5表（见 pan123_common.spool），
+        数据流结束后直接检测秒传，未命中时从缓存分片上传或单步上传，无需先落盘再读一遍。
+        不超过 memory_threshold 的数据只缓存在内存中；更大的数据写入临时文件，上传结束后删除。
+
+        Args:
+            stream: 可读的数据流（如 sys.stdin.buffer）
+            filename: 上传后的文件名
+            parent_file_id: 父目录ID，0表示根目录
+            duplicate: 同名文件处理策略（可选，1保留两者，2覆盖原文件；默认由服务器决定）
+            memory_threshold: 只缓存在内存中的最大字节数
+
+        Returns:
+            Dict[str, Any]: 上传结果，包含success和fileID
+
+        Raises:
+            Exception: 数据流超过最大限制或上传失败
+
+        示例:
+            >>> uploader.upload_stream(sys.stdin.buffer, "backup.sql", parent_file_id=123)
+        """
+        with self._spool(stream, filename, memory_threshold) as spool:
+            if spool.in_memory:
+                return self._upload_buffer(spool, parent_file_id, duplicate)
+            return self.upload_file(spool.path, parent_file_id, duplicate)
+
+    def _upload_buffer(self, spool: SpooledStream, parent_file_id: int = 0,
+                       duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """
+        上传缓存在内存中的数据流：按上传策略先检测秒传，需要传输时单步上传内存数据
+
+        Args:
+            spool: 缓存在内存中的数据流
+            parent_file_id: 父目录ID
+            duplicate: 同名文件处理策略（可选）
+
+        Returns:
+            Dict[str, Any]: 上传结果，包含success和fileID
+        """
+        etag = spool.digest.etag
+        if self.strategy.should_probe(spool.size, self.upload_hosts.best_throughput(), self._create_wait()):
+            start = time.monotonic()
+            create_result = self._create_file_record(spool.filename, spool.size, etag, parent_file_id, duplicate)
+            self.strategy.record_probe(create_result.get("reuse", False), time.monotonic() - start)
+            if create_result.get("reuse", False):
+                return {"success": True, "fileID": create_result.get("fileID")}
+
+        # 数据已在内存中且不超过单步上传限制：直接单步上传，无需分片
+        print(f"🚀 开始单步上传: {spool.filename}")
+        body = self._build_single_upload_body(spool.filename, parent_file_id, etag, spool.size, duplicate,
+                                              data=spool.data)
+        return self._send_single_upload(body)
+
+    def list_folder(self, parent_id: int) -> List[Dict[str, Any]]:
+        """
+        获取目录下的全部文件和子目录（自动翻页，不含回收站中的文件）
+
+        Args:
+            parent_id: 目录ID
+
+        Returns:
+            List[Dict[str, Any]]: 文件列表（/api/v2/file/list 返回的 fileList 条目）
+
+        Raises:
+            Exception: API调用失败
+        """
+        files = []
+        last_file_id = None
+
+        while True:
+            params = f"?parentFileId={parent_id}&limit=100"
+            if last_file_id is not None:
+                params += f"&lastFileId={last_file_id}"
+
+            response = self._request("GET", f"/api/v2/file/list{params}", "", self._get_headers())
+            result = json.loads(response.data.decode("utf-8"))
+            if result.get("code") != 0:
+                raise Exception(f"获取文件列表失败: {result.get('message', '未知错误')}")
+
+            data = result.get("data", {})
+            files.extend(f for f in data.get("fileList", []) if f.get("trashed", 0) == 0)
+
+            last_file_id = data.get("lastFileId", -1)
+            if last_file_id == -1:
+                return files
+
+    def make_directory(self, name: str, parent_id: int = 0) -> Tuple[int, bool]:
+        """
+        在云盘中创建目录；同名目录已存在时沿用已有目录
+
+        先直接调用 mkdir（新建目录树时只需一次请求），失败后才列出父目录查找同名目录。
+
+        Args:
+            name: 目录名
+            parent_id: 父目录ID，0表示根目录
+
+        Returns:
+            Tuple[int, bool]: (目录ID, 是否为新创建)
+
+        Raises:
+            Exception: 创建失败且父目录下没有同名目录
+        """
+        headers = self._get_headers()
+        headers['Content-Type'] = 'application/json'
+        payload = json.dumps({"name": name, "parentID": parent_id})
+
+        response = self._request("POST", "/upload/v1/file/mkdir", payload, headers)
+        result = json.loads(response.data.decode("utf-8"))
+
+        if result.get("code") == 0 and result.get("data", {}).get("dirID"):
+            dir_id = int(result["data"]["dirID"])
+            print(f"📁 目录创建成功: {name} (ID: {dir_id})")
+            return dir_id, True
+
+        # 目录名不能重名：同名目录已存在时 mkdir 失败，改为查找已有目录
+        for file_info in self.list_folder(parent_id):
+            if file_info.get("type") == 1 and file_info.get("filename") == name:
+                return int(file_info.get("fileId")), False
+
+        raise Exception(f"创建目录失败: {name}: {result.get('message', '未知错误')}")
+
+    def _scan_directory(self, local_dir: str) -> Tuple[List[Tuple[str, str, int]], List[str]]:
+        """
+        遍历本地目录
+
+        Returns:
+            Tuple[List[Tuple[str, str, int]], List[str]]: 文件列表 (本地路径, 相对目录, 大小)，
+                以及不含任何文件的目录（同样需要在云盘中创建）
+        """
+        tasks = []
+        empty_dirs = []
+
+        for root, dirs, files in os.walk(local_dir):
+            dirs.sort()
+            rel_dir = os.path.relpath(root, local_dir)
+            rel_dir = "" if rel_dir == "." else rel_dir.replace(os.sep, "/")
+
+            regular = []
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if os.path.isfile(path):
+                    regular.append((path, rel_dir, os.path.getsize(path)))
+            tasks.extend(regular)
+
+            if not regular and not dirs:
+                empty_dirs.append(rel_dir)
+
+        return tasks, empty_dirs
+
+    def upload_tasks(self, tasks: List[Tuple[str, str, int]], folders: RemoteFolderCache,
+                     file_concurrency: int = DEFAULT_FILE_CONCURRENCY,
+                     duplicate: Optional[int] = None) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """
+        并行上传一批文件到各自对应的云盘目录
+
+        小文件经过 哈希 → 创建（检测秒传）→ 传输 三个阶段的流水线，相邻阶段由有界队列连接，
+        计算后面文件的哈希、create 受限流等待、前面文件的传输同时进行；服务器合并分片的等待
+        由 completions 跟踪器统一轮询，不占用上传位。大文件由单独的线程上传，小文件传完前
+        最多占用一半上传位。单个文件失败不影响其他文件。
+        开启自适应并发时，同时传输的文件数按每秒完成的字节数和限流情况自动调整。
+
+        内容相同的文件（大小和MD5都相同）只传输第一个，其余文件在第一个上传完成后
+        通过 create 秒传；秒传未命中时（例如第一个上传失败）再正常传输。
+        重复文件在各自的哈希阶段识别（只有与其他文件大小相同的文件才需要比对），
+        不会在开始上传前先计算整批文件的哈希。
+
+        Args:
+            tasks: (本地路径, 相对目录, 文件大小) 列表
+            folders: 相对目录 -> 云盘目录ID 的缓存
+            file_concurrency: 同时传输的文件数（自适应并发时为初始值）
+            duplicate: 同名文件处理策略（可选）
+
+        Returns:
+            Tuple[List[str], List[Tuple[str, str]]]: 成功上传的本地路径，以及失败的 (本地路径, 错误信息)
+        """
+        small = [_UploadItem(*t) for t in tasks if t[2] < self.LARGE_FILE_THRESHOLD]
+        large = deque(t for t in tasks if t[2] >= self.LARGE_FILE_THRESHOLD)
+
+        # 批内内容相同的文件只传输一份：只有与其他文件大小相同的文件才可能重复，在哈希后比对
+        size_counts = Counter(t[2] for t in tasks)
+        shared_sizes = {size for size, count in size_counts.items() if count > 1}
+
+        # 文件并发：按每秒完成的字节数加性增，单步上传或创建文件被限流时减半
+        controller = self._concurrency_controller(file_concurrency, self.MAX_FILE_CONCURRENCY,
+                                                  ("upload/v2/file/single/create", "upload/v2/file/create"))
+        metrics = self.api_client.retry_policy.metrics
+        metrics.add_listener(controller.on_retry)
+        print(f"📂 开始上传 {len(tasks)} 个文件，{self._concurrency_label(controller)}")
+
+        lock = threading.Lock()
+        gate = _LargeFileGate()
+        uploaded = []
+        failed = []
+        completions = []
+        copy_jobs = []
+        # (大小, etag) -> 代表文件路径；代表文件路径 -> 等它有结果后再秒传的重复文件
+        representatives = {}
+        copies = {}
+        settled = set()
+        duplicate_groups = set()
+        deferred = []
+
+        def settle(path: str, error: Optional[Exception] = None) -> None:
+            with lock:
+                settled.add(path)
+                if error is None:
+                    uploaded.append(path)
+                else:
+                    print(f"❌ 上传失败: {path}: {error}")
+                    failed.append((path, str(error)))
+                print(f"📊 文件上传进度: {len(uploaded) + len(failed)}/{len(tasks)}（{controller.status()}）")
+
+                # 代表文件已有结果：开始处理与其内容相同的文件
+                for task in copies.pop(path, ()):
+                    copy_jobs.append(copy_executor.submit(upload_copy, *task))
+
+        def on_complete(path: str, future: Future, recorded: Future) -> None:
+            settle(path, future.exception())
+            recorded.set_result(None)
+
+        def track(path: str, future: Future) -> None:
+            # 传输完成即让出上传位，完成确认由跟踪器在后台轮询
+            recorded = Future()
+            with lock:
+                completions.append(recorded)
+            future.add_done_callback(lambda f: on_complete(path, f, recorded))
+
+        def defer_duplicate(path: str, rel_dir: str, size: int, etag: str) -> bool:
+            # 与之前出现的文件内容相同：等代表文件有结果后再秒传，代表文件已有结果时立即开始
+            with lock:
+                representative = representatives.setdefault((size, etag), path)
+                if representative == path:
+                    return False
+                duplicate_groups.add(representative)
+                deferred.append(path)
+                if representative in settled:
+                    copy_jobs.append(copy_executor.submit(upload_copy, path, rel_dir, size))
+                else:
+                    copies.setdefault(representative, []).append((path, rel_dir, size))
+                return True
+
+        def hash_stage(item: _UploadItem) -> Optional[_UploadItem]:
+            digest = self.hasher.digest(item.path, self.EXPECTED_SLICE_SIZES)
+            if item.size in shared_sizes and defer_duplicate(item.path, item.rel_dir, item.size, digest.etag):
+                return None
+            return item
+
+        def create_stage(item: _UploadItem) -> Optional[_UploadItem]:
+            item.parent_id = folders.resolve(item.rel_dir)
+            if self.journal.find(item.path, item.parent_id):
+                # 上次中断的分片上传交给 start_upload 续传
+                item.resume = True
+                return item
+            item.create_result = self._probe_upload(item.path, item.parent_id, duplicate)
+            if item.create_result is not None and item.create_result.get("reuse", False):
+                # 秒传成功，无需传输
+                settle(item.path)
+                return None
+            return item
+
+        def transfer_stage(item: _UploadItem) -> None:
+            controller.acquire()
+            start = time.monotonic()
+            try:
+                if item.resume:
+                    future = self.start_upload(item.path, item.parent_id, duplicate)
+                else:
+                    future = self._transfer_upload(item.path, item.parent_id, duplicate, item.create_result)
+                controller.record_success(item.size, time.monotonic() - start)
+            finally:
+                controller.release()
+            track(item.path, future)
+
+        def upload_copy(path: str, rel_dir: str, size: int) -> None:
+            try:
+                parent_id = folders.resolve(rel_dir)
+                # 代表文件已上传，create 通常直接秒传（不计入上传策略的秒传命中率）
+                create_result = self.create_file(path, parent_id, duplicate)
+                if create_result.get("reuse", False):
+                    settle(path)
+                    return
+
+                controller.acquire()
+                start = time.monotonic()
+                try:
+                    future = self._transfer_upload(path, parent_id, duplicate, create_result)
+                    controller.record_success(size, time.monotonic() - start)
+                finally:
+                    controller.release()
+                track(path, future)
+            except Exception as e:
+                settle(path, e)
+
+        def upload_large() -> None:
+            while True:
+                with lock:
+                    if not large:
+                        return
+                    path, rel_dir, size = large.popleft()
+                if size in shared_sizes:
+                    try:
+                        etag = self.hasher.digest(path, self.EXPECTED_SLICE_SIZES).etag
+                    except Exception as e:
+                        settle(path, e)
+                        continue
+                    if defer_duplicate(path, rel_dir, size, etag):
+                        continue
+                gate.enter(lambda: controller.limit // 2)
+                controller.acquire()
+                start = time.monotonic()
+                try:
+                    future = self.start_upload(path, folders.resolve(rel_dir), duplicate)
+                    controller.record_success(size, time.monotonic() - start)
+                    track(path, future)
+                except Exception as e:
+                    settle(path, e)
+                finally:
+                    controller.release()
+                    gate.leave()
+
+        # 传输阶段的线程数按并发上限创建，实际同时传输的文件数由控制器的当前上限决定
+        pipeline = Pipeline([
+            Stage("哈希", hash_stage, workers=self.hasher.workers),
+            Stage("创建", create_stage, workers=self.CREATE_STAGE_WORKERS),
+            Stage("传输", transfer_stage, workers=min(controller.maximum, max(1, len(small)))),
+        ], on_error=lambda item, error, stage: settle(item.path, error))
+
+        large_workers = min(controller.maximum, len(large))
+        copy_executor = ThreadPoolExecutor(max_workers=self.CREATE_STAGE_WORKERS)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, large_workers)) as executor:
+                # 大文件耗时最长，与小文件流水线同时开始
+                large_futures = [executor.submit(upload_large) for _ in range(large_workers)]
+                try:
+                    if small:
+                        pipeline.run(small)
+                        print(f"📈 流水线: {pipeline.summary()}，"
+                              f"{len(small) / max(pipeline.elapsed, 1e-6):.1f} 个文件/秒")
+                finally:
+                    gate.small_finished()
+                for future in large_futures:
+                    future.result()
+
+            # 等待仍在合并分片的文件确认完成，以及由此开始的重复文件秒传（可能又产生新的等待）
+            while True:
+                with lock:
+                    pending = [f for f in completions + copy_jobs if not f.done()]
+                if not pending:
+                    break
+                wait(pending)
+        finally:
+            copy_executor.shutdown(wait=True)
+            metrics.remove_listener(controller.on_retry)
+
+        if deferred:
+            print(f"♻️  批内重复文件 {len(deferred)} 个（{len(duplicate_groups)} 组），"
+                  f"每组只传输一份，其余在其上传完成后秒传")
+
+        return uploaded, failed
+
+    def upload_directory(self, local_dir: str, parent_file_id: int = 0,
+                         file_concurrency: int = DEFAULT_FILE_CONCURRENCY) -> Dict[str, Any]:
+        """
+        把本地目录（含子目录）上传到云盘的指定目录下
+
+        在父目录下创建与本地目录同名的目录，按本地结构逐级创建子目录（每个目录只创建或查找一次），
+        由有界线程池同时上传多个文件。大文件同时最多占用一半上传位，
+        其余上传位持续处理小文件。单个文件失败不影响其他文件。
+
+        Args:
+            local_dir: 本地目录路径
+            parent_file_id: 云盘父目录ID，0表示根目录
+            file_concurrency: 同时上传的文件数
+
+        Returns:
+            Dict[str, Any]: 上传结果，包含：
+                - success: 是否全部成功
+                - dirID: 云盘中对应本地目录的目录ID
+                - uploaded: 成功上传的文件数
+                - failed: 失败的文件列表 [(本地路径, 错误信息)]
+
+        Raises:
+            Exception: 目录不存在或无法创建顶层目录
+        """
+        if not os.path.isdir(local_dir):
+            raise Exception(f"目录不存在: {local_dir}")
+
+        local_dir = os.path.abspath(local_dir)
+        tasks, empty_dirs = self._scan_directory(local_dir)
+        total_size = sum(t[2] for t in tasks)
+
+        print("=" * 60)
+        print(f"📂 准备上传目录: {local_dir}")
+        print(f"📄 文件数: {len(tasks)}，总大小: {self._format_file_size(total_size)}，初始并发文件数: {file_concurrency}")
+        print("=" * 60)
+
+        root_id, _ = self.make_directory(os.path.basename(local_dir), parent_file_id)
+        folders = RemoteFolderCache(self, root_id)
+        uploaded, failed = self.upload_tasks(tasks, folders, file_concurrency)
 
+        for rel_dir in empty_dirs:
+            try:
+                folders.resolve(rel_dir)
+            except Exception as e:
+                failed.append((os.path.join(local_dir, rel_dir), str(e)))
+
+        print(f"📁 目录: 新建 {folders.created} 个，沿用已有 {folders.found} 个")
+        print(f"✅ 目录上传完成: 成功 {len(uploaded)} 个文件，失败 {len(failed)} 个")
+        return {"success": not failed, "dirID": root_id, "uploaded": len(uploaded), "failed": failed}
+
+
+class AsyncPan123Uploader(Pan123Uploader):
+    """
+    123云盘文件上传器（asyncio版本）
+
+    方法名、参数和返回值与 Pan123Uploader 一致，但网络相关方法均为协程，
+    基于 pan123_common.aio 的异步传输层发送请求；计算MD5、读取文件等阻塞操作
+    放到线程池中执行，不阻塞事件循环。适合在一个事件循环中并发上传大量文件。
+
+    注意：
+        使用 client_id/client_secret 初始化时会同步获取访问令牌（通常命中本地缓存），
+        在事件循环中构造前可先获取令牌并直接传入 access_token。
+
+    使用示例:
+        >>> async def main():
+        ...     uploader = AsyncPan123Uploader(client_id="id", client_secret="secret")
+        ...     results = await asyncio.gather(*(uploader.upload_file(path) for path in paths))
+        ...     await uploader.aclose()
+    """
+
+    def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None,
+                 async_transport: Optional[AsyncTransport] = None,
+                 slice_concurrency: int = Pan123Uploader.DEFAULT_SLICE_CONCURRENCY,
+                 journal: Optional[UploadJournal] = None, adaptive_concurrency: bool = True,
+                 slice_mmap: bool = Pan123Uploader.SLICE_MMAP):
+        """
+        初始化异步上传器
+
+        Args:
+            access_token: API访问令牌（可选）
+            client_id: 客户端ID（当access_token为空时必需）
+            client_secret: 客户端密钥（当access_token为空时必需）
+            transport: 同步HTTP传输层（仅用于获取和刷新令牌）
+            async_transport: 异步HTTP传输层（可选，默认新建）
+            slice_concurrency: 分片上传并发数
+            journal: 断点续传日志（可选，默认位于缓存目录）
+            adaptive_concurrency: 是否按实测吞吐和限流自动调整分片和文件的并发数
+            slice_mmap: 是否以文件映射窗口发送分片
+        """
+        super().__init__(access_token, client_id, client_secret, transport, slice_concurrency, journal,
+                         adaptive_concurrency, slice_mmap)
+        self.async_client = AsyncApiClient(async_transport, self.token_manager)
+        self.async_slice_client = AsyncApiClient(self.async_client.transport, self.token_manager,
+                                                 retry_policy=self.slice_client.retry_policy)
+        self.async_completions = AsyncCompletionTracker(self._apoll_complete)
+        # 延迟探测改为后台进行，不阻塞事件循环；探测完成前按原有顺序和吞吐调度
+        self.host_prober.blocking = False
+
+    async def _run_blocking(self, func, *args):
+        """在线程池中执行阻塞函数（计算MD5、读取文件）"""
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    async def _arequest(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                        host: Optional[str] = None, client: Optional[AsyncApiClient] = None) -> PooledResponse:
+        """通过异步连接池发送请求（限流、重试、重新认证与 _request 相同）"""
+        response = await (client or self.async_client).request(method, host or self.api_base, path, body, headers)
+        self.access_token = self.token_manager.access_token
+        return response
+
+    def _create_wait(self) -> float:
+        """现在调用 create 接口需要等待限流的秒数（按异步请求客户端的限流器）"""
+        client = self.async_client
+        if client.rate_limiter is None:
+            return 0.0
+        return client.rate_limiter.wait_time(client.client_id, "/upload/v2/file/create")
+
+    async def _send_to_upload_host(self, host: str, path: str, body: MultipartEncoder,
+                                   headers: Dict[str, str],
+                                   client: Optional[AsyncApiClient] = None) -> PooledResponse:
+        """向调度器选出的上传服务器发送请求（协程版 Pan123Uploader._send_to_upload_host）"""
+        start = time.monotonic()
+        try:
+            response = await self._arequest("POST", path, self.bandwidth.wrap_upload(body), headers,
+                                            host=host, client=client)
+        except Exception:
+            self.upload_hosts.record_failure(host)
+            self._record_transfer(path, len(body), None)
+            raise
+
+        return self._check_upload_response(host, path, body, response, time.monotonic() - start)
+
+    async def get_upload_domains(self) -> List[str]:
+        """获取上传域名列表（协程版 Pan123Uploader.get_upload_domains）"""
+        print("🌐 正在获取上传域名...")
+
+        try:
+            response = await self._arequest("GET", "/upload/v2/file/domain", "", self._get_headers())
+            result = json.loads(response.data.decode("utf-8"))
+
+            if result.get("code") == 0:
+                domains = result.get("data", [])
+                self.upload_domains = domains
+                print(f"✅ 获取到 {len(domains)} 个上传域名")
+                self._probe_upload_domains(domains)
+                return domains
+            else:
+                raise Exception(f"获取上传域名失败: {result.get('message', '未知错误')}")
+
+        except Exception as e:
+            print(f"❌ 获取上传域名时发生错误: {e}")
+            raise
+
+    async def create_file(self, file_path: str, parent_file_id: int = 0,
+                          duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """创建文件并检测秒传（协程版 Pan123Uploader.create_file）"""
+        file_md5 = await self._run_blocking(self._calculate_md5, file_path)
+        return await self._create_file_record(os.path.basename(file_path), os.path.getsize(file_path), file_md5,
+                                              parent_file_id, duplicate)
+
+    async def _create_file_record(self, filename: str, file_size: int, file_md5: str, parent_file_id: int = 0,
+                                  duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """按文件名、大小和MD5调用 create 接口（协程版 Pan123Uploader._create_file_record）"""
+        print(f"📝 正在创建文件: {filename}")
+        print(f"📏 文件大小: {self._format_file_size(file_size)}")
+
+        if file_size > self.MAX_FILE_SIZE:
+            raise Exception(
+                f"文件大小 {self._format_file_size(file_size)} "
+                f"超过最大限制 {self._format_file_size(self.MAX_FILE_SIZE)}"
+            )
+
+        try:
+            headers = self._get_headers()
+            headers['Content-Type'] = 'application/json'
+
+            payload = {
+                "parentFileID": parent_file_id,
+                "filename": filename,
+                "etag": file_md5,
+                "size": file_size
+            }
+            if duplicate:
+                payload["duplicate"] = duplicate
+            payload = json.dumps(payload)
+
+            response = await self._arequest("POST", "/upload/v2/file/create", payload, headers)
+            result = json.loads(response.data.decode("utf-8"))
+
+            if result.get("code") == 0:
+                data = result.get("data", {})
+
+                if data.get("reuse", False):
+                    print(f"✅ 文件秒传成功! 文件ID: {data.get('fileID')}")
+                    return {"success": True, "reuse": True, "fileID": data.get("fileID")}
+                else:
+                    print("需要上传文件内容")
+                    return {
+                        "success": True,
+                        "reuse": False,
+                        "preuploadID": data.get("preuploadID"),
+                        "sliceSize": data.get("sliceSize"),
+                        "servers": data.get("servers", [])
+                    }
+            else:
+                raise Exception(f"创建文件失败: {result.get('message', '未知错误')}")
+
+        except Exception as e:
+            print(f"❌ 创建文件时发生错误: {e}")
+            raise
+
+    async def single_upload(self, file_path: str, parent_file_id: int = 0,
+                            duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """单步上传文件（协程版 Pan123Uploader.single_upload）"""
+        filename = os.path.basename(file_path)
+        file_size = os.path.getsize(file_path)
+        file_md5 = await self._run_blocking(self._calculate_md5, file_path)
+
+        print(f"🚀 开始单步上传: {filename}")
+        body = self._build_single_upload_body(file_path, parent_file_id, file_md5, file_size, duplicate)
+        return await self._send_single_upload(body)
+
+    async def _send_single_upload(self, body: MultipartEncoder) -> Dict[str, Any]:
+        """把单步上传请求体发送到当前表现最好的上传域名（协程版 Pan123Uploader._send_single_upload）"""
+        if not self.upload_domains:
+            await self.get_upload_domains()
+
+        if not self.upload_domains:
+            raise Exception("无法获取上传域名")
+
+        try:
+            headers = self._get_headers()
+            headers['Content-type'] = body.content_type
+
+            upload_domain = self.upload_hosts.acquire(self.upload_domains)
+            print(f"⬆️  正在上传到服务器: {upload_domain}")
+            response = await self._send_to_upload_host(upload_domain, "/upload/v2/file/single/create",
+                                                       body, headers)
+            result = json.loads(response.data.decode("utf-8"))
+
+            if result.get("code") == 0:
+                data = result.get("data", {})
+                if data.get("completed", False):
+                    print(f"✅ 单步上传成功! 文件ID: {data.get('fileID')}")
+                    return {"success": True, "fileID": data.get("fileID")}
+                else:
+                    raise Exception("上传未完成")
+            else:
+                raise Exception(f"单步上传失败: {result.get('message', '未知错误')}")
+
+        except Exception as e:
+            print(f"❌ 单步上传时发生错误: {e}")
+            raise
+
+    async def _upload_slice(self, file_path: str, preupload_id: str, slice_no: int, start_pos: int,
+                            size: int, servers: List[str], slice_md5: Optional[str] = None) -> int:
+        """上传单个分片，失败时单独重试（协程版 Pan123Uploader._upload_slice）"""
+        slice_md5 = slice_md5 or await self._run_blocking(hash_range, file_path, start_pos, size)
+        body = self._build_slice_body(preupload_id, slice_no, slice_md5, file_path, start_pos, size)
+
+        for attempt in range(1, self.SLICE_MAX_ATTEMPTS + 1):
+            try:
+                headers = self._get_headers()
+                headers['Content-type'] = body.content_type
+
+                upload_server = self.upload_hosts.acquire(servers)
+                print(f"⬆️  正在上传分片 {slice_no} (大小: {self._format_file_size(size)}) -> {upload_server}")
+                response = await self._send_to_upload_host(upload_server, "/upload/v2/file/slice", body, headers,
+                                                           client=self.async_slice_client)
+                result = json.loads(response.data.decode("utf-8"))
+
+                if result.get("code") != 0:
+                    raise UploadRejectedError(f"分片 {slice_no} 上传失败: {result.get('message', '未知错误')}")
+
+                return slice_no
+
+            except Exception as e:
+                delay = self.slice_retry_policy.next_delay("POST", "/upload/v2/file/slice",
+                                                           self._slice_retry_reason(e), attempt)
+                if delay is None:
+                    print(f"❌ 分片 {slice_no} 上传时发生错误: {e}")
+                    raise
+                print(f"⚠️  分片 {slice_no} 上传失败（{e}），{delay:.1f}秒后换服务器重试 "
+                      f"({attempt}/{self.SLICE_MAX_ATTEMPTS - 1})")
+                await asyncio.sleep(delay)
+
+    async def slice_upload(self, file_path: str, preupload_id: str, slice_size: int,
+                           servers: List[str], concurrency: Optional[int] = None,
+                           session: Optional[UploadSession] = None) -> bool:
+        """分片并发上传文件（协程版 Pan123Uploader.slice_upload，并发数由 slice_controller 调整）"""
+        file_size = os.path.getsize(file_path)
+        total_slices = math.ceil(file_size / slice_size)
+        acked = set(session.acked) if session else set()
+        pending = [n for n in range(1, total_slices + 1) if n not in acked]
+        controller = AdaptiveConcurrency(concurrency, concurrency, concurrency) if concurrency else self.slice_controller
+
+        print(f"📦 开始分片上传，总分片数: {total_slices}，{self._concurrency_label(controller)}")
+        if acked:
+            print(f"🔁 跳过已上传的 {total_slices - len(pending)} 个分片，剩余 {len(pending)} 个")
+
+        slice_md5s = self._cached_slice_table(file_path, slice_size) or [None] * total_slices
+
+        async def upload_with_slot(slice_no: int) -> int:
+            start_pos = (slice_no - 1) * slice_size
+            await controller.acquire_async()
+            try:
+                return await self._upload_slice(file_path, preupload_id, slice_no, start_pos,
+                                                min(slice_size, file_size - start_pos), servers,
+                                                slice_md5s[slice_no - 1])
+            finally:
+                controller.release()
+
+        tasks = [asyncio.ensure_future(upload_with_slot(slice_no)) for slice_no in pending]
+        completed = total_slices - len(pending)
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                slice_no = await next_done
+                if session:
+                    await self._run_blocking(self.journal.ack, session, slice_no)
+                completed += 1
+                print(f"✅ 分片 {slice_no} 上传成功 ({completed}/{total_slices}，{controller.status()})")
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            if session:
+                for slice_no in results:
+                    if isinstance(slice_no, int) and slice_no not in session.acked:
+                        await self._run_blocking(self.journal.ack, session, slice_no)
+            raise
+
+        print("✅ 所有分片上传完成")
+        if len(servers) > 1:
+            print(f"📊 上传服务器统计: {self.upload_hosts.summary()}")
+        return True
+
+    async def _apoll_complete(self, preupload_id: str) -> Optional[Dict[str, Any]]:
+        """检查一次上传是否已完成（由 async_completions 跟踪器调用）"""
+        headers = self._get_headers()
+        headers['Content-Type'] = 'application/json'
+        payload = json.dumps({"preuploadID": preupload_id})
+
+        response = await self._arequest("POST", "/upload/v2/file/upload_complete", payload, headers)
+        return self._parse_complete(response)
+
+    async def submit_complete(self, preupload_id: str,
+                              session: Optional[UploadSession] = None) -> "asyncio.Future":
+        """提交上传完成确认，不等待服务器合并分片（协程版 Pan123Uploader.submit_complete）"""
+        print("⏰ 正在确认上传完成...")
+        pending = self.async_completions.submit(preupload_id)
+
+        async def finish() -> Dict[str, Any]:
+            try:
+                result = await pending
+                if session is not None:
+                    await self._run_blocking(self.journal.finish, session)
+                return result
+            except Exception as e:
+                print(f"❌ 确认上传完成时发生错误: {e}")
+                raise
+
+        return asyncio.ensure_future(finish())
+
+    async def upload_complete(self, preupload_id: str) -> Dict[str, Any]:
+        """确认上传完成（协程版 Pan123Uploader.upload_complete）"""
+        return await (await self.submit_complete(preupload_id))
+
+    @staticmethod
+    def _resolved(result: Dict[str, Any]) -> "asyncio.Future":
+        """把已得到的上传结果包装为已完成的 asyncio.Future"""
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(result)
+        return future
+
+    async def upload_file(self, file_path: str, parent_file_id: int = 0,
+                          duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """
+        上传文件到123云盘（协程版 Pan123Uploader.upload_file）
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID，0表示根目录
+            duplicate: 同名文件处理策略（可选，1保留两者，2覆盖原文件；默认由服务器决定）
+
+        Returns:
+            Dict[str, Any]: 上传结果，包含success和fileID
+        """
+        return await (await self.start_upload(file_path, parent_file_id, duplicate))
+
+    async def start_upload(self, file_path: str, parent_file_id: int = 0,
+                           duplicate: Optional[int] = None) -> "asyncio.Future":
+        """
+        上传文件，传输完成后即返回，不等待服务器合并分片（协程版 Pan123Uploader.start_upload）
+
+        Returns:
+            asyncio.Future: 完成时得到上传结果（success和fileID）
+        """
+        if not os.path.exists(file_path):
+            raise Exception(f"文件不存在: {file_path}")
+
+        file_size = os.path.getsize(file_path)
+        print(f"📂 准备上传文件: {os.path.basename(file_path)} ({self._format_file_size(file_size)})")
+
+        session = await self._run_blocking(self.journal.find, file_path, parent_file_id)
+        if session:
+            try:
+                return self._resolved(await self._resume_upload(file_path, session))
+            except UploadRejectedError as e:
+                print(f"⚠️  续传失败（{e}），服务器上的上传会话可能已过期，重新创建上传")
+                await self._run_blocking(self.journal.finish, session)
+
+        if not self.strategy.should_probe(file_size, self.upload_hosts.best_throughput(), self._create_wait()):
+            return self._resolved(await self.single_upload(file_path, parent_file_id, duplicate))
+
+        await self._run_blocking(self._hash_file, file_path, True)
+
+        start = time.monotonic()
+        create_result = await self.create_file(file_path, parent_file_id, duplicate)
+        self.strategy.record_probe(create_result.get("reuse", False), time.monotonic() - start)
+        if create_result.get("reuse", False):
+            return self._resolved({"success": True, "fileID": create_result.get("fileID")})
+
+        preupload_id = create_result.get("preuploadID")
+        slice_size = create_result.get("sliceSize")
+        servers = create_result.get("servers", [])
+
+        if not preupload_id or not slice_size or not servers:
+            raise Exception("创建文件响应数据不完整")
+
+        session = await self._run_blocking(self.journal.begin, file_path, parent_file_id,
+                                           self._calculate_md5(file_path), preupload_id, slice_size, servers)
+        await self.slice_upload(file_path, preupload_id, slice_size, servers, session=session)
+        return await self.submit_complete(preupload_id, session)
+
+    async def _resume_upload(self, file_path: str, session: UploadSession) -> Dict[str, Any]:
+        """继续上次中断的分片上传（协程版 Pan123Uploader._resume_upload）"""
+        total_slices = math.ceil(session.identity["size"] / session.slice_size)
+        print(f"🔁 发现未完成的上传（已确认 {len(session.acked)}/{total_slices} 个分片），继续上传")
+
+        await self.slice_upload(file_path, session.preupload_id, session.slice_size, session.servers,
+                                session=session)
+
+        return await (await self.submit_complete(session.preupload_id, session))
+
+    async def upload_stream(self, stream, filename: str, parent_file_id: int = 0,
+                            duplicate: Optional[int] = None,
+                            memory_threshold: int = DEFAULT_MEMORY_THRESHOLD) -> Dict[str, Any]:
+        """
+        上传不可回退的数据流（协程版 Pan123Uploader.upload_stream）
+
+        读取数据流是阻塞操作，在线程池中边缓存边计算MD5，不阻塞事件循环。
+        """
+        spool = await self._run_blocking(self._spool, stream, filename, memory_threshold)
+        with spool:
+            if spool.in_memory:
+                return await self._upload_buffer(spool, parent_file_id, duplicate)
+            return await self.upload_file(spool.path, parent_file_id, duplicate)
+
+    async def _upload_buffer(self, spool: SpooledStream, parent_file_id: int = 0,
+                             duplicate: Optional[int] = None) -> Dict[str, Any]:
+        """上传缓存在内存中的数据流（协程版 Pan123Uploader._upload_buffer）"""
+        etag = spool.digest.etag
+        if self.strategy.should_probe(spool.size, self.upload_hosts.best_throughput(), self._create_wait()):
+            start = time.monotonic()
+            create_result = await self._create_file_record(spool.filename, spool.size, etag,
+                                                           parent_file_id, duplicate)
+            self.strategy.record_probe(create_result.get("reuse", False), time.monotonic() - start)
             if create_result.get("reuse", False):
-                # 秒传成功
                 return {"success": True, "fileID": create_result.get("fileID")}
 
-            # 需要分片上传
-            preupload_id = create_result.get("preuploadID")
-            slice_size = create_result.get("sliceSize")
-            servers = create_result.get("servers", [])
+        print(f"🚀 开始单步上传: {spool.filename}")
+        body = self._build_single_upload_body(spool.filename, parent_file_id, etag, spool.size, duplicate,
+                                              data=spool.data)
+        return await self._send_single_upload(body)
+
+    async def upload_directory(self, local_dir: str, parent_file_id: int = 0,
+                               file_concurrency: int = Pan123Uploader.DEFAULT_FILE_CONCURRENCY) -> Dict[str, Any]:
+        """
+        把本地目录（含子目录）上传到云盘的指定目录下（协程版 Pan123Uploader.upload_directory）
+
+        Args:
+            local_dir: 本地目录路径
+            parent_file_id: 云盘父目录ID，0表示根目录
+            file_concurrency: 同时上传的文件数
+
+        Returns:
+            Dict[str, Any]: 上传结果，包含success、dirID、uploaded和failed
+        """
+        if not os.path.isdir(local_dir):
+            raise Exception(f"目录不存在: {local_dir}")
+
+        local_dir = os.path.abspath(local_dir)
+        tasks, empty_dirs = await self._run_blocking(self._scan_directory, local_dir)
+        print(f"📂 准备上传目录: {local_dir}（{len(tasks)} 个文件）")
+
+        # 创建目录走同步请求（mkdir 限流为每秒2次，并发创建也不会更快），放到线程池中执行
+        root_id, _ = await self._run_blocking(self.make_directory, os.path.basename(local_dir), parent_file_id)
+        folders = RemoteFolderCache(self, root_id)
+        scheduler = _FileScheduler(tasks, self.LARGE_FILE_THRESHOLD, file_concurrency // 2)
+        controller = self._concurrency_controller(file_concurrency, self.MAX_FILE_CONCURRENCY,
+                                                  ("upload/v2/file/single/create", "upload/v2/file/create"))
+        metrics = self.async_client.retry_policy.metrics
+        metrics.add_listener(controller.on_retry)
+        self._prefetch_hashes(tasks)
+        uploaded = []
+        failed = []
+        completions = []
+
+        def settle(path: str, error: Optional[Exception] = None) -> None:
+            if error is None:
+                uploaded.append(path)
+            else:
+                print(f"❌ 上传失败: {path}: {error}")
+                failed.append((path, str(error)))
+            print(f"📊 文件上传进度: {len(uploaded) + len(failed)}/{len(tasks)}（{controller.status()}）")
+
+        async def complete(path: str, future: "asyncio.Future") -> None:
+            try:
+                await future
+                settle(path)
+            except Exception as e:
+                settle(path, e)
+
+        async def worker():
+            while True:
+                await controller.acquire_async()
+                item = scheduler.next(controller.limit // 2)
+                if item is None:
+                    controller.release()
+                    return
+                (path, rel_dir, size), large = item
+                start = time.monotonic()
+                try:
+                    # 传输完成即让出上传位，完成确认由跟踪器统一轮询
+                    future = await self.start_upload(path, await self._run_blocking(folders.resolve, rel_dir))
+                    controller.record_success(size, time.monotonic() - start)
+                    completions.append(asyncio.ensure_future(complete(path, future)))
+                except Exception as e:
+                    settle(path, e)
+                finally:
+                    scheduler.done(large)
+                    controller.release()
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, min(controller.maximum, len(tasks))))))
+            await asyncio.gather(*completions)
+        finally:
+            metrics.remove_listener(controller.on_retry)
 
-            if not preupload_id or not slice_size or not servers:
-                raise Exception("创建文件响应数据不完整")
+        for rel_dir in empty_dirs:
+            try:
+                await self._run_blocking(folders.resolve, rel_dir)
+            except Exception as e:
+                failed.append((os.path.join(local_dir, rel_dir), str(e)))
 
-            # 执行分片上传
-            self.slice_upload(file_path, preupload_id, slice_size, servers)
+        print(f"✅ 目录上传完成: 成功 {len(uploaded)} 个文件，失败 {len(failed)} 个")
+        return {"success": not failed, "dirID": root_id, "uploaded": len(uploaded), "failed": failed}
 
-            # 确认上传完成
-            return self.upload_complete(preupload_id)
+    async def aclose(self) -> None:
+        """关闭异步连接池中的空闲连接"""
+        await self.async_client.transport.close()
 
 
 # ==================== 主程序 ====================
@@ -767,8 +2457,13 @@ def main():
     主函数 - 交互式命令行界面
 
     提供两种文件路径输入方式：
-    1. 命令行参数：python upload_to_123pan_v2.py <文件路径>
-    2. 交互式输入：运行后提示用户输入文件路径
+    1. 命令行参数：python upload_to_123pan_v2.py <文件或目录路径>
+    2. 交互式输入：运行后提示用户输入文件或目录路径
+
+    路径为 "-" 时上传标准输入的数据，第二个参数为上传后的文件名：
+        mysqldump mydb | python upload_to_123pan_v2.py - mydb.sql
+
+    路径为目录时上传整个目录（含子目录），同时上传的文件数由配置项 FILE_CONCURRENCY 决定。
 
     父目录ID获取方式：
     - 优先使用配置文件config.txt中的PARENT_FILE_ID
@@ -785,6 +2480,14 @@ def main():
         CLIENT_ID = config.get("CLIENT_ID")
         CLIENT_SECRET = config.get("CLIENT_SECRET")
         PARENT_FILE_ID_CONFIG = config.get("PARENT_FILE_ID", "").strip()
+        SLICE_CONCURRENCY = int(config.get("SLICE_CONCURRENCY", "").strip()
+                                or Pan123Uploader.DEFAULT_SLICE_CONCURRENCY)
+        FILE_CONCURRENCY = int(config.get("FILE_CONCURRENCY", "").strip()
+                               or Pan123Uploader.DEFAULT_FILE_CONCURRENCY)
+        ADAPTIVE_CONCURRENCY = config.get("ADAPTIVE_CONCURRENCY", "").strip().lower() not in ("0", "false", "no")
+        SLICE_MMAP = config.get("SLICE_MMAP", "").strip().lower() in ("1", "true", "yes")
+        get_default_bandwidth_governor().configure(config)
+        get_default_buffer_pool().configure(config)
 
         if not CLIENT_ID or not CLIENT_SECRET:
             raise ValueError("配置文件中缺少CLIENT_ID或CLIENT_SECRET")
@@ -801,9 +2504,17 @@ def main():
     if len(sys.argv) > 1:
         FILE_PATH = sys.argv[1]
         print(f"使用命令行参数指定的文件路径: {FILE_PATH}")
+
+        # "-" 表示上传标准输入：标准输入是数据本身，不能再交互式输入父目录ID
+        if FILE_PATH == "-":
+            if len(sys.argv) < 3:
+                print("❌ 上传标准输入时需要指定文件名: python upload_to_123pan_v2.py - <文件名>")
+                return
+            upload_stdin(config, sys.argv[2], PARENT_FILE_ID_CONFIG, SLICE_CONCURRENCY, ADAPTIVE_CONCURRENCY)
+            return
     else:
         # 方式2：交互式输入
-        FILE_PATH = input("请输入要上传的文件路径: ").strip()
+        FILE_PATH = input("请输入要上传的文件或目录路径: ").strip()
 
         # 移除可能的引号
         if FILE_PATH.startswith('"') and FILE_PATH.endswith('"'):
@@ -830,20 +2541,86 @@ def main():
         parent_id_input = input("请输入父目录ID（直接回车表示根目录）: ").strip()
         PARENT_FILE_ID = int(parent_id_input) if parent_id_input else 0
 
+    bandwidth = get_default_bandwidth_governor()
+    if bandwidth.limited or bandwidth.schedule:
+        print(f"🚦 带宽限制: {bandwidth.describe()}")
+
+    uploader = None
     try:
         # 创建上传器实例
-        uploader = Pan123Uploader(client_id=CLIENT_ID, client_secret=CLIENT_SECRET)
+        uploader = Pan123Uploader(client_id=CLIENT_ID, client_secret=CLIENT_SECRET,
+                                   slice_concurrency=SLICE_CONCURRENCY,
+                                   adaptive_concurrency=ADAPTIVE_CONCURRENCY, slice_mmap=SLICE_MMAP)
+        uploader.host_prober.configure(config)
+
+        if os.path.isdir(FILE_PATH):
+            # 上传整个目录
+            result = uploader.upload_directory(FILE_PATH, parent_file_id=PARENT_FILE_ID,
+                                               file_concurrency=FILE_CONCURRENCY)
+
+            print("\n" + "=" * 60)
+            print(f"📁 目录ID: {result.get('dirID')}")
+            print(f"✅ 成功上传 {result.get('uploaded')} 个文件")
+            for path, error in result.get("failed", []):
+                print(f"❌ {path}: {error}")
+            print("=" * 60)
+        else:
+            # 上传文件
+            result = uploader.upload_file(FILE_PATH, parent_file_id=PARENT_FILE_ID)
+
+            if result.get("success", False):
+                print("\n" + "=" * 60)
+                print("✅ 文件上传成功!")
+                print(f"📄 文件ID: {result.get('fileID')}")
+                print("=" * 60)
+            else:
+                print("\n❌ 文件上传失败!")
 
-        # 上传文件
-        result = uploader.upload_file(FILE_PATH, parent_file_id=PARENT_FILE_ID)
+        print(f"💡 上传策略: {uploader.strategy.summary()}")
+
+    except Exception as e:
+        print(f"\n❌ 上传过程中发生错误: {e}")
+
+    # 输出重试统计，便于根据限流情况调整并发
+    metrics = get_default_retry_policy().metrics
+    if metrics.retries:
+        print(f"🔁 重试统计: {metrics.summary()}")
+    if uploader is not None and uploader.slice_client.retry_policy.metrics.retries:
+        print(f"🔁 分片重试统计: {uploader.slice_client.retry_policy.metrics.summary()}")
+
+
+def upload_stdin(config: Dict[str, str], filename: str, parent_file_id_config: str,
+                 slice_concurrency: int, adaptive_concurrency: bool = True) -> None:
+    """
+    上传标准输入的数据（python upload_to_123pan_v2.py - <文件名>）
+
+    Args:
+        config: 配置字典
+        filename: 上传后的文件名
+        parent_file_id_config: 配置文件中的父目录ID（为空时上传到根目录）
+        slice_concurrency: 分片上传并发数
+        adaptive_concurrency: 是否按实测吞吐和限流自动调整分片并发数（config.txt 的 ADAPTIVE_CONCURRENCY）
+    """
+    PARENT_FILE_ID = int(parent_file_id_config) if parent_file_id_config else 0
+    print(f"使用父目录ID: {PARENT_FILE_ID}")
+
+    bandwidth = get_default_bandwidth_governor()
+    if bandwidth.limited or bandwidth.schedule:
+        print(f"🚦 带宽限制: {bandwidth.describe()}")
+
+    try:
+        uploader = Pan123Uploader(client_id=config.get("CLIENT_ID"), client_secret=config.get("CLIENT_SECRET"),
+                                  slice_concurrency=slice_concurrency, adaptive_concurrency=adaptive_concurrency)
+        uploader.host_prober.configure(config)
+        result = uploader.upload_stream(sys.stdin.buffer, filename, parent_file_id=PARENT_FILE_ID)
 
         if result.get("success", False):
             print("\n" + "=" * 60)
-            print("✅ 文件上传成功!")
+            print("✅ 数据流上传成功!")
             print(f"📄 文件ID: {result.get('fileID')}")
             print("=" * 60)
         else:
-            print("\n❌ 文件上传失败!")
+            print("\n❌ 数据流上传失败!")
 
     except Exception as e:
         print(f"\n❌ 上传过程中发生错误: {e}")
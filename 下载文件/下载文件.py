@@ -12,6 +12,7 @@
     - MD5校验：下载后自动验证文件完整性
     - 进度显示：实时显示下载进度
     - 智能命名：自动使用API返回的真实文件名
+    - 异步接口：AsyncPan123Downloader 提供同名协程方法，便于在事件循环中并发下载
 
 技术特点：
     - 使用v1 API，稳定可靠
@@ -29,15 +30,25 @@
 
 import requests
 import os
-import sys
 import json
-import http.client
+import asyncio
+import sys
 import argparse
 import hashlib
 from urllib.parse import urlparse
 from pathlib import Path
 from typing import Optional, Dict, Any
 
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.aio import AsyncApiClient, AsyncTransport
+from pan123_common.auth import TokenManager, get_access_token
+from pan123_common.bandwidth import DOWNLOAD, get_default_bandwidth_governor
+from pan123_common.hash_cache import get_default_hash_cache
+from pan123_common.hashing import FileDigest
+from pan123_common.transport import create_requests_session
+
 
 # ==================== 配置文件处理 ====================
 
@@ -106,7 +117,9 @@ class Pan123Downloader:
     属性:
         access_token: API访问令牌
         base_url: API服务器地址
-        headers: 通用请求头
+        headers: 通用请求头（令牌失效后自动换用新令牌）
+        token_manager: 令牌管理器，401时自动重新认证
+        session: 带有界连接池的requests会话，所有请求复用keep-alive连接
         CHUNK_SIZE: 下载块大小（默认8KB）
 
     使用示例:
@@ -139,6 +152,8 @@ class Pan123Downloader:
         Raises:
             ValueError: 未提供有效的认证信息
         """
+        self.session = create_requests_session()
+
         # 根据提供的参数选择认证方式
         if access_token:
             self.access_token = access_token
@@ -147,18 +162,29 @@ class Pan123Downloader:
         else:
             raise ValueError("必须提供access_token或者client_id和client_secret")
 
+        # 令牌失效（401）时由 token_manager 自动重新认证并重放请求
+        self.token_manager = TokenManager(self.access_token, client_id, client_secret)
+        self.token_manager.install_requests_hook(self.session)
+
         self.base_url = self.API_BASE_URL
-        self.headers = {
+
+        # 进程内共享的带宽控制器：下载内容按配置的下载速率（及上传下载合计速率）限速接收
+        self.bandwidth = get_default_bandwidth_governor()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """通用请求头（令牌重新认证后自动使用新令牌）"""
+        return {
             'Content-Type': 'application/json',
             'Platform': 'open_platform',
-            'Authorization': f'Bearer {self.access_token}'
+            'Authorization': f'Bearer {self.token_manager.access_token}'
         }
 
     def _get_access_token(self, client_id: str, client_secret: str) -> str:
         """
         获取API访问令牌
 
-        向123云盘开放平台认证服务器请求访问令牌。
+        优先使用本地缓存的令牌，缓存缺失或即将过期时向123云盘开放平台认证服务器请求新令牌。
         令牌用于后续所有API调用的身份验证。
 
         Args:
@@ -174,39 +200,10 @@ class Pan123Downloader:
         print("正在获取访问令牌...")
 
         try:
-            # 建立HTTPS连接
-            conn = http.client.HTTPSConnection("open-api.123pan.com")
-
-            # 构造请求体
-            payload = json.dumps({
-                "clientID": client_id,
-                "clientSecret": client_secret
-            })
-
-            # 设置请求头
-            headers = {
-                'Platform': 'open_platform',
-                'Content-Type': 'application/json'
-            }
-
-            # 发送POST请求
-            conn.request("POST", "/api/v1/access_token", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-
-            # 解析响应
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                access_token = result.get("data", {}).get("accessToken")
-                if access_token:
-                    print("✅ 访问令牌获取成功")
-                    return access_token
-                else:
-                    raise Exception("响应中未找到访问令牌")
-            else:
-                raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+            # 优先使用本地缓存的令牌（按client_id在多个进程间共享，过期前自动换新）
+            access_token = get_access_token(client_id, client_secret)
+            print("✅ 访问令牌获取成功")
+            return access_token
 
         except Exception as e:
             print(f"❌ 获取访问令牌时发生错误: {e}")
@@ -247,7 +244,8 @@ class Pan123Downloader:
         """
         计算文件MD5值
 
-        分块读取文件并计算MD5哈希值，避免大文件占用过多内存。
+        大缓冲区一遍读取文件，结果保存在持久化哈希缓存中，
+        之后上传或再次校验该文件时（文件未变化）无需重新读取。
 
         Args:
             file_path: 文件路径
@@ -255,12 +253,7 @@ class Pan123Downloader:
         Returns:
             str: 文件的MD5哈希值（32位小写十六进制字符串）
         """
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            # 分块读取文件，每块4KB
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        return get_default_hash_cache().md5(file_path)
 
     def get_file_detail(self, file_id: int) -> Optional[Dict[str, Any]]:
         """
@@ -281,7 +274,7 @@ class Pan123Downloader:
         params = {'fileID': file_id}
 
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.session.get(url, headers=self.headers, params=params)
             response.raise_for_status()
 
             data = response.json()
@@ -318,7 +311,7 @@ class Pan123Downloader:
         params = {'fileId': file_id}
 
         try:
-            response = requests.get(url, headers=self.headers, params=params)
+            response = self.session.get(url, headers=self.headers, params=params)
             response.raise_for_status()
 
             data = response.json()
@@ -360,6 +353,53 @@ class Pan123Downloader:
         print(f"回收站状态: {'在回收站' if file_detail.get('trashed') == 1 else '正常'}")
         print("=" * 60)
 
+    def _resolve_save_path(self, filename: str, save_folder: Optional[str]) -> Optional[str]:
+        """
+        确定保存路径并创建保存目录
+
+        Args:
+            filename: 文件名
+            save_folder: 保存文件夹路径，不指定时保存到当前目录
+
+        Returns:
+            Optional[str]: 保存路径，save_folder 不是有效文件夹时返回None
+        """
+        if save_folder:
+            # 用户指定了文件夹路径
+            if os.path.isdir(save_folder) or not os.path.exists(save_folder):
+                save_path = os.path.join(save_folder, filename)
+            else:
+                print("❌ 错误: 指定的路径不是有效的文件夹路径")
+                return None
+        else:
+            # 保存到当前目录
+            save_path = filename
+
+        # 创建保存目录
+        save_dir = os.path.dirname(save_path)
+        if save_dir:
+            Path(save_dir).mkdir(parents=True, exist_ok=True)
+
+        return save_path
+
+    def _print_progress(self, downloaded_size: int, total_size: int) -> None:
+        """
+        在同一行刷新下载进度
+
+        Args:
+            downloaded_size: 已下载字节数
+            total_size: 总字节数（未知时为0）
+        """
+        if total_size > 0:
+            progress = (downloaded_size / total_size) * 100
+            downloaded_str = self._format_file_size(downloaded_size)
+            total_str = self._format_file_size(total_size)
+            print(f"\r📥 下载进度: {progress:.1f}% "
+                  f"({downloaded_str}/{total_str})", end='')
+        else:
+            downloaded_str = self._format_file_size(downloaded_size)
+            print(f"\r📥 已下载: {downloaded_str}", end='')
+
     def download_file(self, file_id: int, save_folder: Optional[str] = None,
                      chunk_size: int = None) -> bool:
         """
@@ -425,22 +465,9 @@ class Pan123Downloader:
 
         # 步骤4：确定保存路径
         filename = file_detail.get('filename', f"file_{file_id}")
-
-        if save_folder:
-            # 用户指定了文件夹路径
-            if os.path.isdir(save_folder) or not os.path.exists(save_folder):
-                save_path = os.path.join(save_folder, filename)
-            else:
-                print("❌ 错误: 指定的路径不是有效的文件夹路径")
-                return False
-        else:
-            # 保存到当前目录
-            save_path = filename
-
-        # 创建保存目录
-        save_dir = os.path.dirname(save_path)
-        if save_dir:
-            Path(save_dir).mkdir(parents=True, exist_ok=True)
+        save_path = self._resolve_save_path(filename, save_folder)
+        if save_path is None:
+            return False
 
         try:
             # 步骤5：下载文件
@@ -450,7 +477,7 @@ class Pan123Downloader:
             print(f"📏 预期大小: {self._format_file_size(file_detail.get('size', 0))}")
 
             # 发送下载请求（流式）
-            response = requests.get(download_url, stream=True)
+            response = self.session.get(download_url, stream=True)
             response.raise_for_status()
 
             # 获取文件大小
@@ -462,23 +489,16 @@ class Pan123Downloader:
             if total_size > 0 and expected_size > 0 and total_size != expected_size:
                 print(f"⚠️  警告: 下载大小({total_size})与预期大小({expected_size})不匹配")
 
-            # 写入文件并显示进度
-            with open(save_path, 'wb') as f:
+            # 写入文件并显示进度（结束后连接归还连接池）
+            with response, open(save_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=chunk_size):
                     if chunk:
+                        self.bandwidth.throttle(DOWNLOAD, len(chunk))
                         f.write(chunk)
                         downloaded_size += len(chunk)
 
                         # 显示下载进度
-                        if total_size > 0:
-                            progress = (downloaded_size / total_size) * 100
-                            downloaded_str = self._format_file_size(downloaded_size)
-                            total_str = self._format_file_size(total_size)
-                            print(f"\r📥 下载进度: {progress:.1f}% "
-                                  f"({downloaded_str}/{total_str})", end='')
-                        else:
-                            downloaded_str = self._format_file_size(downloaded_size)
-                            print(f"\r📥 已下载: {downloaded_str}", end='')
+                        self._print_progress(downloaded_size, total_size)
 
             print(f"\n✅ 文件下载完成: {save_path}")
 
@@ -508,6 +528,188 @@ class Pan123Downloader:
             return False
 
 
+class AsyncPan123Downloader(Pan123Downloader):
+    """
+    123云盘文件下载器（asyncio版本）
+
+    方法名、参数和返回值与 Pan123Downloader 一致，但网络相关方法均为协程，
+    基于 pan123_common.aio 的异步传输层发送请求和流式读取文件内容，
+    可在一个事件循环中并发下载多个文件。下载过程中同步计算MD5，无需下载后再读一遍文件。
+
+    使用示例:
+        >>> async def main():
+        ...     downloader = AsyncPan123Downloader(client_id="your_id", client_secret="your_secret")
+        ...     results = await asyncio.gather(*(downloader.download_file(fid, "./downloads") for fid in file_ids))
+        ...     await downloader.aclose()
+    """
+
+    # 异步下载的块大小（256KB），减少事件循环调度次数
+    CHUNK_SIZE = 256 * 1024
+
+    def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
+                 client_secret: Optional[str] = None, async_transport: Optional[AsyncTransport] = None):
+        """
+        初始化异步下载器
+
+        Args:
+            access_token: API访问令牌（可选）
+            client_id: 客户端ID（当access_token为空时必需）
+            client_secret: 客户端密钥（当access_token为空时必需）
+            async_transport: 异步HTTP传输层（可选，默认新建）
+        """
+        super().__init__(access_token, client_id, client_secret)
+        self.async_client = AsyncApiClient(async_transport, self.token_manager)
+
+    async def _get_api_data(self, path: str, action: str) -> Optional[Dict[str, Any]]:
+        """
+        请求GET接口并返回data字段
+
+        Args:
+            path: 请求路径（包含查询参数）
+            action: 操作名称，用于错误提示
+
+        Returns:
+            Optional[Dict[str, Any]]: 响应中的data，失败时返回None
+        """
+        try:
+            response = await self.async_client.request("GET", self.base_url, path, None, self.headers)
+            if response.status >= 400:
+                print(f"❌ 请求失败: HTTP {response.status} {response.reason}")
+                return None
+
+            data = json.loads(response.data.decode("utf-8"))
+
+            if data.get('code') == 0:
+                return data.get('data')
+            else:
+                print(f"❌ {action}失败: {data.get('message', '未知错误')}")
+                return None
+
+        except ValueError as e:
+            print(f"❌ JSON解析失败: {e}")
+            return None
+        except (OSError, asyncio.TimeoutError) as e:
+            print(f"❌ 请求失败: {e}")
+            return None
+
+    async def get_file_detail(self, file_id: int) -> Optional[Dict[str, Any]]:
+        """获取文件详情信息（协程版 Pan123Downloader.get_file_detail）"""
+        return await self._get_api_data(f"/api/v1/file/detail?fileID={file_id}", "获取文件详情")
+
+    async def get_download_info(self, file_id: int) -> Optional[Dict[str, Any]]:
+        """获取文件下载信息（协程版 Pan123Downloader.get_download_info）"""
+        return await self._get_api_data(f"/api/v1/file/download_info?fileId={file_id}", "获取下载信息")
+
+    async def download_file(self, file_id: int, save_folder: Optional[str] = None,
+                            chunk_size: int = None) -> bool:
+        """
+        下载文件（协程版 Pan123Downloader.download_file）
+
+        Args:
+            file_id: 文件ID
+            save_folder: 保存文件夹路径，如果不指定则保存到当前目录
+            chunk_size: 下载块大小，默认256KB
+
+        Returns:
+            bool: 下载成功返回True，失败返回False
+        """
+        if chunk_size is None:
+            chunk_size = self.CHUNK_SIZE
+
+        print("📋 正在获取文件详情...")
+        file_detail = await self.get_file_detail(file_id)
+        if not file_detail:
+            return False
+
+        self._display_file_info(file_detail)
+
+        if file_detail.get('type') == 1:
+            print("❌ 错误: 不能下载文件夹，请指定具体文件ID")
+            return False
+
+        if file_detail.get('status', 0) > 100:
+            print("⚠️  警告: 该文件已被审核驳回，可能无法正常下载")
+
+        if file_detail.get('trashed') == 1:
+            print("⚠️  警告: 该文件在回收站中")
+
+        print("\n🔗 正在获取下载链接...")
+        download_info = await self.get_download_info(file_id)
+        if not download_info:
+            return False
+
+        download_url = download_info.get('downloadUrl')
+        if not download_url:
+            print("❌ 未获取到下载链接")
+            return False
+
+        print(f"✅ 下载链接: {download_url}")
+
+        filename = file_detail.get('filename', f"file_{file_id}")
+        save_path = self._resolve_save_path(filename, save_folder)
+        if save_path is None:
+            return False
+
+        try:
+            print("\n🚀 开始下载文件")
+            print(f"📄 文件名: {filename}")
+            print(f"💾 保存路径: {os.path.abspath(save_path)}")
+            print(f"📏 预期大小: {self._format_file_size(file_detail.get('size', 0))}")
+
+            hash_md5 = hashlib.md5()
+            downloaded_size = 0
+
+            async with self.async_client.transport.stream("GET", download_url) as response:
+                if response.status >= 400:
+                    print(f"\n❌ 下载失败: HTTP {response.status} {response.reason}")
+                    return False
+
+                total_size = int(response.headers.get('Content-Length') or 0)
+                expected_size = file_detail.get('size', 0)
+
+                if total_size > 0 and expected_size > 0 and total_size != expected_size:
+                    print(f"⚠️  警告: 下载大小({total_size})与预期大小({expected_size})不匹配")
+
+                # 写入页缓存通常远快于网络，这里直接写文件而不切换到线程池
+                with open(save_path, 'wb') as f:
+                    async for chunk in response.iter_chunks(chunk_size):
+                        await self.bandwidth.throttle_async(DOWNLOAD, len(chunk))
+                        f.write(chunk)
+                        hash_md5.update(chunk)
+                        downloaded_size += len(chunk)
+                        self._print_progress(downloaded_size, total_size)
+
+            print(f"\n✅ 文件下载完成: {save_path}")
+
+            # 下载时已算出MD5，存入哈希缓存，之后上传或校验该文件时无需再读一遍
+            actual_md5 = hash_md5.hexdigest()
+            get_default_hash_cache().put(save_path, FileDigest(actual_md5, downloaded_size))
+
+            expected_md5 = file_detail.get('etag', '').lower()
+            if expected_md5:
+                print("\n🔍 正在进行MD5校验...")
+                print(f"预期MD5: {expected_md5}")
+                print(f"实际MD5: {actual_md5}")
+
+                if actual_md5 == expected_md5:
+                    print("✅ MD5校验通过，文件完整性验证成功！")
+                else:
+                    print("❌ MD5校验失败，文件可能已损坏！")
+                    return False
+            else:
+                print("⚠️  无法获取预期MD5值，跳过校验")
+
+            return True
+
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            print(f"\n❌ 下载失败: {e}")
+            return False
+
+    async def aclose(self) -> None:
+        """关闭异步连接池中的空闲连接"""
+        await self.async_client.transport.close()
+
+
 # ==================== 命令行参数解析 ====================
 
 def parse_arguments():
@@ -607,6 +809,7 @@ def main():
         config = load_config()
         CLIENT_ID = config.get("CLIENT_ID")
         CLIENT_SECRET = config.get("CLIENT_SECRET")
+        get_default_bandwidth_governor().configure(config)
 
         if not CLIENT_ID or not CLIENT_SECRET:
             raise ValueError("配置文件中缺少CLIENT_ID或CLIENT_SECRET")
@@ -16,17 +16,26 @@
 """
 
 import json
-import http.client
 import sys
 import os
 import hashlib
 import math
-import time
+from concurrent.futures import Future
 from typing import Optional, Dict, Any, List
-from urllib.parse import urlparse
 from codecs import encode
 import mimetypes
 
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.auth import TokenManager, get_access_token
+from pan123_common.bandwidth import get_default_bandwidth_governor
+from pan123_common.client import ApiClient
+from pan123_common.completion import CompletionTracker
+from pan123_common.filemap import FileMap, map_file
+from pan123_common.hash_cache import get_default_hash_cache
+from pan123_common.transport import PooledTransport, PooledResponse, get_default_transport
+
 
 def load_config(config_path: str = None) -> Dict[str, str]:
     """
@@ -70,7 +79,8 @@ class ImageHostingManager:
     """123云盘图床管理器"""
 
     def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
-                 client_secret: Optional[str] = None):
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None,
+                 slice_mmap: bool = False):
         """
         初始化图床管理器
 
@@ -78,8 +88,14 @@ class ImageHostingManager:
             access_token: 访问令牌（可选，如果提供则直接使用）
             client_id: 客户端ID（当access_token为空时使用）
             client_secret: 客户端密钥（当access_token为空时使用）
+            transport: HTTP传输层（可选，默认使用进程内共享的连接池）
+            slice_mmap: 是否以文件映射窗口发送分片（零拷贝；文件在上传期间被截断会使进程收到 SIGBUS，默认关闭）
         """
         self.api_base = "open-api.123pan.com"
+        self.transport = transport or get_default_transport()
+        self.slice_mmap = slice_mmap
+        # 进程内共享的带宽控制器：图片分片按配置的上传速率限速发送
+        self.bandwidth = get_default_bandwidth_governor()
 
         # 支持的图片格式
         self.SUPPORTED_FORMATS = ['png', 'gif', 'jpeg', 'jpg', 'tiff', 'tif', 'webp', 'svg', 'bmp']
@@ -93,6 +109,13 @@ class ImageHostingManager:
         else:
             raise ValueError("必须提供access_token或者client_id和client_secret")
 
+        # 令牌失效（401）时由 token_manager 自动重新认证并重放请求
+        self.token_manager = TokenManager(self.access_token, client_id, client_secret, self.transport)
+        self.api_client = ApiClient(self.transport, self.token_manager)
+
+        # 需要异步轮询的上传由同一个跟踪器按指数退避成批检查，上传下一张图片时不必等待
+        self.completions = CompletionTracker(self._poll_async_result)
+
     def _get_access_token(self, client_id: str, client_secret: str) -> str:
         """
         获取访问令牌
@@ -107,39 +130,23 @@ class ImageHostingManager:
         print("正在获取访问令牌...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
-
-            payload = json.dumps({
-                "clientID": client_id,
-                "clientSecret": client_secret
-            })
-
-            headers = {
-                'Platform': 'open_platform',
-                'Content-Type': 'application/json'
-            }
-
-            conn.request("POST", "/api/v1/access_token", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                access_token = result.get("data", {}).get("accessToken")
-                if access_token:
-                    print("✅ 访问令牌获取成功")
-                    return access_token
-                else:
-                    raise Exception("响应中未找到访问令牌")
-            else:
-                raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+            # 优先使用本地缓存的令牌（按client_id在多个进程间共享，过期前自动换新）
+            access_token = get_access_token(client_id, client_secret, self.transport)
+            print("✅ 访问令牌获取成功")
+            return access_token
 
         except Exception as e:
             print(f"❌ 获取访问令牌时发生错误: {e}")
             raise
 
+    def _request(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                 host: Optional[str] = None) -> PooledResponse:
+        """通过共享连接池发送请求（按接口QPS限流，令牌失效时自动重新认证），host为空时使用API服务器地址"""
+        response = self.api_client.request(method, host or self.api_base, path, body, headers)
+        # 重新认证后同步新令牌，后续构造的请求头直接使用新令牌
+        self.access_token = self.token_manager.access_token
+        return response
+
     def _get_headers(self) -> Dict[str, str]:
         """获取通用请求头"""
         return {
@@ -164,12 +171,8 @@ class ImageHostingManager:
         return f"{float_size:.1f} {units[unit_index]}"
 
     def _calculate_md5(self, file_path: str) -> str:
-        """计算文件MD5值"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        """计算文件MD5值（文件未变化时直接使用持久化哈希缓存中的结果）"""
+        return get_default_hash_cache().md5(file_path)
 
     def _calculate_slice_md5(self, file_path: str, start: int, size: int) -> str:
         """计算文件分片的MD5值"""
@@ -205,15 +208,12 @@ class ImageHostingManager:
         print(f"🗑️  正在删除 {len(file_ids)} 个图片...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({"fileIDs": file_ids})
 
-            conn.request("POST", "/api/v1/oss/file/delete", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/oss/file/delete", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -246,7 +246,6 @@ class ImageHostingManager:
         print(f"📦 正在移动 {len(file_ids)} 个图片...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({
@@ -254,10 +253,8 @@ class ImageHostingManager:
                 "toParentFileID": to_parent_file_id
             })
 
-            conn.request("POST", "/api/v1/oss/file/move", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/oss/file/move", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -291,7 +288,6 @@ class ImageHostingManager:
         print(f"📋 正在获取图片列表...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = {
@@ -309,10 +305,8 @@ class ImageHostingManager:
 
             payload_json = json.dumps(payload)
 
-            conn.request("POST", "/api/v1/oss/file/list", payload_json, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/oss/file/list", payload_json, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -361,13 +355,10 @@ class ImageHostingManager:
         print(f"🔍 正在获取图片详情...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", f"/api/v1/oss/file/detail?fileID={file_id}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", f"/api/v1/oss/file/detail?fileID={file_id}", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -416,7 +407,6 @@ class ImageHostingManager:
         print(f"📁 正在创建目录: {dir_name}")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({
@@ -425,10 +415,8 @@ class ImageHostingManager:
                 "type": 1
             })
 
-            conn.request("POST", "/upload/v1/oss/file/mkdir", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/upload/v1/oss/file/mkdir", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -480,7 +468,6 @@ class ImageHostingManager:
         print(f"📝 正在创建文件: {filename} (大小: {self._format_file_size(file_size)})")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({
@@ -491,10 +478,8 @@ class ImageHostingManager:
                 "type": 1
             })
 
-            conn.request("POST", "/upload/v1/oss/file/create", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/upload/v1/oss/file/create", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -531,7 +516,6 @@ class ImageHostingManager:
             上传URL
         """
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({
@@ -539,10 +523,8 @@ class ImageHostingManager:
                 "sliceNo": slice_no
             })
 
-            conn.request("POST", "/upload/v1/oss/file/get_upload_url", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/upload/v1/oss/file/get_upload_url", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -557,7 +539,8 @@ class ImageHostingManager:
             print(f"❌ 获取上传地址时发生错误: {e}")
             return None
 
-    def upload_slice(self, upload_url: str, file_path: str, start: int, size: int) -> bool:
+    def upload_slice(self, upload_url: str, file_path: str, start: int, size: int,
+                     file_map: Optional[FileMap] = None) -> bool:
         """
         上传分片到预签名URL
 
@@ -566,29 +549,25 @@ class ImageHostingManager:
             file_path: 文件路径
             start: 分片起始位置
             size: 分片大小
+            file_map: 文件映射（可选），提供时直接发送映射上的窗口，不复制分片数据
 
         Returns:
             成功返回True
         """
         try:
-            # 解析URL
-            parsed = urlparse(upload_url)
-            host = parsed.netloc
-            path = parsed.path + '?' + parsed.query if parsed.query else parsed.path
-
-            # 读取分片数据
-            with open(file_path, 'rb') as f:
-                f.seek(start)
-                slice_data = f.read(size)
+            # 分片数据：映射上的窗口（先确认文件没有被截断，否则访问映射会导致 SIGBUS），或读入内存
+            if file_map is not None:
+                file_map.check(start, size)
+                slice_data = file_map.window(start, size)
+            else:
+                with open(file_path, 'rb') as f:
+                    f.seek(start)
+                    slice_data = f.read(size)
 
             # 发送PUT请求
-            conn = http.client.HTTPSConnection(host)
             headers = {'Content-Type': 'application/octet-stream'}
 
-            conn.request("PUT", path, slice_data, headers)
-            response = conn.getresponse()
-            response.read()  # 读取响应内容
-            conn.close()
+            response = self.transport.request_url("PUT", upload_url, self.bandwidth.wrap_upload(slice_data), headers)
 
             if response.status == 200:
                 return True
@@ -600,28 +579,25 @@ class ImageHostingManager:
             print(f"❌ 上传分片时发生错误: {e}")
             return False
 
-    def upload_complete(self, preupload_id: str) -> Dict[str, Any]:
+    def submit_complete(self, preupload_id: str) -> Future:
         """
-        确认上传完成
+        确认上传完成，服务器需要异步处理时不等待结果
 
         Args:
             preupload_id: 预上传ID
 
         Returns:
-            上传完成结果
+            Future: 完成时得到上传结果；服务器已直接完成时返回已完成的 Future
         """
         print("⏰ 正在确认上传完成...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({"preuploadID": preupload_id})
 
-            conn.request("POST", "/upload/v1/oss/file/upload_complete", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/upload/v1/oss/file/upload_complete", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -629,12 +605,14 @@ class ImageHostingManager:
                 data_info = result.get("data", {})
 
                 if data_info.get("async", False):
-                    # 需要异步轮询
+                    # 需要异步轮询：交给跟踪器，与其他上传一起按退避间隔检查
                     print("需要异步轮询上传结果...")
-                    return self.poll_upload_result(preupload_id)
+                    return self.completions.submit(preupload_id, self.completions.initial_delay)
                 elif data_info.get("completed", False) and data_info.get("fileID"):
                     print(f"✅ 上传完成! 文件ID: {data_info.get('fileID')}")
-                    return {"success": True, "fileID": data_info.get("fileID")}
+                    future = Future()
+                    future.set_result({"success": True, "fileID": data_info.get("fileID")})
+                    return future
                 else:
                     raise Exception("上传未完成")
             else:
@@ -644,49 +622,54 @@ class ImageHostingManager:
             print(f"❌ 确认上传完成时发生错误: {e}")
             raise
 
-    def poll_upload_result(self, preupload_id: str, max_retries: int = 30) -> Dict[str, Any]:
+    def upload_complete(self, preupload_id: str) -> Dict[str, Any]:
         """
-        异步轮询获取上传结果
+        确认上传完成
 
         Args:
             preupload_id: 预上传ID
-            max_retries: 最大重试次数
 
         Returns:
-            上传结果
+            上传完成结果
         """
-        print("🔄 开始轮询上传结果...")
+        return self.submit_complete(preupload_id).result()
 
-        try:
-            conn = http.client.HTTPSConnection(self.api_base)
-            headers = self._get_headers()
+    def _poll_async_result(self, preupload_id: str) -> Optional[Dict[str, Any]]:
+        """检查一次异步上传的结果（由 completions 跟踪器调用），尚未完成时返回None"""
+        headers = self._get_headers()
 
-            payload = json.dumps({"preuploadID": preupload_id})
+        payload = json.dumps({"preuploadID": preupload_id})
 
-            for i in range(max_retries):
-                conn.request("POST", "/upload/v1/oss/file/upload_async_result", payload, headers)
-                response = conn.getresponse()
-                data = response.read().decode("utf-8")
+        response = self._request("POST", "/upload/v1/oss/file/upload_async_result", payload, headers)
+        result = json.loads(response.data.decode("utf-8"))
 
-                result = json.loads(data)
+        if result.get("code") != 0:
+            raise Exception(f"轮询失败: {result.get('message', '未知错误')}")
 
-                if result.get("code") == 0:
-                    data_info = result.get("data", {})
+        data_info = result.get("data", {})
+        if data_info.get("completed", False):
+            file_id = data_info.get("fileID")
+            print(f"✅ 上传完成! 文件ID: {file_id}")
+            return {"success": True, "fileID": file_id}
+        return None
 
-                    if data_info.get("completed", False):
-                        file_id = data_info.get("fileID")
-                        print(f"✅ 上传完成! 文件ID: {file_id}")
-                        conn.close()
-                        return {"success": True, "fileID": file_id}
-                    else:
-                        print(f"⏳ 上传处理中... ({i+1}/{max_retries})")
-                        time.sleep(1)
-                else:
-                    conn.close()
-                    raise Exception(f"轮询失败: {result.get('message', '未知错误')}")
+    def poll_upload_result(self, preupload_id: str, max_retries: int = 30) -> Dict[str, Any]:
+        """
+        异步轮询获取上传结果
+
+        检查间隔按指数退避增长，同时等待的多个上传由 completions 跟踪器成批检查。
+
+        Args:
+            preupload_id: 预上传ID
+            max_retries: 最大检查次数
 
-            conn.close()
-            raise Exception("轮询超时，上传可能未完成")
+        Returns:
+            上传结果
+        """
+        print("🔄 开始轮询上传结果...")
+
+        try:
+            return self.completions.wait(preupload_id, max_polls=max_retries)
 
         except Exception as e:
             print(f"❌ 轮询上传结果时发生错误: {e}")
@@ -703,6 +686,19 @@ class ImageHostingManager:
         Returns:
             上传结果
         """
+        return self.start_upload_image(file_path, parent_file_id).result()
+
+    def start_upload_image(self, file_path: str, parent_file_id: str = "") -> Future:
+        """
+        上传图片，分片传输完成后即返回，不等待服务器异步处理
+
+        Args:
+            file_path: 本地文件路径
+            parent_file_id: 父目录ID，空表示根目录
+
+        Returns:
+            Future: 完成时得到上传结果（success和fileID）
+        """
         if not os.path.exists(file_path):
             raise Exception(f"文件不存在: {file_path}")
 
@@ -717,7 +713,9 @@ class ImageHostingManager:
 
         if create_result.get("reuse", False):
             # 秒传成功
-            return {"success": True, "fileID": create_result.get("fileID")}
+            future = Future()
+            future.set_result({"success": True, "fileID": create_result.get("fileID")})
+            return future
 
         # 需要上传
         preupload_id = create_result.get("preuploadID")
@@ -730,28 +728,66 @@ class ImageHostingManager:
         total_slices = math.ceil(file_size / slice_size)
         print(f"📦 开始分片上传，总分片数: {total_slices}")
 
-        # 上传每个分片
-        for slice_no in range(1, total_slices + 1):
-            start_pos = (slice_no - 1) * slice_size
-            current_slice_size = min(slice_size, file_size - start_pos)
+        # 上传每个分片（开启映射时整个文件只映射一次，各分片发送映射上的窗口）
+        file_map = map_file(file_path) if self.slice_mmap else None
+        try:
+            for slice_no in range(1, total_slices + 1):
+                start_pos = (slice_no - 1) * slice_size
+                current_slice_size = min(slice_size, file_size - start_pos)
 
-            print(f"⬆️  正在上传分片 {slice_no}/{total_slices} (大小: {self._format_file_size(current_slice_size)})")
+                print(f"⬆️  正在上传分片 {slice_no}/{total_slices} (大小: {self._format_file_size(current_slice_size)})")
 
-            # 获取上传地址
-            upload_url = self.get_upload_url(preupload_id, slice_no)
-            if not upload_url:
-                raise Exception(f"获取分片 {slice_no} 上传地址失败")
+                # 获取上传地址
+                upload_url = self.get_upload_url(preupload_id, slice_no)
+                if not upload_url:
+                    raise Exception(f"获取分片 {slice_no} 上传地址失败")
 
-            # 上传分片
-            if not self.upload_slice(upload_url, file_path, start_pos, current_slice_size):
-                raise Exception(f"分片 {slice_no} 上传失败")
+                # 上传分片
+                if not self.upload_slice(upload_url, file_path, start_pos, current_slice_size, file_map):
+                    raise Exception(f"分片 {slice_no} 上传失败")
 
-            print(f"✅ 分片 {slice_no} 上传成功")
+                print(f"✅ 分片 {slice_no} 上传成功")
+        finally:
+            if file_map is not None:
+                file_map.close()
 
         print("✅ 所有分片上传完成")
 
         # 确认上传完成
-        return self.upload_complete(preupload_id)
+        return self.submit_complete(preupload_id)
+
+    def upload_images(self, file_paths: List[str], parent_file_id: str = "") -> List[Dict[str, Any]]:
+        """
+        依次上传多张图片
+
+        每张图片传输完成后立即开始下一张，服务器异步处理的结果由 completions 跟踪器统一轮询，
+        全部传输完成后再等待各自的结果。单张图片失败不影响其他图片。
+
+        Args:
+            file_paths: 本地文件路径列表
+            parent_file_id: 父目录ID，空表示根目录
+
+        Returns:
+            List[Dict[str, Any]]: 与 file_paths 一一对应的上传结果，失败时为 {"success": False, "error": 错误信息}
+        """
+        futures = []
+        for i, file_path in enumerate(file_paths, 1):
+            print(f"\n[{i}/{len(file_paths)}] {file_path}")
+            try:
+                futures.append(self.start_upload_image(file_path, parent_file_id))
+            except Exception as e:
+                print(f"❌ 上传失败: {e}")
+                future = Future()
+                future.set_exception(e)
+                futures.append(future)
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"success": False, "error": str(e)})
+        return results
 
     # ==================== 复制云盘图片 ====================
 
@@ -773,7 +809,6 @@ class ImageHostingManager:
         print(f"📋 正在创建复制任务...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({
@@ -783,10 +818,8 @@ class ImageHostingManager:
                 "type": 1
             })
 
-            conn.request("POST", "/api/v1/oss/source/copy", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/oss/source/copy", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -815,13 +848,10 @@ class ImageHostingManager:
         print(f"🔍 正在查询复制任务状态...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", f"/api/v1/oss/source/copy/process?taskID={task_id}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", f"/api/v1/oss/source/copy/process?taskID={task_id}", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -859,13 +889,10 @@ class ImageHostingManager:
         print(f"📋 正在获取复制失败文件列表...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", f"/api/v1/oss/source/copy/fail?taskID={task_id}&limit={limit}&page={page}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", f"/api/v1/oss/source/copy/fail?taskID={task_id}&limit={limit}&page={page}", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -910,7 +937,6 @@ class ImageHostingManager:
         print(f"🔗 URL: {url}")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = {"url": url, "type": 1}
@@ -923,10 +949,8 @@ class ImageHostingManager:
 
             payload_json = json.dumps(payload)
 
-            conn.request("POST", "/api/v1/oss/offline/download", payload_json, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/oss/offline/download", payload_json, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -955,13 +979,10 @@ class ImageHostingManager:
         print(f"🔍 正在查询离线迁移任务状态...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", f"/api/v1/oss/offline/download/process?taskID={task_id}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", f"/api/v1/oss/offline/download/process?taskID={task_id}", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -991,6 +1012,8 @@ def main():
         config = load_config()
         CLIENT_ID = config.get("CLIENT_ID")
         CLIENT_SECRET = config.get("CLIENT_SECRET")
+        SLICE_MMAP = config.get("SLICE_MMAP", "").strip().lower() in ("1", "true", "yes")
+        get_default_bandwidth_governor().configure(config)
 
         if not CLIENT_ID or not CLIENT_SECRET:
             raise ValueError("配置文件中缺少CLIENT_ID或CLIENT_SECRET")
@@ -1001,7 +1024,7 @@ def main():
 
     try:
         # 创建图床管理器实例
-        manager = ImageHostingManager(client_id=CLIENT_ID, client_secret=CLIENT_SECRET)
+        manager = ImageHostingManager(client_id=CLIENT_ID, client_secret=CLIENT_SECRET, slice_mmap=SLICE_MMAP)
 
         print("=" * 60)
         print("123云盘图床管理工具")
@@ -1081,9 +1104,16 @@ def main():
                     print("❌ 目录名不能为空")
 
             elif choice == "6":
-                # 上传图片
-                file_path = input("请输入图片文件路径: ").strip().replace('"', '')
-                if file_path and os.path.exists(file_path):
+                # 上传图片（输入目录时上传目录下的所有图片）
+                file_path = input("请输入图片文件或目录路径: ").strip().replace('"', '')
+                if file_path and os.path.isdir(file_path):
+                    parent_id = input("请输入父目录ID (直接回车表示根目录): ").strip()
+                    image_paths = [os.path.join(file_path, name) for name in sorted(os.listdir(file_path))
+                                   if name.rsplit('.', 1)[-1].lower() in manager.SUPPORTED_FORMATS]
+                    results = manager.upload_images(image_paths, parent_id)
+                    succeeded = sum(1 for r in results if r.get("success"))
+                    print(f"\n✅ 上传完成: 成功 {succeeded} 张，失败 {len(results) - succeeded} 张")
+                elif file_path and os.path.exists(file_path):
                     parent_id = input("请输入父目录ID (直接回车表示根目录): ").strip()
                     try:
                         manager.upload_image(file_path, parent_id)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+连接池握手次数基准测试
+
+功能说明：
+    在本地启动一个模拟123云盘API的HTTP服务器，分别用"每次请求新建连接"
+    （旧实现）和共享连接池 PooledTransport（新实现）发送相同数量的请求，
+    对比服务器端实际接受的TCP连接数（即握手次数）和总耗时。
+
+    本地回环不走TLS，因此这里以TCP连接数作为握手次数的计量；
+    对真实的 open-api.123pan.com 而言，每个新连接还要额外付出一次TLS握手。
+
+使用方法：
+    python bench_connection_pool.py
+    python bench_connection_pool.py --requests 500 --threads 8 --latency 0.002
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import http.client
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.transport import PooledTransport
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """模拟API：对任意请求返回 code=0 的JSON，支持keep-alive"""
+
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体合并为一次写出，避免Nagle算法与延迟ACK叠加造成的人为延迟
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # 每个处理器实例对应一个被接受的TCP连接
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        body = json.dumps({"code": 0, "message": "ok", "data": {}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(latency: float) -> ThreadingHTTPServer:
+    """在随机端口启动模拟服务器"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApiHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.connections = 0
+    server.stats_lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def request_without_pool(host: str, path: str, headers: dict) -> None:
+    """旧实现：每次请求新建连接，用完即关闭"""
+    conn = http.client.HTTPConnection(host)
+    conn.request("GET", path, "", headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+
+
+def run_case(server: ThreadingHTTPServer, send, total: int, threads: int) -> dict:
+    """执行一轮测试，返回连接数和耗时"""
+    with server.stats_lock:
+        server.connections = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: send(), range(total)))
+    elapsed = time.perf_counter() - start
+
+    return {"connections": server.connections, "elapsed": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连接池握手次数基准测试")
+    parser.add_argument("--requests", type=int, default=300, help="请求总数（默认300）")
+    parser.add_argument("--threads", type=int, default=4, help="并发线程数（默认4）")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器处理延迟，秒（默认0）")
+    args = parser.parse_args()
+
+    server = start_server(args.latency)
+    host = "127.0.0.1:%d" % server.server_address[1]
+    path = "/api/v2/file/list?parentFileId=0&limit=100"
+    headers = {"Authorization": "Bearer test", "Platform": "open_platform"}
+
+    print("=" * 60)
+    print("连接池握手次数基准测试")
+    print("=" * 60)
+    print(f"请求总数: {args.requests}    并发线程: {args.threads}    服务器延迟: {args.latency}s")
+
+    before = run_case(server, lambda: request_without_pool(host, path, headers), args.requests, args.threads)
+
+    transport = PooledTransport(pool_size=args.threads)
+    after = run_case(server, lambda: transport.request("GET", f"http://{host}", path, "", headers),
+                     args.requests, args.threads)
+    stats = transport.stats()
+    transport.close()
+    server.shutdown()
+
+    print("-" * 60)
+    print(f"{'方案':<16}{'握手次数':>10}{'总耗时(s)':>12}{'请求/秒':>12}")
+    print(f"{'每次新建连接':<14}{before['connections']:>10}{before['elapsed']:>12.3f}"
+          f"{args.requests / before['elapsed']:>12.1f}")
+    print(f"{'共享连接池':<15}{after['connections']:>10}{after['elapsed']:>12.3f}"
+          f"{args.requests / after['elapsed']:>12.1f}")
+    print("-" * 60)
+    print(f"连接池统计: 新建 {stats['connections_created']} 个连接，复用 {stats['connections_reused']} 次")
+    if after["connections"]:
+        print(f"✅ 握手次数减少为原来的 1/{before['connections'] / after['connections']:.0f}")
+
+
+if __name__ == "__main__":
+    main()
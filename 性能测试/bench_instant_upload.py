@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+秒传探测策略基准测试
+
+功能说明：
+    在本地启动一个模拟123云盘上传接口的HTTP服务器（按设定带宽限速接收文件内容，
+    已有相同MD5的文件在 create 时直接返回秒传），准备一批重复率较高的文件，
+    分别用原有策略（不超过1GB的文件一律单步上传）和按大小与命中率决定的探测策略上传，
+    对比总耗时、实际发送的文件字节数和 create 探测次数。
+
+    测试两批文件：1MB ~ --max-mb 的混合大小文件，以及 --small-max-kb 以内、重复率同样很高的小文件
+    （小文件单独看不值得探测，策略需要靠抽样探测学到命中率很高后才会先探测）。
+
+    create 接口照常受内置的每秒2次限流约束，因此探测本身的代价与真实环境一致。
+    测试前先为全部文件预热哈希缓存，两种策略的计时都不包含首次计算MD5的时间。
+
+使用方法：
+    python bench_instant_upload.py
+    python bench_instant_upload.py --files 40 --duplicates 0.75 --bandwidth 20
+    python bench_instant_upload.py --small-files 100 --small-max-kb 1024
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "上传文件"))
+
+# 哈希缓存和断点续传日志写入临时目录，不影响真实缓存
+os.environ["PAN123_CACHE_DIR"] = tempfile.mkdtemp(prefix="pan123_bench_")
+
+from pan123_common.hash_cache import get_default_hash_cache
+from pan123_common.transport import PooledTransport
+from pan123_common.upload_strategy import UploadStrategy
+from upload_to_123pan_v2 import Pan123Uploader
+
+
+SLICE_SIZE = Pan123Uploader.EXPECTED_SLICE_SIZES[0]
+
+
+class PlainTransport(PooledTransport):
+    """本地模拟服务器不走TLS：上传服务器地址一律按http连接"""
+
+    @staticmethod
+    def _split_host(host):
+        return "http", host.split("://")[-1]
+
+
+class FakeUploadHandler(BaseHTTPRequestHandler):
+    """模拟上传接口：domain、create、single/create、slice、upload_complete"""
+
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体合并为一次写出，避免Nagle算法与延迟ACK叠加造成的人为延迟
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _json(self, data):
+        body = json.dumps({"code": 0, "message": "ok", "data": data}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _receive(self) -> bytes:
+        """读取请求体，文件内容按设定带宽计时"""
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        if "/upload/v2/file/single/create" in self.path or "/upload/v2/file/slice" in self.path:
+            with self.server.stats_lock:
+                self.server.bytes_received += length
+            time.sleep(length / self.server.bandwidth)
+        return body
+
+    def do_GET(self):
+        self._receive()
+        self._json([self.server.base_url])
+
+    def do_POST(self):
+        body = self._receive()
+        server = self.server
+
+        if self.path.startswith("/upload/v2/file/create"):
+            payload = json.loads(body.decode("utf-8"))
+            with server.stats_lock:
+                server.creates += 1
+                known = payload["etag"] in server.known_etags
+                if not known:
+                    server.pending[payload["etag"]] = payload["etag"]
+            if known:
+                self._json({"reuse": True, "fileID": 1})
+            else:
+                self._json({"reuse": False, "preuploadID": payload["etag"],
+                            "sliceSize": SLICE_SIZE, "servers": [server.base_url]})
+        elif self.path.startswith("/upload/v2/file/single/create"):
+            etag = body.split(b'name="etag"\r\n\r\n', 1)[1].split(b"\r\n", 1)[0].decode("utf-8")
+            with server.stats_lock:
+                server.known_etags.add(etag)
+            self._json({"completed": True, "fileID": 1})
+        elif self.path.startswith("/upload/v2/file/upload_complete"):
+            preupload_id = json.loads(body.decode("utf-8"))["preuploadID"]
+            with server.stats_lock:
+                server.known_etags.add(server.pending.pop(preupload_id, preupload_id))
+            self._json({"completed": True, "fileID": 1})
+        else:
+            self._json({})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(bandwidth: float) -> ThreadingHTTPServer:
+    """在随机端口启动模拟服务器"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUploadHandler)
+    server.daemon_threads = True
+    server.bandwidth = bandwidth
+    server.base_url = "http://127.0.0.1:%d" % server.server_address[1]
+    server.stats_lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def make_corpus(directory: str, count: int, duplicates: float, min_kb: int, max_kb: int, seed: int,
+                prefix: str = "file"):
+    """
+    生成测试文件
+
+    Args:
+        directory: 目录
+        count: 文件数
+        duplicates: "云盘上已存在"的文件比例
+        min_kb: 最小文件大小（KB）
+        max_kb: 最大文件大小（KB）
+        seed: 随机种子
+        prefix: 文件名前缀
+
+    Returns:
+        Tuple[List[str], Set[str]]: 文件路径列表，以及"云盘上已存在"的文件MD5
+    """
+    rng = random.Random(seed)
+    paths = []
+    existing = set()
+
+    for i in range(count):
+        # 大小在 min_kb ~ max_kb 之间按对数均匀分布，小文件居多
+        size = int(1024 * min_kb * ((max_kb / min_kb) ** rng.random()))
+        data = rng.getrandbits(8 * size).to_bytes(size, "little")
+        path = os.path.join(directory, f"{prefix}_{i:03d}.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+        if rng.random() < duplicates:
+            existing.add(hashlib.md5(data).hexdigest())
+
+    return paths, existing
+
+
+def run_case(server: ThreadingHTTPServer, paths, existing, strategy: UploadStrategy) -> dict:
+    """用指定策略上传全部文件，返回耗时、发送字节数和探测次数"""
+    with server.stats_lock:
+        server.known_etags = set(existing)
+        server.pending = {}
+        server.bytes_received = 0
+        server.creates = 0
+
+    uploader = Pan123Uploader(access_token="bench", transport=PlainTransport())
+    uploader.api_base = server.base_url
+    uploader.strategy = strategy
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            uploader.upload_file(path)
+    elapsed = time.perf_counter() - start
+    uploader.transport.close()
+
+    return {"elapsed": elapsed, "bytes": server.bytes_received, "creates": server.creates,
+            "summary": strategy.summary()}
+
+
+def compare(server: ThreadingHTTPServer, title: str, paths, existing) -> None:
+    """用两种策略上传同一批文件并打印对比"""
+    total = sum(os.path.getsize(p) for p in paths)
+
+    # 预热哈希缓存（含分片MD5表），两种策略都不计首次哈希的耗时
+    cache = get_default_hash_cache()
+    for path in paths:
+        cache.digest(path, Pan123Uploader.EXPECTED_SLICE_SIZES)
+
+    print(f"\n【{title}】文件数: {len(paths)}    总大小: {total / 1024 / 1024:.1f} MB    已存在: {len(existing)} 个")
+
+    limit = Pan123Uploader.SINGLE_UPLOAD_LIMIT
+    before = run_case(server, paths, existing, UploadStrategy(limit, adaptive=False))
+    after = run_case(server, paths, existing, UploadStrategy(limit))
+
+    print("-" * 60)
+    print(f"{'方案':<16}{'总耗时(s)':>12}{'发送(MB)':>12}{'探测次数':>10}")
+    print(f"{'一律单步上传':<14}{before['elapsed']:>12.2f}{before['bytes'] / 1024 / 1024:>12.1f}"
+          f"{before['creates']:>10}")
+    print(f"{'按收益探测秒传':<13}{after['elapsed']:>12.2f}{after['bytes'] / 1024 / 1024:>12.1f}"
+          f"{after['creates']:>10}")
+    print("-" * 60)
+    print(f"探测策略统计: {after['summary']}")
+    if after["elapsed"]:
+        print(f"✅ 总耗时缩短为原来的 {after['elapsed'] / before['elapsed']:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="秒传探测策略基准测试")
+    parser.add_argument("--files", type=int, default=30, help="混合大小文件数（默认30）")
+    parser.add_argument("--duplicates", type=float, default=0.75, help="云盘上已存在的文件比例（默认0.75）")
+    parser.add_argument("--max-mb", type=int, default=64, help="混合大小文件的最大大小，MB（默认64）")
+    parser.add_argument("--small-files", type=int, default=60, help="小文件数（默认60，0为不测试）")
+    parser.add_argument("--small-max-kb", type=int, default=2048, help="小文件的最大大小，KB（默认2048）")
+    parser.add_argument("--bandwidth", type=float, default=20, help="模拟上传带宽，MB/s（默认20）")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子（默认1）")
+    args = parser.parse_args()
+
+    server = start_server(args.bandwidth * 1024 * 1024)
+
+    print("=" * 60)
+    print("秒传探测策略基准测试")
+    print("=" * 60)
+    print(f"带宽: {args.bandwidth} MB/s    已存在比例: {args.duplicates:.0%}")
+
+    with tempfile.TemporaryDirectory(prefix="pan123_corpus_") as directory:
+        paths, existing = make_corpus(directory, args.files, args.duplicates, 1024, args.max_mb * 1024, args.seed)
+        compare(server, "混合大小文件", paths, existing)
+
+        if args.small_files > 0:
+            paths, existing = make_corpus(directory, args.small_files, args.duplicates, 16, args.small_max_kb,
+                                          args.seed + 1, "small")
+            compare(server, "小文件", paths, existing)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+客户端限流器吞吐基准测试
+
+功能说明：
+    在本地启动一个按官方QPS表限流的模拟API服务器（超限返回 code=429），
+    对比两种典型负载在有无客户端限流器时的有效吞吐：
+
+    1. 文件列表遍历（api/v2/file/list，3 QPS）：
+       - 旧方式：多线程直接请求，遇到429后固定休眠1秒再试
+       - 新方式：经 ApiClient 按令牌桶等待恰好足够的时间
+    2. 离线下载任务提交（api/v1/offline/download）：
+       - 旧方式：每提交一个任务固定休眠5秒
+       - 新方式：经 ApiClient 限流
+
+使用方法：
+    python bench_rate_limit.py
+    python bench_rate_limit.py --list-requests 60 --offline-tasks 8
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.client import ApiClient
+from pan123_common.rate_limit import RateLimiter, normalize_endpoint, QPS_LIMITS, UNPUBLISHED_QPS_LIMITS
+from pan123_common.transport import PooledTransport
+
+
+LIST_PATH = "/api/v2/file/list?parentFileId=0&limit=100"
+OFFLINE_PATH = "/api/v1/offline/download"
+
+
+class ThrottledApiHandler(BaseHTTPRequestHandler):
+    """按1秒滑动窗口统计请求数，超过限流表时返回 code=429"""
+
+    protocol_version = "HTTP/1.1"
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+
+        endpoint = normalize_endpoint(self.path)
+        qps = self.server.limits.get(endpoint)
+        now = time.monotonic()
+
+        with self.server.stats_lock:
+            window = self.server.windows.setdefault(endpoint, deque())
+            while window and now - window[0] >= 1.0:
+                window.popleft()
+
+            if qps and len(window) >= qps:
+                self.server.throttled += 1
+                result = {"code": 429, "message": "请求太频繁"}
+            else:
+                window.append(now)
+                self.server.accepted += 1
+                result = {"code": 0, "message": "ok", "data": {}}
+
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    """在随机端口启动限流模拟服务器"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledApiHandler)
+    server.daemon_threads = True
+    server.limits = dict(QPS_LIMITS)
+    server.limits.update(UNPUBLISHED_QPS_LIMITS)
+    server.windows = {}
+    server.accepted = 0
+    server.throttled = 0
+    server.stats_lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def reset(server: ThreadingHTTPServer) -> None:
+    """清空统计并等待滑动窗口过期"""
+    time.sleep(1.0)
+    with server.stats_lock:
+        server.windows = {}
+        server.accepted = 0
+        server.throttled = 0
+
+
+def send_until_accepted(send) -> None:
+    """旧方式：遇到429后固定休眠1秒重试"""
+    while json.loads(send().data.decode("utf-8")).get("code") == 429:
+        time.sleep(1)
+
+
+def run(server, total: int, threads: int, send_one) -> dict:
+    """执行一轮负载，返回耗时、成功数和被限流次数"""
+    reset(server)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda _: send_one(), range(total)))
+    elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "accepted": server.accepted, "throttled": server.throttled}
+
+
+def print_row(name: str, result: dict) -> None:
+    rate = result["accepted"] / result["elapsed"] if result["elapsed"] else 0
+    print(f"{name:<22}{result['elapsed']:>10.2f}{result['accepted']:>8}{result['throttled']:>8}{rate:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="客户端限流器吞吐基准测试")
+    parser.add_argument("--list-requests", type=int, default=30, help="文件列表请求数（默认30）")
+    parser.add_argument("--threads", type=int, default=4, help="文件列表并发线程数（默认4）")
+    parser.add_argument("--offline-tasks", type=int, default=5, help="离线任务数（默认5）")
+    args = parser.parse_args()
+
+    server = start_server()
+    host = "http://127.0.0.1:%d" % server.server_address[1]
+    headers = {"Platform": "open_platform", "Content-Type": "application/json"}
+    transport = PooledTransport()
+    client = ApiClient(transport, rate_limiter=RateLimiter())
+
+    print("=" * 62)
+    print("客户端限流器吞吐基准测试")
+    print("=" * 62)
+    print(f"{'负载':<20}{'耗时(s)':>10}{'成功':>6}{'429':>8}{'有效请求/秒':>10}")
+
+    # 文件列表遍历
+    before = run(server, args.list_requests, args.threads, lambda: send_until_accepted(
+        lambda: transport.request("GET", host, LIST_PATH, "", headers)))
+    print_row("列表-遇429休眠重试", before)
+    after = run(server, args.list_requests, args.threads, lambda: send_until_accepted(
+        lambda: client.request("GET", host, LIST_PATH, "", headers)))
+    print_row("列表-客户端限流", after)
+
+    # 离线任务提交（单线程顺序提交，与 process_downloads 一致）
+    payload = json.dumps({"url": "https://example.com/file.zip"})
+    counter = {"sent": 0}
+
+    def submit_with_sleep():
+        transport.request("POST", host, OFFLINE_PATH, payload, headers)
+        counter["sent"] += 1
+        if counter["sent"] < args.offline_tasks:
+            time.sleep(5)
+
+    before = run(server, args.offline_tasks, 1, submit_with_sleep)
+    print_row("离线-固定休眠5秒", before)
+    after = run(server, args.offline_tasks, 1, lambda: client.request("POST", host, OFFLINE_PATH, payload, headers))
+    print_row("离线-客户端限流", after)
+
+    print("-" * 62)
+    print(f"限流器累计等待: {client.rate_limiter.total_wait:.2f}s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量小文件流水线上传基准测试
+
+功能说明：
+    在本地启动模拟123云盘上传接口的HTTP服务器（每个请求附加固定的往返延迟，
+    按设定带宽接收文件内容），生成一批小文件，分别用逐个调用 upload_file 和
+    流水线上传（upload_tasks：哈希 → 创建 → 传输 各阶段重叠进行）上传，
+    对比每秒完成的文件数。
+
+    两种方式各自使用一批内容不同的文件，哈希缓存都是冷的，计时包含计算MD5的时间。
+    部分文件在"云盘上已存在"，按上传策略探测秒传时 create 照常受内置的每秒2次限流约束。
+
+使用方法：
+    python bench_upload_pipeline.py
+    python bench_upload_pipeline.py --files 500 --latency 80 --duplicates 0.2
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import hashlib
+import argparse
+import tempfile
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer
+
+from bench_instant_upload import PlainTransport, FakeUploadHandler, ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "上传文件"))
+
+from upload_to_123pan_v2 import Pan123Uploader, RemoteFolderCache
+
+
+class LatencyUploadHandler(FakeUploadHandler):
+    """每个请求先等待固定的往返延迟再处理"""
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        super().do_GET()
+
+    def do_POST(self):
+        time.sleep(self.server.latency)
+        super().do_POST()
+
+
+def start_server(bandwidth: float, latency: float) -> ThreadingHTTPServer:
+    """在随机端口启动带延迟的模拟服务器"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LatencyUploadHandler)
+    server.daemon_threads = True
+    server.bandwidth = bandwidth
+    server.latency = latency
+    server.base_url = "http://127.0.0.1:%d" % server.server_address[1]
+    server.stats_lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def make_files(directory: str, count: int, max_kb: int, duplicates: float, rng: random.Random):
+    """
+    生成一批小文件
+
+    Returns:
+        Tuple[List[str], Set[str]]: 文件路径列表，以及"云盘上已存在"的文件MD5
+    """
+    os.makedirs(directory)
+    paths = []
+    existing = set()
+
+    for i in range(count):
+        size = rng.randint(1, max_kb) * 1024
+        data = rng.getrandbits(8 * size).to_bytes(size, "little")
+        path = os.path.join(directory, f"small_{i:04d}.bin")
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+        if rng.random() < duplicates:
+            existing.add(hashlib.md5(data).hexdigest())
+
+    return paths, existing
+
+
+def new_uploader(server: ThreadingHTTPServer, existing) -> Pan123Uploader:
+    with server.stats_lock:
+        server.known_etags = set(existing)
+        server.pending = {}
+        server.bytes_received = 0
+        server.creates = 0
+
+    uploader = Pan123Uploader(access_token="bench", transport=PlainTransport())
+    uploader.api_base = server.base_url
+    return uploader
+
+
+def run_sequential(server: ThreadingHTTPServer, paths, existing) -> dict:
+    """逐个调用 upload_file"""
+    uploader = new_uploader(server, existing)
+    failed = 0
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            try:
+                uploader.upload_file(path)
+            except Exception:
+                failed += 1
+    elapsed = time.perf_counter() - start
+    uploader.transport.close()
+
+    return {"elapsed": elapsed, "failed": failed, "creates": server.creates, "summary": ""}
+
+
+def run_pipeline(server: ThreadingHTTPServer, paths, existing, file_concurrency: int) -> dict:
+    """流水线上传（upload_tasks）"""
+    uploader = new_uploader(server, existing)
+    tasks = [(path, "", os.path.getsize(path)) for path in paths]
+    output = io.StringIO()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        _, failed = uploader.upload_tasks(tasks, RemoteFolderCache(uploader, 0), file_concurrency)
+    elapsed = time.perf_counter() - start
+    uploader.transport.close()
+
+    summary = [line for line in output.getvalue().splitlines() if line.startswith("📈")]
+    return {"elapsed": elapsed, "failed": len(failed), "creates": server.creates,
+            "summary": summary[-1] if summary else ""}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量小文件流水线上传基准测试")
+    parser.add_argument("--files", type=int, default=200, help="文件数（默认200）")
+    parser.add_argument("--max-kb", type=int, default=256, help="最大文件大小，KB（默认256）")
+    parser.add_argument("--latency", type=float, default=50, help="每个请求的往返延迟，毫秒（默认50）")
+    parser.add_argument("--bandwidth", type=float, default=50, help="模拟上传带宽，MB/s（默认50）")
+    parser.add_argument("--duplicates", type=float, default=0.1, help="云盘上已存在的文件比例（默认0.1）")
+    parser.add_argument("--concurrency", type=int, default=Pan123Uploader.DEFAULT_FILE_CONCURRENCY,
+                        help="流水线初始并发文件数")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子（默认1）")
+    args = parser.parse_args()
+
+    server = start_server(args.bandwidth * 1024 * 1024, args.latency / 1000)
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="pan123_pipeline_") as directory:
+        # 两种方式各用一批不同的文件，哈希缓存都是冷的
+        seq_paths, seq_existing = make_files(os.path.join(directory, "sequential"), args.files,
+                                             args.max_kb, args.duplicates, rng)
+        pipe_paths, pipe_existing = make_files(os.path.join(directory, "pipeline"), args.files,
+                                               args.max_kb, args.duplicates, rng)
+
+        print("=" * 60)
+        print("批量小文件流水线上传基准测试")
+        print("=" * 60)
+        print(f"文件数: {args.files}    最大: {args.max_kb} KB    延迟: {args.latency} ms    "
+              f"带宽: {args.bandwidth} MB/s    已存在: {args.duplicates:.0%}")
+
+        before = run_sequential(server, seq_paths, seq_existing)
+        after = run_pipeline(server, pipe_paths, pipe_existing, args.concurrency)
+
+    server.shutdown()
+
+    print("-" * 60)
+    print(f"{'方案':<14}{'总耗时(s)':>12}{'文件/秒':>10}{'探测次数':>10}{'失败':>6}")
+    for name, result in (("逐个上传", before), ("流水线上传", after)):
+        rate = args.files / result["elapsed"] if result["elapsed"] else 0.0
+        print(f"{name:<12}{result['elapsed']:>12.2f}{rate:>12.1f}{result['creates']:>10}{result['failed']:>6}")
+    print("-" * 60)
+    if after["summary"]:
+        print(after["summary"])
+    if after["elapsed"]:
+        print(f"✅ 每秒完成的文件数提高到原来的 {before['elapsed'] / after['elapsed']:.1f} 倍")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分片零拷贝发送基准测试
+
+功能说明：
+    生成一个测试文件，按16MB分片构造上传请求体并写入本地socket（另一端只丢弃数据），
+    对比几种构造分片请求体的方式在Python中复制分片数据的字节数（按每上传1GB折算）：
+
+    - 读入后拼接（原实现）：seek + read 出整个分片，再与部分头 b"".join 成完整请求体
+    - 预签名PUT读入（图床原实现）：read 出整个分片直接作为请求体
+    - add_file 按块读取（旧编码器）：发送时按1MB块 read
+    - 缓冲池预读：后台线程 readinto 可复用的缓冲区，以 memoryview 发送
+    - 映射窗口预读（当前实现）：整个文件映射一次，分片为映射上的 memoryview 窗口
+    - add_file 按区间映射（当前编码器）：发送时映射分片区间，按块产生 memoryview
+
+    复制字节数分两部分计量：
+    - read复制：内核 /proc/self/io 的 rchar 增量，即 read()/readinto() 从页缓存复制到Python缓冲区的字节数
+      （mmap 缺页不经过 read()，socket 接收端用 recv_into 也不计入）
+    - 拼接复制：每个分片发送期间 tracemalloc 记录的Python堆峰值减去该方式单次读取的缓冲区大小，
+      即拼接请求体时产生的额外副本
+
+    测试文件刚写入，数据都在页缓存中，因此对比的是CPU复制而不是磁盘速度。
+
+使用方法：
+    python bench_zero_copy_slices.py
+    python bench_zero_copy_slices.py --size 1024 --slice 16
+
+作者: Assistant
+创建日期: 2026/10/16
+"""
+
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.multipart import MultipartEncoder
+from pan123_common.readahead import BufferPool, SliceReadAhead
+
+MB = 1024 * 1024
+GB = 1024 * MB
+
+# 旧编码器按块读取的块大小
+LEGACY_CHUNK_SIZE = MB
+
+BOUNDARY = "----WebKitFormBoundary7MA4YWxkTrZu0gW"
+
+
+def read_rchar():
+    """读取本进程累计经 read() 类系统调用读取的字节数（不支持的平台返回None）"""
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+class DiscardSink:
+    """本地socket对：发送端供测试写入，接收端在后台线程用 recv_into 丢弃数据"""
+
+    def __init__(self):
+        self.sender, self._receiver = socket.socketpair()
+        self.received = 0
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        buffer = bytearray(MB)
+        while True:
+            n = self._receiver.recv_into(buffer)
+            if not n:
+                return
+            self.received += n
+
+    def send(self, body):
+        if isinstance(body, (bytes, bytearray, memoryview)):
+            self.sender.sendall(body)
+        else:
+            for chunk in body:
+                self.sender.sendall(chunk)
+
+    def close(self):
+        self.sender.close()
+        self._thread.join()
+        self._receiver.close()
+
+
+def slice_heads(slice_no: int):
+    """原实现中分片请求体的文本部分"""
+    head = [f"--{BOUNDARY}".encode()]
+    for name, value in (("preuploadID", "bench"), ("sliceNo", str(slice_no)), ("sliceMD5", "0" * 32)):
+        head.append(f'Content-Disposition: form-data; name="{name}"'.encode())
+        head.append(b"")
+        head.append(value.encode())
+        head.append(f"--{BOUNDARY}".encode())
+    head.append(f'Content-Disposition: form-data; name="slice"; filename="slice_{slice_no}"'.encode())
+    head.append(b"Content-Type: application/octet-stream")
+    head.append(b"")
+    return head
+
+
+def new_encoder(slice_no: int) -> MultipartEncoder:
+    body = MultipartEncoder(BOUNDARY, chunk_size=LEGACY_CHUNK_SIZE)
+    body.add_field("preuploadID", "bench")
+    body.add_field("sliceNo", slice_no)
+    body.add_field("sliceMD5", "0" * 32)
+    return body
+
+
+class LegacyFileEncoder(MultipartEncoder):
+    """旧编码器：文件部分发送时按块 read"""
+
+    def __iter__(self):
+        for head, kind, payload, size in self._parts:
+            if kind != "file":
+                yield head + payload + b"\r\n"
+                continue
+            yield head
+            with open(payload[0], "rb") as f:
+                f.seek(payload[1])
+                remaining = size
+                while remaining > 0:
+                    chunk = f.read(min(self.chunk_size, remaining))
+                    remaining -= len(chunk)
+                    yield chunk
+            yield b"\r\n"
+        yield self._closing()
+
+
+# ==================== 各种方式：每个函数逐个产生分片请求体 ====================
+
+def bodies_join(path, slices, pool):
+    for slice_no, offset, size in slices:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(size)
+        yield b"\r\n".join(slice_heads(slice_no) + [data, f"--{BOUNDARY}--".encode(), b""])
+
+
+def bodies_put_read(path, slices, pool):
+    for slice_no, offset, size in slices:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            yield f.read(size)
+
+
+def bodies_legacy_add_file(path, slices, pool):
+    for slice_no, offset, size in slices:
+        body = LegacyFileEncoder(BOUNDARY, chunk_size=LEGACY_CHUNK_SIZE)
+        body.add_field("sliceNo", slice_no)
+        body.add_file("slice", f"slice_{slice_no}", path, offset=offset, length=size)
+        yield body
+
+
+def _bodies_readahead(path, slices, pool, use_mmap):
+    with SliceReadAhead(path, slices, 4, pool, use_mmap) as readahead:
+        for slice_no, offset, size in slices:
+            data = readahead.get(slice_no)
+            try:
+                yield new_encoder(slice_no).add_buffer("slice", f"slice_{slice_no}", data.view)
+            finally:
+                data.release()
+
+
+def bodies_pool(path, slices, pool):
+    return _bodies_readahead(path, slices, pool, False)
+
+
+def bodies_mapped(path, slices, pool):
+    return _bodies_readahead(path, slices, pool, True)
+
+
+def bodies_add_file(path, slices, pool):
+    for slice_no, offset, size in slices:
+        yield new_encoder(slice_no).add_file("slice", f"slice_{slice_no}", path, offset=offset, length=size)
+
+
+# (名称, 构造函数, 单次读取的缓冲区大小：0表示不读取或缓冲区在计时前已分配)
+SCENARIOS = [
+    ("读入后拼接（原实现）", bodies_join, "slice"),
+    ("预签名PUT读入（图床原实现）", bodies_put_read, "slice"),
+    ("add_file按块读取（旧编码器）", bodies_legacy_add_file, LEGACY_CHUNK_SIZE),
+    ("缓冲池预读", bodies_pool, 0),
+    ("映射窗口预读（当前实现）", bodies_mapped, 0),
+    ("add_file按区间映射（当前编码器）", bodies_add_file, 0),
+]
+
+
+def run_scenario(path, slices, build, read_size, slice_size) -> dict:
+    """发送全部分片，返回耗时和两部分复制字节数"""
+    # 缓冲池在计时前分配好（与长期运行的上传器一样复用缓冲区）
+    pool = BufferPool(8 * slice_size)
+    warm = [pool.acquire(slice_size) for _ in range(6)]
+    for buffer in warm:
+        buffer.release()
+
+    sink = DiscardSink()
+    reads_before = read_rchar()
+    concat = 0
+    tracemalloc.start()
+
+    own_read = slice_size if read_size == "slice" else read_size
+    bodies = build(path, slices, pool)
+
+    start = time.perf_counter()
+    while True:
+        # 构造和发送一个分片请求体期间的堆峰值
+        tracemalloc.clear_traces()
+        body = next(bodies, None)
+        if body is None:
+            break
+        sink.send(body)
+        concat += max(0, tracemalloc.get_traced_memory()[1] - own_read)
+        del body
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.stop()
+    reads_after = read_rchar()
+    sink.close()
+
+    reads = reads_after - reads_before if reads_before is not None else None
+    return {"elapsed": elapsed, "reads": reads, "concat": concat, "sent": sink.received}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片零拷贝发送基准测试")
+    parser.add_argument("--size", type=int, default=256, help="测试文件大小，MB（默认256）")
+    parser.add_argument("--slice", type=int, default=16, help="分片大小，MB（默认16）")
+    args = parser.parse_args()
+
+    slice_size = args.slice * MB
+    file_size = args.size * MB + 12345
+    slices = [(n + 1, offset, min(slice_size, file_size - offset))
+              for n, offset in enumerate(range(0, file_size, slice_size))]
+
+    with tempfile.TemporaryDirectory(prefix="pan123_zero_copy_") as directory:
+        path = os.path.join(directory, "slices.bin")
+        with open(path, "wb") as f:
+            for _ in range(0, file_size, MB):
+                f.write(os.urandom(MB))
+            f.truncate(file_size)
+
+        print("=" * 84)
+        print("分片零拷贝发送基准测试")
+        print("=" * 84)
+        print(f"文件: {file_size / MB:.1f} MB    分片: {args.slice} MB × {len(slices)}")
+        if read_rchar() is None:
+            print("⚠️  当前平台没有 /proc/self/io，read复制一栏不可用")
+
+        results = []
+        for name, build, read_size in SCENARIOS:
+            results.append((name, run_scenario(path, slices, build, read_size, slice_size)))
+
+    scale = GB / file_size
+    print("-" * 84)
+    print(f"{'方式':<34}{'read复制':>10}{'拼接复制':>10}{'合计(GB/GB)':>13}{'MB/s':>9}")
+    for name, result in results:
+        reads = result["reads"] * scale / GB if result["reads"] is not None else None
+        concat = result["concat"] * scale / GB
+        total = (reads or 0.0) + concat
+        rate = file_size / MB / result["elapsed"] if result["elapsed"] else 0.0
+        reads_text = f"{reads:>10.2f}" if reads is not None else f"{'n/a':>10}"
+        print(f"{name:<{36 - sum(1 for ch in name if ord(ch) > 127)}}{reads_text}{concat:>10.2f}"
+              f"{total:>13.2f}{rate:>9.0f}")
+    print("-" * 84)
+    print("✅ 复制字节数按每上传1GB折算；映射方式的分片数据由内核直接从页缓存发送到socket")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,7 @@
     - 文件搜索：支持模糊搜索和精准搜索两种模式
     - 批量查询：一次性获取所有页面的文件列表
     - 智能过滤：自动过滤回收站文件，保持结果清晰
+    - 异步接口：AsyncPan123Query 提供同名协程方法，便于在事件循环中并发查询
 
 技术特点：
     - 使用v2 API，性能更优
@@ -26,12 +27,19 @@
 """
 
 import json
-import http.client
 import sys
 import os
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from urllib.parse import quote
 
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.aio import AsyncApiClient, AsyncTransport
+from pan123_common.auth import TokenManager, get_access_token
+from pan123_common.client import ApiClient
+from pan123_common.transport import PooledTransport, PooledResponse, get_default_transport
+
 
 # ==================== 配置文件处理 ====================
 
@@ -120,7 +128,7 @@ class Pan123Query:
     }
 
     def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
-                 client_secret: Optional[str] = None):
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None):
         """
         初始化查询器
 
@@ -132,11 +140,13 @@ class Pan123Query:
             access_token: API访问令牌（可选）
             client_id: 客户端ID（当access_token为空时必需）
             client_secret: 客户端密钥（当access_token为空时必需）
+            transport: HTTP传输层（可选，默认使用进程内共享的连接池）
 
         Raises:
             ValueError: 未提供有效的认证信息
         """
         self.api_base = self.API_BASE
+        self.transport = transport or get_default_transport()
 
         # 根据提供的参数选择认证方式
         if access_token:
@@ -146,11 +156,15 @@ class Pan123Query:
         else:
             raise ValueError("必须提供access_token或者client_id和client_secret")
 
+        # 令牌失效（401）时由 token_manager 自动重新认证并重放请求
+        self.token_manager = TokenManager(self.access_token, client_id, client_secret, self.transport)
+        self.api_client = ApiClient(self.transport, self.token_manager)
+
     def _get_access_token(self, client_id: str, client_secret: str) -> str:
         """
         获取API访问令牌
 
-        向123云盘开放平台认证服务器请求访问令牌。
+        优先使用本地缓存的令牌，缓存缺失或即将过期时向123云盘开放平台认证服务器请求新令牌。
         令牌用于后续所有API调用的身份验证。
 
         Args:
@@ -166,44 +180,23 @@ class Pan123Query:
         print("正在获取访问令牌...")
 
         try:
-            # 建立HTTPS连接
-            conn = http.client.HTTPSConnection(self.api_base)
-
-            # 构造请求体
-            payload = json.dumps({
-                "clientID": client_id,
-                "clientSecret": client_secret
-            })
-
-            # 设置请求头
-            headers = {
-                'Platform': 'open_platform',
-                'Content-Type': 'application/json'
-            }
-
-            # 发送POST请求
-            conn.request("POST", "/api/v1/access_token", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-
-            # 解析响应
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                access_token = result.get("data", {}).get("accessToken")
-                if access_token:
-                    print("✅ 访问令牌获取成功")
-                    return access_token
-                else:
-                    raise Exception("响应中未找到访问令牌")
-            else:
-                raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+            # 优先使用本地缓存的令牌（按client_id在多个进程间共享，过期前自动换新）
+            access_token = get_access_token(client_id, client_secret, self.transport)
+            print("✅ 访问令牌获取成功")
+            return access_token
 
         except Exception as e:
             print(f"❌ 获取访问令牌时发生错误: {e}")
             raise
 
+    def _request(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                 host: Optional[str] = None) -> PooledResponse:
+        """通过共享连接池发送请求（按接口QPS限流，令牌失效时自动重新认证），host为空时使用API服务器地址"""
+        response = self.api_client.request(method, host or self.api_base, path, body, headers)
+        # 重新认证后同步新令牌，后续构造的请求头直接使用新令牌
+        self.access_token = self.token_manager.access_token
+        return response
+
     def _get_headers(self) -> Dict[str, str]:
         """
         构造API请求头
@@ -293,48 +286,9 @@ class Pan123Query:
         print(f"正在获取文件列表 (目录ID: {parent_file_id})")
 
         try:
-            # 建立连接
-            conn = http.client.HTTPSConnection(self.api_base)
-            headers = self._get_headers()
-
-            # 构建查询参数
-            params = f"?parentFileId={parent_file_id}&limit={limit}"
-            if last_file_id is not None:
-                params += f"&lastFileId={last_file_id}"
-
-            # 发送请求
-            conn.request("GET", f"/api/v2/file/list{params}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-
-            # 解析响应
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                data = result.get("data", {})
-                file_list = data.get("fileList", [])
-                last_file_id = data.get("lastFileId", -1)
-
-                # 过滤回收站文件（除非明确要求包含）
-                if not include_trashed:
-                    file_list = [f for f in file_list if f.get("trashed", 0) == 0]
-
-                print(f"✅ 获取到 {len(file_list)} 个文件/文件夹")
-
-                # 格式化输出文件列表
-                if file_list:
-                    self._print_file_list(file_list)
-
-                return {
-                    "success": True,
-                    "files": file_list,
-                    "last_file_id": last_file_id,
-                    "has_more": last_file_id != -1,
-                    "limit": limit
-                }
-            else:
-                raise Exception(f"获取文件列表失败: {result.get('message', '未知错误')}")
+            response = self._request("GET", self._list_path(limit, last_file_id, parent_file_id), "",
+                                     self._get_headers())
+            return self._file_list_result(response, limit, include_trashed)
 
         except Exception as e:
             print(f"❌ 获取文件列表时发生错误: {e}")
@@ -365,48 +319,9 @@ class Pan123Query:
         print(f"正在搜索文件: '{keyword}' (模式: {'精准' if search_mode == 1 else '模糊'})")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
-            headers = self._get_headers()
-
-            # 构建查询参数 - URL编码搜索关键词
-            encoded_keyword = quote(keyword)
-            params = f"?parentFileId=0&limit={limit}&searchData={encoded_keyword}&searchMode={search_mode}"
-            if last_file_id is not None:
-                params += f"&lastFileId={last_file_id}"
-
-            # 发送请求
-            conn.request("GET", f"/api/v2/file/list{params}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-
-            # 解析响应
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                data = result.get("data", {})
-                file_list = data.get("fileList", [])
-                last_file_id = data.get("lastFileId", -1)
-
-                # 过滤回收站文件
-                if not include_trashed:
-                    file_list = [f for f in file_list if f.get("trashed", 0) == 0]
-
-                print(f"✅ 搜索到 {len(file_list)} 个匹配的文件/文件夹")
-
-                # 格式化输出搜索结果
-                if file_list:
-                    self._print_search_results(file_list)
-
-                return {
-                    "success": True,
-                    "files": file_list,
-                    "last_file_id": last_file_id,
-                    "has_more": last_file_id != -1,
-                    "keyword": keyword
-                }
-            else:
-                raise Exception(f"搜索文件失败: {result.get('message', '未知错误')}")
+            response = self._request("GET", self._list_path(limit, last_file_id, keyword=keyword,
+                                                            search_mode=search_mode), "", self._get_headers())
+            return self._search_result(response, keyword, include_trashed)
 
         except Exception as e:
             print(f"❌ 搜索文件时发生错误: {e}")
@@ -455,6 +370,90 @@ class Pan123Query:
 
         return all_files
 
+    def _list_path(self, limit: int, last_file_id: Optional[int], parent_file_id: int = 0,
+                   keyword: Optional[str] = None, search_mode: int = 0) -> str:
+        """
+        构造文件列表接口的请求路径（同步版和协程版共用）
+
+        Args:
+            limit: 每页数量
+            last_file_id: 翻页查询时的起始文件ID
+            parent_file_id: 父目录ID
+            keyword: 搜索关键词（为空时只列出目录）
+            search_mode: 搜索模式
+
+        Returns:
+            str: 带查询参数的请求路径
+        """
+        params = f"?parentFileId={parent_file_id}&limit={limit}"
+        if keyword is not None:
+            # URL编码搜索关键词
+            params += f"&searchData={quote(keyword)}&searchMode={search_mode}"
+        if last_file_id is not None:
+            params += f"&lastFileId={last_file_id}"
+        return f"/api/v2/file/list{params}"
+
+    def _parse_list_page(self, response: PooledResponse, include_trashed: bool,
+                         action: str) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        解析一页文件列表响应
+
+        Args:
+            response: 文件列表接口的响应
+            include_trashed: 是否保留回收站文件
+            action: 操作名称（用于错误信息）
+
+        Returns:
+            Tuple[List[Dict[str, Any]], int]: (文件列表, 下一页起始ID（-1表示无更多数据）)
+
+        Raises:
+            Exception: API返回错误
+        """
+        result = json.loads(response.data.decode("utf-8"))
+        if result.get("code") != 0:
+            raise Exception(f"{action}失败: {result.get('message', '未知错误')}")
+
+        data = result.get("data", {})
+        file_list = data.get("fileList", [])
+
+        # 过滤回收站文件（除非明确要求包含）
+        if not include_trashed:
+            file_list = [f for f in file_list if f.get("trashed", 0) == 0]
+
+        return file_list, data.get("lastFileId", -1)
+
+    def _file_list_result(self, response: PooledResponse, limit: int, include_trashed: bool) -> Dict[str, Any]:
+        """解析并输出一页文件列表，返回 get_file_list 的结果字典"""
+        file_list, last_file_id = self._parse_list_page(response, include_trashed, "获取文件列表")
+
+        print(f"✅ 获取到 {len(file_list)} 个文件/文件夹")
+        if file_list:
+            self._print_file_list(file_list)
+
+        return {
+            "success": True,
+            "files": file_list,
+            "last_file_id": last_file_id,
+            "has_more": last_file_id != -1,
+            "limit": limit
+        }
+
+    def _search_result(self, response: PooledResponse, keyword: str, include_trashed: bool) -> Dict[str, Any]:
+        """解析并输出一页搜索结果，返回 search_files 的结果字典"""
+        file_list, last_file_id = self._parse_list_page(response, include_trashed, "搜索文件")
+
+        print(f"✅ 搜索到 {len(file_list)} 个匹配的文件/文件夹")
+        if file_list:
+            self._print_search_results(file_list)
+
+        return {
+            "success": True,
+            "files": file_list,
+            "last_file_id": last_file_id,
+            "has_more": last_file_id != -1,
+            "keyword": keyword
+        }
+
     def _print_file_list(self, file_list: List[Dict[str, Any]]) -> None:
         """
         格式化打印文件列表
@@ -502,6 +501,102 @@ class Pan123Query:
             print(f"{file_id:<12} {file_type:<6} {file_name:<25} {file_size:<12} {category:<8} {parent_id:<10} {update_time}")
 
 
+class AsyncPan123Query(Pan123Query):
+    """
+    123云盘文件查询器（asyncio版本）
+
+    方法名、参数和返回值与 Pan123Query 一致，但查询方法均为协程，
+    基于 pan123_common.aio 的异步传输层发送请求，可在一个事件循环中并发查询多个目录。
+    并发请求仍受接口QPS限流（文件列表接口 3 QPS）。
+
+    使用示例:
+        >>> async def main():
+        ...     query = AsyncPan123Query(client_id="your_id", client_secret="your_secret")
+        ...     results = await asyncio.gather(*(query.get_file_list(folder_id) for folder_id in folder_ids))
+        ...     await query.aclose()
+    """
+
+    def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None,
+                 async_transport: Optional[AsyncTransport] = None):
+        """
+        初始化异步查询器
+
+        Args:
+            access_token: API访问令牌（可选）
+            client_id: 客户端ID（当access_token为空时必需）
+            client_secret: 客户端密钥（当access_token为空时必需）
+            transport: 同步HTTP传输层（仅用于获取和刷新令牌）
+            async_transport: 异步HTTP传输层（可选，默认新建）
+        """
+        super().__init__(access_token, client_id, client_secret, transport)
+        self.async_client = AsyncApiClient(async_transport, self.token_manager)
+
+    async def _arequest(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                        host: Optional[str] = None) -> PooledResponse:
+        """通过异步连接池发送请求（限流、重试、重新认证与 _request 相同）"""
+        response = await self.async_client.request(method, host or self.api_base, path, body, headers)
+        self.access_token = self.token_manager.access_token
+        return response
+
+    async def get_file_list(self, parent_file_id: int = 0, limit: int = 100,
+                            last_file_id: Optional[int] = None, include_trashed: bool = False) -> Dict[str, Any]:
+        """获取文件列表（协程版 Pan123Query.get_file_list）"""
+        print(f"正在获取文件列表 (目录ID: {parent_file_id})")
+
+        try:
+            response = await self._arequest("GET", self._list_path(limit, last_file_id, parent_file_id), "",
+                                            self._get_headers())
+            return self._file_list_result(response, limit, include_trashed)
+
+        except Exception as e:
+            print(f"❌ 获取文件列表时发生错误: {e}")
+            raise
+
+    async def search_files(self, keyword: str, search_mode: int = 0, limit: int = 100,
+                           last_file_id: Optional[int] = None, include_trashed: bool = False) -> Dict[str, Any]:
+        """搜索文件（协程版 Pan123Query.search_files）"""
+        print(f"正在搜索文件: '{keyword}' (模式: {'精准' if search_mode == 1 else '模糊'})")
+
+        try:
+            response = await self._arequest("GET", self._list_path(limit, last_file_id, keyword=keyword,
+                                                                   search_mode=search_mode), "", self._get_headers())
+            return self._search_result(response, keyword, include_trashed)
+
+        except Exception as e:
+            print(f"❌ 搜索文件时发生错误: {e}")
+            raise
+
+    async def get_file_list_all_pages(self, parent_file_id: int = 0, limit: int = 100,
+                                      include_trashed: bool = False) -> List[Dict[str, Any]]:
+        """获取所有页面的文件列表（协程版 Pan123Query.get_file_list_all_pages）"""
+        all_files = []
+        last_file_id = None
+
+        print("正在获取所有页面的文件列表...")
+
+        while True:
+            result = await self.get_file_list(parent_file_id, limit, last_file_id, include_trashed)
+
+            if not result.get("success"):
+                break
+
+            all_files.extend(result.get("files", []))
+
+            if not result.get("has_more", False):
+                break
+
+            last_file_id = result.get("last_file_id")
+            if last_file_id == -1:
+                break
+
+        return all_files
+
+    async def aclose(self) -> None:
+        """关闭异步连接池中的空闲连接"""
+        await self.async_client.transport.close()
+
+
 # ==================== 主程序 ====================
 
 def main():
@@ -17,12 +17,18 @@
 """
 
 import json
-import http.client
 import sys
 import os
 from typing import Optional, Dict, Any, List
 from datetime import datetime, timedelta
 
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common.auth import TokenManager, get_access_token
+from pan123_common.client import ApiClient
+from pan123_common.transport import PooledTransport, PooledResponse, get_default_transport
+
 
 def load_config(config_path: str = None) -> Dict[str, str]:
     """
@@ -66,7 +72,7 @@ class DirectLinkManager:
     """123云盘直链管理器"""
 
     def __init__(self, access_token: Optional[str] = None, client_id: Optional[str] = None,
-                 client_secret: Optional[str] = None):
+                 client_secret: Optional[str] = None, transport: Optional[PooledTransport] = None):
         """
         初始化直链管理器
 
@@ -74,8 +80,10 @@ class DirectLinkManager:
             access_token: 访问令牌（可选，如果提供则直接使用）
             client_id: 客户端ID（当access_token为空时使用）
             client_secret: 客户端密钥（当access_token为空时使用）
+            transport: HTTP传输层（可选，默认使用进程内共享的连接池）
         """
         self.api_base = "open-api.123pan.com"
+        self.transport = transport or get_default_transport()
 
         if access_token:
             self.access_token = access_token
@@ -84,6 +92,10 @@ class DirectLinkManager:
         else:
             raise ValueError("必须提供access_token或者client_id和client_secret")
 
+        # 令牌失效（401）时由 token_manager 自动重新认证并重放请求
+        self.token_manager = TokenManager(self.access_token, client_id, client_secret, self.transport)
+        self.api_client = ApiClient(self.transport, self.token_manager)
+
     def _get_access_token(self, client_id: str, client_secret: str) -> str:
         """
         获取访问令牌
@@ -98,39 +110,23 @@ class DirectLinkManager:
         print("正在获取访问令牌...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
-
-            payload = json.dumps({
-                "clientID": client_id,
-                "clientSecret": client_secret
-            })
-
-            headers = {
-                'Platform': 'open_platform',
-                'Content-Type': 'application/json'
-            }
-
-            conn.request("POST", "/api/v1/access_token", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
-
-            result = json.loads(data)
-
-            if result.get("code") == 0:
-                access_token = result.get("data", {}).get("accessToken")
-                if access_token:
-                    print("✅ 访问令牌获取成功")
-                    return access_token
-                else:
-                    raise Exception("响应中未找到访问令牌")
-            else:
-                raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+            # 优先使用本地缓存的令牌（按client_id在多个进程间共享，过期前自动换新）
+            access_token = get_access_token(client_id, client_secret, self.transport)
+            print("✅ 访问令牌获取成功")
+            return access_token
 
         except Exception as e:
             print(f"❌ 获取访问令牌时发生错误: {e}")
             raise
 
+    def _request(self, method: str, path: str, body=None, headers: Optional[Dict[str, str]] = None,
+                 host: Optional[str] = None) -> PooledResponse:
+        """通过共享连接池发送请求（按接口QPS限流，令牌失效时自动重新认证），host为空时使用API服务器地址"""
+        response = self.api_client.request(method, host or self.api_base, path, body, headers)
+        # 重新认证后同步新令牌，后续构造的请求头直接使用新令牌
+        self.access_token = self.token_manager.access_token
+        return response
+
     def _get_headers(self) -> Dict[str, str]:
         """获取通用请求头"""
         return {
@@ -167,13 +163,10 @@ class DirectLinkManager:
         print(f"🔗 正在获取文件 {file_id} 的直链...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", f"/api/v1/direct-link/url?fileID={file_id}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", f"/api/v1/direct-link/url?fileID={file_id}", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -207,15 +200,12 @@ class DirectLinkManager:
         print(f"🔓 正在启用文件夹 {file_id} 的直链空间...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({"fileID": file_id})
 
-            conn.request("POST", "/api/v1/direct-link/enable", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/direct-link/enable", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -244,15 +234,12 @@ class DirectLinkManager:
         print(f"🔒 正在禁用文件夹 {file_id} 的直链空间...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({"fileID": file_id})
 
-            conn.request("POST", "/api/v1/direct-link/disable", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/direct-link/disable", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -278,15 +265,12 @@ class DirectLinkManager:
         print("🔄 正在刷新直链缓存...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({})
 
-            conn.request("POST", "/api/v1/direct-link/cache/refresh", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/direct-link/cache/refresh", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -325,7 +309,6 @@ class DirectLinkManager:
         print(f"⏰ 时间范围: {start_time} ~ {end_time}")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             # URL编码
@@ -333,10 +316,8 @@ class DirectLinkManager:
             params = f"?pageNum={page_num}&pageSize={page_size}"
             params += f"&startTime={quote(start_time)}&endTime={quote(end_time)}"
 
-            conn.request("GET", f"/api/v1/direct-link/log{params}", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", f"/api/v1/direct-link/log{params}", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -388,7 +369,6 @@ class DirectLinkManager:
         print(f"⏰ 时间范围: {start_hour} ~ {end_hour}")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({
@@ -398,10 +378,8 @@ class DirectLinkManager:
                 "pageSize": page_size
             })
 
-            conn.request("GET", "/api/v1/direct-link/offline/logs", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", "/api/v1/direct-link/offline/logs", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -445,13 +423,10 @@ class DirectLinkManager:
         print("🔍 正在获取IP黑名单...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
-            conn.request("GET", "/api/v1/developer/config/forbide-ip/list", "", headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("GET", "/api/v1/developer/config/forbide-ip/list", "", headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -495,15 +470,12 @@ class DirectLinkManager:
         print(f"📝 正在更新IP黑名单 ({len(ip_list)} 个IP)...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({"IpList": ip_list})
 
-            conn.request("POST", "/api/v1/developer/config/forbide-ip/update", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/developer/config/forbide-ip/update", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -534,15 +506,12 @@ class DirectLinkManager:
         print(f"🔧 正在{action}IP黑名单...")
 
         try:
-            conn = http.client.HTTPSConnection(self.api_base)
             headers = self._get_headers()
 
             payload = json.dumps({"Status": status})
 
-            conn.request("POST", "/api/v1/developer/config/forbide-ip/switch", payload, headers)
-            response = conn.getresponse()
-            data = response.read().decode("utf-8")
-            conn.close()
+            response = self._request("POST", "/api/v1/developer/config/forbide-ip/switch", payload, headers)
+            data = response.data.decode("utf-8")
 
             result = json.loads(data)
 
@@ -11,7 +11,7 @@
     - 批量处理：支持从文件批量读取下载链接
     - 手动输入：支持交互式手动输入下载链接
     - 任务管理：自动创建和跟踪下载任务状态
-    - 智能重试：任务间自动延迟，避免频率限制
+    - 客户端限流：按接口QPS自动控制提交频率，避免频率限制
 
 技术特点：
     - 使用v1 API，稳定可靠
@@ -27,14 +27,19 @@
 基于: 123云盘开放平台 API v1
 """
 
-import http.client
 import json
-import time
 import os
 import argparse
 import sys
 from typing import Optional, List, Dict, Any
 
+# 将项目根目录加入模块搜索路径，以便导入公共模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pan123_common import auth
+from pan123_common.client import ApiClient
+from pan123_common.retry import get_default_retry_policy
+
 # ==================== 配置文件处理 ====================
 
 def load_config(config_path: Optional[str] = None) -> Dict[str, str]:
@@ -96,7 +101,7 @@ def get_access_token(client_id: str, client_secret: str) -> str:
     """
     获取API访问令牌
 
-    向123云盘开放平台认证服务器请求访问令牌。
+    优先使用本地缓存的令牌，缓存缺失或即将过期时向123云盘开放平台认证服务器请求新令牌。
     令牌用于后续所有API调用的身份验证。
 
     Args:
@@ -112,39 +117,10 @@ def get_access_token(client_id: str, client_secret: str) -> str:
     print("正在获取访问令牌...")
 
     try:
-        # 建立HTTPS连接
-        conn = http.client.HTTPSConnection("open-api.123pan.com")
-
-        # 构造请求体
-        payload = json.dumps({
-            "clientID": client_id,
-            "clientSecret": client_secret
-        })
-
-        # 设置请求头
-        headers = {
-            'Platform': 'open_platform',
-            'Content-Type': 'application/json'
-        }
-
-        # 发送POST请求
-        conn.request("POST", "/api/v1/access_token", payload, headers)
-        response = conn.getresponse()
-        data = response.read().decode("utf-8")
-        conn.close()
-
-        # 解析响应
-        result = json.loads(data)
-
-        if result.get("code") == 0:
-            access_token = result.get("data", {}).get("accessToken")
-            if access_token:
-                print("✅ 访问令牌获取成功")
-                return access_token
-            else:
-                raise Exception("响应中未找到访问令牌")
-        else:
-            raise Exception(f"获取访问令牌失败: {result.get('message', '未知错误')}")
+        # 优先使用本地缓存的令牌（按client_id在多个进程间共享，过期前自动换新）
+        access_token = auth.get_access_token(client_id, client_secret)
+        print("✅ 访问令牌获取成功")
+        return access_token
 
     except Exception as e:
         print(f"❌ 获取访问令牌时发生错误: {e}")
@@ -154,7 +130,8 @@ def get_access_token(client_id: str, client_secret: str) -> str:
 # ==================== 离线下载任务 ====================
 
 def create_offline_download(access_token: str, url: str, file_name: Optional[str] = None,
-                          dir_id: Optional[int] = None, callback_url: Optional[str] = None) -> Optional[Dict[str, Any]]:
+                          dir_id: Optional[int] = None, callback_url: Optional[str] = None,
+                          token_manager: Optional[auth.TokenManager] = None) -> Optional[Dict[str, Any]]:
     """
     创建离线下载任务
 
@@ -166,6 +143,7 @@ def create_offline_download(access_token: str, url: str, file_name: Optional[str
         file_name: 自定义文件名（可选，默认使用原文件名）
         dir_id: 目标目录ID（可选，默认为根目录）
         callback_url: 任务完成回调地址（可选）
+        token_manager: 令牌管理器（可选，提供时令牌失效会自动重新认证并重试）
 
     Returns:
         Optional[Dict[str, Any]]: API响应数据，失败时返回None
@@ -179,9 +157,6 @@ def create_offline_download(access_token: str, url: str, file_name: Optional[str
     else:
         print("📁 使用默认文件名")
 
-    # 建立HTTPS连接
-    conn = http.client.HTTPSConnection("open-api.123pan.com")
-
     # 构建请求数据
     payload_data = {"url": url}
 
@@ -195,6 +170,10 @@ def create_offline_download(access_token: str, url: str, file_name: Optional[str
     payload = json.dumps(payload_data)
     print(f"📋 请求数据: {payload}")
 
+    # 令牌可能已被重新认证更新
+    if token_manager is not None:
+        access_token = token_manager.access_token
+
     # 设置请求头
     headers = {
         'Content-Type': 'application/json',
@@ -203,12 +182,10 @@ def create_offline_download(access_token: str, url: str, file_name: Optional[str
     }
 
     try:
-        # 发送POST请求
-        conn.request("POST", "/api/v1/offline/download", payload, headers)
-
-        # 获取响应
-        res = conn.getresponse()
-        data = res.read()
+        # 发送POST请求（按接口QPS限流，复用共享连接池中的keep-alive连接）
+        res = ApiClient(token_manager=token_manager).request("POST", "open-api.123pan.com",
+                                                             "/api/v1/offline/download", payload, headers)
+        data = res.data
 
         # 解析响应数据
         response_text = data.decode("utf-8")
@@ -220,8 +197,6 @@ def create_offline_download(access_token: str, url: str, file_name: Optional[str
     except Exception as e:
         print(f"❌ 请求失败: {e}")
         return None
-    finally:
-        conn.close()
 
 
 # ==================== 用户输入处理 ====================
@@ -312,21 +287,23 @@ def get_urls_from_file(file_path: str) -> List[str]:
 
 # ==================== 任务批处理 ====================
 
-def process_downloads(access_token: str, urls: List[str]) -> None:
+def process_downloads(access_token: str, urls: List[str],
+                      token_manager: Optional[auth.TokenManager] = None) -> None:
     """
     批量处理下载任务列表
 
     遍历URL列表，为每个URL创建离线下载任务。
-    任务间自动延迟5秒，避免触发API频率限制。
+    提交频率由客户端限流器按接口QPS控制，只等待恰好足够的时间，避免触发API频率限制。
 
     Args:
         access_token: API访问令牌
         urls: URL列表
+        token_manager: 令牌管理器（可选，长批次中令牌失效时自动重新认证）
 
     功能:
         - 逐个创建离线下载任务
         - 统计成功和失败数量
-        - 任务间延迟避免频率限制
+        - 按接口QPS限流避免频率限制
         - 显示详细的进度信息
     """
     if not urls:
@@ -347,7 +324,8 @@ def process_downloads(access_token: str, urls: List[str]) -> None:
         result = create_offline_download(
             access_token=access_token,
             url=url,
-            file_name=None  # 使用默认文件名
+            file_name=None,  # 使用默认文件名
+            token_manager=token_manager
         )
 
         if result:
@@ -363,17 +341,16 @@ def process_downloads(access_token: str, urls: List[str]) -> None:
             print("❌ 请求失败")
             failed_count += 1
 
-        # 如果不是最后一个任务，等待5秒
-        if i < len(urls):
-            print("⏳ 等待5秒后继续...")
-            time.sleep(5)
-
         print("-" * 40)
 
     print(f"\n🎉 所有任务处理完成！")
     print(f"✅ 成功: {success_count} 个")
     print(f"❌ 失败: {failed_count} 个")
 
+    metrics = get_default_retry_policy().metrics
+    if metrics.retries:
+        print(f"🔁 重试统计: {metrics.summary()}")
+
 
 # ==================== 主程序 ====================
 
@@ -410,6 +387,7 @@ def main() -> None:
     try:
         # 获取访问令牌
         ACCESS_TOKEN = get_access_token(CLIENT_ID, CLIENT_SECRET)
+        TOKEN_MANAGER = auth.TokenManager(ACCESS_TOKEN, CLIENT_ID, CLIENT_SECRET)
     except Exception as e:
         print(f"❌ 无法获取访问令牌: {e}")
         return
@@ -433,14 +411,14 @@ def main() -> None:
             # 手动输入
             urls = get_urls_from_input()
             if urls:
-                process_downloads(ACCESS_TOKEN, urls)
+                process_downloads(ACCESS_TOKEN, urls, TOKEN_MANAGER)
         elif choice == "2":
             # 从文件读取
             file_path = input("请输入文件路径: ").strip().replace('"', '')
             if file_path:
                 urls = get_urls_from_file(file_path)
                 if urls:
-                    process_downloads(ACCESS_TOKEN, urls)
+                    process_downloads(ACCESS_TOKEN, urls, TOKEN_MANAGER)
         else:
             print("❌ 无效选项，请重新选择")
 